@@ -7,14 +7,129 @@ project_root_dir = os.path.abspath(os.path.join(current_script_dir, '..'))
 if project_root_dir not in sys.path:
     sys.path.insert(0, project_root_dir)
 
+import threading
+from dataclasses import dataclass
+
 from rdf_utils.rdf_manager_trading import RDFManagerTrading
+from agentes.registro_configs_indicador import RegistroConfigsIndicador, ConfigIndicador
 from rdflib import Literal, URIRef
 from rdflib.namespace import XSD, RDF
 
+# Periodo de las barras con las que se analiza cada trade:horizonteTemporal
+PERIODO_POR_HORIZONTE = {"CORTO_PLAZO": "1h", "MEDIO_PLAZO": "4h", "LARGO_PLAZO": "1d"}
+PERIODO_PREDETERMINADO = "1d"
+
+@dataclass(frozen=True)
+class Estrategia:
+    uri: URIRef
+    nombre_local: str
+    nombre_display: str
+    par_mercado_uri: URIRef
+    par_mercado_label: str
+    nivel_riesgo: str
+    horizonte_temporal: str
+    configuraciones_indicadores: tuple[ConfigIndicador, ...] = ()
+
+    @property
+    def periodo_tiempo(self) -> str:
+        return PERIODO_POR_HORIZONTE.get(self.horizonte_temporal, PERIODO_PREDETERMINADO)
+
+class CacheEstrategias:
+    """
+    Caché de estrategias resueltas. Cada entrada registra las tripletas (sujeto, predicado)
+    de las que se construyó (incluidas las de sus configuraciones); un cambio confirmado en el grafo que toque alguna de ellas
+    invalida solo las estrategias afectadas. El predicado None representa cualquier
+    predicado del sujeto (la propia estrategia).
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entradas = {} # uri estrategia -> Estrategia
+        self._dependencias = {} # (sujeto, predicado | None) -> {uri estrategia}
+        self._claves_por_entrada = {} # uri estrategia -> [(sujeto, predicado | None)]
+        self._generacion = 0 # Aumenta con cada invalidación; evita guardar resultados leídos antes de ella
+        self.aciertos = 0
+        self.fallos = 0
+        self.invalidaciones = 0
+
+    def obtener(self, estrategia_uri: URIRef) -> Estrategia | None:
+        with self._lock:
+            estrategia = self._entradas.get(estrategia_uri)
+            if estrategia is None:
+                self.fallos += 1
+            else:
+                self.aciertos += 1
+            return estrategia
+
+    def generacion(self) -> int:
+        with self._lock:
+            return self._generacion
+
+    def guardar(self, estrategia: Estrategia, dependencias: list[tuple], generacion: int):
+        """Guarda la estrategia si no hubo invalidaciones desde 'generacion' (cuando se empezó a leer)."""
+        with self._lock:
+            if generacion != self._generacion:
+                return
+            self._entradas[estrategia.uri] = estrategia
+            self._claves_por_entrada[estrategia.uri] = dependencias
+            for clave in dependencias:
+                self._dependencias.setdefault(clave, set()).add(estrategia.uri)
+
+    def invalidar(self, estrategia_uri: URIRef):
+        with self._lock:
+            self._invalidar(estrategia_uri)
+
+    def _invalidar(self, estrategia_uri: URIRef):
+        self._generacion += 1
+        if self._entradas.pop(estrategia_uri, None) is None:
+            return
+        self.invalidaciones += 1
+        for clave in self._claves_por_entrada.pop(estrategia_uri, []):
+            afectadas = self._dependencias.get(clave)
+            if afectadas is not None:
+                afectadas.discard(estrategia_uri)
+                if not afectadas:
+                    del self._dependencias[clave]
+
+    def notificar_cambios(self, añadidas=(), eliminadas=()):
+        """Suscriptor de RDFManagerTrading: invalida las estrategias que dependen de las tripletas cambiadas."""
+        with self._lock:
+            if not self._dependencias:
+                return
+            afectadas = set()
+            for tripletas in (añadidas, eliminadas):
+                for s, p, _ in tripletas:
+                    afectadas.update(self._dependencias.get((s, p), ()))
+                    afectadas.update(self._dependencias.get((s, None), ()))
+            for estrategia_uri in afectadas:
+                self._invalidar(estrategia_uri)
+
+    def vaciar(self):
+        with self._lock:
+            self._generacion += 1
+            self._entradas.clear()
+            self._dependencias.clear()
+            self._claves_por_entrada.clear()
+
+    def estadisticas(self) -> dict:
+        with self._lock:
+            consultas = self.aciertos + self.fallos
+            return {
+                "entradas": len(self._entradas),
+                "aciertos": self.aciertos,
+                "fallos": self.fallos,
+                "invalidaciones": self.invalidaciones,
+                "tasa_aciertos": self.aciertos / consultas if consultas else 0.0,
+            }
+
 class AgentePerfilEstrategia:
-    def __init__(self, rdf_manager: RDFManagerTrading):
+    def __init__(self, rdf_manager: RDFManagerTrading, usar_cache: bool = True,
+                 registro_configs: RegistroConfigsIndicador | None = None):
         self.rdf_manager = rdf_manager
         self.ns = rdf_manager.ns_manager 
+        self.registro_configs = registro_configs or RegistroConfigsIndicador(rdf_manager)
+        self.cache = CacheEstrategias() if usar_cache else None
+        if self.cache is not None:
+            rdf_manager.suscribir_cambios(self.cache.notificar_cambios)
 
     def definir_o_actualizar_estrategia(self,
                                         nombre_estrategia_local: str,
@@ -27,127 +142,86 @@ class AgentePerfilEstrategia:
         estrategia_uri = self.ns.get_uri(nombre_estrategia_local)
         par_mercado_uri = self.ns.get_uri(par_mercado_local)
         
-        triples_a_eliminar = list(self.rdf_manager.graph.triples((estrategia_uri, None, None)))
-        for triple in triples_a_eliminar:
-            self.rdf_manager.graph.remove(triple)
-
-        self.rdf_manager.agregar_tripleta(estrategia_uri, RDF.type, self.ns.trade.Estrategia)
-        self.rdf_manager.agregar_tripleta(estrategia_uri, self.ns.trade.nombreEstrategia, Literal(nombre_display_estrategia, lang="es"))
-        self.rdf_manager.agregar_tripleta(estrategia_uri, self.ns.trade.monitoreaPar, par_mercado_uri)
-        self.rdf_manager.agregar_tripleta(estrategia_uri, self.ns.trade.nivelRiesgoPreferido, Literal(nivel_riesgo))
-        self.rdf_manager.agregar_tripleta(estrategia_uri, self.ns.trade.horizonteTemporal, Literal(horizonte_temporal))
-
-        for config_indicador_local in uris_config_indicadores:
-            config_indicador_uri = self.ns.get_uri(config_indicador_local)
-            self.rdf_manager.agregar_tripleta(estrategia_uri, self.ns.trade.utilizaConfigIndicador, config_indicador_uri)
+        with self.rdf_manager.lote_escritura() as lote:
+            lote.eliminar(estrategia_uri, None, None)
+            lote.agregar_entidad(estrategia_uri, self.ns.trade.Estrategia, {
+                self.ns.trade.nombreEstrategia: Literal(nombre_display_estrategia, lang="es"),
+                self.ns.trade.monitoreaPar: par_mercado_uri,
+                self.ns.trade.nivelRiesgoPreferido: Literal(nivel_riesgo),
+                self.ns.trade.horizonteTemporal: Literal(horizonte_temporal),
+                self.ns.trade.utilizaConfigIndicador: [self.ns.get_uri(c) for c in uris_config_indicadores],
+            })
+        if self.cache is not None:
+            self.cache.invalidar(estrategia_uri)
 
         print(f"AgentePerfilEstrategia: Estrategia '{nombre_display_estrategia}' (<{estrategia_uri.split('#')[-1]}>) definida/actualizada.")
         self.rdf_manager.guardar_datos() 
         return estrategia_uri
 
-    def obtener_estrategia_activa(self, nombre_estrategia_local: str = "EstrategiaPredeterminada") -> dict | None:
+    def obtener_estrategia_activa(self, nombre_estrategia_local: str = "EstrategiaPredeterminada") -> Estrategia | None:
         estrategia_uri = self.ns.get_uri(nombre_estrategia_local)
-        
-        query_final = f"""
-            PREFIX trade: <{self.ns.trade}>
-            PREFIX rdf: <{RDF}>
-            SELECT 
-                ?nombreEstrategia ?parMonitoreadoURI ?simboloBase ?simboloCotizacion 
-                ?nivelRiesgo ?horizonteTemporal
-                (GROUP_CONCAT(DISTINCT STR(?configIndicadorURI); separator=",") AS ?configsIndicadoresURIs)
-                (GROUP_CONCAT(DISTINCT ?nombreCfgInd; separator="||") AS ?nombresConfigsIndicadores)
-            WHERE {{
-                <{estrategia_uri}> rdf:type trade:Estrategia ;
-                                 trade:nombreEstrategia ?nombreEstrategia ;
-                                 trade:monitoreaPar ?parMonitoreadoURI ;
-                                 trade:nivelRiesgoPreferido ?nivelRiesgo ;
-                                 trade:horizonteTemporal ?horizonteTemporal .
-                
-                ?parMonitoreadoURI trade:tieneActivoBase ?activoBaseURI ;
-                                   trade:tieneActivoCotizacion ?activoCotizacionURI .
-                ?activoBaseURI trade:simboloCripto ?simboloBase .
-                ?activoCotizacionURI trade:simboloCripto ?simboloCotizacion .
-                
-                OPTIONAL {{
-                    <{estrategia_uri}> trade:utilizaConfigIndicador ?configIndicadorURI .
-                    OPTIONAL {{ ?configIndicadorURI trade:nombreConfigIndicador ?nombreCfgInd . }}
-                }}
-            }}
-            GROUP BY ?nombreEstrategia ?parMonitoreadoURI ?simboloBase ?simboloCotizacion ?nivelRiesgo ?horizonteTemporal
-            LIMIT 1
-        """
-        resultados = self.rdf_manager.ejecutar_sparql(query_final)
-
-        if resultados:
-            filas = list(resultados)
-            if not filas:
-                print(f"AgentePerfilEstrategia: No se encontraron detalles (QUERY FINAL vacía) para '{nombre_estrategia_local}'.")
-                # --- DEBUG: Imprimir todas las tripletas para esta URI de estrategia ---
-                q_debug_existencia = f"""
-                    PREFIX trade: <{self.ns.trade}>
-                    PREFIX rdf: <{RDF}>
-                    SELECT ?p ?o 
-                    WHERE {{ <{estrategia_uri}> ?p ?o . }}"""
-                print(f"DEBUG: Datos existentes para <{estrategia_uri}> en el grafo actual:")
-                res_debug_existencia = self.rdf_manager.ejecutar_sparql(q_debug_existencia)
-                if res_debug_existencia:
-                    count_debug_triples = 0
-                    for r_debug in res_debug_existencia:
-                        print(f"  -> {r_debug['p'].n3(self.rdf_manager.graph.namespace_manager)} :: {r_debug['o'].n3(self.rdf_manager.graph.namespace_manager)}")
-                        count_debug_triples +=1
-                    if count_debug_triples == 0:
-                        print(f"  -> No se encontraron tripletas directas para <{estrategia_uri}>.")
-                # --- FIN DEBUG ---
-                return None
-
-            fila = filas[0] 
-            fila_dict = fila.asdict() 
-            
-            claves_esperadas = ["nombreEstrategia", "parMonitoreadoURI", "simboloBase", 
-                                "simboloCotizacion", "nivelRiesgo", "horizonteTemporal"]
-            claves_faltantes = [k for k in claves_esperadas if k not in fila_dict or fila_dict[k] is None] # Verificar también si el valor es None
-
-            if claves_faltantes:
-                print(f"AgentePerfilEstrategia: Faltan datos esenciales o valores nulos (QUERY FINAL) para '{nombre_estrategia_local}'.")
-                print(f"  Claves esperadas pero faltantes/nulas: {claves_faltantes}")
-                print(f"  Diccionario de la fila devuelta: {fila_dict}")
-                return None
-
-            configs_uris_str = fila_dict.get("configsIndicadoresURIs")
-            nombres_configs_str = fila_dict.get("nombresConfigsIndicadores")
-            
-            lista_configs = []
-            if configs_uris_str and str(configs_uris_str).strip(): 
-                uris = str(configs_uris_str).split(',')
-                nombres = str(nombres_configs_str).split('||') if nombres_configs_str and str(nombres_configs_str).strip() else [None] * len(uris)
-                
-                temp_nombres = [None] * len(uris)
-                nombres_disponibles = str(nombres_configs_str).split('||') if nombres_configs_str and str(nombres_configs_str).strip() else []
-                
-                for i, uri_str_val in enumerate(uris):
-                    if uri_str_val and uri_str_val.strip():
-                        nombre_display_config = nombres[i] if i < len(nombres) and nombres[i] and nombres[i].strip() else uri_str_val.split('#')[-1]
-                        lista_configs.append({
-                            "uri": uri_str_val,
-                            "nombre_local": uri_str_val.split('#')[-1],
-                            "nombre_display": nombre_display_config
-                        })
-            
-            estrategia_data = {
-                "uri": str(estrategia_uri),
-                "nombre_local": nombre_estrategia_local,
-                "nombre_display": str(fila_dict["nombreEstrategia"]),
-                "par_mercado_uri": str(fila_dict["parMonitoreadoURI"]),
-                "par_mercado_label": f"{fila_dict['simboloBase']}/{fila_dict['simboloCotizacion']}",
-                "nivel_riesgo": str(fila_dict["nivelRiesgo"]),
-                "horizonte_temporal": str(fila_dict["horizonteTemporal"]),
-                "configuraciones_indicadores": lista_configs
-            }
-            print(f"AgentePerfilEstrategia: Estrategia activa recuperada: {estrategia_data['nombre_display']}")
-            return estrategia_data
-        
-        print(f"AgentePerfilEstrategia: No se encontró la estrategia '{nombre_estrategia_local}' (bloque de resultados vacío para QUERY FINAL).")
-        return None
+        if self.cache is None:
+            return self._resolver_estrategia(nombre_estrategia_local, estrategia_uri)[0]
+
+        estrategia = self.cache.obtener(estrategia_uri)
+        if estrategia is not None:
+            return estrategia
+        generacion = self.cache.generacion()
+        estrategia, dependencias = self._resolver_estrategia(nombre_estrategia_local, estrategia_uri)
+        if estrategia is not None:
+            self.cache.guardar(estrategia, dependencias, generacion)
+        return estrategia
+
+    def _resolver_estrategia(self, nombre_estrategia_local: str, estrategia_uri: URIRef) -> tuple[Estrategia | None, list]:
+        """Lee la estrategia del grafo. Devuelve (estrategia, dependencias) con las (sujeto, predicado) leídas."""
+        resultados = self.rdf_manager.ejecutar_consulta("estrategia_activa", estrategia=estrategia_uri)
+        if resultados is None:
+            print(f"AgentePerfilEstrategia: No se encontró la estrategia '{nombre_estrategia_local}' (error en la consulta).")
+            return None, []
+
+        filas = list(resultados)
+        if not filas:
+            print(f"AgentePerfilEstrategia: No se encontraron detalles para '{nombre_estrategia_local}'.")
+            # --- DEBUG: Imprimir todas las tripletas para esta URI de estrategia ---
+            print(f"DEBUG: Datos existentes para <{estrategia_uri}> en el grafo actual:")
+            res_debug_existencia = self.rdf_manager.ejecutar_consulta("tripletas_sujeto", sujeto=estrategia_uri)
+            if res_debug_existencia:
+                count_debug_triples = 0
+                for r_debug in res_debug_existencia:
+                    print(f"  -> {r_debug['p'].n3(self.rdf_manager.graph.namespace_manager)} :: {r_debug['o'].n3(self.rdf_manager.graph.namespace_manager)}")
+                    count_debug_triples +=1
+                if count_debug_triples == 0:
+                    print(f"  -> No se encontraron tripletas directas para <{estrategia_uri}>.")
+            # --- FIN DEBUG ---
+            return None, []
+        fila = filas[0].asdict()
+
+        # Las configuraciones (con tipo y parámetros) salen del registro, cargado en bloque
+        res_configs = self.rdf_manager.ejecutar_consulta("configs_estrategia", estrategia=estrategia_uri)
+        lista_configs = tuple(self.registro_configs.obtener(fila_cfg["config"]) for fila_cfg in (res_configs or []))
+        estrategia = Estrategia(
+            uri=estrategia_uri,
+            nombre_local=nombre_estrategia_local,
+            nombre_display=str(fila["nombreEstrategia"]),
+            par_mercado_uri=fila["parMonitoreadoURI"],
+            par_mercado_label=f"{fila['simboloBase']}/{fila['simboloCotizacion']}",
+            nivel_riesgo=str(fila["nivelRiesgo"]),
+            horizonte_temporal=str(fila["horizonteTemporal"]),
+            configuraciones_indicadores=lista_configs,
+        )
+
+        trade = self.ns.trade
+        dependencias = [
+            (estrategia_uri, None),
+            (estrategia.par_mercado_uri, trade.tieneActivoBase),
+            (estrategia.par_mercado_uri, trade.tieneActivoCotizacion),
+            (fila["activoBaseURI"], trade.simboloCripto),
+            (fila["activoCotizacionURI"], trade.simboloCripto),
+        ]
+        dependencias.extend((config.uri, None) for config in lista_configs)
+
+        print(f"AgentePerfilEstrategia: Estrategia activa recuperada: {estrategia.nombre_display}")
+        return estrategia, dependencias
 
 # Bloque de prueba
 if __name__ == '__main__':
@@ -188,13 +262,13 @@ if __name__ == '__main__':
         print("\n--- Obteniendo estrategia predeterminada de datos_trading_muestra.ttl ---")
         estrategia_cargada = agente_estrategia.obtener_estrategia_activa("EstrategiaPredeterminada")
         if estrategia_cargada:
-            print(f"Estrategia Cargada: {estrategia_cargada['nombre_display']}")
-            print(f"  Par Monitoreado: {estrategia_cargada['par_mercado_label']} (<{estrategia_cargada['par_mercado_uri'].split('#')[-1] if estrategia_cargada['par_mercado_uri'] else 'N/A'}>)")
-            print(f"  Nivel de Riesgo: {estrategia_cargada['nivel_riesgo']}")
-            if estrategia_cargada['configuraciones_indicadores']:
+            print(f"Estrategia Cargada: {estrategia_cargada.nombre_display}")
+            print(f"  Par Monitoreado: {estrategia_cargada.par_mercado_label} (<{estrategia_cargada.par_mercado_uri.split('#')[-1] if estrategia_cargada.par_mercado_uri else 'N/A'}>)")
+            print(f"  Nivel de Riesgo: {estrategia_cargada.nivel_riesgo}")
+            if estrategia_cargada.configuraciones_indicadores:
                 print(f"  Indicadores Configurados:")
-                for cfg_ind in estrategia_cargada['configuraciones_indicadores']:
-                    print(f"    - {cfg_ind['nombre_display']} (<{cfg_ind['nombre_local']}>)")
+                for cfg_ind in estrategia_cargada.configuraciones_indicadores:
+                    print(f"    - {cfg_ind.nombre_display} (<{cfg_ind.nombre_local}>)")
             else:
                 print("  No hay indicadores configurados para esta estrategia.")
         else:
@@ -227,17 +301,29 @@ if __name__ == '__main__':
         print(f"\n--- Obteniendo la nueva estrategia '{nombre_nueva_estrategia_local}' ---")
         nueva_estrategia_obtenida = agente_estrategia.obtener_estrategia_activa(nombre_nueva_estrategia_local)
         if nueva_estrategia_obtenida:
-            print(f"Estrategia Obtenida: {nueva_estrategia_obtenida['nombre_display']}")
-            print(f"  Par Monitoreado: {nueva_estrategia_obtenida['par_mercado_label']}")
-            if nueva_estrategia_obtenida['configuraciones_indicadores']:
+            print(f"Estrategia Obtenida: {nueva_estrategia_obtenida.nombre_display}")
+            print(f"  Par Monitoreado: {nueva_estrategia_obtenida.par_mercado_label}")
+            if nueva_estrategia_obtenida.configuraciones_indicadores:
                 print(f"  Indicadores Configurados:")
-                for cfg_ind in nueva_estrategia_obtenida['configuraciones_indicadores']:
-                     print(f"    - {cfg_ind['nombre_display']} (<{cfg_ind['nombre_local']}>)")
+                for cfg_ind in nueva_estrategia_obtenida.configuraciones_indicadores:
+                     print(f"    - {cfg_ind.nombre_display} (<{cfg_ind.nombre_local}>)")
             else:
                 print("  No hay indicadores configurados para la nueva estrategia.")
         else:
             print(f"No se pudo obtener la estrategia '{nombre_nueva_estrategia_local}'. Revisa los DEBUG prints.")
             
+        print("\n--- Caché de estrategias ---")
+        agente_estrategia.obtener_estrategia_activa(nombre_nueva_estrategia_local)
+        agente_estrategia.obtener_estrategia_activa("EstrategiaPredeterminada")
+        print(f"Tras dos lecturas repetidas: {agente_estrategia.cache.estadisticas()}")
+        # Un cambio en un parámetro de una configuración usada solo invalida las estrategias que la usan
+        config_rsi = manager.ns_manager.trade.ConfigRSI14
+        manager.eliminar_tripletas(config_rsi, manager.ns_manager.trade.periodoIndicador, None)
+        manager.agregar_tripleta(config_rsi, manager.ns_manager.trade.periodoIndicador, Literal(21, datatype=XSD.integer))
+        estrategia_rsi = agente_estrategia.obtener_estrategia_activa(nombre_nueva_estrategia_local)
+        print(f"Tras cambiar periodoIndicador de ConfigRSI14: {agente_estrategia.cache.estadisticas()}")
+        print(f"  Parámetros leídos de nuevo: {[(c.nombre_local, c.parametros) for c in estrategia_rsi.configuraciones_indicadores]}")
+
         print(f"\nVerifica el archivo de persistencia: {persist_f}")
         print("\nPrueba de AgentePerfilEstrategia completada.")
 
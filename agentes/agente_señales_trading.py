@@ -2,6 +2,7 @@
 import os
 import sys
 from datetime import datetime, timezone
+import numpy as np
 import pandas as pd # Para manejar los datos históricos
 import uuid # Para generar URIs únicas
 
@@ -13,15 +14,51 @@ if project_root_dir not in sys.path:
 # --- Fin de la modificación ---
 
 from rdf_utils.rdf_manager_trading import RDFManagerTrading
-from agentes.agente_perfil_estrategia import AgentePerfilEstrategia # Para obtener la estrategia
-from utils import indicadores_tecnicos as it # Importar el módulo de indicadores
+from rdf_utils.almacen_series import AlmacenSeriesIndicadores, agregar_nodo_valor_actual
+from rdf_utils.vista_ultimo_estado import VistaUltimoEstado
+from agentes.agente_perfil_estrategia import AgentePerfilEstrategia, Estrategia # Para obtener la estrategia
+from utils import backtesting as bt
+from utils import reglas_señales as rs
+from utils.indicadores_incrementales import SeguimientoIndicadores
+from utils.proveedores_datos import ProveedorDatos, ProveedorSimulado
+from agentes.registro_reglas_señal import RegistroReglasSeñal
 from rdflib import Literal, URIRef
 from rdflib.namespace import XSD, RDF
 
+# Propiedad RDF en la que se almacena cada componente devuelto por el motor de indicadores
+PROPIEDADES_COMPONENTES = {
+    "valor": "valorNumerico",
+    "macd": "valorMACD",
+    "señal": "valorseñalMACD",
+    "histograma": "valorHistogramaMACD",
+    "media": "valorBandaMedia",
+    "superior": "valorBandaSuperior",
+    "inferior": "valorBandaInferior",
+}
+
 class AgenteseñalesTrading:
-    def __init__(self, rdf_manager: RDFManagerTrading, agente_estrategia: AgentePerfilEstrategia):
+    def __init__(self, rdf_manager: RDFManagerTrading, agente_estrategia: AgentePerfilEstrategia,
+                 almacen_series: AlmacenSeriesIndicadores | None = None,
+                 vista_estado: VistaUltimoEstado | None = None,
+                 registro_reglas: RegistroReglasSeñal | None = None,
+                 proveedor_datos: ProveedorDatos | None = None):
+        """
+        Si se indica almacen_series, el historial de valores de indicadores se anexa al almacén
+        columnar y el grafo solo conserva un trade:ValorIndicador por (par, configuración) con
+        el último valor. Sin almacén, cada lectura crea un nodo trade:ValorIndicador nuevo.
+        Si se indica vista_estado, cada ciclo publica en ella el último estado del par.
+        Las señales salen de las trade:ReglaSeñal de registro_reglas (se crea uno si no se indica).
+        Los datos de mercado salen de proveedor_datos (por defecto, el simulado con semilla fija).
+        Los indicadores de cada (par, periodo) se siembran una vez y avanzan con las barras nuevas
+        de cada ciclo (seguimiento_indicadores, compartido con PlanificadorAnalisis).
+        """
         self.rdf_manager = rdf_manager
         self.agente_estrategia = agente_estrategia
+        self.almacen_series = almacen_series
+        self.vista_estado = vista_estado
+        self.registro_reglas = registro_reglas or RegistroReglasSeñal(rdf_manager)
+        self.proveedor_datos = proveedor_datos or ProveedorSimulado()
+        self.seguimiento_indicadores = SeguimientoIndicadores()
         self.ns = rdf_manager.ns_manager
 
     def _crear_uri_valor_indicador(self, par_mercado_local: str, config_indicador_local_id: str) -> URIRef:
@@ -39,75 +76,60 @@ class AgenteseñalesTrading:
         id_local = f"Recom_{par_mercado_local}_{timestamp_id}_{str(uuid.uuid4())[:4]}"
         return self.ns.get_uri(id_local)
 
-    def _interpretar_y_almacenar_señales(self, par_mercado_uri: URIRef, par_mercado_local_id: str, valores_indicadores_calculados: dict, precio_actual: float, timestamp_actual_utc: datetime):
+    def evaluar_señales_lote(self, contextos: list[dict]) -> list[list[tuple]]:
+        """
+        Evalúa las reglas de señales (RegistroReglasSeñal) para varios contextos a la vez: una
+        fila de operandos por contexto y una sola evaluación para todos.
+        Args:
+            contextos (list[dict]): Cada uno con 'estrategia' (ID local), 'ultimos' ({config: {componente: valor}})
+                                    y 'precio'; opcionalmente 'previos' y 'precio_previo' (la barra
+                                    anterior, necesaria para las reglas de cruce).
+        Returns:
+            list[list[tuple]]: Por contexto, las reglas que se cumplen como (regla, valor, referencia).
+        """
+        if not contextos:
+            return []
+        compiladas = self.registro_reglas.compiladas()
+        actuales = np.array([compiladas.fila(c["ultimos"], c["precio"]) for c in contextos])
+        previos = np.array([compiladas.fila(c.get("previos") or {}, c.get("precio_previo")) for c in contextos])
+        aplicables = compiladas.mascara_estrategias([c.get("estrategia") for c in contextos])
+        resultado = compiladas.evaluar(actuales, previos, aplicables)
+        return [
+            [(compiladas.reglas[r], *compiladas.valores(actuales[fila], r)) for r in np.flatnonzero(resultado[fila])]
+            for fila in range(len(contextos))
+        ]
+
+    def _interpretar_y_almacenar_señales(self, par_mercado_uri: URIRef, par_mercado_local_id: str, valores_indicadores_calculados: dict,
+                                         señales_activas: list[tuple], timestamp_actual_utc: datetime):
         """
-        Interpreta los valores de los indicadores calculados y almacena las señales técnicas en RDF.
+        Almacena en RDF una señal técnica por cada regla que se cumple.
         Args:
             par_mercado_uri (URIRef): URI del par de mercado.
             par_mercado_local_id (str): ID local del par de mercado.
-            valores_indicadores_calculados (dict): Diccionario con los valores de los indicadores.
-                                                  Ej: {'ConfigRSI14': {'valorNumerico': 25.0, 'uri_valor_ind': ...}, ...}
-            precio_actual (float): Precio actual del activo.
+            valores_indicadores_calculados (dict): Diccionario con el nodo de valor de cada configuración.
+                                                  Ej: {'ConfigRSI14': {'uri_valor_ind': ...}, ...}
+            señales_activas (list[tuple]): (regla, valor, referencia) devueltas por evaluar_señales_lote.
             timestamp_actual_utc (datetime): Timestamp de la generación de señales.
         """
         print("\nInterpretando y almacenando señales técnicas...")
         señales_generadas_uris = []
-
-        # Ejemplo de interpretación para RSI
-        rsi_config_id = "ConfigRSI14" # Asumimos que este es el ID local de la config RSI
-        if rsi_config_id in valores_indicadores_calculados and valores_indicadores_calculados[rsi_config_id].get('valorNumerico') is not None:
-            rsi_valor = valores_indicadores_calculados[rsi_config_id]['valorNumerico']
-            uri_valor_rsi = valores_indicadores_calculados[rsi_config_id]['uri_valor_ind']
-            tipo_señal_str = None
-            desc_señal = ""
-
-            if rsi_valor < 30:
-                tipo_señal_str = "SOBREVENTA_RSI"
-                desc_señal = f"RSI ({rsi_valor:.2f}) indica sobreventa para {par_mercado_local_id}."
-            elif rsi_valor > 70:
-                tipo_señal_str = "SOBRECOMPRA_RSI"
-                desc_señal = f"RSI ({rsi_valor:.2f}) indica sobrecompra para {par_mercado_local_id}."
-            
-            if tipo_señal_str:
-                señal_uri = self._crear_uri_señal_tecnica(par_mercado_local_id, tipo_señal_str)
-                self.rdf_manager.agregar_tripleta(señal_uri, RDF.type, self.ns.trade.señalTecnica)
-                self.rdf_manager.agregar_tripleta(señal_uri, self.ns.trade.generadaPorIndicador, uri_valor_rsi)
-                self.rdf_manager.agregar_tripleta(señal_uri, self.ns.trade.referenteA, par_mercado_uri)
-                self.rdf_manager.agregar_tripleta(señal_uri, self.ns.trade.tiposeñal, Literal(tipo_señal_str))
-                self.rdf_manager.agregar_tripleta(señal_uri, self.ns.trade.descripcionseñal, Literal(desc_señal))
-                self.rdf_manager.agregar_tripleta(señal_uri, self.ns.trade.fechaseñal, Literal(timestamp_actual_utc.isoformat(), datatype=XSD.dateTime))
+        with self.rdf_manager.lote_escritura() as lote:
+            for regla, valor, referencia in señales_activas:
+                desc_señal = regla.describir(valor, referencia, par_mercado_local_id)
+                propiedades = {
+                    self.ns.trade.referenteA: par_mercado_uri,
+                    self.ns.trade.tiposeñal: Literal(regla.tipo_señal),
+                    self.ns.trade.descripcionseñal: Literal(desc_señal),
+                    self.ns.trade.fechaseñal: Literal(timestamp_actual_utc.isoformat(), datatype=XSD.dateTime),
+                }
+                uri_valor = valores_indicadores_calculados.get(regla.config, {}).get('uri_valor_ind')
+                if uri_valor is not None:
+                    propiedades[self.ns.trade.generadaPorIndicador] = uri_valor
+                señal_uri = self._crear_uri_señal_tecnica(par_mercado_local_id, regla.tipo_señal)
+                lote.agregar_entidad(señal_uri, self.ns.trade.señalTecnica, propiedades)
                 señales_generadas_uris.append(señal_uri)
                 print(f"  Señal generada: {desc_señal}")
 
-        # Ejemplo de interpretación para Cruce de Precio sobre SMA20
-        sma20_config_id = "ConfigSMA20"
-        if sma20_config_id in valores_indicadores_calculados and valores_indicadores_calculados[sma20_config_id].get('valorNumerico') is not None:
-            sma20_valor = valores_indicadores_calculados[sma20_config_id]['valorNumerico']
-            uri_valor_sma20 = valores_indicadores_calculados[sma20_config_id]['uri_valor_ind']
-            tipo_señal_str = None
-            desc_señal = ""
-
-            # Necesitaríamos el precio anterior para un cruce real, aquí simplificamos: precio actual vs SMA
-            if precio_actual > sma20_valor:
-                tipo_señal_str = "PRECIO_SOBRE_SMA20"
-                desc_señal = f"Precio actual ({precio_actual:.4f}) está por encima de SMA20 ({sma20_valor:.4f}) para {par_mercado_local_id}."
-            elif precio_actual < sma20_valor:
-                tipo_señal_str = "PRECIO_BAJO_SMA20"
-                desc_señal = f"Precio actual ({precio_actual:.4f}) está por debajo de SMA20 ({sma20_valor:.4f}) para {par_mercado_local_id}."
-
-            if tipo_señal_str:
-                señal_uri = self._crear_uri_señal_tecnica(par_mercado_local_id, tipo_señal_str)
-                self.rdf_manager.agregar_tripleta(señal_uri, RDF.type, self.ns.trade.señalTecnica)
-                self.rdf_manager.agregar_tripleta(señal_uri, self.ns.trade.generadaPorIndicador, uri_valor_sma20) # O podría ser una señal compuesta
-                self.rdf_manager.agregar_tripleta(señal_uri, self.ns.trade.referenteA, par_mercado_uri)
-                self.rdf_manager.agregar_tripleta(señal_uri, self.ns.trade.tiposeñal, Literal(tipo_señal_str))
-                self.rdf_manager.agregar_tripleta(señal_uri, self.ns.trade.descripcionseñal, Literal(desc_señal))
-                self.rdf_manager.agregar_tripleta(señal_uri, self.ns.trade.fechaseñal, Literal(timestamp_actual_utc.isoformat(), datatype=XSD.dateTime))
-                señales_generadas_uris.append(señal_uri)
-                print(f"  Señal generada: {desc_señal}")
-        
-        # TODO: Añadir interpretación para MACD (cruce de línea MACD y señal) y Bandas de Bollinger (precio tocando bandas)
-
         return señales_generadas_uris
 
 
@@ -124,10 +146,15 @@ class AgenteseñalesTrading:
         # Lógica de decisión simple basada en señales (ejemplo)
         # Necesitamos consultar las propiedades de las señales activas
         tipos_señales_activas = []
+        lote_actual = self.rdf_manager.lote_activo()
         if señales_activas_uris:
             for señal_uri in señales_activas_uris:
-                q_tipo_señal = f"SELECT ?tipo WHERE {{ <{señal_uri}> <{self.ns.trade.tiposeñal}> ?tipo . }}"
-                res_tipo = self.rdf_manager.ejecutar_sparql(q_tipo_señal)
+                # Las señales de este ciclo pueden estar aún en el lote de escritura sin aplicar
+                tipos_pendientes = lote_actual.objetos_pendientes(señal_uri, self.ns.trade.tiposeñal) if lote_actual else []
+                if tipos_pendientes:
+                    tipos_señales_activas.extend(str(t) for t in tipos_pendientes)
+                    continue
+                res_tipo = self.rdf_manager.ejecutar_consulta("tipo_señal", señal=señal_uri)
                 if res_tipo:
                     for r in res_tipo:
                         tipos_señales_activas.append(str(r["tipo"]))
@@ -146,22 +173,218 @@ class AgenteseñalesTrading:
         
         # Crear y almacenar la instancia de RecomendacionTrading
         recomendacion_uri = self._crear_uri_recomendacion(par_mercado_local_id)
-        self.rdf_manager.agregar_tripleta(recomendacion_uri, RDF.type, self.ns.trade.RecomendacionTrading)
-        self.rdf_manager.agregar_tripleta(recomendacion_uri, self.ns.trade.paraActivo, par_mercado_uri)
-        self.rdf_manager.agregar_tripleta(recomendacion_uri, self.ns.trade.basadaEnEstrategia, estrategia_uri)
-        self.rdf_manager.agregar_tripleta(recomendacion_uri, self.ns.trade.accionSugerida, Literal(accion_sugerida))
-        self.rdf_manager.agregar_tripleta(recomendacion_uri, self.ns.trade.justificacionDecision, Literal(justificacion))
-        self.rdf_manager.agregar_tripleta(recomendacion_uri, self.ns.trade.nivelConfianza, Literal(confianza, datatype=XSD.float))
-        self.rdf_manager.agregar_tripleta(recomendacion_uri, self.ns.trade.timestampRecomendacion, Literal(timestamp_actual_utc.isoformat(), datatype=XSD.dateTime))
-        
-        # Enlazar la recomendación con las señales que la fundamentaron
-        for señal_uri in señales_activas_uris: # Usar las URIs que ya tenemos
-            self.rdf_manager.agregar_tripleta(recomendacion_uri, self.ns.trade.basadaEnseñal, señal_uri)
+        with self.rdf_manager.lote_escritura() as lote:
+            lote.agregar_entidad(recomendacion_uri, self.ns.trade.RecomendacionTrading, {
+                self.ns.trade.paraActivo: par_mercado_uri,
+                self.ns.trade.basadaEnEstrategia: estrategia_uri,
+                self.ns.trade.accionSugerida: Literal(accion_sugerida),
+                self.ns.trade.justificacionDecision: Literal(justificacion),
+                self.ns.trade.nivelConfianza: Literal(confianza, datatype=XSD.float),
+                self.ns.trade.timestampRecomendacion: Literal(timestamp_actual_utc.isoformat(), datatype=XSD.dateTime),
+                # Enlazar la recomendación con las señales que la fundamentaron
+                self.ns.trade.basadaEnseñal: list(señales_activas_uris),
+            })
 
         print(f"  Recomendación generada: {accion_sugerida} para {par_mercado_local_id}. Justificación: {justificacion}")
         return recomendacion_uri
 
 
+    def _detalle_recomendacion_pendiente(self, lote, recomendacion_uri: URIRef, señales_uris: list) -> dict:
+        """Resumen de la recomendación escrita en el lote (aún sin aplicar) para la vista de último estado."""
+        trade = self.ns.trade
+        pendiente = lambda predicado: next(iter(lote.objetos_pendientes(recomendacion_uri, predicado)), None)
+        confianza = pendiente(trade.nivelConfianza)
+        return {
+            "accion": str(pendiente(trade.accionSugerida)),
+            "justificacion": str(pendiente(trade.justificacionDecision)),
+            "confianza": float(confianza) if confianza is not None else None,
+            "timestamp": str(pendiente(trade.timestampRecomendacion)),
+            "señales": [str(d) for señal_uri in señales_uris for d in lote.objetos_pendientes(señal_uri, trade.descripcionseñal)],
+        }
+
+    def resolver_configs_motor(self, estrategia: Estrategia) -> list[dict]:
+        """
+        Configuraciones de indicadores de una estrategia en el formato que espera
+        it.calcular_indicadores_lote. El tipo sale de trade:tieneTipoBase (ver
+        agentes/registro_configs_indicador.py); 'tipo' queda en None si no se reconoce o
+        faltan parámetros.
+        """
+        return [config_ind.config_motor() for config_ind in estrategia.configuraciones_indicadores]
+
+    def obtener_datos_mercado(self, par_mercado_label: str, periodo_tiempo: str = "1d", limite: int = 100) -> pd.DataFrame | None:
+        datos_historicos_df = self.proveedor_datos.obtener(par_mercado_label, periodo_tiempo=periodo_tiempo, limite=limite)
+        if datos_historicos_df is None or datos_historicos_df.empty:
+            print(f"Error: No se pudieron obtener datos históricos para '{par_mercado_label}'.")
+            return None
+        print(f"Datos históricos ({type(self.proveedor_datos).__name__}) obtenidos para '{par_mercado_label}'. Última fecha: {datos_historicos_df.index[-1].strftime('%Y-%m-%d %H:%M')}")
+        return datos_historicos_df
+
+    def obtener_datos_ciclo(self, par_mercado_label: str, periodo_tiempo: str, configs_motor: list[dict],
+                            limite: int = 100) -> pd.DataFrame | None:
+        """
+        Datos de mercado para avanzar seguimiento_indicadores: si la serie ya está sembrada, solo
+        las barras desde la última vista (como mucho 'limite'); si no, las 'limite' más recientes.
+        """
+        desde = self.seguimiento_indicadores.desde_necesario((par_mercado_label, periodo_tiempo), configs_motor)
+        if desde is None:
+            return self.obtener_datos_mercado(par_mercado_label, periodo_tiempo, limite)
+        datos_nuevos_df = self.proveedor_datos.leer(par_mercado_label, periodo_tiempo, desde=desde, limite=limite)
+        if datos_nuevos_df is None or datos_nuevos_df.empty:
+            print(f"Error: No se pudieron obtener las barras nuevas para '{par_mercado_label}'.")
+            return None
+        return datos_nuevos_df
+
+    def calcular_ultimos_valores(self, par_mercado_label: str, periodo_tiempo: str, configs_motor: list[dict],
+                                 datos_ohlcv: pd.DataFrame, sembrados: dict | None = None) -> tuple[dict, dict, float, float | None]:
+        """
+        Avanza los indicadores de la serie con las barras nuevas de datos_ohlcv (obtener_datos_ciclo).
+        sembrados: indicadores ya sembrados con sembrar_configs (ver SeguimientoIndicadores.avanzar).
+        Devuelve (últimos por config, previos por config, precio, precio previo).
+        """
+        return self.seguimiento_indicadores.avanzar((par_mercado_label, periodo_tiempo), datos_ohlcv, configs_motor, sembrados)
+
+    def almacenar_resultados_ciclo(self, estrategia: Estrategia, configs_motor: list[dict], ultimos_por_config: dict,
+                                   ultimo_precio_cierre: float, guardar: bool = True,
+                                   previos_por_config: dict | None = None, precio_previo: float | None = None,
+                                   señales_activas: list[tuple] | None = None):
+        """
+        Escribe en el grafo el precio actual, los valores de indicadores, las señales y la
+        recomendación de un ciclo ya calculado.
+
+        Args:
+            estrategia (Estrategia): Estrategia devuelta por AgentePerfilEstrategia.obtener_estrategia_activa.
+            configs_motor (list[dict]): Configuraciones resueltas por resolver_configs_motor.
+            ultimos_por_config (dict): {id_config: {componente: valor}} con los últimos valores calculados.
+            ultimo_precio_cierre (float): Último precio de cierre del par.
+            guardar (bool): Si es True, persiste el grafo al terminar.
+            previos_por_config (dict | None): Valores de la barra anterior, para las reglas de cruce.
+            precio_previo (float | None): Precio de cierre de la barra anterior.
+            señales_activas (list[tuple] | None): Reglas que se cumplen, si ya se evaluaron por lotes
+                                                 (evaluar_señales_lote); si no, se evalúan aquí.
+        """
+        par_mercado_label = estrategia.par_mercado_label
+        par_mercado_uri = estrategia.par_mercado_uri
+        par_mercado_local_id = par_mercado_uri.split('#')[-1]
+        estrategia_uri = estrategia.uri
+
+        # Todas las escrituras del ciclo se aplican en un único lote
+        with self.rdf_manager.lote_escritura() as lote:
+            self.rdf_manager.actualizar_precio_par_mercado(par_mercado_uri, float(ultimo_precio_cierre))
+            print(f"Precio actual de '{par_mercado_label}' actualizado en RDF a: {ultimo_precio_cierre:.4f}")
+
+            timestamp_actual_utc = datetime.now(timezone.utc)
+            valores_indicadores_calculados_para_señales = {} # Para pasar a la interpretación de señales
+            filas_series = [] # Se anexan al almacén columnar solo si el lote se aplica (ver publicar)
+
+            for config_ind, config_motor in zip(estrategia.configuraciones_indicadores, configs_motor):
+                config_indicador_uri = config_ind.uri
+                config_indicador_local_id = config_ind.nombre_local
+                nombre_display_indicador = config_ind.nombre_display
+            
+                print(f"\nCalculando y almacenando: {nombre_display_indicador} para {par_mercado_label}")
+
+                tipo = config_motor["tipo"]
+                ultimos = ultimos_por_config.get(config_indicador_local_id, {})
+                if self.almacen_series is not None:
+                    valor_indicador_inst_uri = agregar_nodo_valor_actual(
+                        lote, self.ns, self.almacen_series, par_mercado_uri, config_indicador_uri,
+                        timestamp_actual_utc, ultimos, PROPIEDADES_COMPONENTES)
+                    if ultimos:
+                        filas_series.append((config_indicador_local_id, ultimos))
+                else:
+                    valor_indicador_inst_uri = self._crear_uri_valor_indicador(par_mercado_local_id, config_indicador_local_id)
+                    propiedades_valor = {
+                        self.ns.trade.esValorDe: config_indicador_uri,
+                        self.ns.trade.seAplicaA: par_mercado_uri,
+                        self.ns.trade.timestampValor: Literal(timestamp_actual_utc.isoformat(), datatype=XSD.dateTime),
+                    }
+                    for componente, valor in ultimos.items():
+                        if valor is not None:
+                            propiedades_valor[self.ns.trade[PROPIEDADES_COMPONENTES[componente]]] = Literal(valor, datatype=XSD.decimal)
+                    lote.agregar_entidad(valor_indicador_inst_uri, self.ns.trade.ValorIndicador, propiedades_valor)
+
+                # Guardar referencia para la interpretación de señales
+                valores_indicadores_calculados_para_señales[config_indicador_local_id] = {'uri_valor_ind': valor_indicador_inst_uri}
+
+                if tipo is None or config_indicador_local_id not in ultimos_por_config:
+                    print(f"  Tipo de indicador '{config_indicador_local_id}' no reconocido o parámetros faltantes.")
+                    continue
+                if all(v is None for v in ultimos.values()):
+                    print(f"  {tipo} = N/A")
+                    continue
+
+                if tipo in ("SMA", "RSI"):
+                    valores_indicadores_calculados_para_señales[config_indicador_local_id]['valorNumerico'] = ultimos["valor"]
+                    print(f"  {tipo}({config_motor['periodo']}) = {ultimos['valor']:.4f}")
+                elif tipo == "MACD":
+                    valores_indicadores_calculados_para_señales[config_indicador_local_id].update(ultimos) # Añade macd, señal, histograma
+                    print(f"  MACD = L:{ultimos.get('macd', 'N/A')}, S:{ultimos.get('señal', 'N/A')}, H:{ultimos.get('histograma', 'N/A')}")
+                elif tipo == "BB":
+                    valores_indicadores_calculados_para_señales[config_indicador_local_id].update(ultimos) # Añade media, superior, inferior
+                    print(f"  BB = M:{ultimos.get('media', 'N/A')}, Sup:{ultimos.get('superior', 'N/A')}, Inf:{ultimos.get('inferior', 'N/A')}")
+        
+            # 5. Interpretar Señales Técnicas
+            if señales_activas is None:
+                señales_activas = self.evaluar_señales_lote([{
+                    "estrategia": estrategia.nombre_local, "ultimos": ultimos_por_config, "precio": float(ultimo_precio_cierre),
+                    "previos": previos_por_config, "precio_previo": precio_previo,
+                }])[0]
+            señales_generadas_uris = self._interpretar_y_almacenar_señales(
+                par_mercado_uri,
+                par_mercado_local_id,
+                valores_indicadores_calculados_para_señales,
+                señales_activas,
+                timestamp_actual_utc
+            )
+        
+            # 6. Generar Recomendación de Trading
+            if señales_generadas_uris: # Solo generar recomendación si hubo señales
+                recomendacion_uri = self._generar_y_almacenar_recomendacion(
+                    par_mercado_uri,
+                    par_mercado_local_id,
+                    estrategia_uri, # Pasar la URI de la estrategia actual
+                    señales_generadas_uris,
+                    timestamp_actual_utc
+                )
+            else:
+                print("\nNo se generaron señales técnicas claras, se emitirá recomendación de MANTENER por defecto.")
+                # Crear una recomendación de MANTENER si no hay señales
+                recomendacion_uri = self._crear_uri_recomendacion(par_mercado_local_id)
+                lote.agregar_entidad(recomendacion_uri, self.ns.trade.RecomendacionTrading, {
+                    self.ns.trade.paraActivo: par_mercado_uri,
+                    self.ns.trade.basadaEnEstrategia: estrategia_uri,
+                    self.ns.trade.accionSugerida: Literal("MANTENER"),
+                    self.ns.trade.justificacionDecision: Literal("No se identificaron señales técnicas suficientes para una acción clara."),
+                    self.ns.trade.nivelConfianza: Literal(0.5, datatype=XSD.float),
+                    self.ns.trade.timestampRecomendacion: Literal(timestamp_actual_utc.isoformat(), datatype=XSD.dateTime),
+                })
+
+            if self.vista_estado is not None:
+                recomendacion_vista = self._detalle_recomendacion_pendiente(lote, recomendacion_uri, señales_generadas_uris)
+                valores_vista = {
+                    config_ind.nombre_local: {
+                        "nombre": config_ind.nombre_display,
+                        "valores": {c: v for c, v in ultimos_por_config[config_ind.nombre_local].items() if v is not None},
+                        "ts": timestamp_actual_utc.isoformat(),
+                    }
+                    for config_ind in estrategia.configuraciones_indicadores
+                    if any(v is not None for v in ultimos_por_config.get(config_ind.nombre_local, {}).values())
+                }
+
+            def publicar():
+                for config_indicador_local_id, ultimos in filas_series:
+                    self.almacen_series.agregar(par_mercado_local_id, config_indicador_local_id, timestamp_actual_utc, ultimos)
+                if self.vista_estado is not None:
+                    self.vista_estado.actualizar_par(par_mercado_local_id, precio=float(ultimo_precio_cierre), timestamp=timestamp_actual_utc,
+                                                     valores_indicadores=valores_vista, recomendacion=recomendacion_vista)
+
+            # El almacén de series y la vista se actualizan cuando el lote (o el del ciclo completo,
+            # si este se unió a uno exterior) ya está aplicado al grafo
+            lote.al_aplicar(publicar)
+
+        if guardar:
+            self.rdf_manager.guardar_datos()
+
     def ejecutar_ciclo_analisis(self, nombre_estrategia_local: str = "EstrategiaPredeterminada"):
         print(f"\n--- Iniciando ciclo de análisis del AgenteseñalesTrading para estrategia '{nombre_estrategia_local}' ---")
 
@@ -170,133 +393,37 @@ class AgenteseñalesTrading:
             print(f"Error: No se pudo obtener la estrategia '{nombre_estrategia_local}'. Abortando ciclo.")
             return
 
-        par_mercado_uri_str = estrategia["par_mercado_uri"]
-        par_mercado_label = estrategia["par_mercado_label"]
-        par_mercado_uri = URIRef(par_mercado_uri_str)
-        par_mercado_local_id = par_mercado_uri_str.split('#')[-1]
-        estrategia_uri = URIRef(estrategia["uri"])
-
-
-        print(f"Estrategia obtenida: '{estrategia['nombre_display']}' para el par '{par_mercado_label}'")
-        if not estrategia["configuraciones_indicadores"]:
+        par_mercado_label = estrategia.par_mercado_label
+        print(f"Estrategia obtenida: '{estrategia.nombre_display}' para el par '{par_mercado_label}'")
+        if not estrategia.configuraciones_indicadores:
             print("Advertencia: La estrategia no tiene configuraciones de indicadores. No se calculará nada.")
         
-        limite_datos_historicos = 100 
-        datos_historicos_df = it.obtener_datos_historicos_simulados(
-            simbolo_par=par_mercado_label, periodo_tiempo="1d", limite=limite_datos_historicos
-        )
-
-        if datos_historicos_df is None or datos_historicos_df.empty:
-            print(f"Error: No se pudieron obtener datos históricos para '{par_mercado_label}'. Abortando ciclo.")
+        # Solo se piden y procesan las barras posteriores a las del ciclo anterior
+        configs_motor = self.resolver_configs_motor(estrategia)
+        datos_historicos_df = self.obtener_datos_ciclo(par_mercado_label, estrategia.periodo_tiempo, configs_motor, limite=100)
+        if datos_historicos_df is None:
+            print(f"Abortando ciclo para '{nombre_estrategia_local}'.")
             return
-        
-        print(f"Datos históricos (simulados) obtenidos para '{par_mercado_label}'. Última fecha: {datos_historicos_df.index[-1].strftime('%Y-%m-%d')}")
-        
-        ultimo_precio_cierre = datos_historicos_df['close'].iloc[-1]
-        self.rdf_manager.actualizar_precio_par_mercado(par_mercado_uri, float(ultimo_precio_cierre))
-        print(f"Precio actual de '{par_mercado_label}' actualizado en RDF a: {ultimo_precio_cierre:.4f}")
+        ultimos_por_config, previos_por_config, precio, precio_previo = self.calcular_ultimos_valores(
+            par_mercado_label, estrategia.periodo_tiempo, configs_motor, datos_historicos_df)
 
-        timestamp_actual_utc = datetime.now(timezone.utc)
-        valores_indicadores_calculados_para_señales = {} # Para pasar a la interpretación de señales
-
-        for config_ind_data in estrategia["configuraciones_indicadores"]:
-            config_indicador_uri = URIRef(config_ind_data["uri"])
-            config_indicador_local_id = config_ind_data["nombre_local"]
-            nombre_display_indicador = config_ind_data["nombre_display"]
-            
-            print(f"\nCalculando y almacenando: {nombre_display_indicador} para {par_mercado_label}")
-
-            valor_indicador_inst_uri = self._crear_uri_valor_indicador(par_mercado_local_id, config_indicador_local_id)
-            self.rdf_manager.agregar_tripleta(valor_indicador_inst_uri, RDF.type, self.ns.trade.ValorIndicador)
-            self.rdf_manager.agregar_tripleta(valor_indicador_inst_uri, self.ns.trade.esValorDe, config_indicador_uri)
-            self.rdf_manager.agregar_tripleta(valor_indicador_inst_uri, self.ns.trade.seAplicaA, par_mercado_uri)
-            self.rdf_manager.agregar_tripleta(valor_indicador_inst_uri, self.ns.trade.timestampValor, Literal(timestamp_actual_utc.isoformat(), datatype=XSD.dateTime))
-            
-            # Guardar referencia para la interpretación de señales
-            valores_indicadores_calculados_para_señales[config_indicador_local_id] = {'uri_valor_ind': valor_indicador_inst_uri}
-
-            periodo, periodo_corto, periodo_largo, periodo_señal_macd, num_std_dev_bb = None, None, None, None, None
-            q_params_config = f"PREFIX trade: <{self.ns.trade}> SELECT ?p ?o WHERE {{ <{config_indicador_uri}> ?p ?o . FILTER (?p IN (trade:periodoIndicador, trade:periodoCorto, trade:periodoLargo, trade:periodoseñal, trade:desviacionEstandar)) }}"
-            res_params = self.rdf_manager.ejecutar_sparql(q_params_config)
-            if res_params:
-                for fila_param in res_params:
-                    prop, obj = fila_param["p"], fila_param["o"]
-                    if prop == self.ns.trade.periodoIndicador: periodo = int(obj)
-                    elif prop == self.ns.trade.periodoCorto: periodo_corto = int(obj)
-                    elif prop == self.ns.trade.periodoLargo: periodo_largo = int(obj)
-                    elif prop == self.ns.trade.periodoseñal: periodo_señal_macd = int(obj)
-                    elif prop == self.ns.trade.desviacionEstandar: num_std_dev_bb = float(obj)
-
-            if "SMA" in config_indicador_local_id.upper() and periodo:
-                valor_sma = it.calcular_sma(datos_historicos_df['close'], periodo=periodo)
-                if valor_sma is not None:
-                    self.rdf_manager.agregar_tripleta(valor_indicador_inst_uri, self.ns.trade.valorNumerico, Literal(valor_sma, datatype=XSD.decimal))
-                    valores_indicadores_calculados_para_señales[config_indicador_local_id]['valorNumerico'] = valor_sma
-                    print(f"  SMA({periodo}) = {valor_sma:.4f}")
-                else: print(f"  SMA({periodo}) = N/A")
-            elif "RSI" in config_indicador_local_id.upper() and periodo:
-                valor_rsi = it.calcular_rsi(datos_historicos_df['close'], periodo=periodo)
-                if valor_rsi is not None:
-                    self.rdf_manager.agregar_tripleta(valor_indicador_inst_uri, self.ns.trade.valorNumerico, Literal(valor_rsi, datatype=XSD.decimal))
-                    valores_indicadores_calculados_para_señales[config_indicador_local_id]['valorNumerico'] = valor_rsi
-                    print(f"  RSI({periodo}) = {valor_rsi:.2f}")
-                else: print(f"  RSI({periodo}) = N/A")
-            elif "MACD" in config_indicador_local_id.upper() and periodo_corto and periodo_largo and periodo_señal_macd:
-                valores_macd = it.calcular_macd(datos_historicos_df['close'], periodo_corto, periodo_largo, periodo_señal_macd)
-                if valores_macd:
-                    # Almacenar todos los componentes del MACD
-                    if valores_macd.get("macd") is not None: self.rdf_manager.agregar_tripleta(valor_indicador_inst_uri, self.ns.trade.valorMACD, Literal(valores_macd["macd"], datatype=XSD.decimal))
-                    if valores_macd.get("señal") is not None: self.rdf_manager.agregar_tripleta(valor_indicador_inst_uri, self.ns.trade.valorseñalMACD, Literal(valores_macd["señal"], datatype=XSD.decimal))
-                    if valores_macd.get("histograma") is not None: self.rdf_manager.agregar_tripleta(valor_indicador_inst_uri, self.ns.trade.valorHistogramaMACD, Literal(valores_macd["histograma"], datatype=XSD.decimal))
-                    valores_indicadores_calculados_para_señales[config_indicador_local_id].update(valores_macd) # Añade macd, señal, histograma
-                    print(f"  MACD = L:{valores_macd.get('macd', 'N/A')}, S:{valores_macd.get('señal', 'N/A')}, H:{valores_macd.get('histograma', 'N/A')}")
-                else: print(f"  MACD = N/A")
-            elif "BB" in config_indicador_local_id.upper() and periodo and num_std_dev_bb:
-                 valores_bb = it.calcular_bandas_bollinger(datos_historicos_df['close'], periodo, int(num_std_dev_bb))
-                 if valores_bb:
-                    if valores_bb.get("media") is not None: self.rdf_manager.agregar_tripleta(valor_indicador_inst_uri, self.ns.trade.valorBandaMedia, Literal(valores_bb["media"], datatype=XSD.decimal))
-                    if valores_bb.get("superior") is not None: self.rdf_manager.agregar_tripleta(valor_indicador_inst_uri, self.ns.trade.valorBandaSuperior, Literal(valores_bb["superior"], datatype=XSD.decimal))
-                    if valores_bb.get("inferior") is not None: self.rdf_manager.agregar_tripleta(valor_indicador_inst_uri, self.ns.trade.valorBandaInferior, Literal(valores_bb["inferior"], datatype=XSD.decimal))
-                    valores_indicadores_calculados_para_señales[config_indicador_local_id].update(valores_bb) # Añade media, superior, inferior
-                    print(f"  BB = M:{valores_bb.get('media', 'N/A')}, Sup:{valores_bb.get('superior', 'N/A')}, Inf:{valores_bb.get('inferior', 'N/A')}")
-                 else: print(f"  BB = N/A")
-            else:
-                print(f"  Tipo de indicador '{config_indicador_local_id}' no reconocido o parámetros faltantes.")
-        
-        # 5. Interpretar Señales Técnicas
-        señales_generadas_uris = self._interpretar_y_almacenar_señales(
-            par_mercado_uri, 
-            par_mercado_local_id, 
-            valores_indicadores_calculados_para_señales, 
-            float(ultimo_precio_cierre), # Pasar el precio actual
-            timestamp_actual_utc
-        )
-        
-        # 6. Generar Recomendación de Trading
-        if señales_generadas_uris: # Solo generar recomendación si hubo señales
-            self._generar_y_almacenar_recomendacion(
-                par_mercado_uri,
-                par_mercado_local_id,
-                estrategia_uri, # Pasar la URI de la estrategia actual
-                señales_generadas_uris,
-                timestamp_actual_utc
-            )
-        else:
-            print("\nNo se generaron señales técnicas claras, se emitirá recomendación de MANTENER por defecto.")
-            # Crear una recomendación de MANTENER si no hay señales
-            recomendacion_mantener_uri = self._crear_uri_recomendacion(par_mercado_local_id)
-            self.rdf_manager.agregar_tripleta(recomendacion_mantener_uri, RDF.type, self.ns.trade.RecomendacionTrading)
-            self.rdf_manager.agregar_tripleta(recomendacion_mantener_uri, self.ns.trade.paraActivo, par_mercado_uri)
-            self.rdf_manager.agregar_tripleta(recomendacion_mantener_uri, self.ns.trade.basadaEnEstrategia, estrategia_uri)
-            self.rdf_manager.agregar_tripleta(recomendacion_mantener_uri, self.ns.trade.accionSugerida, Literal("MANTENER"))
-            self.rdf_manager.agregar_tripleta(recomendacion_mantener_uri, self.ns.trade.justificacionDecision, Literal("No se identificaron señales técnicas suficientes para una acción clara."))
-            self.rdf_manager.agregar_tripleta(recomendacion_mantener_uri, self.ns.trade.nivelConfianza, Literal(0.5, datatype=XSD.float))
-            self.rdf_manager.agregar_tripleta(recomendacion_mantener_uri, self.ns.trade.timestampRecomendacion, Literal(timestamp_actual_utc.isoformat(), datatype=XSD.dateTime))
-
-
-        self.rdf_manager.guardar_datos()
+        self.almacenar_resultados_ciclo(estrategia, configs_motor, ultimos_por_config, precio,
+                                        previos_por_config=previos_por_config, precio_previo=precio_previo)
         print(f"--- Ciclo de análisis completado para '{nombre_estrategia_local}'. Valores, señales y recomendación guardados. ---")
 
+    def ejecutar_backtest(self, nombre_estrategia_local: str, datos_ohlcv: pd.DataFrame, **opciones) -> bt.ResultadoBacktest | None:
+        """
+        Evalúa las reglas de señales y decisión de la estrategia sobre todo el histórico
+        (utils/backtesting.py). No escribe nada en el grafo; 'opciones' se pasan a
+        bt.ejecutar_backtest (capital_inicial, comision, permitir_cortos, ...).
+        """
+        estrategia = self.agente_estrategia.obtener_estrategia_activa(nombre_estrategia_local)
+        if not estrategia:
+            print(f"Error: No se pudo obtener la estrategia '{nombre_estrategia_local}' para el backtest.")
+            return None
+        reglas = rs.reglas_de_estrategia(self.registro_reglas.reglas(), nombre_estrategia_local)
+        return bt.ejecutar_backtest(datos_ohlcv, self.resolver_configs_motor(estrategia), reglas=reglas, **opciones)
+
 
 # Bloque de prueba
 if __name__ == '__main__':
@@ -326,7 +453,7 @@ if __name__ == '__main__':
 
         print("\nVerificando/Definiendo EstrategiaPredeterminada...")
         estrategia_base = agente_estrategia_test.obtener_estrategia_activa("EstrategiaPredeterminada")
-        if not estrategia_base or not estrategia_base.get("configuraciones_indicadores"):
+        if not estrategia_base or not estrategia_base.configuraciones_indicadores:
             print("EstrategiaPredeterminada no encontrada o sin indicadores, definiéndola...")
             agente_estrategia_test.definir_o_actualizar_estrategia(
                 nombre_estrategia_local="EstrategiaPredeterminada",
@@ -370,5 +497,11 @@ if __name__ == '__main__':
         else:
             print("  No se encontró ninguna recomendación para WLD_USDT en el grafo.")
             
+        print("\n--- Backtest de EstrategiaPredeterminada sobre 2000 días simulados ---")
+        datos_backtest = agente_señales_test.obtener_datos_mercado("WLD/USDT", "1d", 2000)
+        resultado_backtest = agente_señales_test.ejecutar_backtest("EstrategiaPredeterminada", datos_backtest)
+        if resultado_backtest is not None:
+            print(f"  Estadísticas: {resultado_backtest.estadisticas}")
+
         print(f"\nVerifica el archivo de persistencia: {persist_f_agente_señales}")
         print("\nPrueba de AgenteseñalesTrading (con señales y recomendación) completada.")
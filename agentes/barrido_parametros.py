@@ -0,0 +1,228 @@
+# agentes/barrido_parametros.py
+import os
+import sys
+import itertools
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, replace
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+# --- Modificación para permitir la ejecución directa del script ---
+current_script_dir = os.path.dirname(os.path.abspath(__file__))
+project_root_dir = os.path.abspath(os.path.join(current_script_dir, '..'))
+if project_root_dir not in sys.path:
+    sys.path.insert(0, project_root_dir)
+# --- Fin de la modificación ---
+
+from agentes.agente_perfil_estrategia import AgentePerfilEstrategia
+from agentes.registro_reglas_señal import RegistroReglasSeñal
+from utils import indicadores_tecnicos as it
+from utils import backtesting as bt
+from utils import reglas_señales as rs
+
+# Barrido de parámetros (búsqueda en rejilla) sobre el backtesting vectorizado. La rejilla da
+# los valores de cada parámetro por tipo de indicador y los umbrales de las reglas; se evalúa
+# cada combinación sobre el histórico y se ordenan por un criterio (Sharpe por defecto).
+# Las combinaciones se reparten en un pool de procesos: los precios se copian una sola vez a
+# memoria compartida y cada proceso los lee desde ahí sin recibir una copia por tarea. Cada
+# tarea es una combinación de indicadores con todas sus variantes de umbrales, así las
+# columnas de los indicadores se calculan una vez por tarea. La mejor combinación se puede
+# guardar como trade:Estrategia con guardar_mejor, junto con sus umbrales como
+# trade:ReglaSeñal propias de esa estrategia.
+#
+# Ejemplo de rejilla:
+#   {"SMA": {"periodo": [10, 20, 50]}, "RSI": {"periodo": [7, 14]},
+#    "umbrales": {"rsi_sobreventa": [25, 30], "rsi_sobrecompra": [70, 75]}}
+
+CRITERIOS_ORDEN = ("sharpe", "rendimiento_total", "max_drawdown", "tasa_acierto")
+
+# Estado de cada proceso del pool, fijado por _inicializar_proceso
+_contexto_proceso = {}
+
+def _inicializar_proceso(nombre_memoria: str, num_barras: int, opciones: dict):
+    memoria = shared_memory.SharedMemory(name=nombre_memoria)
+    _contexto_proceso.update(memoria=memoria, opciones=opciones,
+                             cierres=np.ndarray((num_barras,), dtype=np.float64, buffer=memoria.buf))
+
+def _evaluar_tarea(configs: list[dict], variantes_reglas: list[dict], cierres: np.ndarray | None = None,
+                   opciones: dict | None = None) -> list[dict]:
+    """Calcula los indicadores de una combinación y simula cada variante de umbrales. Devuelve sus estadísticas."""
+    if cierres is None:
+        cierres, opciones = _contexto_proceso["cierres"], _contexto_proceso["opciones"]
+    motor = it.MotorIndicadores(cierres)
+    columnas = {config["id"]: motor.calcular(config) for config in configs}
+    parametros_base = bt.reglas_para_configs(configs)
+    resultados = []
+    for umbrales in variantes_reglas:
+        reglas = bt.reglas_desde_parametros(bt.ParametrosReglas(**{**asdict(parametros_base), **umbrales}))
+        acciones, _ = bt.decidir_acciones(bt.evaluar_señales(columnas, cierres, reglas), len(cierres))
+        _, estadisticas = bt.simular(cierres, acciones, **opciones)
+        resultados.append(estadisticas)
+    return resultados
+
+def _id_config(config: dict) -> str:
+    valores = [f"{config[c]:g}" if isinstance(config[c], float) else str(config[c])
+               for c in ("periodo", "periodo_corto", "periodo_largo", "periodo_señal", "num_std_dev") if config.get(c) is not None]
+    return f"Barrido{config['tipo']}_" + "_".join(valores)
+
+def expandir_rejilla(rejilla: dict) -> tuple[list[list[dict]], list[dict]]:
+    """
+    Devuelve (combinaciones_indicadores, variantes_umbrales): cada combinación es una lista de
+    configuraciones del motor (una por tipo de la rejilla) y cada variante un diccionario de
+    umbrales de ParametrosReglas.
+    """
+    configs_por_tipo = []
+    for tipo, parametros in rejilla.items():
+        if tipo == "umbrales":
+            continue
+        claves = list(parametros)
+        configs = []
+        for valores in itertools.product(*(parametros[c] for c in claves)):
+            config = {"tipo": tipo.upper(), **dict(zip(claves, valores))}
+            if config["tipo"] == "MACD" and config.get("periodo_corto", 0) >= config.get("periodo_largo", 1):
+                continue # Un MACD con la EMA corta más larga que la larga no tiene sentido
+            config["id"] = _id_config(config)
+            configs.append(config)
+        configs_por_tipo.append(configs)
+    combinaciones = [list(combinacion) for combinacion in itertools.product(*configs_por_tipo)]
+    umbrales = rejilla.get("umbrales", {})
+    claves = list(umbrales)
+    variantes = [dict(zip(claves, valores)) for valores in itertools.product(*(umbrales[c] for c in claves))]
+    variantes = [v for v in variantes
+                 if v.get("rsi_sobreventa", bt.RSI_SOBREVENTA) < v.get("rsi_sobrecompra", bt.RSI_SOBRECOMPRA)]
+    return combinaciones, variantes or [{}]
+
+class BarridoParametros:
+    def __init__(self, agente_estrategia: AgentePerfilEstrategia | None = None, max_procesos: int | None = None,
+                 criterio: str = "sharpe", capital_inicial: float = 10_000.0, comision: float = 0.001,
+                 permitir_cortos: bool = False, registro_reglas: RegistroReglasSeñal | None = None):
+        """
+        max_procesos=1 evalúa en el propio proceso (sin pool ni memoria compartida).
+        agente_estrategia (y registro_reglas, que se crea si no se indica) solo hacen falta para guardar_mejor.
+        """
+        if criterio not in CRITERIOS_ORDEN:
+            raise ValueError(f"Criterio '{criterio}' no válido; usa uno de {CRITERIOS_ORDEN}")
+        self.agente_estrategia = agente_estrategia
+        if registro_reglas is None and agente_estrategia is not None:
+            registro_reglas = RegistroReglasSeñal(agente_estrategia.rdf_manager)
+        self.registro_reglas = registro_reglas
+        self.max_procesos = max_procesos or os.cpu_count() or 1
+        self.criterio = criterio
+        self.opciones = {"capital_inicial": capital_inicial, "comision": comision, "permitir_cortos": permitir_cortos}
+        self.ultimo_ranking = None
+
+    def ejecutar(self, datos_ohlcv: pd.DataFrame, rejilla: dict, columna: str = 'close') -> pd.DataFrame | None:
+        """
+        Evalúa todas las combinaciones de la rejilla y devuelve el ranking (la mejor primero):
+        una fila por combinación con 'configs' (configuraciones del motor), 'umbrales' y las
+        estadísticas de bt.simular. None si no hay datos.
+        """
+        if datos_ohlcv is None or columna not in datos_ohlcv or datos_ohlcv.empty:
+            print(f"Error en BarridoParametros.ejecutar: no hay datos en la columna '{columna}'.")
+            return None
+        combinaciones, variantes = expandir_rejilla(rejilla)
+        cierres = datos_ohlcv[columna].to_numpy(dtype=np.float64)
+        opciones = {**self.opciones, "periodos_anuales": bt.periodos_por_año(datos_ohlcv.index)}
+        print(f"BarridoParametros: {len(combinaciones) * len(variantes)} combinaciones sobre {len(cierres):,} barras "
+              f"({min(self.max_procesos, len(combinaciones))} procesos).")
+        inicio = time.perf_counter()
+
+        if self.max_procesos <= 1 or len(combinaciones) <= 1:
+            resultados = [_evaluar_tarea(configs, variantes, cierres, opciones) for configs in combinaciones]
+        else:
+            memoria = shared_memory.SharedMemory(create=True, size=cierres.nbytes)
+            try:
+                np.ndarray(cierres.shape, dtype=np.float64, buffer=memoria.buf)[:] = cierres
+                with ProcessPoolExecutor(max_workers=min(self.max_procesos, len(combinaciones)),
+                                         initializer=_inicializar_proceso,
+                                         initargs=(memoria.name, len(cierres), opciones)) as pool:
+                    resultados = list(pool.map(_evaluar_tarea, combinaciones, itertools.repeat(variantes)))
+            finally:
+                memoria.close()
+                memoria.unlink()
+
+        filas = [{"configs": configs, "umbrales": umbrales, **estadisticas}
+                 for configs, estadisticas_tarea in zip(combinaciones, resultados)
+                 for umbrales, estadisticas in zip(variantes, estadisticas_tarea)]
+        ranking = pd.DataFrame(filas)
+        # En max_drawdown el mejor es el menos negativo; las combinaciones sin valor van al final
+        ranking = ranking.sort_values(self.criterio, ascending=False, na_position="last", kind="stable").reset_index(drop=True)
+        print(f"BarridoParametros: Completado en {time.perf_counter() - inicio:.2f}s; mejor {self.criterio} = {ranking[self.criterio].iloc[0]}")
+        self.ultimo_ranking = ranking
+        return ranking
+
+    def guardar_mejor(self, nombre_estrategia_local: str, nombre_display: str, par_mercado_local: str,
+                      ranking: pd.DataFrame | None = None, posicion: int = 0, **kwargs_estrategia):
+        """
+        Guarda la combinación del ranking (la mejor por defecto) como estrategia con
+        definir_o_actualizar_estrategia. Reutiliza las trade:IndicadorTecnicoConfig existentes
+        con los mismos parámetros y crea las que falten; las reglas RSI/SMA con los umbrales de
+        la combinación se guardan como trade:ReglaSeñal de la estrategia. Devuelve la URI de la estrategia.
+        """
+        if self.agente_estrategia is None:
+            print("Error en BarridoParametros.guardar_mejor: no se indicó agente_estrategia.")
+            return None
+        ranking = ranking if ranking is not None else self.ultimo_ranking
+        if ranking is None or posicion >= len(ranking):
+            print("Error en BarridoParametros.guardar_mejor: no hay ranking o la posición no existe.")
+            return None
+        fila = ranking.iloc[posicion]
+        registro = self.agente_estrategia.registro_configs
+        uris_configs = [registro.definir_config(config) for config in fila["configs"]]
+        if any(uri is None for uri in uris_configs):
+            return None
+        ids_guardados = [uri.split('#')[-1] for uri in uris_configs]
+        estrategia_uri = self.agente_estrategia.definir_o_actualizar_estrategia(
+            nombre_estrategia_local=nombre_estrategia_local,
+            nombre_display_estrategia=nombre_display,
+            par_mercado_local=par_mercado_local,
+            uris_config_indicadores=ids_guardados,
+            **kwargs_estrategia
+        )
+        configs_guardadas = [{**config, "id": id_guardado} for config, id_guardado in zip(fila["configs"], ids_guardados)]
+        parametros = bt.ParametrosReglas(**{**asdict(bt.reglas_para_configs(configs_guardadas)), **fila["umbrales"]})
+        with self.agente_estrategia.rdf_manager.lote_escritura():
+            for regla in bt.reglas_desde_parametros(parametros, estrategia=nombre_estrategia_local):
+                self.registro_reglas.definir_regla(replace(regla, id=f"Regla{regla.tipo_señal}_{nombre_estrategia_local}"))
+        return estrategia_uri
+
+
+# Bloque de prueba
+if __name__ == '__main__':
+    from rdf_utils.rdf_manager_trading import RDFManagerTrading
+    print("Probando BarridoParametros...")
+    np.random.seed(11)
+    num_barras = 2 * 365 * 24 * 60 # 2 años de barras de 1 minuto
+    fechas = pd.date_range("2023-01-01", periods=num_barras, freq="min", tz="UTC")
+    datos = pd.DataFrame({"close": 3.5 * np.exp(np.cumsum(np.random.normal(0, 0.0008, num_barras)))}, index=fechas)
+    rejilla = {
+        "SMA": {"periodo": [10, 20, 50, 100]},
+        "RSI": {"periodo": [7, 14, 21]},
+        "umbrales": {"rsi_sobreventa": [20, 25, 30], "rsi_sobrecompra": [70, 75, 80]},
+    }
+
+    manager = RDFManagerTrading(
+        ontologia_path=os.path.join(project_root_dir, 'datos_trading', 'ontologia_trading.ttl'),
+        datos_muestra_path=os.path.join(project_root_dir, 'datos_trading', 'datos_trading_muestra.ttl'),
+        persist_path=None
+    )
+    agente_estrategia = AgentePerfilEstrategia(manager)
+    barrido = BarridoParametros(agente_estrategia, max_procesos=2, permitir_cortos=True)
+    ranking = barrido.ejecutar(datos, rejilla)
+    columnas = ["sharpe", "rendimiento_total", "max_drawdown", "operaciones", "tasa_acierto"]
+    for _, fila in ranking.head(3).iterrows():
+        print(f"  {[c['id'] for c in fila['configs']]} {fila['umbrales']}: "
+              f"{ {c: round(fila[c], 4) if isinstance(fila[c], float) else fila[c] for c in columnas} }")
+
+    secuencial = BarridoParametros(max_procesos=1, permitir_cortos=True).ejecutar(datos, rejilla)
+    print(f"  Mismo ranking en un solo proceso: {secuencial[columnas].equals(ranking[columnas])}")
+
+    estrategia_uri = barrido.guardar_mejor("EstrategiaBarridoDemo", "Mejor combinación del barrido", "WLD_USDT")
+    estrategia = agente_estrategia.obtener_estrategia_activa("EstrategiaBarridoDemo")
+    print(f"  Estrategia guardada: <{estrategia_uri.split('#')[-1]}> con {[c.config_motor() for c in estrategia.configuraciones_indicadores]}")
+    for regla in rs.reglas_de_estrategia(barrido.registro_reglas.reglas(), "EstrategiaBarridoDemo"):
+        if regla.estrategia:
+            print(f"  Regla propia: {regla.id} ({regla.config} {regla.operador} {regla.umbral if regla.umbral is not None else regla.compara_con})")
@@ -0,0 +1,176 @@
+# agentes/cola_trabajos.py
+import os
+import sys
+import queue
+import threading
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Any
+
+# --- Modificación para permitir la ejecución directa del script ---
+current_script_dir = os.path.dirname(os.path.abspath(__file__))
+project_root_dir = os.path.abspath(os.path.join(current_script_dir, '..'))
+if project_root_dir not in sys.path:
+    sys.path.insert(0, project_root_dir)
+# --- Fin de la modificación ---
+
+# Cola de trabajos en segundo plano para la interfaz web. Una petición solo encola el trabajo
+# y recibe su ID; un hilo trabajador los ejecuta en orden y guarda su estado y resultado para
+# consultarlos después. Dos trabajos con la misma clave (p. ej. el ciclo de una estrategia)
+# no se encolan dos veces mientras el primero siga pendiente.
+
+ESTADOS_TRABAJO = ("pendiente", "en_curso", "completado", "error")
+MAX_HISTORIAL_DEFAULT = 100 # Trabajos terminados que se conservan para consultar su estado
+
+@dataclass
+class Trabajo:
+    id: str
+    clave: tuple
+    descripcion: str
+    estado: str = "pendiente"
+    creado: datetime = field(default_factory=lambda: datetime.now(timezone.utc))
+    iniciado: datetime | None = None
+    terminado: datetime | None = None
+    resultado: Any = None
+    error: str | None = None
+
+    def a_dict(self) -> dict:
+        fecha = lambda valor: valor.isoformat() if valor else None
+        return {
+            "id": self.id,
+            "descripcion": self.descripcion,
+            "estado": self.estado,
+            "creado": fecha(self.creado),
+            "iniciado": fecha(self.iniciado),
+            "terminado": fecha(self.terminado),
+            "resultado": self.resultado,
+            "error": self.error,
+        }
+
+class ColaTrabajos:
+    def __init__(self, max_historial: int = MAX_HISTORIAL_DEFAULT, nombre: str = "ColaTrabajos"):
+        self.max_historial = max_historial
+        self.nombre = nombre
+        self._cola = queue.Queue()
+        self._lock = threading.Lock()
+        self._trabajos = OrderedDict() # id -> Trabajo, en orden de creación
+        self._pendientes = {} # clave -> id del trabajo pendiente con esa clave
+        self._hilo = None
+        self._detener = threading.Event()
+        self.duplicados_evitados = 0
+
+    def encolar(self, clave: tuple, funcion, *args, descripcion: str = "", **kwargs) -> tuple[str, bool]:
+        """
+        Encola funcion(*args, **kwargs) y devuelve (id_trabajo, nuevo). Si ya hay un trabajo
+        pendiente con la misma clave no se encola otro: se devuelve su ID y nuevo=False.
+        Un trabajo que ya está en curso no cuenta como pendiente.
+        """
+        with self._lock:
+            id_existente = self._pendientes.get(clave)
+            if id_existente is not None:
+                self.duplicados_evitados += 1
+                return id_existente, False
+            trabajo = Trabajo(id=uuid.uuid4().hex[:12], clave=clave, descripcion=descripcion)
+            self._trabajos[trabajo.id] = trabajo
+            self._pendientes[clave] = trabajo.id
+        self._cola.put((trabajo, funcion, args, kwargs))
+        self.iniciar()
+        return trabajo.id, True
+
+    def obtener(self, id_trabajo: str) -> dict | None:
+        """Estado del trabajo como diccionario, o None si no existe (o ya salió del historial)."""
+        with self._lock:
+            trabajo = self._trabajos.get(id_trabajo)
+            return trabajo.a_dict() if trabajo else None
+
+    def listar(self) -> list[dict]:
+        """Todos los trabajos conocidos, del más reciente al más antiguo."""
+        with self._lock:
+            return [trabajo.a_dict() for trabajo in reversed(self._trabajos.values())]
+
+    def estadisticas(self) -> dict:
+        with self._lock:
+            por_estado = {estado: 0 for estado in ESTADOS_TRABAJO}
+            for trabajo in self._trabajos.values():
+                por_estado[trabajo.estado] += 1
+            return {**por_estado, "duplicados_evitados": self.duplicados_evitados}
+
+    def _ejecutar(self, trabajo: Trabajo, funcion, args, kwargs):
+        with self._lock:
+            self._pendientes.pop(trabajo.clave, None)
+            trabajo.estado, trabajo.iniciado = "en_curso", datetime.now(timezone.utc)
+        try:
+            resultado, error = funcion(*args, **kwargs), None
+        except Exception as e:
+            resultado, error = None, str(e)
+            print(f"{self.nombre}: Error en el trabajo {trabajo.id} ({trabajo.descripcion}): {e}")
+        with self._lock:
+            trabajo.resultado, trabajo.error = resultado, error
+            trabajo.estado = "error" if error is not None else "completado"
+            trabajo.terminado = datetime.now(timezone.utc)
+            self._podar_historial()
+
+    def _podar_historial(self):
+        terminados = [t.id for t in self._trabajos.values() if t.estado in ("completado", "error")]
+        for id_trabajo in terminados[:max(0, len(terminados) - self.max_historial)]:
+            del self._trabajos[id_trabajo]
+
+    def _bucle(self):
+        while not self._detener.is_set():
+            try:
+                trabajo, funcion, args, kwargs = self._cola.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            try:
+                self._ejecutar(trabajo, funcion, args, kwargs)
+            finally:
+                self._cola.task_done()
+
+    def iniciar(self):
+        """Arranca el hilo trabajador (se llama sola al encolar el primer trabajo)."""
+        with self._lock:
+            if self._hilo and self._hilo.is_alive():
+                return
+            self._detener.clear()
+            self._hilo = threading.Thread(target=self._bucle, name=self.nombre, daemon=True)
+            self._hilo.start()
+
+    def esperar(self):
+        """Bloquea hasta que no quede ningún trabajo en la cola ni en curso."""
+        self._cola.join()
+
+    def detener(self):
+        """Detiene el hilo trabajador al terminar el trabajo en curso; los pendientes se quedan en la cola."""
+        self._detener.set()
+        if self._hilo:
+            self._hilo.join()
+            self._hilo = None
+
+
+# Bloque de prueba
+if __name__ == '__main__':
+    import time
+    print("Probando ColaTrabajos...")
+    cola = ColaTrabajos()
+    liberar = threading.Event()
+
+    def ciclo_lento(nombre):
+        liberar.wait()
+        return {"estrategia": nombre, "duracion_segundos": 0.1}
+
+    id_1, nuevo_1 = cola.encolar(("ciclo", "A"), ciclo_lento, "A", descripcion="Ciclo de A")
+    time.sleep(0.1) # El trabajador toma el primero y lo deja en curso
+    id_2, nuevo_2 = cola.encolar(("ciclo", "A"), ciclo_lento, "A", descripcion="Ciclo de A")
+    id_3, nuevo_3 = cola.encolar(("ciclo", "A"), ciclo_lento, "A", descripcion="Ciclo de A")
+    id_4, _ = cola.encolar(("ciclo", "B"), lambda: 1 / 0, descripcion="Ciclo de B (falla)")
+    print(f"  Primero en curso: {cola.obtener(id_1)['estado']}; segundo nuevo: {nuevo_2}; "
+          f"tercero deduplicado: {not nuevo_3 and id_3 == id_2}")
+
+    liberar.set()
+    cola.esperar()
+    for trabajo in cola.listar():
+        print(f"  {trabajo['id']} {trabajo['descripcion']}: {trabajo['estado']} {trabajo['resultado'] or trabajo['error'] or ''}")
+    print(f"  Estadísticas: {cola.estadisticas()}")
+    cola.detener()
@@ -0,0 +1,266 @@
+# agentes/planificador_analisis.py
+import os
+import sys
+import threading
+import time
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+# --- Modificación para permitir la ejecución directa del script ---
+current_script_dir = os.path.dirname(os.path.abspath(__file__))
+project_root_dir = os.path.abspath(os.path.join(current_script_dir, '..'))
+if project_root_dir not in sys.path:
+    sys.path.insert(0, project_root_dir)
+# --- Fin de la modificación ---
+
+from rdf_utils.rdf_manager_trading import RDFManagerTrading
+from agentes.agente_perfil_estrategia import AgentePerfilEstrategia
+from agentes.agente_señales_trading import AgenteseñalesTrading
+from utils.indicadores_incrementales import clave_config, sembrar_configs
+
+INTERVALO_DEFAULT_SEGUNDOS = 60
+
+def _descripcion(clave: tuple) -> str:
+    par_uri, periodo = clave
+    return f"<{par_uri}> ({periodo})"
+
+class PlanificadorAnalisis:
+    """
+    Ejecuta el ciclo de análisis para todas las trade:Estrategia del grafo.
+    Agrupa las estrategias por trade:monitoreaPar y periodo de sus barras para obtener los
+    datos de mercado una sola vez por par y periodo. Los indicadores de cada serie se siembran
+    el primer ciclo y después solo avanzan con las barras nuevas (AgenteseñalesTrading.
+    seguimiento_indicadores), así que cada ciclo pide y procesa solo esas barras. Las siembras
+    (primer ciclo, configuraciones nuevas o tras un hueco), que recorren toda la ventana, se
+    reparten en un pool de procesos de max_concurrencia procesos. Centraliza todas las
+    escrituras RDF en el hilo del planificador (un único escritor). Las reglas de señales de
+    todas las estrategias se evalúan juntas, en una sola pasada. Las escrituras de todo el
+    ciclo se aplican en un único lote: el dashboard ve el ciclo completo o el anterior.
+    """
+    def __init__(self, agente_señales: AgenteseñalesTrading,
+                 intervalo_segundos: float = INTERVALO_DEFAULT_SEGUNDOS,
+                 max_concurrencia: int | None = None,
+                 periodo_tiempo: str | None = None, limite_datos: int = 100):
+        self.agente_señales = agente_señales
+        self.agente_estrategia = agente_señales.agente_estrategia
+        self.rdf_manager = agente_señales.rdf_manager
+        self.ns = self.rdf_manager.ns_manager
+        self.intervalo_segundos = intervalo_segundos
+        self.max_concurrencia = max_concurrencia or os.cpu_count() or 1
+        self.periodo_tiempo = periodo_tiempo # None: el del horizonte de cada estrategia (Estrategia.periodo_tiempo)
+        self.limite_datos = limite_datos
+
+        self._pool_procesos = None
+        self._hilo = None
+        self._detener = threading.Event()
+        self._lock_ciclo = threading.Lock() # Un solo ciclo a la vez, sea manual o periódico
+
+    def _obtener_pool(self) -> ProcessPoolExecutor | None:
+        if self.max_concurrencia <= 1:
+            return None
+        if self._pool_procesos is None:
+            self._pool_procesos = ProcessPoolExecutor(max_workers=self.max_concurrencia)
+        return self._pool_procesos
+
+    def descubrir_estrategias_por_par(self, nombres_estrategias: list[str] | None = None) -> dict:
+        """
+        Devuelve {uri_par: [estrategia, ...]} con todas las estrategias del grafo, o solo con
+        las de nombres_estrategias (IDs locales) si se indican.
+        """
+        resultados = self.rdf_manager.ejecutar_consulta("estrategias_y_pares")
+        estrategias_por_par = {}
+        if not resultados:
+            return estrategias_por_par
+        for fila in resultados:
+            nombre_local = str(fila["estrategia"]).split('#')[-1]
+            if nombres_estrategias is not None and nombre_local not in nombres_estrategias:
+                continue
+            estrategia = self.agente_estrategia.obtener_estrategia_activa(nombre_local)
+            if estrategia:
+                estrategias_por_par.setdefault(str(estrategia.par_mercado_uri), []).append(estrategia)
+        return estrategias_por_par
+
+    def ejecutar_ciclo(self, nombres_estrategias: list[str] | None = None) -> dict:
+        """
+        Ejecuta un ciclo completo sobre todas las estrategias (o solo las de nombres_estrategias)
+        y guarda el grafo una sola vez. Devuelve un resumen con las estrategias procesadas y
+        los errores por par y periodo.
+        """
+        with self._lock_ciclo:
+            inicio = time.perf_counter()
+            resumen = {"estrategias": [], "errores": {}, "duracion_segundos": 0.0}
+            estrategias_por_par = self.descubrir_estrategias_por_par(nombres_estrategias)
+            if not estrategias_por_par:
+                print("PlanificadorAnalisis: No hay estrategias en el grafo.")
+                return resumen
+
+            # 1. Resolver configuraciones (lecturas del grafo, en este hilo)
+            grupos = {}
+            for par_uri, estrategias_par in estrategias_por_par.items():
+                for estrategia in estrategias_par:
+                    periodo = self.periodo_tiempo or estrategia.periodo_tiempo
+                    grupos.setdefault((par_uri, periodo), []).append(estrategia)
+            trabajos = {}
+            for clave, estrategias in grupos.items():
+                configs_por_estrategia = [self.agente_señales.resolver_configs_motor(e) for e in estrategias]
+                configs_unicas = {}
+                for configs_motor in configs_por_estrategia:
+                    for config in configs_motor:
+                        if config["tipo"]:
+                            configs_unicas.setdefault(clave_config(config), config)
+                trabajos[clave] = (estrategias, configs_por_estrategia, list(configs_unicas.values()))
+
+            # 2. Obtener los datos de mercado una vez por par y periodo (E/S, en paralelo con hilos):
+            #    solo las barras desde el ciclo anterior si la serie ya está sembrada
+            with ThreadPoolExecutor(max_workers=self.max_concurrencia) as pool_hilos:
+                futuros_datos = {
+                    clave: pool_hilos.submit(self.agente_señales.obtener_datos_ciclo, estrategias[0].par_mercado_label,
+                                             clave[1], configs_unicas, self.limite_datos)
+                    for clave, (estrategias, _, configs_unicas) in trabajos.items()
+                }
+                datos_por_clave = {}
+                for clave, futuro in futuros_datos.items():
+                    try:
+                        datos_por_clave[clave] = futuro.result()
+                    except Exception as e:
+                        # El fallo de un proveedor solo deja sin ciclo a ese par y periodo
+                        resumen["errores"][_descripcion(clave)] = f"Error obteniendo datos de mercado: {e}"
+                        print(f"PlanificadorAnalisis: Error obteniendo datos para {_descripcion(clave)}: {e}")
+
+            # 3. Sembrar en el pool de procesos las configuraciones que lo necesiten (toda la ventana)
+            seguimiento = self.agente_señales.seguimiento_indicadores
+            pool = self._obtener_pool()
+            siembras = {}
+            for clave, (estrategias, _, configs_unicas) in trabajos.items():
+                datos = datos_por_clave.get(clave)
+                if datos is None:
+                    if clave in datos_por_clave:
+                        resumen["errores"][_descripcion(clave)] = "Sin datos de mercado"
+                    continue
+                por_sembrar = seguimiento.configs_por_sembrar((estrategias[0].par_mercado_label, clave[1]), datos, configs_unicas)
+                if por_sembrar and pool is not None:
+                    cierres = datos['close'].to_numpy(dtype=np.float64)
+                    siembras[clave] = pool.submit(sembrar_configs, cierres, por_sembrar)
+
+            # 4. Avanzar los indicadores de cada serie con sus barras nuevas y
+            # 5. evaluar las reglas de señales de todas las estrategias a la vez
+            pendientes = []
+            for clave, (estrategias, configs_por_estrategia, configs_unicas) in trabajos.items():
+                datos = datos_por_clave.get(clave)
+                if datos is None:
+                    continue
+                try:
+                    sembrados = siembras[clave].result() if clave in siembras else None
+                    ultimos, previos, precio, precio_previo = self.agente_señales.calcular_ultimos_valores(
+                        estrategias[0].par_mercado_label, clave[1], configs_unicas, datos, sembrados)
+                except Exception as e:
+                    resumen["errores"][_descripcion(clave)] = str(e)
+                    print(f"PlanificadorAnalisis: Error calculando indicadores para {_descripcion(clave)}: {e}")
+                    continue
+                for estrategia, configs_motor in zip(estrategias, configs_por_estrategia):
+                    # Cada estrategia solo ve sus propias configuraciones, no las del resto de la serie
+                    ids_configs = {config["id"] for config in configs_motor}
+                    pendientes.append((estrategia, configs_motor, {
+                        "estrategia": estrategia.nombre_local, "precio": precio, "precio_previo": precio_previo,
+                        "ultimos": {id_config: v for id_config, v in ultimos.items() if id_config in ids_configs},
+                        "previos": {id_config: v for id_config, v in previos.items() if id_config in ids_configs},
+                    }))
+            señales_por_contexto = self.agente_señales.evaluar_señales_lote([contexto for _, _, contexto in pendientes])
+
+            # 6. Escribir: los lotes de cada estrategia se unen al del ciclo y se aplican juntos al final
+            with self.rdf_manager.lote_escritura():
+                for (estrategia, configs_motor, contexto), señales_activas in zip(pendientes, señales_por_contexto):
+                    self.agente_señales.almacenar_resultados_ciclo(estrategia, configs_motor, contexto["ultimos"],
+                                                                    contexto["precio"], guardar=False,
+                                                                    señales_activas=señales_activas)
+                    resumen["estrategias"].append(estrategia.nombre_local)
+
+            self.rdf_manager.guardar_datos()
+            resumen["duracion_segundos"] = time.perf_counter() - inicio
+            print(f"PlanificadorAnalisis: Ciclo completado para {len(resumen['estrategias'])} estrategias "
+                  f"en {len(estrategias_por_par)} pares y {len(trabajos)} series ({resumen['duracion_segundos']:.2f}s).")
+            return resumen
+
+    def _bucle(self):
+        while not self._detener.is_set():
+            try:
+                self.ejecutar_ciclo()
+            except Exception as e:
+                print(f"PlanificadorAnalisis: Error en el ciclo periódico: {e}")
+            self._detener.wait(self.intervalo_segundos)
+
+    def iniciar(self):
+        """Inicia la ejecución periódica del ciclo en un hilo de fondo."""
+        if self._hilo and self._hilo.is_alive():
+            return
+        self._detener.clear()
+        self._hilo = threading.Thread(target=self._bucle, name="PlanificadorAnalisis", daemon=True)
+        self._hilo.start()
+        print(f"PlanificadorAnalisis: Iniciado con intervalo de {self.intervalo_segundos}s y concurrencia máxima {self.max_concurrencia}.")
+
+    def detener(self):
+        self._detener.set()
+        if self._hilo:
+            self._hilo.join()
+            self._hilo = None
+        if self._pool_procesos:
+            self._pool_procesos.shutdown()
+            self._pool_procesos = None
+
+
+# Bloque de prueba
+if __name__ == '__main__':
+    print("Probando PlanificadorAnalisis...")
+
+    ontologia_f = os.path.join(project_root_dir, 'datos_trading', 'ontologia_trading.ttl')
+    datos_muestra_f = os.path.join(project_root_dir, 'datos_trading', 'datos_trading_muestra.ttl')
+    persist_f = os.path.join(project_root_dir, 'datos_trading', 'test_planificador_persist.ttl')
+
+    if os.path.exists(persist_f):
+        os.remove(persist_f)
+
+    manager = RDFManagerTrading(
+        ontologia_path=ontologia_f,
+        datos_muestra_path=datos_muestra_f,
+        persist_path=persist_f
+    )
+    agente_estrategia_test = AgentePerfilEstrategia(manager)
+    agente_señales_test = AgenteseñalesTrading(manager, agente_estrategia_test)
+    agente_estrategia_test.definir_o_actualizar_estrategia(
+        nombre_estrategia_local="EstrategiaAgresivaWLD",
+        nombre_display_estrategia="Estrategia Agresiva WLD",
+        par_mercado_local="WLD_USDT",
+        uris_config_indicadores=["ConfigRSI14", "ConfigMACD12_26_9"],
+        nivel_riesgo="ALTO",
+    )
+
+    planificador = PlanificadorAnalisis(agente_señales_test, max_concurrencia=2)
+    resumen = planificador.ejecutar_ciclo()
+    print(f"\nResumen del ciclo: {resumen}")
+
+    # Lectores concurrentes durante varios ciclos: cada ciclo añade una recomendación por
+    # estrategia en un único lote, así que nunca debe verse un número intermedio
+    clase_recomendacion = manager.ns_manager.trade.RecomendacionTrading
+    def contar_recomendaciones():
+        with manager.lectura() as grafo:
+            return len(set(grafo.subjects(manager.ns_manager.rdf.type, clase_recomendacion)))
+    num_estrategias, inicial = len(resumen["estrategias"]), contar_recomendaciones()
+    lecturas, a_medias, detener_lectores = [0], [], threading.Event()
+    def lector():
+        while not detener_lectores.is_set():
+            if (contar_recomendaciones() - inicial) % num_estrategias:
+                a_medias.append(1)
+            manager.ejecutar_consulta("ultima_recomendacion_par", par=manager.ns_manager.trade.WLD_USDT)
+            lecturas[0] += 1
+    lectores = [threading.Thread(target=lector) for _ in range(4)]
+    for hilo in lectores:
+        hilo.start()
+    for _ in range(3):
+        planificador.ejecutar_ciclo()
+    detener_lectores.set()
+    for hilo in lectores:
+        hilo.join()
+    print(f"\n{lecturas[0]} lecturas concurrentes durante 3 ciclos; ciclos vistos a medias: {len(a_medias)}")
+    print(f"Cerrojo del grafo: {manager.cerrojo.estadisticas()}")
+    planificador.detener()
+    print("\nPrueba de PlanificadorAnalisis completada.")
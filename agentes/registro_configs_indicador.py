@@ -0,0 +1,204 @@
+# agentes/registro_configs_indicador.py
+import os
+import sys
+import threading
+from dataclasses import dataclass, field
+from decimal import Decimal
+
+# --- Modificación para permitir la ejecución directa del script ---
+current_script_dir = os.path.dirname(os.path.abspath(__file__))
+project_root_dir = os.path.abspath(os.path.join(current_script_dir, '..'))
+if project_root_dir not in sys.path:
+    sys.path.insert(0, project_root_dir)
+# --- Fin de la modificación ---
+
+from rdf_utils.rdf_manager_trading import RDFManagerTrading
+from rdflib import Literal, URIRef
+from rdflib.namespace import RDF, XSD
+
+# Registro de todas las trade:IndicadorTecnicoConfig del grafo, leídas con una sola consulta.
+# El tipo de cada configuración sale de trade:tieneTipoBase y TIPOS_INDICADOR indica cómo
+# pasar sus propiedades numéricas a los parámetros del motor de indicadores. Un tipo nuevo
+# se añade con registrar_tipo_indicador, sin tocar los agentes.
+
+@dataclass(frozen=True)
+class TipoIndicador:
+    tipo_motor: str # Valor de 'tipo' que entiende MotorIndicadores.calcular
+    parametros: dict # {clave del motor: propiedad de la ontología}
+    requeridos: tuple = () # Claves del motor sin las que la configuración no se calcula
+
+TIPOS_INDICADOR = {
+    "TipoSMA": TipoIndicador("SMA", {"periodo": "periodoIndicador"}, ("periodo",)),
+    "TipoRSI": TipoIndicador("RSI", {"periodo": "periodoIndicador"}, ("periodo",)),
+    "TipoMACD": TipoIndicador("MACD",
+                              {"periodo_corto": "periodoCorto", "periodo_largo": "periodoLargo", "periodo_señal": "periodoseñal"},
+                              ("periodo_corto", "periodo_largo", "periodo_señal")),
+    "TipoBandasBollinger": TipoIndicador("BB", {"periodo": "periodoIndicador", "num_std_dev": "desviacionEstandar"},
+                                         ("periodo", "num_std_dev")),
+}
+
+# Claves presentes en toda configuración del motor (None si el tipo no las usa)
+CLAVES_MOTOR = ("periodo", "periodo_corto", "periodo_largo", "periodo_señal", "num_std_dev")
+
+def registrar_tipo_indicador(tipo_base_local: str, tipo: TipoIndicador):
+    """Asocia un individuo trade:TipoIndicadorTecnico (por su ID local) a su tipo del motor."""
+    TIPOS_INDICADOR[tipo_base_local] = tipo
+
+def _valor_parametro(literal: Literal):
+    valor = literal.toPython()
+    return float(valor) if isinstance(valor, Decimal) else valor
+
+@dataclass(frozen=True)
+class ConfigIndicador:
+    uri: URIRef
+    nombre_local: str
+    nombre_display: str
+    tipo_base: URIRef | None = None
+    parametros: dict = field(default_factory=dict) # {"periodoIndicador": 14, "desviacionEstandar": 2.0, ...}
+
+    def config_motor(self) -> dict:
+        """
+        Configuración en el formato de it.calcular_indicadores_lote. 'tipo' queda en None si
+        el tipo base no está en TIPOS_INDICADOR o faltan parámetros requeridos.
+        """
+        config = {"id": self.nombre_local, "tipo": None, **{clave: None for clave in CLAVES_MOTOR}}
+        tipo = TIPOS_INDICADOR.get(self.tipo_base.split('#')[-1]) if self.tipo_base is not None else None
+        if tipo is None:
+            return config
+        for clave, propiedad in tipo.parametros.items():
+            config[clave] = self.parametros.get(propiedad)
+        if all(config.get(clave) for clave in tipo.requeridos):
+            config["tipo"] = tipo.tipo_motor
+        return config
+
+class RegistroConfigsIndicador:
+    """
+    Configuraciones de indicadores cargadas en bloque y recargadas solo cuando cambia alguna.
+    Se suscribe a los cambios del grafo: una escritura sobre una configuración conocida o un
+    rdf:type trade:IndicadorTecnicoConfig nuevo marca el registro como obsoleto y la
+    siguiente lectura vuelve a ejecutar la consulta.
+    """
+    def __init__(self, rdf_manager: RDFManagerTrading):
+        self.rdf_manager = rdf_manager
+        self.ns = rdf_manager.ns_manager
+        self._lock = threading.Lock()
+        self._configs = {} # uri -> ConfigIndicador
+        self._obsoleto = True
+        self._generacion = 0
+        self.recargas = 0
+        rdf_manager.suscribir_cambios(self.notificar_cambios)
+
+    def notificar_cambios(self, añadidas=(), eliminadas=()):
+        clase_config = self.ns.trade.IndicadorTecnicoConfig
+        with self._lock:
+            for tripletas in (añadidas, eliminadas):
+                for s, p, o in tripletas:
+                    if s in self._configs or (p == RDF.type and o == clase_config):
+                        self._generacion += 1
+                        self._obsoleto = True
+                        return
+
+    def _leer_configs(self) -> dict:
+        configs = {}
+        resultados = self.rdf_manager.ejecutar_consulta("configs_indicador")
+        for fila in (resultados or []):
+            config = configs.setdefault(fila["config"], {"nombre": fila["nombreCfgInd"], "tipo_base": fila["tipoBase"], "parametros": {}})
+            if fila["p"] is not None:
+                config["parametros"][str(fila["p"]).split('#')[-1]] = _valor_parametro(fila["o"])
+        return {
+            config_uri: ConfigIndicador(
+                uri=config_uri,
+                nombre_local=config_uri.split('#')[-1],
+                nombre_display=str(datos["nombre"]) if datos["nombre"] is not None else config_uri.split('#')[-1],
+                tipo_base=datos["tipo_base"],
+                parametros=datos["parametros"],
+            )
+            for config_uri, datos in configs.items()
+        }
+
+    def configs(self) -> dict:
+        """{uri: ConfigIndicador} con todas las configuraciones del grafo."""
+        with self._lock:
+            if not self._obsoleto:
+                return self._configs
+            generacion = self._generacion
+        configs = self._leer_configs()
+        with self._lock:
+            # Si hubo un cambio mientras se leía, se devuelve lo leído pero se recargará en la próxima lectura
+            if generacion == self._generacion:
+                self._configs, self._obsoleto = configs, False
+                self.recargas += 1
+        return configs
+
+    def obtener(self, config_uri: URIRef) -> ConfigIndicador:
+        """
+        Configuración de una URI. Si no es una trade:IndicadorTecnicoConfig del grafo se
+        devuelve una configuración sin tipo, que el ciclo de análisis ignora.
+        """
+        config = self.configs().get(config_uri)
+        if config is None:
+            nombre_local = config_uri.split('#')[-1]
+            config = ConfigIndicador(uri=config_uri, nombre_local=nombre_local, nombre_display=nombre_local)
+        return config
+
+
+    def definir_config(self, config_motor: dict) -> URIRef | None:
+        """
+        Devuelve la trade:IndicadorTecnicoConfig con ese tipo del motor y esos parámetros. Si
+        no existe ninguna se crea una con un ID derivado de ellos (p. ej. ConfigSMA30,
+        ConfigMACD8_21_5, ConfigBB20_2p5). None si el tipo no está en TIPOS_INDICADOR.
+        """
+        tipo_motor = config_motor.get("tipo")
+        tipo_base_local, tipo = next(((nombre, t) for nombre, t in TIPOS_INDICADOR.items() if t.tipo_motor == tipo_motor),
+                                     (None, None))
+        if tipo is None:
+            print(f"RegistroConfigsIndicador: Tipo de indicador '{tipo_motor}' no registrado.")
+            return None
+        claves = tuple(tipo.parametros)
+        buscada = {clave: config_motor.get(clave) for clave in claves}
+        for config in self.configs().values():
+            existente = config.config_motor()
+            if existente["tipo"] == tipo_motor and all(existente[c] == buscada[c] for c in claves):
+                return config.uri
+
+        textos = [f"{buscada[c]:g}" if isinstance(buscada[c], float) else str(buscada[c]) for c in claves]
+        config_uri = self.ns.get_uri(f"Config{tipo_motor}" + "_".join(t.replace(".", "p") for t in textos))
+        propiedades = {
+            self.ns.trade.nombreConfigIndicador: Literal(f"{tipo_motor} ({', '.join(textos)})"),
+            self.ns.trade.tieneTipoBase: self.ns.trade[tipo_base_local],
+        }
+        for clave, propiedad in tipo.parametros.items():
+            valor = buscada[clave]
+            propiedades[self.ns.trade[propiedad]] = Literal(valor, datatype=XSD.decimal if isinstance(valor, float) else XSD.integer)
+        with self.rdf_manager.lote_escritura() as lote:
+            lote.agregar_entidad(config_uri, self.ns.trade.IndicadorTecnicoConfig, propiedades)
+        return config_uri
+
+
+# Bloque de prueba
+if __name__ == '__main__':
+    print("Probando RegistroConfigsIndicador...")
+    manager = RDFManagerTrading(
+        ontologia_path=os.path.join(project_root_dir, 'datos_trading', 'ontologia_trading.ttl'),
+        datos_muestra_path=os.path.join(project_root_dir, 'datos_trading', 'datos_trading_muestra.ttl'),
+        persist_path=None
+    )
+    registro = RegistroConfigsIndicador(manager)
+    for config in sorted(registro.configs().values(), key=lambda c: c.nombre_local):
+        print(f"  {config.nombre_local}: {config.config_motor()}")
+    registro.configs()
+    print(f"Recargas tras dos lecturas: {registro.recargas}")
+
+    # Un tipo nuevo se registra sin tocar los agentes (el motor de indicadores debe reconocer su 'tipo')
+    trade = manager.ns_manager.trade
+    registrar_tipo_indicador("TipoEMA", TipoIndicador("EMA", {"periodo": "periodoIndicador"}, ("periodo",)))
+    with manager.lote_escritura() as lote:
+        lote.agregar_entidad(trade.ConfigEMA9, trade.IndicadorTecnicoConfig, {
+            trade.nombreConfigIndicador: Literal("EMA de 9 períodos"),
+            trade.tieneTipoBase: trade.TipoEMA,
+            trade.periodoIndicador: Literal(9),
+        })
+    print(f"ConfigEMA9 tras añadirla: {registro.obtener(trade.ConfigEMA9).config_motor()} (recargas: {registro.recargas})")
+    manager.actualizar_precio_par_mercado(trade.WLD_USDT, 2.5)
+    registro.configs()
+    print(f"Recargas tras actualizar un precio (no es una configuración): {registro.recargas}")
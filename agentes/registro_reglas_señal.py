@@ -0,0 +1,146 @@
+# agentes/registro_reglas_señal.py
+import os
+import sys
+import threading
+
+# --- Modificación para permitir la ejecución directa del script ---
+current_script_dir = os.path.dirname(os.path.abspath(__file__))
+project_root_dir = os.path.abspath(os.path.join(current_script_dir, '..'))
+if project_root_dir not in sys.path:
+    sys.path.insert(0, project_root_dir)
+# --- Fin de la modificación ---
+
+from rdf_utils.rdf_manager_trading import RDFManagerTrading
+from utils.reglas_señales import ReglaSeñal, ReglasCompiladas, REGLAS_PREDETERMINADAS
+from rdflib import Literal, URIRef
+from rdflib.namespace import RDF, XSD
+
+# Registro de las trade:ReglaSeñal del grafo, leídas con una sola consulta y compiladas una
+# vez (ReglasCompiladas). Como RegistroConfigsIndicador, se suscribe a los cambios del grafo
+# y solo vuelve a leer y compilar cuando cambia alguna regla. Si el grafo no tiene reglas
+# generales (sin trade:aplicaAEstrategia) se usan REGLAS_PREDETERMINADAS junto a las propias
+# de cada estrategia; sembrar_predeterminadas() las escribe en el grafo.
+
+class RegistroReglasSeñal:
+    def __init__(self, rdf_manager: RDFManagerTrading):
+        self.rdf_manager = rdf_manager
+        self.ns = rdf_manager.ns_manager
+        self._lock = threading.Lock()
+        self._compiladas = None
+        self._uris = set() # Reglas conocidas, para reconocer los cambios que les afectan
+        self._obsoleto = True
+        self._generacion = 0
+        self.recargas = 0
+        rdf_manager.suscribir_cambios(self.notificar_cambios)
+
+    def notificar_cambios(self, añadidas=(), eliminadas=()):
+        clase_regla = self.ns.trade.ReglaSeñal
+        with self._lock:
+            for tripletas in (añadidas, eliminadas):
+                for s, p, o in tripletas:
+                    if s in self._uris or (p == RDF.type and o == clase_regla):
+                        self._generacion += 1
+                        self._obsoleto = True
+                        return
+
+    def _leer_reglas(self) -> tuple[list[ReglaSeñal], set]:
+        local = lambda termino: str(termino).split('#')[-1] if termino is not None else None
+        texto = lambda termino: str(termino) if termino is not None else None
+        reglas, uris = [], set()
+        for fila in (self.rdf_manager.ejecutar_consulta("reglas_señal") or []):
+            uris.add(fila["regla"])
+            try:
+                reglas.append(ReglaSeñal(
+                    id=local(fila["regla"]),
+                    tipo_señal=str(fila["tipo"]),
+                    config=local(fila["config"]),
+                    operador=str(fila["operador"]),
+                    componente=texto(fila["componente"]) or "valor",
+                    umbral=float(fila["umbral"]) if fila["umbral"] is not None else None,
+                    compara_con=texto(fila["comparaCon"]),
+                    compara_con_config=local(fila["comparaConConfig"]),
+                    plantilla=texto(fila["plantilla"]) or "",
+                    estrategia=local(fila["estrategia"]),
+                ))
+            except (TypeError, ValueError) as e:
+                print(f"RegistroReglasSeñal: Regla <{fila['regla']}> ignorada: {e}")
+        return reglas, uris
+
+    def compiladas(self) -> ReglasCompiladas:
+        """Reglas del grafo (con las predeterminadas si no hay reglas generales) ya compiladas."""
+        with self._lock:
+            if not self._obsoleto:
+                return self._compiladas
+            generacion = self._generacion
+        reglas, uris = self._leer_reglas()
+        if not any(regla.estrategia is None for regla in reglas):
+            reglas = list(REGLAS_PREDETERMINADAS) + reglas
+        compiladas = ReglasCompiladas(reglas)
+        with self._lock:
+            # Si hubo un cambio mientras se leía, se devuelve lo leído pero se recargará en la próxima lectura
+            if generacion == self._generacion:
+                self._compiladas, self._uris, self._obsoleto = compiladas, uris, False
+                self.recargas += 1
+        return compiladas
+
+    def reglas(self) -> list[ReglaSeñal]:
+        return list(self.compiladas().reglas)
+
+    def definir_regla(self, regla: ReglaSeñal) -> URIRef | None:
+        """Crea o reemplaza la trade:ReglaSeñal con el ID de la regla. None si la regla no es válida."""
+        motivo = regla.validar()
+        if motivo:
+            print(f"RegistroReglasSeñal: Regla '{regla.id}' no válida: {motivo}.")
+            return None
+        trade = self.ns.trade
+        regla_uri = self.ns.get_uri(regla.id)
+        propiedades = {
+            trade.tiposeñalGenerada: Literal(regla.tipo_señal),
+            trade.evaluaConfigIndicador: self.ns.get_uri(regla.config),
+            trade.operadorRegla: Literal(regla.operador),
+            trade.componenteEvaluado: Literal(regla.componente),
+        }
+        if regla.umbral is not None:
+            propiedades[trade.umbralRegla] = Literal(float(regla.umbral), datatype=XSD.decimal)
+        if regla.compara_con is not None:
+            propiedades[trade.comparaConComponente] = Literal(regla.compara_con)
+        if regla.compara_con_config is not None:
+            propiedades[trade.comparaConConfig] = self.ns.get_uri(regla.compara_con_config)
+        if regla.plantilla:
+            propiedades[trade.plantillaDescripcion] = Literal(regla.plantilla)
+        if regla.estrategia is not None:
+            propiedades[trade.aplicaAEstrategia] = self.ns.get_uri(regla.estrategia)
+        with self.rdf_manager.lote_escritura() as lote:
+            lote.eliminar(regla_uri, None, None)
+            lote.agregar_entidad(regla_uri, trade.ReglaSeñal, propiedades)
+        return regla_uri
+
+    def sembrar_predeterminadas(self) -> int:
+        """Escribe REGLAS_PREDETERMINADAS en el grafo si aún no hay reglas generales. Devuelve cuántas escribió."""
+        if any(regla.estrategia is None for regla in self._leer_reglas()[0]):
+            return 0
+        with self.rdf_manager.lote_escritura():
+            escritas = sum(self.definir_regla(regla) is not None for regla in REGLAS_PREDETERMINADAS)
+        return escritas
+
+
+# Bloque de prueba
+if __name__ == '__main__':
+    print("Probando RegistroReglasSeñal...")
+    manager = RDFManagerTrading(
+        ontologia_path=os.path.join(project_root_dir, 'datos_trading', 'ontologia_trading.ttl'),
+        datos_muestra_path=os.path.join(project_root_dir, 'datos_trading', 'datos_trading_muestra.ttl'),
+        persist_path=None
+    )
+    registro = RegistroReglasSeñal(manager)
+    print(f"  Sin reglas en el grafo se usan las predeterminadas: {[r.id for r in registro.reglas()]}")
+    print(f"  Reglas sembradas: {registro.sembrar_predeterminadas()}; recargas: {registro.recargas}")
+    print(f"  Leídas del grafo: {sorted(registro.reglas(), key=lambda r: r.id) == sorted(REGLAS_PREDETERMINADAS, key=lambda r: r.id)}; recargas: {registro.recargas}")
+
+    # Una regla nueva es solo datos: entra en la siguiente compilación sin tocar el código
+    registro.definir_regla(ReglaSeñal("ReglaRSIExtremo", "RSI_EXTREMO_BAJO", "ConfigRSI14", "MENOR_QUE", umbral=15,
+                                      plantilla="RSI ({valor:.2f}) en zona extrema para {par}."))
+    print(f"  Tras añadir una regla: {len(registro.compiladas())} reglas; recargas: {registro.recargas}")
+    manager.actualizar_precio_par_mercado(manager.ns_manager.trade.WLD_USDT, 2.5)
+    registro.compiladas()
+    print(f"  Recargas tras actualizar un precio (no es una regla): {registro.recargas}")
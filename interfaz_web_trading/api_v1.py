@@ -0,0 +1,163 @@
+# interfaz_web_trading/api_v1.py
+import os
+import sys
+
+import numpy as np
+from flask import Blueprint, jsonify, request
+from rdflib.namespace import RDF
+
+current_script_dir = os.path.dirname(os.path.abspath(__file__))
+project_root_dir = os.path.abspath(os.path.join(current_script_dir, '..'))
+if project_root_dir not in sys.path:
+    sys.path.insert(0, project_root_dir)
+
+from rdf_utils.vista_ultimo_estado import a_json
+from rdf_utils.indice_recomendaciones import a_ns, codificar_cursor, decodificar_cursor
+
+# API JSON versionada para consumidores automáticos (/api/v1/...). Los datos "últimos" salen
+# de la vista precalculada, el historial de indicadores del almacén de series y el de
+# recomendaciones del índice ordenado por tiempo. Las listas largas se paginan por clave:
+# cada respuesta trae 'siguiente' (un cursor opaco o null) que se pasa como ?cursor= para
+# pedir la página siguiente; el coste de una página no depende de su posición.
+LIMITE_PAGINA_DEFAULT = 100
+LIMITE_PAGINA_MAX = 1000
+
+def _error(mensaje: str, estado: int):
+    return jsonify({"error": mensaje}), estado
+
+def _parametros_pagina() -> dict:
+    """limite, cursor, desde, hasta y orden de la petición. Lanza ValueError si alguno no es válido."""
+    limite = request.args.get('limite', LIMITE_PAGINA_DEFAULT, type=int)
+    if not 1 <= limite <= LIMITE_PAGINA_MAX:
+        raise ValueError(f"'limite' debe estar entre 1 y {LIMITE_PAGINA_MAX}")
+    orden = request.args.get('orden', 'desc')
+    if orden not in ('asc', 'desc'):
+        raise ValueError("'orden' debe ser 'asc' o 'desc'")
+    desde, hasta = request.args.get('desde'), request.args.get('hasta')
+    for valor in (desde, hasta):
+        if valor is not None:
+            a_ns(valor) # Valida el formato ISO 8601
+    cursor = request.args.get('cursor') or None
+    if cursor is not None:
+        decodificar_cursor(cursor)
+    return {"limite": limite, "cursor": cursor, "desde": desde, "hasta": hasta, "descendente": orden == 'desc'}
+
+def _estrategia_a_dict(estrategia) -> dict:
+    return {
+        "id": estrategia.nombre_local,
+        "nombre": estrategia.nombre_display,
+        "par": str(estrategia.par_mercado_uri).split('#')[-1],
+        "nivel_riesgo": estrategia.nivel_riesgo,
+        "horizonte": estrategia.horizonte_temporal,
+        "indicadores": [
+            {"id": config.nombre_local, "nombre": config.nombre_display,
+             "tipo": config.config_motor()["tipo"], "parametros": config.parametros}
+            for config in estrategia.configuraciones_indicadores
+        ],
+    }
+
+def crear_api_v1(rdf_manager, agente_estrategia, vista_estado, almacen_series, indice_recomendaciones) -> Blueprint:
+    """Blueprint de /api/v1 sobre los componentes ya inicializados de la aplicación."""
+    api = Blueprint('api_v1', __name__, url_prefix='/api/v1')
+    trade = rdf_manager.ns_manager.trade
+
+    def par_existe(par_local: str) -> bool:
+        with rdf_manager.lectura() as grafo:
+            return (trade[par_local], RDF.type, trade.ParMercado) in grafo
+
+    def estado_par(par_local: str) -> dict:
+        estado = vista_estado.obtener(par_local)
+        if estado is None:
+            estado = vista_estado.reconstruir_par(rdf_manager, trade[par_local])
+        return estado
+
+    @api.route('/pares')
+    def pares():
+        filas = rdf_manager.ejecutar_consulta("pares_mercado")
+        if filas is None:
+            return _error("No se pudieron consultar los pares de mercado.", 500)
+        return jsonify({"datos": [{
+            "id": str(fila["par"]).split('#')[-1],
+            "base": str(fila["simboloBase"]) if fila["simboloBase"] is not None else None,
+            "cotizacion": str(fila["simboloCotizacion"]) if fila["simboloCotizacion"] is not None else None,
+            "precio": float(fila["precio"]) if fila["precio"] is not None else None,
+            "volumen24h": float(fila["volumen"]) if fila["volumen"] is not None else None,
+        } for fila in filas]})
+
+    @api.route('/pares/<par_local>')
+    def par(par_local):
+        """Último estado del par (precio, indicadores y recomendación), con ETag para peticiones condicionales."""
+        if not par_existe(par_local):
+            return _error(f"Par '{par_local}' no encontrado.", 404)
+        estado = estado_par(par_local)
+        respuesta = jsonify(a_json(estado))
+        respuesta.set_etag(estado["etag"])
+        return respuesta.make_conditional(request)
+
+    @api.route('/pares/<par_local>/indicadores')
+    def indicadores_par(par_local):
+        if not par_existe(par_local):
+            return _error(f"Par '{par_local}' no encontrado.", 404)
+        return jsonify({"datos": estado_par(par_local)["valores_indicadores"]})
+
+    @api.route('/pares/<par_local>/indicadores/<config_local>/historial')
+    def historial_indicador(par_local, config_local):
+        """
+        Historial paginado en columnas: {"ts": [...], "valores": {componente: [...]}, "siguiente"}.
+        Parámetros: ?limite=, ?cursor=, ?desde=, ?hasta= (ISO 8601) y ?orden=desc|asc.
+        """
+        if not almacen_series:
+            return _error("El almacén de series no está disponible.", 503)
+        if (par_local, config_local) not in almacen_series.series(par_local):
+            return _error(f"No hay historial de '{config_local}' para '{par_local}'.", 404)
+        try:
+            pagina = _parametros_pagina()
+        except ValueError as e:
+            return _error(f"Parámetros no válidos: {e}", 400)
+        despues_de = decodificar_cursor(pagina["cursor"])[0] if pagina["cursor"] else None
+        df, siguiente = almacen_series.leer_pagina(par_local, config_local, pagina["limite"], despues_de=despues_de,
+                                                   desde=pagina["desde"], hasta=pagina["hasta"],
+                                                   descendente=pagina["descendente"])
+        return jsonify({
+            "par": par_local,
+            "config": config_local,
+            "ts": [ts.isoformat() for ts in df.index],
+            "valores": {c: [None if np.isnan(v) else float(v) for v in df[c].to_numpy()] for c in df.columns},
+            "siguiente": codificar_cursor(siguiente) if siguiente is not None else None,
+        })
+
+    @api.route('/pares/<par_local>/recomendaciones')
+    def recomendaciones_par(par_local):
+        """Historial paginado de recomendaciones (mismos parámetros que el historial de indicadores)."""
+        if not par_existe(par_local):
+            return _error(f"Par '{par_local}' no encontrado.", 404)
+        try:
+            pagina = _parametros_pagina()
+        except ValueError as e:
+            return _error(f"Parámetros no válidos: {e}", 400)
+        filas, siguiente = indice_recomendaciones.pagina(trade[par_local], pagina["limite"], cursor=pagina["cursor"],
+                                                         desde=pagina["desde"], hasta=pagina["hasta"],
+                                                         descendente=pagina["descendente"])
+        return jsonify({
+            "par": par_local,
+            "datos": indice_recomendaciones.detalle([uri for _, uri in filas]),
+            "siguiente": siguiente,
+        })
+
+    @api.route('/estrategias')
+    def estrategias():
+        filas = rdf_manager.ejecutar_consulta("estrategias_y_pares")
+        if filas is None:
+            return _error("No se pudieron consultar las estrategias.", 500)
+        nombres = sorted({str(fila["estrategia"]).split('#')[-1] for fila in filas})
+        resueltas = (agente_estrategia.obtener_estrategia_activa(nombre) for nombre in nombres)
+        return jsonify({"datos": [_estrategia_a_dict(e) for e in resueltas if e is not None]})
+
+    @api.route('/estrategias/<nombre_local>')
+    def estrategia(nombre_local):
+        resuelta = agente_estrategia.obtener_estrategia_activa(nombre_local)
+        if resuelta is None:
+            return _error(f"Estrategia '{nombre_local}' no encontrada.", 404)
+        return jsonify(_estrategia_a_dict(resuelta))
+
+    return api
@@ -1,7 +1,9 @@
 import os
 import sys
-from flask import Flask, render_template, request, flash, redirect, url_for
+import json
+from flask import Flask, Response, render_template, request, flash, redirect, url_for, jsonify, make_response, session
 from datetime import datetime
+import pandas as pd
 
 current_script_dir = os.path.dirname(os.path.abspath(__file__))
 project_root_dir = os.path.abspath(os.path.join(current_script_dir, '..'))
@@ -9,9 +11,20 @@ if project_root_dir not in sys.path:
     sys.path.insert(0, project_root_dir)
 
 from rdf_utils.rdf_manager_trading import RDFManagerTrading
+from rdf_utils.almacen_series import AlmacenSeriesIndicadores
+from rdf_utils.retencion_trading import RetencionTrading, INTERVALO_RETENCION_DEFAULT_SEGUNDOS
+from rdf_utils.vista_ultimo_estado import VistaUltimoEstado, a_json
+from rdf_utils.canal_eventos import CanalEventos
+from rdf_utils.indice_recomendaciones import IndiceRecomendaciones
 from agentes.agente_perfil_estrategia import AgentePerfilEstrategia
 from agentes.agente_señales_trading import AgenteseñalesTrading
-from rdflib.namespace import RDF, XSD 
+from agentes.planificador_analisis import PlanificadorAnalisis, INTERVALO_DEFAULT_SEGUNDOS
+from agentes.cola_trabajos import ColaTrabajos
+from interfaz_web_trading.api_v1 import crear_api_v1
+from utils.proveedores_datos import crear_proveedor
+from utils.cache_ohlcv import CacheOHLCV
+from utils.remuestreo import ProveedorRemuestreado
+from utils import indicadores_tecnicos as it
 
 app = Flask(__name__, template_folder='templates', static_folder='../static_trading') 
 app.secret_key = os.urandom(24)
@@ -19,27 +32,110 @@ app.secret_key = os.urandom(24)
 ONTOLOGIA_PATH = os.path.join(project_root_dir, 'datos_trading', 'ontologia_trading.ttl')
 DATOS_MUESTRA_PATH = os.path.join(project_root_dir, 'datos_trading', 'datos_trading_muestra.ttl')
 DATOS_PERSIST_PATH = os.path.join(project_root_dir, 'datos_trading', 'datos_actualizados.ttl') 
+PERSISTENCIA_MODO = os.environ.get('PERSISTENCIA_MODO', 'turtle') # 'turtle' o 'diario'
+RDF_BACKEND = os.environ.get('RDF_BACKEND', 'memoria') # 'memoria' o 'sqlite'
+SERIES_INDICADORES_DIR = os.environ.get('SERIES_INDICADORES_DIR', os.path.join(project_root_dir, 'datos_trading', 'series_indicadores'))
+
+# Origen de los datos de mercado (ver utils/proveedores_datos.py)
+PROVEEDOR_DATOS = os.environ.get('PROVEEDOR_DATOS', 'simulado') # 'simulado' o 'archivos'
+DATOS_MERCADO_DIR = os.environ.get('DATOS_MERCADO_DIR', os.path.join(project_root_dir, 'datos_trading', 'mercado'))
+PROVEEDOR_SEMILLA = int(os.environ.get('PROVEEDOR_SEMILLA', 0))
+# Caché local de barras OHLCV delante del proveedor (vacío = sin caché)
+CACHE_OHLCV_DIR = os.environ.get('CACHE_OHLCV_DIR', os.path.join(project_root_dir, 'datos_trading', 'cache_ohlcv'))
+# Periodo del flujo base del que se derivan los periodos mayores (vacío = cada periodo se pide aparte)
+PERIODO_BASE = os.environ.get('PERIODO_BASE', '1m')
+
+# Planificación del ciclo de análisis (todas las estrategias del grafo)
+ANALISIS_INTERVALO_SEGUNDOS = float(os.environ.get('ANALISIS_INTERVALO_SEGUNDOS', INTERVALO_DEFAULT_SEGUNDOS))
+ANALISIS_MAX_CONCURRENCIA = int(os.environ.get('ANALISIS_MAX_CONCURRENCIA', 0)) or None # 0 = número de CPUs
+ANALISIS_AUTOINICIAR = os.environ.get('ANALISIS_AUTOINICIAR', 'False').lower() in ['true', '1', 't']
+
+# Retención del historial (valores de indicadores, señales y recomendaciones)
+RETENCION_DIAS_CRUDOS = int(os.environ.get('RETENCION_DIAS_CRUDOS', 7))
+RETENCION_DIAS_HORARIOS = int(os.environ.get('RETENCION_DIAS_HORARIOS', 90))
+RETENCION_DIAS_RECOMENDACIONES = int(os.environ.get('RETENCION_DIAS_RECOMENDACIONES', 30))
+RETENCION_INTERVALO_SEGUNDOS = float(os.environ.get('RETENCION_INTERVALO_SEGUNDOS', INTERVALO_RETENCION_DEFAULT_SEGUNDOS))
+RETENCION_AUTOINICIAR = os.environ.get('RETENCION_AUTOINICIAR', 'False').lower() in ['true', '1', 't']
+
+# Stream de eventos del dashboard: comentario de latido para mantener viva la conexión
+SSE_LATIDO_SEGUNDOS = float(os.environ.get('SSE_LATIDO_SEGUNDOS', 15))
 
 try:
     rdf_manager = RDFManagerTrading(
         ontologia_path=ONTOLOGIA_PATH,
         datos_muestra_path=DATOS_MUESTRA_PATH,
-        persist_path=DATOS_PERSIST_PATH
+        persist_path=DATOS_PERSIST_PATH,
+        modo_persistencia=PERSISTENCIA_MODO,
+        backend=RDF_BACKEND
     )
+    almacen_series = AlmacenSeriesIndicadores(SERIES_INDICADORES_DIR)
+    # La vista publica en el canal un delta por par cada vez que un ciclo aplica su lote (ver /stream)
+    canal_eventos = CanalEventos()
+    vista_estado = VistaUltimoEstado(canal=canal_eventos)
     agente_estrategia = AgentePerfilEstrategia(rdf_manager)
-    agente_señales = AgenteseñalesTrading(rdf_manager, agente_estrategia)
+    proveedor_datos = crear_proveedor(PROVEEDOR_DATOS, directorio=DATOS_MERCADO_DIR, semilla=PROVEEDOR_SEMILLA)
+    if CACHE_OHLCV_DIR:
+        # Cada ciclo solo pide al proveedor las barras que faltan en la caché
+        proveedor_datos = CacheOHLCV(proveedor_datos, CACHE_OHLCV_DIR)
+    if PERIODO_BASE:
+        # Las estrategias de cada horizonte (1h, 4h, 1d...) comparten un único flujo base por par
+        proveedor_datos = ProveedorRemuestreado(proveedor_datos, periodo_base=PERIODO_BASE)
+    agente_señales = AgenteseñalesTrading(rdf_manager, agente_estrategia, almacen_series=almacen_series,
+                                          vista_estado=vista_estado, proveedor_datos=proveedor_datos)
+    planificador = PlanificadorAnalisis(
+        agente_señales,
+        intervalo_segundos=ANALISIS_INTERVALO_SEGUNDOS,
+        max_concurrencia=ANALISIS_MAX_CONCURRENCIA
+    )
+    if ANALISIS_AUTOINICIAR:
+        planificador.iniciar()
+    # Los ciclos pedidos desde la web se ejecutan en segundo plano (ver /ejecutar_ciclo y /trabajos)
+    cola_trabajos = ColaTrabajos(nombre="ColaCiclosAnalisis")
+    retencion = RetencionTrading(
+        rdf_manager,
+        almacen_series=almacen_series,
+        dias_valores_crudos=RETENCION_DIAS_CRUDOS,
+        dias_valores_horarios=RETENCION_DIAS_HORARIOS,
+        dias_recomendaciones=RETENCION_DIAS_RECOMENDACIONES
+    )
+    if RETENCION_AUTOINICIAR:
+        retencion.iniciar(RETENCION_INTERVALO_SEGUNDOS)
+    # API JSON (/api/v1); el historial de recomendaciones se pagina sobre un índice por par
+    indice_recomendaciones = IndiceRecomendaciones(rdf_manager)
+    app.register_blueprint(crear_api_v1(rdf_manager, agente_estrategia, vista_estado, almacen_series, indice_recomendaciones))
     print("RDFManager y agentes inicializados correctamente para Flask.")
 except Exception as e:
     print(f"Error fatal durante la inicialización de RDF/Agentes en Flask: {e}")
     rdf_manager = None
+    almacen_series = None
+    canal_eventos = None
+    vista_estado = None
+    proveedor_datos = None
     agente_estrategia = None
     agente_señales = None
+    planificador = None
+    cola_trabajos = None
+    retencion = None
+    indice_recomendaciones = None
 
 PARES_MERCADO_DEMO = {
     "WLD_USDT": "WLD/USDT"
 }
 DEFAULT_PAR_MERCADO_ID = "WLD_USDT"
 
+ETIQUETAS_COMPONENTES = {
+    "valor": "Valor", "macd": "MACD", "señal": "Señal MACD", "histograma": "Hist. MACD",
+    "media": "Banda Media", "superior": "Banda Sup.", "inferior": "Banda Inf.",
+}
+
+def _cabeceras_cache_dashboard(respuesta, estado: dict):
+    """ETag y Last-Modified del estado del par; no-cache obliga al navegador a revalidar."""
+    respuesta.set_etag(estado["etag"])
+    if estado["modificado"] is not None:
+        respuesta.last_modified = estado["modificado"]
+    respuesta.cache_control.no_cache = True
+    return respuesta
+
 @app.context_processor
 def inject_global_vars():
     return dict(
@@ -61,164 +157,246 @@ def dashboard_par(par_mercado_id_local=DEFAULT_PAR_MERCADO_ID):
     if par_mercado_id_local != "WLD_USDT":
         return redirect(url_for('dashboard_par', par_mercado_id_local="WLD_USDT"))
 
-    par_mercado_uri = rdf_manager.ns_manager.get_uri(par_mercado_id_local)
+    # Último estado precalculado por el ciclo de análisis; solo se consulta el grafo en frío
+    estado = vista_estado.obtener(par_mercado_id_local)
+    if estado is None:
+        estado = vista_estado.reconstruir_par(rdf_manager, rdf_manager.ns_manager.get_uri(par_mercado_id_local))
+
+    # Petición condicional (If-None-Match / If-Modified-Since). Si hay mensajes flash pendientes
+    # la página se genera siempre para mostrarlos.
+    if not session.get('_flashes'):
+        no_modificada = _cabeceras_cache_dashboard(app.response_class(), estado).make_conditional(request)
+        if no_modificada.status_code == 304:
+            return no_modificada
+
     par_mercado_label = PARES_MERCADO_DEMO.get(par_mercado_id_local, par_mercado_id_local)
-    
     datos_dashboard = {
         "par_mercado_label": par_mercado_label,
         "par_mercado_id_local": par_mercado_id_local, 
-        "precio_actual": "N/A",
-        "volumen24h": "N/A",
-        "ultima_actualizacion_precio": "N/A",
-        "valores_indicadores": [], 
+        "version": estado["version"],
+        "precio_actual": f"{estado['precio_actual']:.4f}" if estado["precio_actual"] is not None else "N/A",
+        "volumen24h": f"{estado['volumen24h']:,.2f}" if estado["volumen24h"] is not None else "N/A",
+        "ultima_actualizacion_precio": estado["timestamp_precio"] or "N/A",
+        "valores_indicadores": sorted((
+            {
+                "nombre": indicador["nombre"],
+                "valores": [f"{ETIQUETAS_COMPONENTES.get(c, c)}: {v:.4f}" for c, v in indicador["valores"].items()],
+                "ts": indicador["ts"],
+            }
+            for indicador in estado["valores_indicadores"].values()
+        ), key=lambda ind: ind["nombre"]),
         "ultima_recomendacion": None 
     }
+    recomendacion = estado["ultima_recomendacion"]
+    if recomendacion:
+        datos_dashboard["ultima_recomendacion"] = {
+            "accion": recomendacion["accion"],
+            "justificacion": recomendacion["justificacion"],
+            "confianza": f"{recomendacion['confianza']:.2%}" if recomendacion["confianza"] is not None else "N/A",
+            "timestamp": recomendacion["timestamp"],
+            "señales_base": "; ".join(recomendacion["señales"]) or "N/A",
+        }
+
+    respuesta = make_response(render_template('dashboard_trading.html', data=datos_dashboard, par_mercado_actual_id_for_page=par_mercado_id_local,
+                                              etiquetas_componentes=ETIQUETAS_COMPONENTES, indicadores_iniciales=estado["valores_indicadores"]))
+    return _cabeceras_cache_dashboard(respuesta, estado)
+
+def _mensaje_sse(tipo: str, id_evento: int, datos_json: str) -> str:
+    return f"id: {id_evento}\nevent: {tipo}\ndata: {datos_json}\n\n"
 
-    q_par_info = f"""
-        PREFIX trade: <{rdf_manager.ns_manager.trade}>
-        SELECT ?precio ?volumen
-        WHERE {{
-            <{par_mercado_uri}> trade:precioActual ?precio .
-            OPTIONAL {{ <{par_mercado_uri}> trade:volumen24h ?volumen . }}
-        }} LIMIT 1
+@app.route('/stream/<par_mercado_id_local>')
+def stream_par(par_mercado_id_local):
     """
-    res_par_info = rdf_manager.ejecutar_sparql(q_par_info)
-    if res_par_info:
-        for fila in res_par_info:
-            datos_dashboard["precio_actual"] = f"{float(fila['precio']):.4f}" if fila.get("precio") else "N/A"
-            datos_dashboard["volumen24h"] = f"{float(fila.get('volumen', 0)):,.2f}" if fila.get("volumen") else "N/A"
-            datos_dashboard["ultima_actualizacion_precio"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S") 
-    
-    q_valores_indicadores = f"""
-        PREFIX trade: <{rdf_manager.ns_manager.trade}>
-        PREFIX rdf: <{RDF}>
-        PREFIX xsd: <{XSD}>
-        SELECT ?configNombre ?valorNum ?valorMACD ?valorseñalMACD ?valorHistMACD 
-               ?valorBandaMedia ?valorBandaSuperior ?valorBandaInferior ?ts
-        WHERE {{
-            ?valorIndInst rdf:type trade:ValorIndicador ;
-                          trade:seAplicaA <{par_mercado_uri}> ;
-                          trade:esValorDe ?configIndURI ;
-                          trade:timestampValor ?ts .
-            ?configIndURI trade:nombreConfigIndicador ?configNombre .
-            
-            OPTIONAL {{ ?valorIndInst trade:valorNumerico ?valorNum . }}
-            OPTIONAL {{ ?valorIndInst trade:valorMACD ?valorMACD . }}
-            OPTIONAL {{ ?valorIndInst trade:valorseñalMACD ?valorseñalMACD . }}
-            OPTIONAL {{ ?valorIndInst trade:valorHistogramaMACD ?valorHistMACD . }}
-            OPTIONAL {{ ?valorIndInst trade:valorBandaMedia ?valorBandaMedia . }}
-            OPTIONAL {{ ?valorIndInst trade:valorBandaSuperior ?valorBandaSuperior . }}
-            OPTIONAL {{ ?valorIndInst trade:valorBandaInferior ?valorBandaInferior . }}
-        }} 
-        ORDER BY DESC(?ts) ?configNombre 
+    Server-Sent Events con los cambios del par. Al conectar se envía el estado completo
+    (evento 'estado') salvo que el cliente ya tenga la versión actual (cabecera Last-Event-ID o
+    ?desde=versión); después, un evento 'delta' por cada ciclo que cambie el par. Todos los
+    clientes reciben el mismo JSON, serializado una vez por ciclo, sin consultar el grafo.
+    """
+    if not vista_estado or not canal_eventos:
+        return jsonify({"error": "El stream de eventos no está disponible."}), 503
+    if par_mercado_id_local not in PARES_MERCADO_DEMO and vista_estado.obtener(par_mercado_id_local) is None:
+        return jsonify({"error": f"Par '{par_mercado_id_local}' no encontrado."}), 404
+
+    version_cliente = request.headers.get('Last-Event-ID', type=int)
+    if version_cliente is None:
+        version_cliente = request.args.get('desde', type=int)
+    # Suscribirse antes de leer el estado para no perder un delta publicado entre medias
+    suscripcion = canal_eventos.suscribir(par_mercado_id_local)
+
+    def estado_actual() -> dict:
+        estado = vista_estado.obtener(par_mercado_id_local)
+        if estado is None:
+            estado = vista_estado.reconstruir_par(rdf_manager, rdf_manager.ns_manager.get_uri(par_mercado_id_local))
+        return estado
+
+    def generar():
+        try:
+            version, sincronizar = version_cliente, True
+            yield "retry: 5000\n\n"
+            while True:
+                if sincronizar or suscripcion.desincronizada:
+                    # Conexión nueva o cliente que se quedó atrás: estado completo si su versión no es la actual
+                    sincronizar, suscripcion.desincronizada = False, False
+                    estado = estado_actual()
+                    if estado["version"] != version:
+                        yield _mensaje_sse("estado", estado["version"], json.dumps(a_json(estado), default=str))
+                        version = estado["version"]
+                evento = suscripcion.recibir(timeout=SSE_LATIDO_SEGUNDOS)
+                if evento is None:
+                    yield ": latido\n\n"
+                elif evento.id > version:
+                    yield _mensaje_sse(evento.tipo, evento.id, evento.datos)
+                    version = evento.id
+        finally:
+            suscripcion.cerrar()
+
+    return Response(generar(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@app.route('/estadisticas/eventos')
+def estadisticas_eventos():
+    """Suscriptores conectados y eventos publicados/entregados/perdidos del canal, en JSON."""
+    if not canal_eventos:
+        return jsonify({"error": "El canal de eventos no está disponible."}), 503
+    return jsonify(canal_eventos.estadisticas())
+
+@app.route('/historial/<par_mercado_id_local>/<config_indicador_id_local>')
+def historial_indicador(par_mercado_id_local, config_indicador_id_local):
+    """Historial de una configuración sobre un par en JSON (?ultimos=N, ?desde=ISO, ?hasta=ISO)."""
+    if not almacen_series:
+        return jsonify({"error": "El almacén de series no está disponible."}), 503
+    try:
+        ultimos = int(request.args['ultimos']) if request.args.get('ultimos') else None
+        df = almacen_series.leer(par_mercado_id_local, config_indicador_id_local,
+                                 desde=request.args.get('desde'), hasta=request.args.get('hasta'), ultimos=ultimos)
+    except ValueError as e:
+        return jsonify({"error": f"Parámetros no válidos: {e}"}), 400
+    filas = [{"timestamp": ts.isoformat(), **{c: (None if pd.isna(v) else float(v)) for c, v in fila.items()}}
+             for ts, fila in zip(df.index, df.to_dict("records"))]
+    return jsonify({
+        "par": par_mercado_id_local,
+        "config": config_indicador_id_local,
+        "componentes": list(df.columns),
+        "filas": filas,
+    })
+
+@app.route('/universo/indicadores')
+def indicadores_universo():
     """
-    res_valores_ind = rdf_manager.ejecutar_sparql(q_valores_indicadores)
-    indicadores_procesados = {} 
-    if res_valores_ind:
-        for fila_ind in res_valores_ind:
-            nombre_conf = str(fila_ind["configNombre"])
-            if nombre_conf not in indicadores_procesados: 
-                indicador_display = {"nombre": nombre_conf, "valores": [], "ts": str(fila_ind["ts"])}
-                if fila_ind.get("valorNum") is not None:
-                    indicador_display["valores"].append(f"Valor: {float(fila_ind['valorNum']):.4f}")
-                if fila_ind.get("valorMACD") is not None:
-                    indicador_display["valores"].append(f"MACD: {float(fila_ind['valorMACD']):.4f}")
-                if fila_ind.get("valorseñalMACD") is not None:
-                    indicador_display["valores"].append(f"Señal MACD: {float(fila_ind['valorseñalMACD']):.4f}")
-                if fila_ind.get("valorHistMACD") is not None:
-                    indicador_display["valores"].append(f"Hist. MACD: {float(fila_ind['valorHistMACD']):.4f}")
-                if fila_ind.get("valorBandaMedia") is not None:
-                    indicador_display["valores"].append(f"Banda Media: {float(fila_ind['valorBandaMedia']):.4f}")
-                if fila_ind.get("valorBandaSuperior") is not None:
-                    indicador_display["valores"].append(f"Banda Sup.: {float(fila_ind['valorBandaSuperior']):.4f}")
-                if fila_ind.get("valorBandaInferior") is not None:
-                    indicador_display["valores"].append(f"Banda Inf.: {float(fila_ind['valorBandaInferior']):.4f}")
-                
-                if indicador_display["valores"]: 
-                    datos_dashboard["valores_indicadores"].append(indicador_display)
-                    indicadores_procesados[nombre_conf] = True
-
-    q_ultima_recomendacion = f"""
-        PREFIX trade: <{rdf_manager.ns_manager.trade}>
-        PREFIX rdf: <{RDF}>
-        SELECT ?recomInst ?accion ?justificacion ?confianza ?ts 
-               (COALESCE(GROUP_CONCAT(DISTINCT ?desc; separator="; "), "N/A") AS ?señalesDetalle)
-        WHERE {{
-            ?recomInst rdf:type trade:RecomendacionTrading ;
-                       trade:paraActivo <{par_mercado_uri}> ;
-                       trade:accionSugerida ?accion ;
-                       trade:justificacionDecision ?justificacion ;
-                       trade:nivelConfianza ?confianza ;
-                       trade:timestampRecomendacion ?ts .
-            
-            OPTIONAL {{
-                ?recomInst trade:basadaEnseñal ?s .
-                ?s trade:descripcionseñal ?desc .
-            }}
-        }}
-        GROUP BY ?recomInst ?accion ?justificacion ?confianza ?ts 
-        ORDER BY DESC(?ts)
-        LIMIT 1
+    Instantánea de indicadores (configuraciones por defecto) de todos los pares monitorizados,
+    calculada en una sola llamada sobre la matriz de cierres tiempo × pares (?periodo=1d, ?limite=200).
     """
-    res_recom = rdf_manager.ejecutar_sparql(q_ultima_recomendacion)
-    
-    if res_recom:
-        lista_res_recom = list(res_recom) 
-        if lista_res_recom:
-            fila_recom = lista_res_recom[0] 
-            datos_dashboard["ultima_recomendacion"] = {
-                "accion": str(fila_recom["accion"]),
-                "justificacion": str(fila_recom["justificacion"]),
-                "confianza": f"{float(fila_recom['confianza']):.2%}" if fila_recom.get("confianza") else "N/A",
-                "timestamp": str(fila_recom["ts"]),
-                "señales_base": str(fila_recom.get("señalesDetalle", "N/A")) 
-            }
+    if not proveedor_datos:
+        return jsonify({"error": "El proveedor de datos de mercado no está disponible."}), 503
+    periodo = request.args.get('periodo', '1d')
+    try:
+        limite = int(request.args.get('limite', 200))
+    except ValueError as e:
+        return jsonify({"error": f"Parámetros no válidos: {e}"}), 400
+    datos_por_par = {par_id: proveedor_datos.obtener(etiqueta, periodo_tiempo=periodo, limite=limite)
+                     for par_id, etiqueta in PARES_MERCADO_DEMO.items()}
+    cierres = it.matriz_cierres(datos_por_par)
+    if cierres.empty:
+        return jsonify({"error": f"No hay datos de mercado para el periodo '{periodo}'."}), 404
+    instantanea = it.instantanea_universo(cierres)
+    return jsonify({
+        "periodo": periodo,
+        "columnas": list(instantanea.columns),
+        "pares": {par_id: {c: (None if pd.isna(v) else float(v)) for c, v in fila.items()}
+                  for par_id, fila in zip(instantanea.index, instantanea.to_dict("records"))},
+    })
+
+@app.route('/estadisticas/consultas')
+def estadisticas_consultas():
+    """Contadores de llamadas y tiempos de las consultas SPARQL preparadas, en JSON."""
+    if not rdf_manager:
+        return jsonify({"error": "El sistema de análisis no está disponible."}), 503
+    return jsonify(rdf_manager.estadisticas_consultas())
+
+@app.route('/estadisticas/estrategias')
+def estadisticas_cache_estrategias():
+    """Aciertos, fallos e invalidaciones de la caché de estrategias, en JSON."""
+    if not agente_estrategia or agente_estrategia.cache is None:
+        return jsonify({"error": "La caché de estrategias no está disponible."}), 503
+    return jsonify(agente_estrategia.cache.estadisticas())
+
+NOMBRE_ESTRATEGIA_PREDETERMINADA = "EstrategiaPredeterminada"
 
-    return render_template('dashboard_trading.html', data=datos_dashboard, par_mercado_actual_id_for_page=par_mercado_id_local)
+def _asegurar_estrategia_predeterminada():
+    """Crea la EstrategiaPredeterminada si no existe, para que el ciclo tenga al menos una estrategia."""
+    if agente_estrategia.obtener_estrategia_activa(NOMBRE_ESTRATEGIA_PREDETERMINADA):
+        return
+    print(f"DEBUG [ciclo_analisis]: Estrategia '{NOMBRE_ESTRATEGIA_PREDETERMINADA}' no encontrada. Intentando crearla...")
+    agente_estrategia.definir_o_actualizar_estrategia(
+        nombre_estrategia_local=NOMBRE_ESTRATEGIA_PREDETERMINADA,
+        nombre_display_estrategia="Estrategia Conservadora WLD (Auto-Creada)", # Nombre consistente
+        par_mercado_local=DEFAULT_PAR_MERCADO_ID, 
+        uris_config_indicadores=["ConfigSMA20", "ConfigRSI14", "ConfigMACD12_26_9", "ConfigBB20_2"], 
+        nivel_riesgo="MEDIO",
+        horizonte_temporal="CORTO_PLAZO"
+    )
+    if not agente_estrategia.obtener_estrategia_activa(NOMBRE_ESTRATEGIA_PREDETERMINADA):
+        raise RuntimeError(f"Error crítico al configurar la estrategia '{NOMBRE_ESTRATEGIA_PREDETERMINADA}'.")
+    print(f"DEBUG [ciclo_analisis]: Estrategia '{NOMBRE_ESTRATEGIA_PREDETERMINADA}' creada/verificada.")
+
+def _ejecutar_ciclo_analisis(nombre_estrategia: str | None = None) -> dict:
+    """Trabajo de la cola: ciclo del planificador para una estrategia o, si no se indica, para todas."""
+    if nombre_estrategia is None:
+        _asegurar_estrategia_predeterminada()
+        return planificador.ejecutar_ciclo()
+    if not agente_estrategia.obtener_estrategia_activa(nombre_estrategia):
+        raise ValueError(f"La estrategia '{nombre_estrategia}' no existe en el grafo.")
+    return planificador.ejecutar_ciclo(nombres_estrategias=[nombre_estrategia])
+
+def _prefiere_json() -> bool:
+    mejor = request.accept_mimetypes.best_match(["application/json", "text/html"])
+    return mejor == "application/json" and request.accept_mimetypes[mejor] > request.accept_mimetypes["text/html"]
 
 @app.route('/ejecutar_ciclo', methods=['POST'])
 def ejecutar_ciclo_agente():
-    if not agente_señales or not agente_estrategia: 
+    """
+    Encola un ciclo de análisis (todas las estrategias, o la indicada en 'estrategia') y
+    responde enseguida con el ID del trabajo: 202 en JSON o redirección al dashboard con un
+    aviso. Si ya hay un ciclo pendiente para la misma estrategia se devuelve ese trabajo.
+    """
+    par_id_actual = request.args.get('par_mercado', DEFAULT_PAR_MERCADO_ID)
+    if not agente_señales or not agente_estrategia or not planificador or not cola_trabajos: 
+        if _prefiere_json():
+            return jsonify({"error": "Los agentes de análisis o estrategia no están disponibles."}), 503
         flash("Error: Los agentes de análisis o estrategia no están disponibles.", "danger")
         return redirect(request.referrer or url_for('index_redirect'))
 
-    par_id_actual = "WLD_USDT" 
-    nombre_estrategia_a_ejecutar = "EstrategiaPredeterminada"
-        
-    print(f"DEBUG [ejecutar_ciclo_agente]: Solicitud para ejecutar ciclo para el par: {par_id_actual}")
-    print(f"DEBUG [ejecutar_ciclo_agente]: Usando estrategia '{nombre_estrategia_a_ejecutar}' para {par_id_actual}.")
-            
-    if nombre_estrategia_a_ejecutar:
-        current_strategy_details = agente_estrategia.obtener_estrategia_activa(nombre_estrategia_a_ejecutar)
-        if not current_strategy_details:
-            print(f"DEBUG [ejecutar_ciclo_agente]: Estrategia '{nombre_estrategia_a_ejecutar}' no encontrada. Intentando crearla...")
-            agente_estrategia.definir_o_actualizar_estrategia(
-                nombre_estrategia_local=nombre_estrategia_a_ejecutar,
-                nombre_display_estrategia="Estrategia Conservadora WLD (Auto-Creada)", # Nombre consistente
-                par_mercado_local=par_id_actual, 
-                uris_config_indicadores=["ConfigSMA20", "ConfigRSI14", "ConfigMACD12_26_9", "ConfigBB20_2"], 
-                nivel_riesgo="MEDIO",
-                horizonte_temporal="CORTO_PLAZO"
-            )
-            if not agente_estrategia.obtener_estrategia_activa(nombre_estrategia_a_ejecutar):
-                flash(f"Error crítico al configurar la estrategia '{nombre_estrategia_a_ejecutar}'.", "danger")
-                return redirect(url_for('dashboard_par', par_mercado_id_local=par_id_actual))
-            print(f"DEBUG [ejecutar_ciclo_agente]: Estrategia '{nombre_estrategia_a_ejecutar}' creada/verificada.")
+    nombre_estrategia = request.values.get('estrategia') or None
+    descripcion = f"Ciclo de análisis ({nombre_estrategia or 'todas las estrategias'})"
+    id_trabajo, nuevo = cola_trabajos.encolar(("ciclo", nombre_estrategia), _ejecutar_ciclo_analisis, nombre_estrategia,
+                                              descripcion=descripcion)
+    url_estado = url_for('estado_trabajo', id_trabajo=id_trabajo)
+    if _prefiere_json():
+        return jsonify({"id": id_trabajo, "nuevo": nuevo, "estado": url_estado}), 202, {"Location": url_estado}
 
-
-        try:
-            print(f"Ejecutando ciclo de análisis para la estrategia: {nombre_estrategia_a_ejecutar}")
-            agente_señales.ejecutar_ciclo_analisis(nombre_estrategia_a_ejecutar)
-            flash(f"Ciclo de análisis ejecutado para {PARES_MERCADO_DEMO.get(par_id_actual, par_id_actual)} usando estrategia '{nombre_estrategia_a_ejecutar}'.", "success")
-        except Exception as e:
-            flash(f"Error al ejecutar el ciclo de análisis: {e}", "danger")
-            print(f"Error en ejecutar_ciclo_agente: {e}")
+    if nuevo:
+        flash(f"{descripcion} encolado (trabajo {id_trabajo}). El dashboard mostrará los resultados al terminar.", "info")
     else:
-        flash(f"No se pudo determinar la estrategia para el par {par_id_actual}.", "warning")
-        print(f"WARN [ejecutar_ciclo_agente]: No se ejecutó ciclo para {par_id_actual} porque nombre_estrategia_a_ejecutar es None.")
-
+        flash(f"Ya había un ciclo pendiente para esta estrategia (trabajo {id_trabajo}).", "info")
     return redirect(url_for('dashboard_par', par_mercado_id_local=par_id_actual))
 
+@app.route('/trabajos')
+def listar_trabajos():
+    """Trabajos de la cola (los más recientes primero) y recuento por estado, en JSON."""
+    if not cola_trabajos:
+        return jsonify({"error": "La cola de trabajos no está disponible."}), 503
+    return jsonify({"estadisticas": cola_trabajos.estadisticas(), "trabajos": cola_trabajos.listar()})
+
+@app.route('/trabajos/<id_trabajo>')
+def estado_trabajo(id_trabajo):
+    """Estado de un trabajo (pendiente, en_curso, completado o error) y su resultado, en JSON."""
+    if not cola_trabajos:
+        return jsonify({"error": "La cola de trabajos no está disponible."}), 503
+    trabajo = cola_trabajos.obtener(id_trabajo)
+    if trabajo is None:
+        return jsonify({"error": f"Trabajo '{id_trabajo}' no encontrado."}), 404
+    return jsonify(trabajo)
+
 @app.errorhandler(404)
 def pagina_no_encontrada(e):
     return render_template('error_page_trading.html', mensaje="Página no encontrada (404)."), 404
@@ -234,4 +412,4 @@ if __name__ == '__main__':
         os.makedirs(datos_dir)
         print(f"Directorio '{datos_dir}' creado por app_trading.py.")
     
-    app.run(debug=True, port=5002)
+    app.run(debug=True, port=5002, threaded=True)
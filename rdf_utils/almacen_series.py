@@ -0,0 +1,318 @@
+# rdf_utils/almacen_series.py
+import os
+import sys
+import json
+import re
+import shutil
+import threading
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+from rdflib import Literal, URIRef
+from rdflib.namespace import XSD
+
+# --- Modificación para permitir la ejecución directa del script ---
+current_script_dir = os.path.dirname(os.path.abspath(__file__))
+project_root_dir = os.path.abspath(os.path.join(current_script_dir, '..'))
+if project_root_dir not in sys.path:
+    sys.path.insert(0, project_root_dir)
+# --- Fin de la modificación ---
+
+# Almacén columnar de series temporales de indicadores, fuera del grafo RDF.
+# Cada serie (par, configuración) es un directorio con un archivo binario por columna:
+# 'timestamp.i8' (int64, ns desde epoch UTC) y un 'float64' por componente ('valor',
+# 'macd', 'señal', ...), con NaN donde no hay valor. Las columnas solo se anexan y se
+# leen con np.memmap, así que el historial no se carga en memoria. El número de filas de
+# la serie es el de la columna más corta: 'timestamp' se escribe la última, de modo que
+# una escritura interrumpida nunca deja filas a medias visibles.
+# En el grafo cada serie tiene un único trade:ValorIndicador con el último valor,
+# enlazado a su trade:SerieIndicador mediante trade:tieneSerieTemporal.
+COLUMNA_TIEMPO = "timestamp"
+ARCHIVO_ESQUEMA = "esquema.json"
+
+def _nombre_seguro(nombre: str) -> str:
+    return re.sub(r"[^\w\-]", "_", nombre)
+
+def uri_valor_actual(ns_trade, par_local: str, config_local: str) -> URIRef:
+    """URI estable del trade:ValorIndicador con el último valor de una serie."""
+    return ns_trade[f"ValorActual_{par_local}_{config_local}"]
+
+def uri_serie(ns_trade, par_local: str, config_local: str) -> URIRef:
+    return ns_trade[f"Serie_{par_local}_{config_local}"]
+
+def _a_ns(timestamp) -> int:
+    ts = pd.Timestamp(timestamp)
+    return (ts.tz_localize("UTC") if ts.tzinfo is None else ts.tz_convert("UTC")).value
+
+def _a_ns_vector(timestamps) -> np.ndarray:
+    indice = pd.DatetimeIndex(timestamps)
+    indice = indice.tz_localize("UTC") if indice.tz is None else indice.tz_convert("UTC")
+    return indice.asi8.astype(np.int64)
+
+class AlmacenSeriesIndicadores:
+    def __init__(self, directorio: str):
+        self.directorio = directorio
+        self._lock = threading.RLock() # Las reescrituras leen y escriben la serie bajo el mismo bloqueo
+
+    def ruta_serie(self, par_local: str, config_local: str) -> str:
+        return os.path.join(self.directorio, _nombre_seguro(par_local), _nombre_seguro(config_local))
+
+    def ruta_relativa(self, par_local: str, config_local: str) -> str:
+        return os.path.relpath(self.ruta_serie(par_local, config_local), self.directorio)
+
+    def _componentes(self, ruta: str) -> list[str]:
+        ruta_esquema = os.path.join(ruta, ARCHIVO_ESQUEMA)
+        if not os.path.exists(ruta_esquema):
+            return []
+        with open(ruta_esquema, "r", encoding="utf-8") as f:
+            return json.load(f)["componentes"]
+
+    def _guardar_componentes(self, ruta: str, componentes: list[str]):
+        ruta_temporal = os.path.join(ruta, ARCHIVO_ESQUEMA + ".tmp")
+        with open(ruta_temporal, "w", encoding="utf-8") as f:
+            json.dump({"componentes": componentes}, f, ensure_ascii=False)
+        os.replace(ruta_temporal, os.path.join(ruta, ARCHIVO_ESQUEMA))
+
+    def _archivo(self, ruta: str, columna: str) -> str:
+        extension = "i8" if columna == COLUMNA_TIEMPO else "f8"
+        return os.path.join(ruta, f"{_nombre_seguro(columna)}.{extension}")
+
+    def _num_filas(self, ruta: str, componentes: list[str]) -> int:
+        tamaños = [os.path.getsize(self._archivo(ruta, c)) // 8 if os.path.exists(self._archivo(ruta, c)) else 0
+                   for c in [COLUMNA_TIEMPO] + componentes]
+        return min(tamaños)
+
+    def agregar(self, par_local: str, config_local: str, timestamp: datetime, valores: dict):
+        """Anexa una fila {componente: valor} a la serie. Los None se guardan como NaN."""
+        self.agregar_lote(par_local, config_local, [timestamp], {c: [v] for c, v in valores.items()})
+
+    def agregar_lote(self, par_local: str, config_local: str, timestamps, columnas: dict):
+        """
+        Anexa varias filas a la serie. timestamps debe ser creciente y posterior al último
+        timestamp almacenado; las filas fuera de orden se descartan.
+        """
+        with self._lock:
+            self._anexar(self.ruta_serie(par_local, config_local), timestamps, columnas)
+
+    def _anexar(self, ruta: str, timestamps, columnas: dict):
+        tiempos = _a_ns_vector(timestamps)
+        if tiempos.size == 0:
+            return
+        os.makedirs(ruta, exist_ok=True)
+        componentes = self._componentes(ruta)
+        num_filas = self._num_filas(ruta, componentes)
+        nuevos = [c for c in columnas if c not in componentes]
+        if nuevos:
+            # Un componente nuevo empieza con NaN en las filas ya existentes
+            for componente in nuevos:
+                with open(self._archivo(ruta, componente), "wb") as f:
+                    np.full(num_filas, np.nan, dtype=np.float64).tofile(f)
+            componentes = componentes + nuevos
+            self._guardar_componentes(ruta, componentes)
+
+        ultimo = int(self._leer_columna(ruta, COLUMNA_TIEMPO, num_filas)[-1]) if num_filas else np.iinfo(np.int64).min
+        anteriores = np.maximum.accumulate(np.concatenate(([ultimo], tiempos[:-1])))
+        validas = tiempos > anteriores
+        if not validas.any():
+            return
+
+        # Recortar columnas que una escritura interrumpida dejó más largas que 'timestamp'
+        for columna in componentes:
+            archivo = self._archivo(ruta, columna)
+            if os.path.getsize(archivo) // 8 > num_filas:
+                with open(archivo, "r+b") as f:
+                    f.truncate(num_filas * 8)
+
+        for componente in componentes:
+            valores = pd.to_numeric(pd.Series(columnas.get(componente, [None] * tiempos.size), dtype=object),
+                                    errors="coerce").to_numpy(dtype=np.float64)
+            with open(self._archivo(ruta, componente), "ab") as f:
+                valores[validas].tofile(f)
+        with open(self._archivo(ruta, COLUMNA_TIEMPO), "ab") as f:
+            tiempos[validas].tofile(f)
+
+    def fusionar_lote(self, par_local: str, config_local: str, timestamps, columnas: dict):
+        """
+        Mezcla filas en cualquier orden con la serie existente (p. ej. al migrar historial antiguo).
+        Ante timestamps repetidos se conserva la fila ya almacenada.
+        """
+        with self._lock:
+            existente = self.leer(par_local, config_local)
+            nuevas = pd.DataFrame({c: [np.nan if v is None else v for v in valores] for c, valores in columnas.items()},
+                                  index=pd.to_datetime(_a_ns_vector(timestamps), utc=True), dtype=np.float64)
+            combinada = pd.concat([existente, nuevas])
+            combinada = combinada[~combinada.index.duplicated(keep="first")].sort_index()
+            self._reescribir(par_local, config_local, combinada)
+
+    def reducir(self, par_local: str, config_local: str, niveles: list[tuple]) -> int:
+        """
+        Reduce la resolución de las filas antiguas de la serie. niveles es una lista de
+        (antes_de, frecuencia), p. ej. [(hace_90_dias, "1D"), (hace_7_dias, "1h")]: las filas
+        anteriores a cada fecha se agregan por la media de cada intervalo de esa frecuencia,
+        aplicando primero el nivel más antiguo. Devuelve el número de filas eliminadas.
+        """
+        with self._lock:
+            df = self.leer(par_local, config_local)
+            if df.empty:
+                return 0
+            partes, restante = [], df
+            for antes_de, frecuencia in sorted(niveles, key=lambda nivel: _a_ns(nivel[0])):
+                limite = pd.Timestamp(_a_ns(antes_de), tz="UTC")
+                antiguas, restante = restante[restante.index < limite], restante[restante.index >= limite]
+                if not antiguas.empty:
+                    partes.append(antiguas.resample(frecuencia).mean().dropna(how="all"))
+            reducida = pd.concat(partes + [restante])
+            if len(reducida) == len(df):
+                return 0
+            self._reescribir(par_local, config_local, reducida)
+            return len(df) - len(reducida)
+
+    def _reescribir(self, par_local: str, config_local: str, df: pd.DataFrame):
+        """Escribe la serie completa en un directorio temporal y lo intercambia con el actual."""
+        ruta = self.ruta_serie(par_local, config_local)
+        ruta_nueva, ruta_anterior = ruta + ".nueva", ruta + ".anterior"
+        with self._lock:
+            shutil.rmtree(ruta_nueva, ignore_errors=True)
+            self._anexar(ruta_nueva, df.index, {c: df[c].tolist() for c in df.columns})
+            if os.path.exists(ruta):
+                os.replace(ruta, ruta_anterior)
+            os.replace(ruta_nueva, ruta)
+            shutil.rmtree(ruta_anterior, ignore_errors=True)
+
+    def _leer_columna(self, ruta: str, columna: str, num_filas: int) -> np.ndarray:
+        if num_filas == 0:
+            return np.empty(0, dtype=np.int64 if columna == COLUMNA_TIEMPO else np.float64)
+        dtype = np.int64 if columna == COLUMNA_TIEMPO else np.float64
+        return np.memmap(self._archivo(ruta, columna), dtype=dtype, mode="r", shape=(num_filas,))
+
+    def _abrir(self, ruta: str) -> tuple[list[str], np.ndarray, dict]:
+        """
+        Abre la serie bajo el bloqueo del almacén: _reescribir no puede intercambiar el directorio
+        entre la lectura del esquema y la apertura de los memmaps. Una vez abiertos, los memmaps
+        siguen leyendo los archivos originales aunque después se sustituyan.
+        """
+        with self._lock:
+            componentes = self._componentes(ruta)
+            num_filas = self._num_filas(ruta, componentes) if componentes else 0
+            tiempos = self._leer_columna(ruta, COLUMNA_TIEMPO, num_filas)
+            columnas = {c: self._leer_columna(ruta, c, num_filas) for c in componentes}
+        return componentes, tiempos, columnas
+
+    def leer(self, par_local: str, config_local: str, desde=None, hasta=None, ultimos: int | None = None) -> pd.DataFrame:
+        """
+        Devuelve la serie como DataFrame indexado por timestamp UTC, con una columna por
+        componente. El rango [desde, hasta] se localiza por búsqueda binaria sobre el memmap.
+        """
+        componentes, tiempos, columnas = self._abrir(self.ruta_serie(par_local, config_local))
+        num_filas = len(tiempos)
+        inicio = int(np.searchsorted(tiempos, _a_ns(desde), side="left")) if desde is not None else 0
+        fin = int(np.searchsorted(tiempos, _a_ns(hasta), side="right")) if hasta is not None else num_filas
+        if ultimos is not None:
+            inicio = max(inicio, fin - ultimos)
+        datos = {c: np.array(columnas[c][inicio:fin]) for c in componentes}
+        indice = pd.to_datetime(np.array(tiempos[inicio:fin]), utc=True)
+        return pd.DataFrame(datos, index=pd.DatetimeIndex(indice, name=COLUMNA_TIEMPO))
+
+    def leer_pagina(self, par_local: str, config_local: str, limite: int, despues_de: int | None = None,
+                    desde=None, hasta=None, descendente: bool = True) -> tuple[pd.DataFrame, int | None]:
+        """
+        Página de hasta 'limite' filas para paginar por clave: las filas de [desde, hasta]
+        estrictamente anteriores (descendente) o posteriores a 'despues_de' (ns desde epoch,
+        el último timestamp de la página previa). Devuelve el DataFrame en el orden pedido y el
+        timestamp en ns que sirve de clave para la página siguiente, o None si no hay más.
+        """
+        componentes, tiempos, columnas = self._abrir(self.ruta_serie(par_local, config_local))
+        num_filas = len(tiempos)
+        inicio = int(np.searchsorted(tiempos, _a_ns(desde), side="left")) if desde is not None else 0
+        fin = int(np.searchsorted(tiempos, _a_ns(hasta), side="right")) if hasta is not None else num_filas
+        if despues_de is not None:
+            if descendente:
+                fin = min(fin, int(np.searchsorted(tiempos, despues_de, side="left")))
+            else:
+                inicio = max(inicio, int(np.searchsorted(tiempos, despues_de, side="right")))
+        if descendente:
+            inicio_pagina, fin_pagina, hay_mas = max(inicio, fin - limite), fin, fin - limite > inicio
+        else:
+            inicio_pagina, fin_pagina, hay_mas = inicio, min(fin, inicio + limite), inicio + limite < fin
+        orden = slice(None, None, -1) if descendente else slice(None)
+        tiempos_pagina = np.array(tiempos[inicio_pagina:fin_pagina])[orden]
+        datos = {c: np.array(columnas[c][inicio_pagina:fin_pagina])[orden] for c in componentes}
+        df = pd.DataFrame(datos, index=pd.DatetimeIndex(pd.to_datetime(tiempos_pagina, utc=True), name=COLUMNA_TIEMPO))
+        siguiente = int(tiempos_pagina[-1]) if hay_mas and len(tiempos_pagina) else None
+        return df, siguiente
+
+    def ultimo(self, par_local: str, config_local: str) -> tuple[datetime, dict] | None:
+        """Último registro de la serie como (timestamp, {componente: valor o None})."""
+        df = self.leer(par_local, config_local, ultimos=1)
+        if df.empty:
+            return None
+        fila = df.iloc[-1]
+        return df.index[-1].to_pydatetime(), {c: (None if pd.isna(v) else float(v)) for c, v in fila.items()}
+
+    def series(self, par_local: str | None = None) -> list[tuple[str, str]]:
+        """Lista las series almacenadas como (par, configuración)."""
+        if not os.path.isdir(self.directorio):
+            return []
+        pares = [par_local] if par_local else sorted(os.listdir(self.directorio))
+        resultado = []
+        for par in pares:
+            ruta_par = os.path.join(self.directorio, _nombre_seguro(par))
+            if os.path.isdir(ruta_par):
+                resultado.extend((par, config) for config in sorted(os.listdir(ruta_par))
+                                 if os.path.exists(os.path.join(ruta_par, config, ARCHIVO_ESQUEMA)))
+        return resultado
+
+def agregar_nodo_valor_actual(lote, ns, almacen: AlmacenSeriesIndicadores, par_mercado_uri: URIRef,
+                              config_indicador_uri: URIRef, timestamp: datetime, valores: dict,
+                              propiedades_componentes: dict) -> URIRef:
+    """
+    Reemplaza en el lote de escritura el trade:ValorIndicador estable de la serie por el último
+    valor y lo enlaza a su trade:SerieIndicador. Devuelve la URI del nodo.
+    """
+    par_local = str(par_mercado_uri).split('#')[-1]
+    config_local = str(config_indicador_uri).split('#')[-1]
+    valor_uri = uri_valor_actual(ns.trade, par_local, config_local)
+    serie_uri = uri_serie(ns.trade, par_local, config_local)
+    lote.eliminar(valor_uri, None, None)
+    propiedades = {
+        ns.trade.esValorDe: config_indicador_uri,
+        ns.trade.seAplicaA: par_mercado_uri,
+        ns.trade.timestampValor: Literal(timestamp.isoformat(), datatype=XSD.dateTime),
+        ns.trade.tieneSerieTemporal: serie_uri,
+    }
+    for componente, valor in valores.items():
+        if valor is not None:
+            propiedades[ns.trade[propiedades_componentes[componente]]] = Literal(valor, datatype=XSD.decimal)
+    lote.agregar_entidad(valor_uri, ns.trade.ValorIndicador, propiedades)
+    lote.eliminar(serie_uri, None, None)
+    lote.agregar_entidad(serie_uri, ns.trade.SerieIndicador, {
+        ns.trade.esValorDe: config_indicador_uri,
+        ns.trade.seAplicaA: par_mercado_uri,
+        ns.trade.rutaSerie: Literal(almacen.ruta_relativa(par_local, config_local)),
+    })
+    return valor_uri
+
+
+# Bloque de prueba
+if __name__ == '__main__':
+    print("Probando AlmacenSeriesIndicadores...")
+    directorio_f = os.path.join(project_root_dir, 'datos_trading', 'test_series_indicadores')
+    shutil.rmtree(directorio_f, ignore_errors=True)
+
+    almacen = AlmacenSeriesIndicadores(directorio_f)
+    inicio = pd.Timestamp("2025-01-01", tz="UTC")
+    tiempos = [inicio + pd.Timedelta(minutes=i) for i in range(10_000)]
+    almacen.agregar_lote("WLD_USDT", "ConfigRSI14", tiempos, {"valor": np.linspace(20, 80, len(tiempos))})
+    almacen.agregar("WLD_USDT", "ConfigMACD12_26_9", inicio, {"macd": 0.1, "señal": 0.05, "histograma": None})
+    almacen.agregar("WLD_USDT", "ConfigRSI14", inicio, {"valor": 50.0}) # Fuera de orden: se descarta
+    almacen.fusionar_lote("WLD_USDT", "ConfigMACD12_26_9", [inicio - pd.Timedelta(days=1)], {"macd": [0.2]})
+
+    rango = almacen.leer("WLD_USDT", "ConfigRSI14", desde=inicio + pd.Timedelta(hours=1), hasta=inicio + pd.Timedelta(hours=2))
+    print(f"Series: {almacen.series()}")
+    print(f"Filas en la segunda hora: {len(rango)} (primera {rango.index[0]}, última {rango.index[-1]})")
+    print(f"Último RSI: {almacen.ultimo('WLD_USDT', 'ConfigRSI14')}")
+    print(f"Último MACD: {almacen.ultimo('WLD_USDT', 'ConfigMACD12_26_9')}")
+    print(f"MACD tras fusionar historial anterior:\n{almacen.leer('WLD_USDT', 'ConfigMACD12_26_9')}")
+    shutil.rmtree(directorio_f, ignore_errors=True)
+    print("\nPrueba de AlmacenSeriesIndicadores completada.")
@@ -0,0 +1,274 @@
+# rdf_utils/almacen_sqlite.py
+import os
+import sys
+import sqlite3
+import threading
+
+from rdflib import Graph, URIRef, Literal, BNode
+from rdflib.store import Store, VALID_STORE, NO_STORE
+
+# --- Modificación para permitir la ejecución directa del script ---
+current_script_dir = os.path.dirname(os.path.abspath(__file__))
+project_root_dir = os.path.abspath(os.path.join(current_script_dir, '..'))
+if project_root_dir not in sys.path:
+    sys.path.insert(0, project_root_dir)
+# --- Fin de la modificación ---
+
+# Almacén de tripletas persistente sobre SQLite (un único archivo local, sin servidor).
+# Los términos RDF se internan en la tabla 'terminos' y las tripletas se guardan como
+# enteros en 'tripletas', cuya clave primaria (s, p, o) es el índice SPO; los índices
+# POS y OSP cubren el resto de patrones. rdflib ejecuta SPARQL sobre triples(), así que
+# ejecutar_sparql y los agentes funcionan igual que con el grafo en memoria.
+CLASE_URI, CLASE_LITERAL, CLASE_BNODE = 0, 1, 2
+MAX_TERMINOS_EN_CACHE = 100_000
+
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS terminos (
+    id INTEGER PRIMARY KEY,
+    clase INTEGER NOT NULL,
+    lexico TEXT NOT NULL,
+    datatype TEXT NOT NULL DEFAULT '',
+    idioma TEXT NOT NULL DEFAULT '',
+    UNIQUE (lexico, clase, datatype, idioma)
+);
+CREATE TABLE IF NOT EXISTS tripletas (
+    s INTEGER NOT NULL,
+    p INTEGER NOT NULL,
+    o INTEGER NOT NULL,
+    PRIMARY KEY (s, p, o)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_tripletas_pos ON tripletas (p, o, s);
+CREATE INDEX IF NOT EXISTS idx_tripletas_osp ON tripletas (o, s, p);
+CREATE TABLE IF NOT EXISTS namespaces (
+    prefijo TEXT PRIMARY KEY,
+    uri TEXT NOT NULL UNIQUE
+);
+"""
+
+def _clave_termino(termino) -> tuple:
+    if isinstance(termino, Literal):
+        return (str(termino), CLASE_LITERAL, str(termino.datatype or ""), termino.language or "")
+    if isinstance(termino, BNode):
+        return (str(termino), CLASE_BNODE, "", "")
+    return (str(termino), CLASE_URI, "", "")
+
+def _crear_termino(clase: int, lexico: str, datatype: str, idioma: str):
+    if clase == CLASE_LITERAL:
+        return Literal(lexico, datatype=URIRef(datatype) if datatype else None, lang=idioma or None)
+    if clase == CLASE_BNODE:
+        return BNode(lexico)
+    return URIRef(lexico)
+
+class AlmacenSQLite(Store):
+    """
+    Store de rdflib respaldado por SQLite. Uso:
+        graph = Graph(store=AlmacenSQLite())
+        graph.open("datos_trading/datos.sqlite", create=True)
+    Las escrituras quedan en la transacción abierta hasta commit() (RDFManagerTrading.guardar_datos).
+    """
+    context_aware = False
+    formula_aware = False
+    transaction_aware = True
+    graph_aware = False
+
+    def __init__(self, configuration: str | None = None, identifier=None):
+        self._conexion = None
+        self._lock = threading.RLock()
+        self._ids_por_termino = {} # Caché acotada término -> id
+        self._terminos_por_id = {} # Caché acotada id -> término
+        super().__init__(configuration, identifier)
+
+    # --- Ciclo de vida ---
+    def open(self, configuration: str, create: bool = True):
+        if not create and not os.path.exists(configuration):
+            return NO_STORE
+        directorio = os.path.dirname(configuration)
+        if directorio:
+            os.makedirs(directorio, exist_ok=True)
+        with self._lock:
+            self._conexion = sqlite3.connect(configuration, check_same_thread=False)
+            self._conexion.execute("PRAGMA journal_mode=WAL")
+            self._conexion.execute("PRAGMA synchronous=NORMAL")
+            self._conexion.executescript(ESQUEMA)
+            self._conexion.commit()
+        self.ruta = configuration
+        return VALID_STORE
+
+    def close(self, commit_pending_transaction: bool = False):
+        with self._lock:
+            if self._conexion is None:
+                return
+            if commit_pending_transaction:
+                self._conexion.commit()
+            else:
+                self._conexion.rollback()
+            self._conexion.close()
+            self._conexion = None
+
+    def commit(self):
+        with self._lock:
+            self._conexion.commit()
+
+    def rollback(self):
+        with self._lock:
+            self._conexion.rollback()
+            self._vaciar_caches()
+
+    def _vaciar_caches(self):
+        self._ids_por_termino.clear()
+        self._terminos_por_id.clear()
+
+    # --- Internado de términos ---
+    def _id_termino(self, termino, crear: bool) -> int | None:
+        id_termino = self._ids_por_termino.get(termino)
+        if id_termino is not None:
+            return id_termino
+        clave = _clave_termino(termino)
+        fila = self._conexion.execute(
+            "SELECT id FROM terminos WHERE lexico = ? AND clase = ? AND datatype = ? AND idioma = ?", clave).fetchone()
+        if fila is None:
+            if not crear:
+                return None
+            id_termino = self._conexion.execute(
+                "INSERT INTO terminos (lexico, clase, datatype, idioma) VALUES (?, ?, ?, ?)", clave).lastrowid
+        else:
+            id_termino = fila[0]
+        if len(self._ids_por_termino) >= MAX_TERMINOS_EN_CACHE:
+            self._ids_por_termino.clear()
+        self._ids_por_termino[termino] = id_termino
+        return id_termino
+
+    def _terminos(self, ids: set) -> dict:
+        """Resuelve un conjunto de ids a términos, consultando en bloque los que no están en caché."""
+        resultado = {i: self._terminos_por_id[i] for i in ids if i in self._terminos_por_id}
+        faltan = [i for i in ids if i not in resultado]
+        for inicio in range(0, len(faltan), 500):
+            bloque = faltan[inicio:inicio + 500]
+            marcadores = ",".join("?" * len(bloque))
+            for id_termino, clase, lexico, datatype, idioma in self._conexion.execute(
+                    f"SELECT id, clase, lexico, datatype, idioma FROM terminos WHERE id IN ({marcadores})", bloque):
+                resultado[id_termino] = _crear_termino(clase, lexico, datatype, idioma)
+        if len(self._terminos_por_id) + len(faltan) >= MAX_TERMINOS_EN_CACHE:
+            self._terminos_por_id.clear()
+        self._terminos_por_id.update((i, resultado[i]) for i in faltan)
+        return resultado
+
+    # --- Escritura ---
+    def add(self, triple, context, quoted: bool = False):
+        Store.add(self, triple, context, quoted)
+        with self._lock:
+            ids = tuple(self._id_termino(t, crear=True) for t in triple)
+            self._conexion.execute("INSERT OR IGNORE INTO tripletas (s, p, o) VALUES (?, ?, ?)", ids)
+
+    def addN(self, quads):
+        with self._lock:
+            filas = [tuple(self._id_termino(t, crear=True) for t in (s, p, o)) for s, p, o, _ in quads]
+            self._conexion.executemany("INSERT OR IGNORE INTO tripletas (s, p, o) VALUES (?, ?, ?)", filas)
+
+    def remove(self, triple, context=None):
+        with self._lock:
+            condiciones, parametros = self._condiciones(triple)
+            if condiciones is None:
+                return
+            donde = f" WHERE {' AND '.join(condiciones)}" if condiciones else ""
+            self._conexion.execute(f"DELETE FROM tripletas{donde}", parametros)
+
+    # --- Lectura ---
+    def _condiciones(self, patron) -> tuple[list | None, list]:
+        """Condiciones SQL del patrón. Devuelve (None, []) si algún término fijado no existe en el almacén."""
+        condiciones, parametros = [], []
+        for columna, termino in zip(("s", "p", "o"), patron):
+            if termino is None:
+                continue
+            id_termino = self._id_termino(termino, crear=False)
+            if id_termino is None:
+                return None, []
+            condiciones.append(f"{columna} = ?")
+            parametros.append(id_termino)
+        return condiciones, parametros
+
+    def triples(self, triple_pattern, context=None):
+        with self._lock:
+            condiciones, parametros = self._condiciones(triple_pattern)
+            if condiciones is None:
+                return
+            donde = f" WHERE {' AND '.join(condiciones)}" if condiciones else ""
+            # Se materializa el resultado para que el llamador pueda modificar el grafo mientras itera
+            filas = self._conexion.execute(f"SELECT s, p, o FROM tripletas{donde}", parametros).fetchall()
+            terminos = self._terminos({i for fila in filas for i in fila})
+        for s, p, o in filas:
+            yield (terminos[s], terminos[p], terminos[o]), iter(())
+
+    def __len__(self, context=None):
+        with self._lock:
+            return self._conexion.execute("SELECT COUNT(*) FROM tripletas").fetchone()[0]
+
+    def contexts(self, triple=None):
+        return iter(())
+
+    # --- Namespaces ---
+    def bind(self, prefix: str, namespace, override: bool = True):
+        with self._lock:
+            existente = self._conexion.execute("SELECT prefijo FROM namespaces WHERE uri = ?", (str(namespace),)).fetchone()
+            if existente and not override:
+                return
+            self._conexion.execute("DELETE FROM namespaces WHERE uri = ? OR prefijo = ?", (str(namespace), prefix))
+            self._conexion.execute("INSERT INTO namespaces (prefijo, uri) VALUES (?, ?)", (prefix, str(namespace)))
+
+    def prefix(self, namespace):
+        with self._lock:
+            fila = self._conexion.execute("SELECT prefijo FROM namespaces WHERE uri = ?", (str(namespace),)).fetchone()
+        return fila[0] if fila else None
+
+    def namespace(self, prefix: str):
+        with self._lock:
+            fila = self._conexion.execute("SELECT uri FROM namespaces WHERE prefijo = ?", (prefix,)).fetchone()
+        return URIRef(fila[0]) if fila else None
+
+    def namespaces(self):
+        with self._lock:
+            filas = self._conexion.execute("SELECT prefijo, uri FROM namespaces").fetchall()
+        for prefijo, uri in filas:
+            yield prefijo, URIRef(uri)
+
+
+# Bloque de prueba
+if __name__ == '__main__':
+    import time
+    print("Probando AlmacenSQLite...")
+    ruta_f = os.path.join(project_root_dir, 'datos_trading', 'test_almacen.sqlite')
+    for sufijo in ("", "-wal", "-shm"):
+        if os.path.exists(ruta_f + sufijo):
+            os.remove(ruta_f + sufijo)
+
+    ontologia_f = os.path.join(project_root_dir, 'datos_trading', 'ontologia_trading.ttl')
+    datos_muestra_f = os.path.join(project_root_dir, 'datos_trading', 'datos_trading_muestra.ttl')
+    grafo_memoria = Graph()
+    grafo_memoria.parse(ontologia_f, format="turtle")
+    grafo_memoria.parse(datos_muestra_f, format="turtle")
+
+    grafo = Graph(store=AlmacenSQLite())
+    grafo.open(ruta_f, create=True)
+    grafo.addN((s, p, o, grafo) for s, p, o in grafo_memoria)
+    grafo.commit()
+    print(f"Tripletas en SQLite: {len(grafo)} (en memoria: {len(grafo_memoria)})")
+
+    consulta = """
+        PREFIX trade: <http://www.example.org/trading#>
+        SELECT ?config ?tipo ?nombre WHERE { ?config a trade:IndicadorTecnicoConfig ; trade:tieneTipoBase ?tipo ; trade:nombreConfigIndicador ?nombre . }
+        ORDER BY ?config
+    """
+    en_sqlite = [tuple(f) for f in grafo.query(consulta)]
+    en_memoria = [tuple(f) for f in grafo_memoria.query(consulta)]
+    print(f"Misma respuesta SPARQL que en memoria: {en_sqlite == en_memoria} ({len(en_sqlite)} filas)")
+    grafo.close(commit_pending_transaction=True)
+
+    inicio = time.perf_counter()
+    reabierto = Graph(store=AlmacenSQLite())
+    reabierto.open(ruta_f, create=False)
+    print(f"Reapertura en {(time.perf_counter() - inicio) * 1000:.1f} ms con {len(reabierto)} tripletas")
+    reabierto.close()
+    for sufijo in ("", "-wal", "-shm"):
+        if os.path.exists(ruta_f + sufijo):
+            os.remove(ruta_f + sufijo)
+    print("\nPrueba de AlmacenSQLite completada.")
@@ -0,0 +1,225 @@
+# rdf_utils/cache_grafo.py
+import os
+import sys
+import json
+import hashlib
+import time
+
+import numpy as np
+from rdflib import Graph, URIRef, Literal, BNode
+
+# --- Modificación para permitir la ejecución directa del script ---
+current_script_dir = os.path.dirname(os.path.abspath(__file__))
+project_root_dir = os.path.abspath(os.path.join(current_script_dir, '..'))
+if project_root_dir not in sys.path:
+    sys.path.insert(0, project_root_dir)
+# --- Fin de la modificación ---
+
+# Snapshot binario del grafo parseado para acelerar el arranque.
+# Los términos se internan en una tabla (un único bloque UTF-8 con desplazamientos, más
+# clase, datatype e idioma de cada término) y las tripletas se guardan como una matriz
+# de enteros (n, 3) de índices a esa tabla. Todo va en un .npz sin comprimir.
+# El snapshot lleva la firma de los archivos fuente (ruta, mtime, tamaño, sha256) y se
+# descarta si alguno cambia.
+VERSION_FORMATO = 1
+CLASE_URI, CLASE_LITERAL, CLASE_BNODE = 0, 1, 2
+
+def _sha256_archivo(ruta: str) -> str:
+    h = hashlib.sha256()
+    with open(ruta, "rb") as f:
+        for bloque in iter(lambda: f.read(1 << 20), b""):
+            h.update(bloque)
+    return h.hexdigest()
+
+def firma_fuentes(rutas: list[str], firma_previa: list[dict] | None = None) -> list[dict]:
+    """
+    Firma de los archivos fuente. Si el mtime y el tamaño coinciden con la firma previa se
+    reutiliza su hash, así que el caso habitual (nada ha cambiado) no lee los archivos.
+    """
+    previas = {f["ruta"]: f for f in (firma_previa or [])}
+    firma = []
+    for ruta in rutas:
+        ruta_abs = os.path.abspath(ruta)
+        estado = os.stat(ruta_abs)
+        previa = previas.get(ruta_abs)
+        if previa and previa["mtime_ns"] == estado.st_mtime_ns and previa["tamaño"] == estado.st_size:
+            sha = previa["sha256"]
+        else:
+            sha = _sha256_archivo(ruta_abs)
+        firma.append({"ruta": ruta_abs, "mtime_ns": estado.st_mtime_ns, "tamaño": estado.st_size, "sha256": sha})
+    return firma
+
+def _firmas_equivalentes(a: list[dict], b: list[dict]) -> bool:
+    # El contenido manda: un archivo tocado pero idéntico no invalida el snapshot
+    return [(f["ruta"], f["sha256"]) for f in a] == [(f["ruta"], f["sha256"]) for f in b]
+
+class CacheGrafo:
+    def __init__(self, ruta_cache: str):
+        self.ruta_cache = ruta_cache
+
+    def _leer_firma(self, datos) -> list[dict]:
+        return json.loads(bytes(datos["firma"]).decode("utf-8"))
+
+    def cargar(self, graph: Graph, fuentes: list[str]) -> bool:
+        """
+        Carga el snapshot en el grafo si existe y su firma coincide con las fuentes.
+        Devuelve False (sin tocar el grafo) si no hay snapshot válido.
+        """
+        if not os.path.exists(self.ruta_cache):
+            return False
+        try:
+            with np.load(self.ruta_cache, allow_pickle=False) as datos:
+                if int(datos["version"]) != VERSION_FORMATO:
+                    return False
+                firma_guardada = self._leer_firma(datos)
+                if not _firmas_equivalentes(firma_guardada, firma_fuentes(fuentes, firma_guardada)):
+                    return False
+                terminos = self._decodificar_terminos(datos)
+                tripletas = datos["tripletas"]
+                namespaces = json.loads(bytes(datos["namespaces"]).decode("utf-8"))
+        except Exception as e:
+            print(f"Advertencia: Snapshot {self.ruta_cache} ilegible, se ignorará: {e}")
+            return False
+
+        for prefijo, namespace in namespaces:
+            graph.bind(prefijo, URIRef(namespace), override=False)
+        graph.addN((terminos[s], terminos[p], terminos[o], graph) for s, p, o in tripletas.tolist())
+        return True
+
+    def _decodificar_terminos(self, datos) -> list:
+        texto = bytes(datos["textos"])
+        desplazamientos = datos["desplazamientos"].tolist()
+        clases = datos["clases"].tolist()
+        datatypes = datos["datatypes"].tolist()
+        idiomas = json.loads(bytes(datos["idiomas"]).decode("utf-8"))
+        indices_idioma = datos["indices_idioma"].tolist()
+        lexicos = [texto[desplazamientos[i]:desplazamientos[i + 1]].decode("utf-8") for i in range(len(clases))]
+
+        terminos = [None] * len(clases)
+        # Primero las URIs: los datatypes de los literales apuntan a ellas
+        for i, clase in enumerate(clases):
+            if clase == CLASE_URI:
+                terminos[i] = URIRef(lexicos[i])
+            elif clase == CLASE_BNODE:
+                terminos[i] = BNode(lexicos[i])
+        for i, clase in enumerate(clases):
+            if clase == CLASE_LITERAL:
+                datatype = terminos[datatypes[i]] if datatypes[i] >= 0 else None
+                idioma = idiomas[indices_idioma[i]] if indices_idioma[i] >= 0 else None
+                terminos[i] = Literal(lexicos[i], datatype=datatype, lang=idioma)
+        return terminos
+
+    def guardar(self, graph: Graph, fuentes: list[str], firma: list[dict] | None = None):
+        """
+        Escribe el snapshot del grafo (escritura atómica) con la firma de las fuentes. Si se
+        escribe después de que cambien, conviene pasar la firma tomada cuando graph y las
+        fuentes coincidían; si no, se calcula ahora.
+        """
+        indices = {}
+        clases, lexicos, datatypes, indices_idioma = [], [], [], []
+        idiomas = {}
+
+        def internar(termino) -> int:
+            indice = indices.get(termino)
+            if indice is not None:
+                return indice
+            datatype, idioma = -1, -1
+            if isinstance(termino, Literal):
+                if termino.datatype is not None:
+                    datatype = internar(termino.datatype)
+                if termino.language:
+                    idioma = idiomas.setdefault(termino.language, len(idiomas))
+                clase = CLASE_LITERAL
+            elif isinstance(termino, BNode):
+                clase = CLASE_BNODE
+            else:
+                clase = CLASE_URI
+            indice = indices[termino] = len(clases)
+            clases.append(clase)
+            lexicos.append(str(termino).encode("utf-8"))
+            datatypes.append(datatype)
+            indices_idioma.append(idioma)
+            return indice
+
+        tripletas = np.array([(internar(s), internar(p), internar(o)) for s, p, o in graph],
+                             dtype=np.int32).reshape(-1, 3)
+        desplazamientos = np.zeros(len(lexicos) + 1, dtype=np.int64)
+        np.cumsum([len(l) for l in lexicos], out=desplazamientos[1:])
+
+        def a_bytes(valor) -> np.ndarray:
+            return np.frombuffer(json.dumps(valor, ensure_ascii=False).encode("utf-8"), dtype=np.uint8)
+
+        directorio = os.path.dirname(self.ruta_cache)
+        if directorio:
+            os.makedirs(directorio, exist_ok=True)
+        ruta_temporal = self.ruta_cache + ".tmp"
+        with open(ruta_temporal, "wb") as f:
+            np.savez(
+                f,
+                version=np.array(VERSION_FORMATO),
+                firma=a_bytes(firma if firma is not None else firma_fuentes(fuentes)),
+                namespaces=a_bytes([(p, str(ns)) for p, ns in graph.namespaces()]),
+                textos=np.frombuffer(b"".join(lexicos), dtype=np.uint8),
+                desplazamientos=desplazamientos,
+                clases=np.array(clases, dtype=np.int8),
+                datatypes=np.array(datatypes, dtype=np.int32),
+                idiomas=a_bytes(sorted(idiomas, key=idiomas.get)),
+                indices_idioma=np.array(indices_idioma, dtype=np.int32),
+                tripletas=tripletas,
+            )
+        os.replace(ruta_temporal, self.ruta_cache)
+
+    def invalidar(self):
+        if os.path.exists(self.ruta_cache):
+            os.remove(self.ruta_cache)
+
+def informe_tiempos_arranque(fuentes: list[str], ruta_cache: str, repeticiones: int = 3) -> dict:
+    """
+    Compara el arranque en frío (parseo Turtle de las fuentes) con la carga del snapshot.
+    Devuelve los mejores tiempos de cada camino y la aceleración.
+    """
+    cache = CacheGrafo(ruta_cache)
+    tiempos_parseo, tiempos_snapshot = [], []
+    grafo_parseado = None
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        grafo_parseado = Graph()
+        for ruta in fuentes:
+            grafo_parseado.parse(ruta, format="turtle")
+        tiempos_parseo.append(time.perf_counter() - inicio)
+    cache.guardar(grafo_parseado, fuentes)
+
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        grafo_snapshot = Graph()
+        if not cache.cargar(grafo_snapshot, fuentes):
+            raise RuntimeError(f"No se pudo cargar el snapshot {ruta_cache}")
+        tiempos_snapshot.append(time.perf_counter() - inicio)
+
+    informe = {
+        "tripletas": len(grafo_parseado),
+        "parseo_turtle_segundos": min(tiempos_parseo),
+        "snapshot_segundos": min(tiempos_snapshot),
+        "tamaño_snapshot_bytes": os.path.getsize(ruta_cache),
+        "isomorfo": set(grafo_parseado) == set(grafo_snapshot),
+    }
+    informe["aceleracion"] = informe["parseo_turtle_segundos"] / max(informe["snapshot_segundos"], 1e-9)
+    return informe
+
+
+# Bloque de prueba
+if __name__ == '__main__':
+    print("Informe de tiempos de arranque: parseo Turtle vs snapshot binario")
+    ontologia_f = os.path.join(project_root_dir, 'datos_trading', 'ontologia_trading.ttl')
+    datos_f = os.path.join(project_root_dir, 'datos_trading', 'datos_actualizados.ttl')
+    if not os.path.exists(datos_f):
+        datos_f = os.path.join(project_root_dir, 'datos_trading', 'datos_trading_muestra.ttl')
+    ruta_cache_f = os.path.join(project_root_dir, 'datos_trading', 'test_cache_grafo.npz')
+
+    informe = informe_tiempos_arranque([ontologia_f, datos_f], ruta_cache_f)
+    print(f"  Fuentes: {os.path.basename(ontologia_f)}, {os.path.basename(datos_f)} ({informe['tripletas']} tripletas)")
+    print(f"  Parseo Turtle (en frío): {informe['parseo_turtle_segundos'] * 1000:.1f} ms")
+    print(f"  Snapshot binario:        {informe['snapshot_segundos'] * 1000:.1f} ms "
+          f"({informe['tamaño_snapshot_bytes']} bytes)")
+    print(f"  Aceleración: x{informe['aceleracion']:.1f} | Mismo grafo: {informe['isomorfo']}")
+    os.remove(ruta_cache_f)
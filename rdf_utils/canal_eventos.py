@@ -0,0 +1,136 @@
+# rdf_utils/canal_eventos.py
+import os
+import sys
+import json
+import queue
+import threading
+from dataclasses import dataclass
+
+# --- Modificación para permitir la ejecución directa del script ---
+current_script_dir = os.path.dirname(os.path.abspath(__file__))
+project_root_dir = os.path.abspath(os.path.join(current_script_dir, '..'))
+if project_root_dir not in sys.path:
+    sys.path.insert(0, project_root_dir)
+# --- Fin de la modificación ---
+
+# Publicación/suscripción en el proceso para empujar cambios a los clientes conectados (p. ej.
+# el stream SSE del dashboard). Cada evento se serializa a JSON una sola vez al publicarlo y
+# el mismo texto se entrega a todos los suscriptores del tema, así que un ciclo cuesta una
+# difusión aunque haya cientos de dashboards abiertos. Publicar nunca bloquea: si un
+# suscriptor lento llena su cola se descarta su evento más antiguo y la suscripción queda
+# marcada como desincronizada para que su consumidor vuelva a pedir el estado completo.
+
+MAX_PENDIENTES_DEFAULT = 100
+
+@dataclass(frozen=True)
+class Evento:
+    tema: str
+    tipo: str
+    id: int
+    datos: str # JSON ya serializado
+
+class Suscripcion:
+    def __init__(self, canal: "CanalEventos", temas: set | None, max_pendientes: int):
+        self.canal = canal
+        self.temas = temas # None = todos los temas
+        self._cola = queue.Queue(maxsize=max_pendientes)
+        self.desincronizada = False
+        self.perdidos = 0
+
+    def _entregar(self, evento: Evento) -> int:
+        """Encola el evento sin bloquear y devuelve cuántos eventos antiguos se descartaron."""
+        descartados = 0
+        while True:
+            try:
+                self._cola.put_nowait(evento)
+                self.perdidos += descartados
+                return descartados
+            except queue.Full:
+                try:
+                    self._cola.get_nowait()
+                    descartados += 1
+                    self.desincronizada = True
+                except queue.Empty:
+                    pass
+
+    def recibir(self, timeout: float | None = None) -> Evento | None:
+        """Siguiente evento, o None si no llega ninguno en 'timeout' segundos."""
+        try:
+            return self._cola.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def cerrar(self):
+        self.canal._retirar(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.cerrar()
+
+class CanalEventos:
+    def __init__(self, max_pendientes: int = MAX_PENDIENTES_DEFAULT):
+        self.max_pendientes = max_pendientes
+        self._lock = threading.Lock()
+        self._suscripciones = []
+        self.publicados = 0
+        self.entregas = 0
+        self.perdidos = 0
+
+    def suscribir(self, temas=None) -> Suscripcion:
+        """Suscripción a los temas indicados (un tema o una colección), o a todos si es None."""
+        if isinstance(temas, str):
+            temas = {temas}
+        suscripcion = Suscripcion(self, set(temas) if temas is not None else None, self.max_pendientes)
+        with self._lock:
+            self._suscripciones = self._suscripciones + [suscripcion]
+        return suscripcion
+
+    def _retirar(self, suscripcion: Suscripcion):
+        with self._lock:
+            self._suscripciones = [s for s in self._suscripciones if s is not suscripcion]
+
+    def publicar(self, tema: str, tipo: str, id_evento: int, datos: dict) -> int:
+        """Difunde un evento a los suscriptores del tema y devuelve a cuántos se entregó."""
+        evento = Evento(tema, tipo, id_evento, json.dumps(datos, default=str, separators=(",", ":")))
+        # La lista de suscripciones se reemplaza (no se modifica), así que se recorre sin el lock
+        destinatarios = [s for s in self._suscripciones if s.temas is None or tema in s.temas]
+        perdidos = sum(suscripcion._entregar(evento) for suscripcion in destinatarios)
+        with self._lock:
+            self.publicados += 1
+            self.entregas += len(destinatarios)
+            self.perdidos += perdidos
+        return len(destinatarios)
+
+    def estadisticas(self) -> dict:
+        with self._lock:
+            return {
+                "suscriptores": len(self._suscripciones),
+                "publicados": self.publicados,
+                "entregas": self.entregas,
+                "perdidos": self.perdidos,
+            }
+
+
+# Bloque de prueba
+if __name__ == '__main__':
+    import time
+    print("Probando CanalEventos...")
+    canal = CanalEventos(max_pendientes=5)
+    suscripciones = [canal.suscribir("WLD_USDT") for _ in range(300)]
+    otra = canal.suscribir("BTC_USDT")
+
+    inicio = time.perf_counter()
+    entregados = canal.publicar("WLD_USDT", "delta", 1, {"par": "WLD_USDT", "cambios": {"precio_actual": 2.75}})
+    print(f"  Difusión a {entregados} suscriptores en {(time.perf_counter() - inicio) * 1000:.2f} ms")
+    evento = suscripciones[0].recibir(timeout=0.1)
+    print(f"  Recibido: {evento.tipo} #{evento.id} {evento.datos}; el otro tema no recibe nada: {otra.recibir(timeout=0.01) is None}")
+
+    for version in range(2, 12):
+        canal.publicar("WLD_USDT", "delta", version, {"version": version})
+    lenta = suscripciones[1]
+    print(f"  Suscriptor lento: desincronizada={lenta.desincronizada}, perdidos={lenta.perdidos}")
+    for suscripcion in suscripciones + [otra]:
+        suscripcion.cerrar()
+    print(f"  Estadísticas: {canal.estadisticas()}")
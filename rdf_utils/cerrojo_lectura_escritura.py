@@ -0,0 +1,154 @@
+# rdf_utils/cerrojo_lectura_escritura.py
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+# --- Modificación para permitir la ejecución directa del script ---
+current_script_dir = os.path.dirname(os.path.abspath(__file__))
+project_root_dir = os.path.abspath(os.path.join(current_script_dir, '..'))
+if project_root_dir not in sys.path:
+    sys.path.insert(0, project_root_dir)
+# --- Fin de la modificación ---
+
+# Cerrojo de lectores/escritor para el grafo compartido. Muchas lecturas (dashboard, consultas
+# de los agentes) pueden ir a la vez; una escritura (aplicar un lote) va sola. Da preferencia
+# al escritor: en cuanto uno espera, no entran lectores nuevos, así un ciclo no se queda sin
+# aplicar aunque el dashboard reciba peticiones continuamente. Es reentrante por hilo: un
+# lector puede volver a leer y el escritor puede leer (p. ej. los suscriptores de cambios),
+# pero un lector no puede pasar a escritor porque dos lectores que lo intentaran a la vez
+# se bloquearían mutuamente.
+
+class CerrojoLecturaEscritura:
+    def __init__(self):
+        self._condicion = threading.Condition(threading.Lock())
+        self._lectores = {} # id del hilo -> lecturas anidadas
+        self._escritor = None # id del hilo que escribe
+        self._escrituras_anidadas = 0
+        self._escritores_esperando = 0
+        # Estadísticas (segundos que los hilos esperaron para entrar)
+        self.esperas_lectura = 0.0
+        self.esperas_escritura = 0.0
+        self.escrituras = 0
+
+    def adquirir_lectura(self):
+        hilo = threading.get_ident()
+        with self._condicion:
+            if hilo == self._escritor or hilo in self._lectores:
+                self._lectores[hilo] = self._lectores.get(hilo, 0) + 1
+                return
+            inicio = time.perf_counter()
+            while self._escritor is not None or self._escritores_esperando:
+                self._condicion.wait()
+            self.esperas_lectura += time.perf_counter() - inicio
+            self._lectores[hilo] = 1
+
+    def liberar_lectura(self):
+        hilo = threading.get_ident()
+        with self._condicion:
+            restantes = self._lectores.get(hilo, 0) - 1
+            if restantes < 0:
+                raise RuntimeError("liberar_lectura sin una lectura adquirida por este hilo")
+            if restantes:
+                self._lectores[hilo] = restantes
+            else:
+                del self._lectores[hilo]
+                self._condicion.notify_all()
+
+    def adquirir_escritura(self):
+        hilo = threading.get_ident()
+        with self._condicion:
+            if hilo == self._escritor:
+                self._escrituras_anidadas += 1
+                return
+            if hilo in self._lectores:
+                raise RuntimeError("No se puede pasar de lectura a escritura: libera la lectura antes de escribir")
+            inicio = time.perf_counter()
+            self._escritores_esperando += 1
+            try:
+                while self._escritor is not None or self._lectores:
+                    self._condicion.wait()
+            finally:
+                self._escritores_esperando -= 1
+            self.esperas_escritura += time.perf_counter() - inicio
+            self._escritor, self._escrituras_anidadas = hilo, 1
+            self.escrituras += 1
+
+    def liberar_escritura(self):
+        with self._condicion:
+            if self._escritor != threading.get_ident():
+                raise RuntimeError("liberar_escritura desde un hilo que no es el escritor")
+            self._escrituras_anidadas -= 1
+            if not self._escrituras_anidadas:
+                self._escritor = None
+                self._condicion.notify_all()
+
+    @contextmanager
+    def lectura(self):
+        self.adquirir_lectura()
+        try:
+            yield
+        finally:
+            self.liberar_lectura()
+
+    @contextmanager
+    def escritura(self):
+        self.adquirir_escritura()
+        try:
+            yield
+        finally:
+            self.liberar_escritura()
+
+    def estadisticas(self) -> dict:
+        with self._condicion:
+            return {
+                "lectores_activos": len(self._lectores),
+                "escritor_activo": self._escritor is not None,
+                "escritores_esperando": self._escritores_esperando,
+                "escrituras": self.escrituras,
+                "segundos_espera_lectura": self.esperas_lectura,
+                "segundos_espera_escritura": self.esperas_escritura,
+            }
+
+
+# Bloque de prueba
+if __name__ == '__main__':
+    print("Probando CerrojoLecturaEscritura...")
+    cerrojo = CerrojoLecturaEscritura()
+    estado = {"a": 0, "b": 0} # Invariante: a == b fuera de una escritura
+    inconsistencias = []
+    detener = threading.Event()
+
+    def lector():
+        while not detener.is_set():
+            with cerrojo.lectura():
+                with cerrojo.lectura(): # Reentrante
+                    if estado["a"] != estado["b"]:
+                        inconsistencias.append(dict(estado))
+
+    def escritor():
+        for _ in range(200):
+            with cerrojo.escritura():
+                estado["a"] += 1
+                time.sleep(0.0005) # Escritura a medias: ningún lector debe verla
+                with cerrojo.lectura(): # El escritor puede leer
+                    estado["b"] = estado["a"]
+
+    hilos = [threading.Thread(target=lector) for _ in range(8)]
+    for hilo in hilos:
+        hilo.start()
+    inicio = time.perf_counter()
+    escritor()
+    detener.set()
+    for hilo in hilos:
+        hilo.join()
+    print(f"  200 escrituras con 8 lectores en {time.perf_counter() - inicio:.2f}s; estados a medias vistos: {len(inconsistencias)}")
+    print(f"  Estadísticas: {cerrojo.estadisticas()}")
+
+    try:
+        with cerrojo.lectura():
+            with cerrojo.escritura():
+                pass
+    except RuntimeError as e:
+        print(f"  Paso de lectura a escritura rechazado: {e}")
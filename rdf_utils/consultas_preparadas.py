@@ -0,0 +1,262 @@
+# rdf_utils/consultas_preparadas.py
+import os
+import sys
+import time
+import threading
+
+from rdflib.namespace import RDF, XSD, Namespace
+from rdflib.plugins.sparql import prepareQuery
+
+# --- Modificación para permitir la ejecución directa del script ---
+current_script_dir = os.path.dirname(os.path.abspath(__file__))
+project_root_dir = os.path.abspath(os.path.join(current_script_dir, '..'))
+if project_root_dir not in sys.path:
+    sys.path.insert(0, project_root_dir)
+# --- Fin de la modificación ---
+
+# Registro de consultas SPARQL preparadas. Cada consulta se parsea y se traduce a álgebra
+# una sola vez (prepareQuery) y las URIs que cambian entre llamadas (estrategia, par,
+# configuración, señal) se pasan como initBindings en lugar de interpolarse en el texto.
+# El registro lleva contadores de llamadas y tiempos por consulta.
+NS_TRADE = Namespace("http://www.example.org/trading#")
+PREFIJOS_CONSULTAS = {"trade": NS_TRADE, "rdf": RDF, "xsd": XSD}
+
+CONSULTAS_PREDEFINIDAS = {
+    # ?estrategia
+    "estrategia_activa": """
+        SELECT ?nombreEstrategia ?parMonitoreadoURI ?activoBaseURI ?simboloBase ?activoCotizacionURI
+               ?simboloCotizacion ?nivelRiesgo ?horizonteTemporal
+        WHERE {
+            ?estrategia rdf:type trade:Estrategia ;
+                        trade:nombreEstrategia ?nombreEstrategia ;
+                        trade:monitoreaPar ?parMonitoreadoURI ;
+                        trade:nivelRiesgoPreferido ?nivelRiesgo ;
+                        trade:horizonteTemporal ?horizonteTemporal .
+
+            ?parMonitoreadoURI trade:tieneActivoBase ?activoBaseURI ;
+                               trade:tieneActivoCotizacion ?activoCotizacionURI .
+            ?activoBaseURI trade:simboloCripto ?simboloBase .
+            ?activoCotizacionURI trade:simboloCripto ?simboloCotizacion .
+        }
+        LIMIT 1
+    """,
+    # ?estrategia
+    "configs_estrategia": """
+        SELECT ?config WHERE { ?estrategia trade:utilizaConfigIndicador ?config . }
+    """,
+    # Todas las configuraciones: una fila por propiedad literal (parámetro) o una sin ?p si no tiene
+    "configs_indicador": """
+        SELECT ?config ?nombreCfgInd ?tipoBase ?p ?o
+        WHERE {
+            ?config rdf:type trade:IndicadorTecnicoConfig .
+            OPTIONAL { ?config trade:nombreConfigIndicador ?nombreCfgInd . }
+            OPTIONAL { ?config trade:tieneTipoBase ?tipoBase . }
+            OPTIONAL {
+                ?config ?p ?o .
+                FILTER (isLiteral(?o) && ?p != trade:nombreConfigIndicador)
+            }
+        }
+    """,
+    # ?sujeto
+    "tripletas_sujeto": """
+        SELECT ?p ?o WHERE { ?sujeto ?p ?o . }
+    """,
+    "estrategias_y_pares": """
+        SELECT ?estrategia ?par
+        WHERE { ?estrategia rdf:type trade:Estrategia ; trade:monitoreaPar ?par . }
+    """,
+    # ?señal
+    "tipo_señal": """
+        SELECT ?tipo WHERE { ?señal trade:tiposeñal ?tipo . }
+    """,
+    "reglas_señal": """
+        SELECT ?regla ?tipo ?config ?operador ?componente ?umbral ?comparaCon ?comparaConConfig ?plantilla ?estrategia
+        WHERE {
+            ?regla rdf:type trade:ReglaSeñal ;
+                   trade:tiposeñalGenerada ?tipo ;
+                   trade:evaluaConfigIndicador ?config ;
+                   trade:operadorRegla ?operador .
+            OPTIONAL { ?regla trade:componenteEvaluado ?componente . }
+            OPTIONAL { ?regla trade:umbralRegla ?umbral . }
+            OPTIONAL { ?regla trade:comparaConComponente ?comparaCon . }
+            OPTIONAL { ?regla trade:comparaConConfig ?comparaConConfig . }
+            OPTIONAL { ?regla trade:plantillaDescripcion ?plantilla . }
+            OPTIONAL { ?regla trade:aplicaAEstrategia ?estrategia . }
+        }
+        ORDER BY ?regla
+    """,
+    "pares_mercado": """
+        SELECT ?par ?simboloBase ?simboloCotizacion ?precio ?volumen
+        WHERE {
+            ?par rdf:type trade:ParMercado .
+            OPTIONAL { ?par trade:tieneActivoBase/trade:simboloCripto ?simboloBase . }
+            OPTIONAL { ?par trade:tieneActivoCotizacion/trade:simboloCripto ?simboloCotizacion . }
+            OPTIONAL { ?par trade:precioActual ?precio . }
+            OPTIONAL { ?par trade:volumen24h ?volumen . }
+        }
+        ORDER BY ?par
+    """,
+    # ?par
+    "info_par": """
+        SELECT ?precio ?volumen
+        WHERE {
+            ?par trade:precioActual ?precio .
+            OPTIONAL { ?par trade:volumen24h ?volumen . }
+        } LIMIT 1
+    """,
+    # ?par
+    "valores_indicadores_par": """
+        SELECT ?configIndURI ?configNombre ?valorNum ?valorMACD ?valorseñalMACD ?valorHistMACD
+               ?valorBandaMedia ?valorBandaSuperior ?valorBandaInferior ?ts
+        WHERE {
+            ?valorIndInst rdf:type trade:ValorIndicador ;
+                          trade:seAplicaA ?par ;
+                          trade:esValorDe ?configIndURI ;
+                          trade:timestampValor ?ts .
+            ?configIndURI trade:nombreConfigIndicador ?configNombre .
+
+            OPTIONAL { ?valorIndInst trade:valorNumerico ?valorNum . }
+            OPTIONAL { ?valorIndInst trade:valorMACD ?valorMACD . }
+            OPTIONAL { ?valorIndInst trade:valorseñalMACD ?valorseñalMACD . }
+            OPTIONAL { ?valorIndInst trade:valorHistogramaMACD ?valorHistMACD . }
+            OPTIONAL { ?valorIndInst trade:valorBandaMedia ?valorBandaMedia . }
+            OPTIONAL { ?valorIndInst trade:valorBandaSuperior ?valorBandaSuperior . }
+            OPTIONAL { ?valorIndInst trade:valorBandaInferior ?valorBandaInferior . }
+        }
+        ORDER BY DESC(?ts) ?configNombre
+    """,
+    # ?par
+    "ultima_recomendacion_par": """
+        SELECT ?recomInst ?accion ?justificacion ?confianza ?ts
+               (COALESCE(GROUP_CONCAT(DISTINCT ?desc; separator="; "), "N/A") AS ?señalesDetalle)
+        WHERE {
+            ?recomInst rdf:type trade:RecomendacionTrading ;
+                       trade:paraActivo ?par ;
+                       trade:accionSugerida ?accion ;
+                       trade:justificacionDecision ?justificacion ;
+                       trade:nivelConfianza ?confianza ;
+                       trade:timestampRecomendacion ?ts .
+
+            OPTIONAL {
+                ?recomInst trade:basadaEnseñal ?s .
+                ?s trade:descripcionseñal ?desc .
+            }
+        }
+        GROUP BY ?recomInst ?accion ?justificacion ?confianza ?ts
+        ORDER BY DESC(?ts)
+        LIMIT 1
+    """,
+}
+
+class ConsultaPreparada:
+    def __init__(self, nombre: str, texto: str, prefijos: dict):
+        self.nombre = nombre
+        self.texto = texto
+        inicio = time.perf_counter()
+        self.consulta = prepareQuery(texto, initNs=prefijos)
+        self.segundos_preparacion = time.perf_counter() - inicio
+        self.llamadas = 0
+        self.errores = 0
+        self.segundos_total = 0.0
+        self.segundos_max = 0.0
+
+    def estadisticas(self) -> dict:
+        return {
+            "llamadas": self.llamadas,
+            "errores": self.errores,
+            "segundos_total": self.segundos_total,
+            "segundos_medio": self.segundos_total / self.llamadas if self.llamadas else 0.0,
+            "segundos_max": self.segundos_max,
+            "segundos_preparacion": self.segundos_preparacion,
+        }
+
+class RegistroConsultas:
+    """
+    Consultas SPARQL compiladas una vez y ejecutadas con initBindings. Uso:
+        registro = RegistroConsultas()
+        resultados = registro.ejecutar(graph, "info_par", par=par_uri)
+    """
+    def __init__(self, consultas: dict | None = None, prefijos: dict | None = None):
+        self.prefijos = dict(PREFIJOS_CONSULTAS if prefijos is None else prefijos)
+        self._consultas = {}
+        self._lock = threading.Lock() # Protege los contadores cuando varios hilos consultan a la vez
+        for nombre, texto in (CONSULTAS_PREDEFINIDAS if consultas is None else consultas).items():
+            self.registrar(nombre, texto)
+
+    def registrar(self, nombre: str, texto: str) -> ConsultaPreparada:
+        """Compila y registra una consulta. Un error de sintaxis se detecta aquí, no al ejecutarla."""
+        consulta = ConsultaPreparada(nombre, texto, self.prefijos)
+        self._consultas[nombre] = consulta
+        return consulta
+
+    def __contains__(self, nombre: str) -> bool:
+        return nombre in self._consultas
+
+    def ejecutar(self, graph, nombre: str, **vinculos):
+        """
+        Ejecuta la consulta 'nombre' sobre el grafo vinculando cada variable de 'vinculos'
+        (sin '?') a su término RDF. Los resultados SELECT se materializan dentro de la
+        medición para que el tiempo registrado incluya la evaluación completa.
+        """
+        consulta = self._consultas[nombre]
+        inicio = time.perf_counter()
+        try:
+            resultados = graph.query(consulta.consulta, initBindings=vinculos)
+            if resultados.type == "SELECT":
+                resultados.bindings
+        except Exception:
+            with self._lock:
+                consulta.errores += 1
+            raise
+        finally:
+            duracion = time.perf_counter() - inicio
+            with self._lock:
+                consulta.llamadas += 1
+                consulta.segundos_total += duracion
+                consulta.segundos_max = max(consulta.segundos_max, duracion)
+        return resultados
+
+    def estadisticas(self) -> dict:
+        """Contadores por consulta: {nombre: {llamadas, errores, segundos_total, segundos_medio, ...}}."""
+        with self._lock:
+            return {nombre: consulta.estadisticas() for nombre, consulta in self._consultas.items()}
+
+    def reiniciar_estadisticas(self):
+        with self._lock:
+            for consulta in self._consultas.values():
+                consulta.llamadas, consulta.errores = 0, 0
+                consulta.segundos_total, consulta.segundos_max = 0.0, 0.0
+
+
+# Bloque de prueba
+if __name__ == '__main__':
+    from rdflib import Graph
+    print("Comparando consultas preparadas con texto SPARQL interpolado...")
+    grafo = Graph()
+    grafo.parse(os.path.join(project_root_dir, 'datos_trading', 'ontologia_trading.ttl'), format="turtle")
+    grafo.parse(os.path.join(project_root_dir, 'datos_trading', 'datos_trading_muestra.ttl'), format="turtle")
+
+    inicio = time.perf_counter()
+    registro = RegistroConsultas()
+    print(f"  {len(CONSULTAS_PREDEFINIDAS)} consultas compiladas en {(time.perf_counter() - inicio) * 1000:.1f} ms")
+
+    estrategia_uri = NS_TRADE.EstrategiaPredeterminada
+    repeticiones = 50
+    inicio = time.perf_counter()
+    for _ in range(repeticiones):
+        texto = "PREFIX trade: <http://www.example.org/trading#>\nPREFIX rdf: <http://www.w3.org/1999/02/22-rdf-syntax-ns#>\n" \
+                + CONSULTAS_PREDEFINIDAS["estrategia_activa"].replace("?estrategia ", f"<{estrategia_uri}> ")
+        filas_texto = list(grafo.query(texto))
+    segundos_texto = (time.perf_counter() - inicio) / repeticiones
+
+    for _ in range(repeticiones):
+        filas_preparadas = list(registro.ejecutar(grafo, "estrategia_activa", estrategia=estrategia_uri))
+    segundos_preparada = registro.estadisticas()["estrategia_activa"]["segundos_medio"]
+
+    print(f"  estrategia_activa con texto interpolado: {segundos_texto * 1000:.2f} ms/llamada")
+    print(f"  estrategia_activa preparada:             {segundos_preparada * 1000:.2f} ms/llamada")
+    print(f"  Mismas filas: {[tuple(f) for f in filas_texto] == [tuple(f) for f in filas_preparadas]}")
+
+    filas_configs = list(registro.ejecutar(grafo, "configs_indicador"))
+    print(f"  Filas de configs_indicador: {len(filas_configs)} "
+          f"({len({f['config'] for f in filas_configs})} configuraciones)")
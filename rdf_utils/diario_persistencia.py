@@ -0,0 +1,121 @@
+# rdf_utils/diario_persistencia.py
+import os
+import threading
+from datetime import datetime, timezone
+from rdflib import Dataset, Graph, URIRef
+
+# Diario de persistencia en modo solo-anexar.
+# Cada confirmación escribe un bloque N-Quads con los cambios netos desde la anterior.
+# El nombre de grafo de cada quad indica la operación, y el bloque termina con una
+# línea de cierre: los bloques sin cierre (escritura interrumpida) se ignoran al reproducir.
+GRAFO_AÑADIR = URIRef("urn:diario-trading:añadir")
+GRAFO_ELIMINAR = URIRef("urn:diario-trading:eliminar")
+INICIO_BLOQUE = "# bloque "
+FIN_BLOQUE = "# fin\n"
+
+class DiarioPersistencia:
+    def __init__(self, ruta_diario: str):
+        self.ruta_diario = ruta_diario
+        self._cambios_pendientes = {} # tripleta -> True (añadir) / False (eliminar); solo importa la última operación
+        self._lock = threading.Lock()
+
+    @property
+    def ruta_rotada(self) -> str:
+        return self.ruta_diario + ".compactando"
+
+    def registrar(self, añadidas=(), eliminadas=()):
+        with self._lock:
+            for tripleta in eliminadas:
+                self._cambios_pendientes[tripleta] = False
+            for tripleta in añadidas:
+                self._cambios_pendientes[tripleta] = True
+
+    def hay_cambios_pendientes(self) -> bool:
+        return bool(self._cambios_pendientes)
+
+    def confirmar(self) -> int:
+        """
+        Anexa los cambios pendientes al diario como un bloque y hace un único fsync.
+        Devuelve el número de tripletas escritas.
+        """
+        with self._lock:
+            cambios, self._cambios_pendientes = self._cambios_pendientes, {}
+        if not cambios:
+            return 0
+
+        dataset = Dataset()
+        grafo_añadir = dataset.graph(GRAFO_AÑADIR)
+        grafo_eliminar = dataset.graph(GRAFO_ELIMINAR)
+        grafo_añadir.addN((s, p, o, grafo_añadir) for (s, p, o), añadir in cambios.items() if añadir)
+        grafo_eliminar.addN((s, p, o, grafo_eliminar) for (s, p, o), añadir in cambios.items() if not añadir)
+        cuerpo = dataset.serialize(format="nquads")
+        if isinstance(cuerpo, bytes):
+            cuerpo = cuerpo.decode("utf-8")
+
+        directorio = os.path.dirname(self.ruta_diario)
+        if directorio:
+            os.makedirs(directorio, exist_ok=True)
+        # El salto de línea inicial cierra cualquier línea que una escritura interrumpida dejara a medias
+        bloque = f"\n{INICIO_BLOQUE}{datetime.now(timezone.utc).isoformat()}\n{cuerpo.rstrip()}\n{FIN_BLOQUE}"
+        try:
+            with open(self.ruta_diario, "a", encoding="utf-8") as f:
+                f.write(bloque)
+                f.flush()
+                os.fsync(f.fileno())
+        except Exception:
+            # Devolver los cambios a la cola para no perderlos en el siguiente intento
+            with self._lock:
+                for tripleta, añadir in cambios.items():
+                    self._cambios_pendientes.setdefault(tripleta, añadir)
+            raise
+        return len(cambios)
+
+    def tamaño_bytes(self) -> int:
+        return os.path.getsize(self.ruta_diario) if os.path.exists(self.ruta_diario) else 0
+
+    def rotar(self) -> bool:
+        """
+        Aparta el diario actual para compactarlo. Devuelve False si ya hay una compactación
+        pendiente (el diario rotado anterior todavía no se ha integrado en el snapshot).
+        """
+        if os.path.exists(self.ruta_rotada) or not os.path.exists(self.ruta_diario):
+            return False
+        os.replace(self.ruta_diario, self.ruta_rotada)
+        return True
+
+    def descartar_rotado(self):
+        if os.path.exists(self.ruta_rotada):
+            os.remove(self.ruta_rotada)
+
+    def reproducir(self, graph: Graph) -> int:
+        """Aplica sobre el grafo el diario rotado (si quedó uno) y el diario actual, en orden."""
+        bloques_aplicados = 0
+        for ruta in (self.ruta_rotada, self.ruta_diario):
+            if os.path.exists(ruta):
+                bloques_aplicados += self._reproducir_archivo(ruta, graph)
+        return bloques_aplicados
+
+    def _reproducir_archivo(self, ruta: str, graph: Graph) -> int:
+        with open(ruta, "r", encoding="utf-8") as f:
+            contenido = f.read()
+        bloques_aplicados = 0
+        # Los literales N-Quads no contienen saltos de línea, así que el cierre solo aparece como línea propia
+        *bloques, resto = contenido.split("\n" + FIN_BLOQUE)
+        if resto.strip():
+            print(f"Advertencia: Bloque incompleto al final de {ruta} ignorado (escritura interrumpida).")
+        for bloque in bloques:
+            # Si antes del bloque quedó otro sin cierre, solo cuenta la última cabecera
+            descartado, separador, bloque = ("\n" + bloque).rpartition("\n" + INICIO_BLOQUE)
+            if not separador:
+                print(f"Advertencia: Bloque sin cabecera en {ruta} ignorado.")
+                continue
+            if descartado.strip():
+                print(f"Advertencia: Bloque incompleto en {ruta} ignorado (escritura interrumpida).")
+            _, _, cuerpo = bloque.partition("\n")
+            dataset = Dataset()
+            dataset.parse(data=cuerpo, format="nquads")
+            for tripleta in dataset.graph(GRAFO_ELIMINAR):
+                graph.remove(tripleta)
+            graph.addN((s, p, o, graph) for s, p, o in dataset.graph(GRAFO_AÑADIR))
+            bloques_aplicados += 1
+        return bloques_aplicados
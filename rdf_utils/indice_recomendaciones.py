@@ -0,0 +1,196 @@
+# rdf_utils/indice_recomendaciones.py
+import os
+import sys
+import base64
+import threading
+from bisect import bisect_left, bisect_right, insort
+
+import pandas as pd
+from rdflib import URIRef
+from rdflib.namespace import RDF
+
+# --- Modificación para permitir la ejecución directa del script ---
+current_script_dir = os.path.dirname(os.path.abspath(__file__))
+project_root_dir = os.path.abspath(os.path.join(current_script_dir, '..'))
+if project_root_dir not in sys.path:
+    sys.path.insert(0, project_root_dir)
+# --- Fin de la modificación ---
+
+# Índice ordenado por tiempo de las trade:RecomendacionTrading de cada par, para paginar el
+# historial por clave (keyset) en lugar de ordenar todo el historial con SPARQL en cada
+# página. Cada par guarda una lista ordenada de (timestamp en ns, URI); una página se
+# localiza con búsqueda binaria a partir del cursor (el último elemento de la página
+# anterior), así que su coste no depende de cuántas páginas haya antes. El índice se
+# construye recorriendo el grafo la primera vez que se usa y después se mantiene con los
+# cambios del grafo (suscribir_cambios), incluidas las eliminaciones de la retención.
+
+def a_ns(timestamp) -> int:
+    """Timestamp (literal xsd:dateTime, texto ISO o datetime) en ns desde epoch UTC; las fechas sin zona se toman como UTC."""
+    ts = pd.Timestamp(str(timestamp))
+    return (ts.tz_localize("UTC") if ts.tzinfo is None else ts.tz_convert("UTC")).value
+
+def codificar_cursor(ts_ns: int, clave: str = "") -> str:
+    """Cursor opaco para la siguiente página: el timestamp y la clave de desempate del último elemento."""
+    return base64.urlsafe_b64encode(f"{ts_ns}|{clave}".encode("utf-8")).decode("ascii").rstrip("=")
+
+def decodificar_cursor(cursor: str) -> tuple[int, str]:
+    """Inverso de codificar_cursor. Lanza ValueError si el cursor no es válido."""
+    try:
+        texto = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode("utf-8")
+        ts_ns, clave = texto.split("|", 1)
+        return int(ts_ns), clave
+    except Exception as e:
+        raise ValueError(f"Cursor no válido: {cursor}") from e
+
+class IndiceRecomendaciones:
+    def __init__(self, rdf_manager):
+        self.rdf_manager = rdf_manager
+        self.ns = rdf_manager.ns_manager
+        self._lock = threading.Lock()
+        self._por_par = None # par_uri -> [(ts_ns, uri_str), ...] ordenada; None hasta construirlo
+        self._entradas = {} # uri -> (par_uri, ts_ns), para retirar una recomendación al cambiar
+        self.construcciones = 0
+        rdf_manager.suscribir_cambios(self.notificar_cambios)
+
+    def _construir(self):
+        trade = self.ns.trade
+        por_par, entradas = {}, {}
+        # Con el cerrojo de lectura tomado no se aplica ningún lote hasta tener el índice completo
+        with self.rdf_manager.lectura() as grafo:
+            for recomendacion, literal in grafo.subject_objects(trade.timestampRecomendacion):
+                par_uri = grafo.value(recomendacion, trade.paraActivo)
+                if par_uri is None or (recomendacion, RDF.type, trade.RecomendacionTrading) not in grafo:
+                    continue
+                entrada = (a_ns(literal), str(recomendacion))
+                por_par.setdefault(par_uri, []).append(entrada)
+                entradas[recomendacion] = (par_uri, entrada[0])
+            for lista in por_par.values():
+                lista.sort()
+            with self._lock:
+                self._por_par, self._entradas = por_par, entradas
+                self.construcciones += 1
+
+    def notificar_cambios(self, añadidas=(), eliminadas=()):
+        """Suscriptor de cambios del grafo: vuelve a leer las recomendaciones tocadas (se llama con el cerrojo de escritura)."""
+        if self._por_par is None:
+            return
+        trade = self.ns.trade
+        relevantes = (trade.timestampRecomendacion, trade.paraActivo)
+        sujetos = {s for tripletas in (añadidas, eliminadas) for s, p, o in tripletas
+                   if p in relevantes or (p == RDF.type and o == trade.RecomendacionTrading)}
+        if not sujetos:
+            return
+        grafo = self.rdf_manager.graph
+        with self._lock:
+            for recomendacion in sujetos:
+                anterior = self._entradas.pop(recomendacion, None)
+                if anterior is not None:
+                    lista = self._por_par.get(anterior[0], [])
+                    posicion = bisect_left(lista, (anterior[1], str(recomendacion)))
+                    if posicion < len(lista) and lista[posicion] == (anterior[1], str(recomendacion)):
+                        del lista[posicion]
+                par_uri = grafo.value(recomendacion, trade.paraActivo)
+                literal = grafo.value(recomendacion, trade.timestampRecomendacion)
+                if par_uri is None or literal is None or (recomendacion, RDF.type, trade.RecomendacionTrading) not in grafo:
+                    continue
+                ts_ns = a_ns(literal)
+                insort(self._por_par.setdefault(par_uri, []), (ts_ns, str(recomendacion)))
+                self._entradas[recomendacion] = (par_uri, ts_ns)
+
+    def pagina(self, par_uri: URIRef, limite: int, cursor: str | None = None, desde=None, hasta=None,
+               descendente: bool = True) -> tuple[list[tuple[int, URIRef]], str | None]:
+        """
+        Hasta 'limite' recomendaciones del par como [(ts_ns, uri)], de la más reciente a la más
+        antigua (o al revés), dentro de [desde, hasta] y a continuación del cursor. Devuelve
+        también el cursor de la página siguiente, o None si no hay más.
+        """
+        if self._por_par is None:
+            self._construir()
+        with self._lock:
+            lista = self._por_par.get(par_uri, [])
+            inicio = bisect_left(lista, (a_ns(desde), "")) if desde is not None else 0
+            fin = bisect_right(lista, (a_ns(hasta), "\uffff")) if hasta is not None else len(lista)
+            if cursor is not None:
+                clave_cursor = decodificar_cursor(cursor)
+                if descendente:
+                    fin = min(fin, bisect_left(lista, clave_cursor))
+                else:
+                    inicio = max(inicio, bisect_right(lista, clave_cursor))
+            if descendente:
+                seleccion = lista[max(inicio, fin - limite):fin][::-1]
+                hay_mas = fin - limite > inicio
+            else:
+                seleccion = lista[inicio:min(fin, inicio + limite)]
+                hay_mas = inicio + limite < fin
+        siguiente = codificar_cursor(*seleccion[-1]) if seleccion and hay_mas else None
+        return [(ts_ns, URIRef(uri)) for ts_ns, uri in seleccion], siguiente
+
+    def detalle(self, recomendaciones: list[URIRef]) -> list[dict]:
+        """Propiedades de cada recomendación (las que ya no estén en el grafo se omiten)."""
+        trade = self.ns.trade
+        resultado = []
+        with self.rdf_manager.lectura() as grafo:
+            for recomendacion in recomendaciones:
+                accion = grafo.value(recomendacion, trade.accionSugerida)
+                if accion is None:
+                    continue
+                confianza = grafo.value(recomendacion, trade.nivelConfianza)
+                estrategia = grafo.value(recomendacion, trade.basadaEnEstrategia)
+                resultado.append({
+                    "id": str(recomendacion).split('#')[-1],
+                    "ts": str(grafo.value(recomendacion, trade.timestampRecomendacion)),
+                    "accion": str(accion),
+                    "confianza": float(confianza) if confianza is not None else None,
+                    "justificacion": str(grafo.value(recomendacion, trade.justificacionDecision) or ""),
+                    "estrategia": str(estrategia).split('#')[-1] if estrategia is not None else None,
+                    "señales": sorted(str(tipo) for señal in grafo.objects(recomendacion, trade.basadaEnseñal)
+                                      for tipo in grafo.objects(señal, trade.tiposeñal)),
+                })
+        return resultado
+
+
+# Bloque de prueba
+if __name__ == '__main__':
+    import time
+    from datetime import datetime, timedelta, timezone
+    from rdflib import Literal
+    from rdflib.namespace import XSD
+    from rdf_utils.rdf_manager_trading import RDFManagerTrading
+    print("Probando IndiceRecomendaciones...")
+    manager = RDFManagerTrading(
+        ontologia_path=os.path.join(project_root_dir, 'datos_trading', 'ontologia_trading.ttl'),
+        datos_muestra_path=os.path.join(project_root_dir, 'datos_trading', 'datos_trading_muestra.ttl'),
+        persist_path=None
+    )
+    trade = manager.ns_manager.trade
+    indice = IndiceRecomendaciones(manager)
+    base = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    with manager.lote_escritura() as lote:
+        for i in range(5000):
+            lote.agregar_entidad(trade[f"RecomDemo_{i}"], trade.RecomendacionTrading, {
+                trade.paraActivo: trade.WLD_USDT,
+                trade.accionSugerida: Literal("MANTENER"),
+                trade.nivelConfianza: Literal(0.5, datatype=XSD.float),
+                trade.timestampRecomendacion: Literal((base + timedelta(minutes=i)).isoformat(), datatype=XSD.dateTime),
+            })
+
+    inicio = time.perf_counter()
+    indice.pagina(trade.WLD_USDT, 1)
+    print(f"  Índice construido en {(time.perf_counter() - inicio) * 1000:.1f} ms")
+    inicio = time.perf_counter()
+    paginas, cursor, vistas = 0, None, set()
+    while True:
+        filas, cursor = indice.pagina(trade.WLD_USDT, 100, cursor=cursor)
+        vistas.update(uri for _, uri in filas)
+        paginas += 1
+        if cursor is None:
+            break
+    print(f"  {paginas} páginas de 100 ({len(vistas)} recomendaciones distintas) en {(time.perf_counter() - inicio) * 1000:.1f} ms")
+
+    filas, _ = indice.pagina(trade.WLD_USDT, 3, desde=base + timedelta(minutes=10), hasta=base + timedelta(minutes=20), descendente=False)
+    print(f"  Rango ascendente: {[uri.split('#')[-1] for _, uri in filas]}")
+
+    manager.eliminar_tripletas(trade.RecomDemo_4999, None, None)
+    filas, _ = indice.pagina(trade.WLD_USDT, 1)
+    print(f"  Tras eliminar la más reciente, la primera es {filas[0][1].split('#')[-1]}; detalle: {indice.detalle([filas[0][1]])}")
+    print(f"  Construcciones del índice: {indice.construcciones}")
@@ -0,0 +1,107 @@
+# rdf_utils/migrar_series_indicadores.py
+import os
+import sys
+import argparse
+from collections import defaultdict
+
+# --- Modificación para permitir la ejecución directa del script ---
+current_script_dir = os.path.dirname(os.path.abspath(__file__))
+project_root_dir = os.path.abspath(os.path.join(current_script_dir, '..'))
+if project_root_dir not in sys.path:
+    sys.path.insert(0, project_root_dir)
+# --- Fin de la modificación ---
+
+import pandas as pd
+from rdflib.namespace import RDF
+
+from rdf_utils.rdf_manager_trading import RDFManagerTrading
+from rdf_utils.almacen_series import AlmacenSeriesIndicadores, agregar_nodo_valor_actual, uri_valor_actual
+from agentes.agente_señales_trading import PROPIEDADES_COMPONENTES
+
+# Herramienta de migración: mueve los nodos trade:ValorIndicador históricos (uno por
+# lectura, con URI basada en uuid) del grafo al almacén columnar. Por cada (par,
+# configuración) deja en el grafo un único ValorIndicador con el último valor, enlazado a
+# su trade:SerieIndicador, y redirige a él las señales que apuntaban a los nodos eliminados.
+
+def migrar_valores_indicador(rdf_manager: RDFManagerTrading, almacen: AlmacenSeriesIndicadores) -> dict:
+    """Migra los ValorIndicador del grafo al almacén y devuelve un resumen de la migración."""
+    ns = rdf_manager.ns_manager
+    graph = rdf_manager.graph
+    componentes_por_propiedad = {ns.trade[prop]: comp for comp, prop in PROPIEDADES_COMPONENTES.items()}
+
+    # 1. Leer los nodos antiguos (los que aún no enlazan a una serie)
+    filas_por_serie = defaultdict(list)
+    nodos_migrados = []
+    with rdf_manager.lectura():
+        for valor_uri in set(graph.subjects(RDF.type, ns.trade.ValorIndicador)):
+            if graph.value(valor_uri, ns.trade.tieneSerieTemporal) is not None:
+                continue
+            config_uri = graph.value(valor_uri, ns.trade.esValorDe)
+            par_uri = graph.value(valor_uri, ns.trade.seAplicaA)
+            timestamp = graph.value(valor_uri, ns.trade.timestampValor)
+            if config_uri is None or par_uri is None or timestamp is None:
+                print(f"Advertencia: <{valor_uri}> no tiene configuración, par o timestamp; se deja en el grafo.")
+                continue
+            valores = {comp: float(graph.value(valor_uri, prop)) for prop, comp in componentes_por_propiedad.items()
+                       if graph.value(valor_uri, prop) is not None}
+            filas_por_serie[(par_uri, config_uri)].append((pd.Timestamp(str(timestamp)), valores))
+            nodos_migrados.append(valor_uri)
+
+    # 2. Volcar cada serie al almacén columnar
+    resumen = {"nodos_migrados": len(nodos_migrados), "series": {}, "tripletas_antes": len(graph)}
+    for (par_uri, config_uri), filas in filas_por_serie.items():
+        filas.sort(key=lambda fila: fila[0])
+        componentes = sorted({c for _, valores in filas for c in valores})
+        par_local, config_local = str(par_uri).split('#')[-1], str(config_uri).split('#')[-1]
+        almacen.fusionar_lote(par_local, config_local, [ts for ts, _ in filas],
+                              {c: [valores.get(c) for _, valores in filas] for c in componentes})
+        resumen["series"][f"{par_local}/{config_local}"] = len(filas)
+
+    # 3. Sustituir los nodos por el ValorIndicador estable de cada serie
+    with rdf_manager.lote_escritura() as lote:
+        with rdf_manager.lectura():
+            for (par_uri, config_uri), filas in filas_por_serie.items():
+                par_local, config_local = str(par_uri).split('#')[-1], str(config_uri).split('#')[-1]
+                valor_actual_uri = uri_valor_actual(ns.trade, par_local, config_local)
+                if (valor_actual_uri, None, None) not in graph:
+                    ultimo_ts, ultimos = almacen.ultimo(par_local, config_local)
+                    agregar_nodo_valor_actual(lote, ns, almacen, par_uri, config_uri, ultimo_ts, ultimos, PROPIEDADES_COMPONENTES)
+            for valor_uri in nodos_migrados:
+                par_local = str(graph.value(valor_uri, ns.trade.seAplicaA)).split('#')[-1]
+                config_local = str(graph.value(valor_uri, ns.trade.esValorDe)).split('#')[-1]
+                valor_actual_uri = uri_valor_actual(ns.trade, par_local, config_local)
+                for señal_uri in list(graph.subjects(ns.trade.generadaPorIndicador, valor_uri)):
+                    lote.eliminar(señal_uri, ns.trade.generadaPorIndicador, valor_uri)
+                    lote.agregar(señal_uri, ns.trade.generadaPorIndicador, valor_actual_uri)
+                lote.eliminar(valor_uri, None, None)
+
+    resumen["tripletas_despues"] = len(graph)
+    return resumen
+
+
+# Uso: python rdf_utils/migrar_series_indicadores.py [--persist ruta.ttl] [--series directorio]
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Mueve los trade:ValorIndicador del grafo al almacén columnar de series.")
+    parser.add_argument("--persist", default=os.path.join(project_root_dir, 'datos_trading', 'datos_actualizados.ttl'),
+                        help="Archivo Turtle persistido a migrar (se reescribe al terminar).")
+    parser.add_argument("--series", default=os.path.join(project_root_dir, 'datos_trading', 'series_indicadores'),
+                        help="Directorio del almacén columnar de series.")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.persist):
+        print(f"No existe el archivo de persistencia {args.persist}; no hay nada que migrar.")
+        sys.exit(0)
+
+    manager = RDFManagerTrading(
+        ontologia_path=os.path.join(project_root_dir, 'datos_trading', 'ontologia_trading.ttl'),
+        datos_muestra_path=None,
+        persist_path=args.persist,
+        usar_cache_binaria=False
+    )
+    resumen = migrar_valores_indicador(manager, AlmacenSeriesIndicadores(args.series))
+    if resumen["nodos_migrados"]:
+        manager.guardar_datos()
+    print(f"\nNodos ValorIndicador migrados: {resumen['nodos_migrados']}")
+    for serie, num_filas in sorted(resumen["series"].items()):
+        print(f"  {serie}: {num_filas} filas")
+    print(f"Tripletas en el grafo: {resumen['tripletas_antes']} -> {resumen['tripletas_despues']}")
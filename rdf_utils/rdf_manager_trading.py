@@ -1,14 +1,40 @@
 # rdf_utils/rdf_manager_trading.py
 import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
 from rdflib import Graph, Namespace, Literal, URIRef
 from rdflib.namespace import RDF, RDFS, OWL, XSD
 from datetime import datetime
 import pandas as pd # Necesario para algunos tipos de datos de indicadores
 
+# --- Modificación para permitir la ejecución directa del script ---
+current_script_dir = os.path.dirname(os.path.abspath(__file__))
+project_root_dir = os.path.abspath(os.path.join(current_script_dir, '..'))
+if project_root_dir not in sys.path:
+    sys.path.insert(0, project_root_dir)
+# --- Fin de la modificación ---
+
+from rdf_utils.diario_persistencia import DiarioPersistencia
+from rdf_utils.cache_grafo import CacheGrafo, firma_fuentes
+from rdf_utils.almacen_sqlite import AlmacenSQLite
+from rdf_utils.consultas_preparadas import RegistroConsultas
+from rdf_utils.cerrojo_lectura_escritura import CerrojoLecturaEscritura
+
+MODOS_PERSISTENCIA = ("turtle", "diario")
+BACKENDS = ("memoria", "sqlite")
+UMBRAL_COMPACTACION_DEFAULT = 5 * 1024 * 1024 # Tamaño del diario (bytes) que dispara la compactación
+
 class RDFManagerTrading:
     def __init__(self, ontologia_path="datos_trading/ontologia_trading.ttl",
                  datos_muestra_path="datos_trading/datos_trading_muestra.ttl",
-                 persist_path="datos_trading/datos_actualizados.ttl"):
+                 persist_path="datos_trading/datos_actualizados.ttl",
+                 modo_persistencia="turtle",
+                 umbral_compactacion_bytes=UMBRAL_COMPACTACION_DEFAULT,
+                 usar_cache_binaria=True,
+                 backend="memoria",
+                 ruta_sqlite=None):
         """
         Inicializa el gestor RDF para el asistente de trading.
         Carga la ontología y los datos (persistidos o de muestra).
@@ -17,11 +43,42 @@ class RDFManagerTrading:
             ontologia_path (str): Ruta al archivo de la ontología (.ttl).
             datos_muestra_path (str): Ruta a los datos RDF de muestra (.ttl).
             persist_path (str): Ruta donde se guardarán/cargarán los datos actualizados.
+            modo_persistencia (str): 'turtle' reescribe el grafo completo en cada guardado.
+                'diario' anexa solo los cambios a un diario N-Quads (persist_path + '.diario.nq')
+                y lo compacta periódicamente en segundo plano sobre persist_path.
+            umbral_compactacion_bytes (int): Tamaño del diario a partir del cual se compacta.
+            usar_cache_binaria (bool): Carga el grafo desde un snapshot binario (persist_path + '.cache.npz')
+                si las fuentes Turtle no han cambiado; si han cambiado, las parsea y regenera el snapshot.
+            backend (str): 'memoria' mantiene el grafo en un rdflib.Graph en RAM. 'sqlite' lo guarda en
+                un almacén SQLite local con índices SPO/POS/OSP (rdf_utils/almacen_sqlite.py): el arranque
+                no parsea nada y el historial no tiene que caber en memoria. Con 'sqlite' no se usan
+                ni el diario ni el snapshot binario, y guardar_datos() confirma la transacción.
+            ruta_sqlite (str): Archivo SQLite del backend 'sqlite' (por defecto, persist_path con extensión .sqlite).
         """
-        self.graph = Graph()
+        if modo_persistencia not in MODOS_PERSISTENCIA:
+            raise ValueError(f"Modo de persistencia no soportado: {modo_persistencia}")
+        if backend not in BACKENDS:
+            raise ValueError(f"Backend no soportado: {backend}")
+        self.backend = backend
+        if backend == "sqlite":
+            self.ruta_sqlite = ruta_sqlite or os.path.splitext(persist_path or "datos_trading/datos_actualizados.ttl")[0] + ".sqlite"
+            self.graph = Graph(store=AlmacenSQLite())
+            self.graph.open(self.ruta_sqlite, create=True)
+            modo_persistencia, usar_cache_binaria = "turtle", False
+        else:
+            self.ruta_sqlite = None
+            self.graph = Graph()
         self.ontologia_path = ontologia_path
         self.datos_muestra_path = datos_muestra_path
         self.persist_path = persist_path
+        self.modo_persistencia = modo_persistencia
+        self.umbral_compactacion_bytes = umbral_compactacion_bytes
+        self.diario = DiarioPersistencia(persist_path + ".diario.nq") if modo_persistencia == "diario" and persist_path else None
+        self._hilo_compactacion = None
+        self._hilo_snapshot = None
+        self._lock_snapshot = threading.Lock()
+        self.cache = CacheGrafo(persist_path + ".cache.npz") if usar_cache_binaria and persist_path else None
+        self.informe_arranque = {}
 
         # Definir namespaces
         self.ns_trade = Namespace("http://www.example.org/trading#")
@@ -34,80 +91,363 @@ class RDFManagerTrading:
         # Acceso más fácil a los namespaces para los agentes
         self.ns_manager = NamespaceHelper(self.graph)
 
-        self._cargar_ontologia()
-        self._cargar_datos()
+        # Lote de escritura activo por hilo (ver lote_escritura)
+        self._estado_hilo = threading.local()
+        # Lectores concurrentes / un único escritor sobre el grafo (ver lectura y escritura)
+        self.cerrojo = CerrojoLecturaEscritura()
+        # Funciones avisadas de cada cambio confirmado (ver suscribir_cambios)
+        self._suscriptores_cambios = []
+
+        # Consultas SPARQL de agentes y dashboard, compiladas una sola vez
+        self.consultas = RegistroConsultas()
+
+        self._cargar_grafo()
+        if self.diario:
+            bloques = self.diario.reproducir(self.graph)
+            if bloques:
+                print(f"Diario de persistencia reproducido: {bloques} bloques desde {self.diario.ruta_diario}")
         
         print(f"RDFManagerTrading inicializado. Grafo con {len(self.graph)} tripletas.")
 
-    def _cargar_ontologia(self):
+    def _fuentes_grafo(self) -> list[str]:
+        """Archivos Turtle de los que se cargaría el grafo (la ontología y los datos persistidos o de muestra)."""
+        fuentes = [self.ontologia_path] if self.ontologia_path and os.path.exists(self.ontologia_path) else []
+        for ruta in (self.persist_path, self.datos_muestra_path):
+            if ruta and os.path.exists(ruta):
+                fuentes.append(ruta)
+                break
+        return fuentes
+
+    def _cargar_grafo(self):
+        inicio = time.perf_counter()
+        fuentes = self._fuentes_grafo()
+        if self.backend == "sqlite":
+            camino = "sqlite"
+            self._cargar_grafo_sqlite()
+        elif self.cache and fuentes and self.cache.cargar(self.graph, fuentes):
+            camino = "snapshot"
+            print(f"Grafo cargado desde el snapshot binario {self.cache.ruta_cache}")
+        else:
+            camino = "parseo"
+            fuentes = [f for f in (self._cargar_ontologia(), self._cargar_datos()) if f]
+            if self.cache and fuentes:
+                try:
+                    self.cache.guardar(self.graph, fuentes)
+                except Exception as e:
+                    print(f"Advertencia: No se pudo escribir el snapshot {self.cache.ruta_cache}: {e}")
+        self.informe_arranque = {"camino": camino, "segundos": time.perf_counter() - inicio, "tripletas": len(self.graph)}
+        print(f"Arranque del grafo por {camino}: {self.informe_arranque['tripletas']} tripletas "
+              f"en {self.informe_arranque['segundos'] * 1000:.1f} ms")
+
+    def _cargar_grafo_sqlite(self):
+        if len(self.graph) > 0:
+            print(f"Grafo abierto desde el almacén SQLite {self.ruta_sqlite}")
+            return
+        # Almacén nuevo: se importan las fuentes Turtle una sola vez, en bloque
+        grafo_importado = Graph()
+        fuentes = [f for f in (self._cargar_ontologia(grafo_importado), self._cargar_datos(grafo_importado)) if f]
+        for prefijo, namespace in grafo_importado.namespaces():
+            self.graph.bind(prefijo, namespace, override=False)
+        self.graph.addN((s, p, o, self.graph) for s, p, o in grafo_importado)
+        self.graph.commit()
+        print(f"Almacén SQLite {self.ruta_sqlite} inicializado desde {', '.join(fuentes) or 'un grafo vacío'}")
+
+    def cerrar(self):
+        """
+        Cierra el almacén persistente (backend 'sqlite'), confirmando lo pendiente, y espera a que
+        termine de escribirse el snapshot binario del último guardado.
+        """
+        if self._hilo_snapshot:
+            self._hilo_snapshot.join()
+        if self.backend == "sqlite":
+            self.graph.close(commit_pending_transaction=True)
+
+    def _cargar_ontologia(self, graph: Graph | None = None) -> str | None:
+        graph = self.graph if graph is None else graph
         if self.ontologia_path and os.path.exists(self.ontologia_path):
             try:
-                self.graph.parse(self.ontologia_path, format="turtle")
+                graph.parse(self.ontologia_path, format="turtle")
                 print(f"Ontología cargada desde {self.ontologia_path}")
+                return self.ontologia_path
             except Exception as e:
                 print(f"Error crítico al cargar la ontología desde {self.ontologia_path}: {e}")
         else:
             print(f"Advertencia: Archivo de ontología no encontrado en {self.ontologia_path}. El sistema puede no funcionar correctamente.")
 
-    def _cargar_datos(self):
+    def _cargar_datos(self, graph: Graph | None = None) -> str | None:
+        graph = self.graph if graph is None else graph
         # Priorizar datos persistidos
         if self.persist_path and os.path.exists(self.persist_path):
             try:
-                self.graph.parse(self.persist_path, format="turtle")
+                graph.parse(self.persist_path, format="turtle")
                 print(f"Datos cargados desde el archivo de persistencia: {self.persist_path}")
-                return # Salir si se cargaron los datos persistidos
+                return self.persist_path # Salir si se cargaron los datos persistidos
             except Exception as e:
                 print(f"Error al cargar datos desde {self.persist_path}: {e}. Intentando cargar datos de muestra.")
         
         # Si no hay persistidos o falló la carga, cargar datos de muestra
         if self.datos_muestra_path and os.path.exists(self.datos_muestra_path):
             try:
-                self.graph.parse(self.datos_muestra_path, format="turtle")
+                graph.parse(self.datos_muestra_path, format="turtle")
                 print(f"Datos de muestra cargados desde {self.datos_muestra_path}")
+                return self.datos_muestra_path
             except Exception as e:
                 print(f"Error crítico al cargar datos de muestra desde {self.datos_muestra_path}: {e}")
         else:
             print(f"Advertencia: No se encontraron datos persistidos en {self.persist_path} ni datos de muestra en {self.datos_muestra_path}.")
+        return None
 
     def guardar_datos(self, ruta_archivo=None):
         """
-        Guarda el estado actual del grafo RDF en un archivo Turtle.
-        Si no se especifica ruta_archivo, usa self.persist_path.
+        Guarda el estado actual del grafo RDF.
+        En modo 'turtle' (o si se indica ruta_archivo) serializa el grafo completo en un archivo
+        Turtle, escribiendo primero a un temporal para no dejar nunca un archivo a medias. Al
+        guardar en persist_path el snapshot binario se regenera en segundo plano desde la misma
+        copia, para que el siguiente arranque no tenga que parsear el Turtle.
+        En modo 'diario' solo anexa los cambios desde el último guardado y, si el diario supera
+        el umbral, lanza la compactación en segundo plano.
+        Con el backend 'sqlite' confirma la transacción abierta del almacén.
         """
+        if self.backend == "sqlite" and not ruta_archivo:
+            try:
+                with self.escritura():
+                    self.graph.commit()
+                print(f"Cambios confirmados en el almacén SQLite {self.ruta_sqlite} ({len(self.graph)} tripletas).")
+            except Exception as e:
+                print(f"Error al confirmar los cambios en {self.ruta_sqlite}: {e}")
+            return
+
+        if self.diario and not ruta_archivo:
+            try:
+                num_cambios = self.diario.confirmar()
+                print(f"Diario de persistencia: {num_cambios} cambios anexados a {self.diario.ruta_diario}.")
+            except Exception as e:
+                print(f"Error al anexar cambios al diario {self.diario.ruta_diario}: {e}")
+                return
+            if self.diario.tamaño_bytes() >= self.umbral_compactacion_bytes:
+                self.compactar(en_segundo_plano=True)
+            return
+
         path_to_save = ruta_archivo if ruta_archivo else self.persist_path
         if not path_to_save:
             print("Error: No se especificó una ruta para guardar los datos y no hay ruta de persistencia configurada.")
             return
-            
-        os.makedirs(os.path.dirname(path_to_save), exist_ok=True)
-
         try:
-            self.graph.serialize(destination=path_to_save, format="turtle")
-            print(f"Grafo RDF guardado en {path_to_save} con {len(self.graph)} tripletas.")
+            # La copia se toma con el cerrojo de lectura (nunca recoge un lote a medias) y se serializa sin él
+            copia = self._copiar_grafo()
+            self._serializar_atomico(copia, path_to_save)
+            print(f"Grafo RDF guardado en {path_to_save} con {len(copia)} tripletas.")
         except Exception as e:
             print(f"Error al guardar el grafo RDF en {path_to_save}: {e}")
+            return
+        if self.cache and path_to_save == self.persist_path:
+            self._regenerar_snapshot(copia)
+
+    def _copiar_grafo(self) -> Graph:
+        copia = Graph()
+        with self.lectura():
+            for prefijo, namespace in self.graph.namespaces():
+                copia.bind(prefijo, namespace)
+            copia.addN((s, p, o, copia) for s, p, o in list(self.graph))
+        return copia
+
+    def _regenerar_snapshot(self, copia: Graph):
+        """
+        Escribe en segundo plano el snapshot binario de la copia recién guardada en Turtle.
+        La firma se toma ahora, antes de que otro guardado pueda cambiar el Turtle: un snapshot
+        que termine tarde nunca pasa por válido para un archivo más nuevo.
+        """
+        fuentes = [f for f in (self.ontologia_path, self.persist_path) if f and os.path.exists(f)]
+        try:
+            firma = firma_fuentes(fuentes)
+        except OSError as e:
+            print(f"Advertencia: No se pudo firmar {self.persist_path} para el snapshot: {e}")
+            return
+
+        def tarea():
+            with self._lock_snapshot:
+                try:
+                    self.cache.guardar(copia, fuentes, firma=firma)
+                except Exception as e:
+                    print(f"Advertencia: No se pudo escribir el snapshot {self.cache.ruta_cache}: {e}")
+
+        self._hilo_snapshot = threading.Thread(target=tarea, name="SnapshotGrafo", daemon=True)
+        self._hilo_snapshot.start()
+
+    def _serializar_atomico(self, graph: Graph, path_to_save: str):
+        directorio = os.path.dirname(path_to_save)
+        if directorio:
+            os.makedirs(directorio, exist_ok=True)
+        ruta_temporal = path_to_save + ".tmp"
+        graph.serialize(destination=ruta_temporal, format="turtle")
+        with open(ruta_temporal, "rb") as f:
+            os.fsync(f.fileno())
+        os.replace(ruta_temporal, path_to_save)
+
+    def compactar(self, en_segundo_plano: bool = False):
+        """
+        Integra el diario en el snapshot Turtle (persist_path).
+        El diario actual se rota y se toma una copia de las tripletas en este hilo; la
+        serialización del snapshot se hace en segundo plano si así se pide. Si el proceso
+        se interrumpe, el diario rotado se vuelve a reproducir al arrancar.
+        """
+        if not self.diario:
+            return
+        if self._hilo_compactacion and self._hilo_compactacion.is_alive():
+            return
+        self.diario.confirmar()
+        if not self.diario.rotar():
+            return
+
+        copia = self._copiar_grafo()
+
+        def tarea():
+            try:
+                self._serializar_atomico(copia, self.persist_path)
+                if self.cache:
+                    # El snapshot binario se regenera desde la misma copia para que el próximo arranque no parsee
+                    self.cache.guardar(copia, [f for f in (self.ontologia_path, self.persist_path) if f and os.path.exists(f)])
+                self.diario.descartar_rotado()
+                print(f"Compactación completada: snapshot {self.persist_path} con {len(copia)} tripletas.")
+            except Exception as e:
+                print(f"Error durante la compactación del diario: {e}")
+
+        if en_segundo_plano:
+            self._hilo_compactacion = threading.Thread(target=tarea, name="CompactacionDiario", daemon=True)
+            self._hilo_compactacion.start()
+        else:
+            tarea()
+
+    @contextmanager
+    def lectura(self):
+        """
+        Bloque de lectura directa del grafo (self.graph.value, triples, ...). Puede haber muchos
+        lectores a la vez; mientras dure no se aplica ningún lote, así que lo leído es coherente.
+        No se puede escribir en el grafo dentro del bloque (sí acumular en un lote_escritura).
+        """
+        with self.cerrojo.lectura():
+            yield self.graph
+
+    @contextmanager
+    def escritura(self):
+        """Acceso exclusivo al grafo. Los lotes y las tripletas sueltas ya lo toman al aplicarse."""
+        with self.cerrojo.escritura():
+            yield self.graph
 
     def ejecutar_sparql(self, consulta_str):
         """
         Ejecuta una consulta SPARQL sobre el grafo.
+        Los resultados SELECT se materializan con el cerrojo de lectura tomado.
         """
         try:
             # print(f"DEBUG SPARQL:\n{consulta_str}\n") # Descomentar para depurar consultas
-            resultados = self.graph.query(consulta_str)
+            with self.lectura():
+                resultados = self.graph.query(consulta_str)
+                if resultados.type == "SELECT":
+                    resultados.bindings
             return resultados
         except Exception as e:
             print(f"Error crítico al ejecutar la consulta SPARQL: {e}\nConsulta:\n{consulta_str}")
             return None # Devolver None en caso de error para manejo posterior
 
+    def ejecutar_consulta(self, nombre_consulta: str, **vinculos):
+        """
+        Ejecuta una consulta preparada del registro (ver rdf_utils/consultas_preparadas.py)
+        vinculando las variables indicadas, p. ej. ejecutar_consulta("info_par", par=par_uri).
+        """
+        try:
+            with self.lectura():
+                return self.consultas.ejecutar(self.graph, nombre_consulta, **vinculos)
+        except Exception as e:
+            print(f"Error crítico al ejecutar la consulta preparada '{nombre_consulta}' ({vinculos}): {e}")
+            return None
+
+    def estadisticas_consultas(self) -> dict:
+        return self.consultas.estadisticas()
+
     def agregar_tripleta(self, sujeto_uri, predicado_uri, objeto_uri_o_literal):
         """
         Añade una tripleta al grafo.
+        Si hay un lote de escritura activo en el hilo, la tripleta se acumula en él.
         """
+        lote = self.lote_activo()
+        if lote is not None:
+            lote.agregar(sujeto_uri, predicado_uri, objeto_uri_o_literal)
+            return
         try:
-            self.graph.add((sujeto_uri, predicado_uri, objeto_uri_o_literal))
+            with self.escritura():
+                self.graph.add((sujeto_uri, predicado_uri, objeto_uri_o_literal))
+                self._registrar_cambios(añadidas=[(sujeto_uri, predicado_uri, objeto_uri_o_literal)])
         except Exception as e:
             print(f"Error al añadir tripleta ({sujeto_uri}, {predicado_uri}, {objeto_uri_o_literal}): {e}")
 
+    def eliminar_tripletas(self, sujeto_uri=None, predicado_uri=None, objeto_uri_o_literal=None):
+        """
+        Elimina las tripletas que coinciden con el patrón (None actúa como comodín).
+        Si hay un lote de escritura activo en el hilo, la eliminación se aplica al confirmarlo.
+        """
+        lote = self.lote_activo()
+        if lote is not None:
+            lote.eliminar(sujeto_uri, predicado_uri, objeto_uri_o_literal)
+            return
+        necesita_eliminadas = self.diario or self._suscriptores_cambios
+        with self.escritura():
+            eliminadas = list(self.graph.triples((sujeto_uri, predicado_uri, objeto_uri_o_literal))) if necesita_eliminadas else []
+            self.graph.remove((sujeto_uri, predicado_uri, objeto_uri_o_literal))
+            self._registrar_cambios(eliminadas=eliminadas)
+
+    def _registrar_cambios(self, añadidas=(), eliminadas=()):
+        """Punto único por el que pasan los cambios confirmados en el grafo."""
+        if self.diario:
+            self.diario.registrar(añadidas=añadidas, eliminadas=eliminadas)
+        for suscriptor in self._suscriptores_cambios:
+            try:
+                suscriptor(añadidas=añadidas, eliminadas=eliminadas)
+            except Exception as e:
+                print(f"Error en un suscriptor de cambios del grafo ({suscriptor}): {e}")
+
+    def suscribir_cambios(self, suscriptor):
+        """
+        Registra una función suscriptor(añadidas=[...], eliminadas=[...]) que se llama tras
+        cada cambio confirmado (tripleta suelta o lote aplicado), en el hilo que escribe y
+        con el cerrojo de escritura tomado: puede leer el grafo pero no debe bloquearse.
+        """
+        self._suscriptores_cambios.append(suscriptor)
+
+    def lote_activo(self):
+        return getattr(self._estado_hilo, "lote", None)
+
+    @contextmanager
+    def lote_escritura(self):
+        """
+        Abre un lote de escritura: las tripletas añadidas o eliminadas dentro del bloque
+        (directamente en el lote o vía agregar_tripleta/eliminar_tripletas) se aplican en
+        bloque al salir. Si el bloque lanza una excepción, no se aplica nada.
+        Un lote abierto dentro de otro se une al lote exterior.
+        El lote se aplica con el cerrojo de escritura: los lectores ven el grafo de antes o el
+        de después, nunca uno a medias. Lo que dependa de que el lote esté aplicado (almacenes
+        auxiliares, vistas) se registra con lote.al_aplicar(funcion).
+
+        Uso:
+            with rdf_manager.lote_escritura() as lote:
+                lote.agregar_entidad(uri, trade.ValorIndicador, {trade.seAplicaA: par_uri})
+        """
+        lote_exterior = self.lote_activo()
+        if lote_exterior is not None:
+            yield lote_exterior
+            return
+
+        lote = LoteEscritura(self)
+        self._estado_hilo.lote = lote
+        try:
+            yield lote
+        except Exception:
+            lote.descartar()
+            raise
+        finally:
+            self._estado_hilo.lote = None
+        lote.aplicar()
+
     def obtener_uri(self, nombre_entidad: str, ns_prefix: str = "trade") -> URIRef:
         """
         Crea una URI completa para una entidad usando el namespace 'trade' por defecto.
@@ -125,17 +465,115 @@ class RDFManagerTrading:
         if timestamp is None:
             timestamp = datetime.now()
 
-        # Eliminar el precio actual anterior para este par de mercado
-        self.graph.remove((par_mercado_uri, self.ns_trade.precioActual, None))
-        
-        # Añadir el nuevo precio actual
-        self.agregar_tripleta(par_mercado_uri, self.ns_trade.precioActual, Literal(nuevo_precio, datatype=XSD.decimal))
+        with self.lote_escritura() as lote:
+            # Eliminar el precio actual anterior para este par de mercado
+            lote.eliminar(par_mercado_uri, self.ns_trade.precioActual, None)
+            # Añadir el nuevo precio actual
+            lote.agregar(par_mercado_uri, self.ns_trade.precioActual, Literal(nuevo_precio, datatype=XSD.decimal))
         
         # Opcional: Podríamos añadir un historial de precios si fuera necesario,
         # creando instancias de :HistoricoPrecio, pero para :precioActual solo mantenemos el último.
         print(f"Precio actualizado para <{par_mercado_uri.split('#')[-1]}> a {nuevo_precio} en {timestamp.isoformat()}")
 
 
+class LoteEscritura:
+    """
+    Acumula tripletas a añadir y patrones a eliminar para aplicarlos de una vez con graph.addN.
+    Si la aplicación falla, el grafo se restaura a su estado anterior.
+    """
+    def __init__(self, rdf_manager: RDFManagerTrading):
+        self.rdf_manager = rdf_manager
+        self._añadir = []
+        self._eliminar = []
+        self._pendientes_por_sujeto = {} # Para consultar lo escrito en el lote antes de aplicarlo
+        self.num_añadidas, self.num_eliminadas = 0, 0 # Tripletas que cambiaron al aplicar el lote
+        self._al_aplicar = []
+
+    def agregar(self, sujeto, predicado, objeto):
+        self._añadir.append((sujeto, predicado, objeto))
+        self._pendientes_por_sujeto.setdefault(sujeto, []).append((predicado, objeto))
+
+    def agregar_entidad(self, sujeto: URIRef, tipo: URIRef | None, propiedades: dict):
+        """
+        Añade una entidad completa: su rdf:type y un diccionario {predicado: objeto}.
+        Los objetos pueden ser un término RDF, una lista de términos o None (se omite).
+        """
+        if tipo is not None:
+            self.agregar(sujeto, RDF.type, tipo)
+        for predicado, objetos in propiedades.items():
+            if objetos is None:
+                continue
+            for objeto in (objetos if isinstance(objetos, (list, tuple, set)) else [objetos]):
+                if objeto is not None:
+                    self.agregar(sujeto, predicado, objeto)
+
+    def eliminar(self, sujeto=None, predicado=None, objeto=None):
+        """Elimina las tripletas del grafo que coinciden con el patrón, incluidas las añadidas antes en este lote."""
+        patron = (sujeto, predicado, objeto)
+        coincide = lambda t: all(p is None or p == v for p, v in zip(patron, t))
+        if any(coincide(t) for t in self._añadir):
+            self._añadir = [t for t in self._añadir if not coincide(t)]
+            self._pendientes_por_sujeto = {}
+            for s, p, o in self._añadir:
+                self._pendientes_por_sujeto.setdefault(s, []).append((p, o))
+        self._eliminar.append(patron)
+
+    def objetos_pendientes(self, sujeto, predicado) -> list:
+        """Objetos añadidos en este lote (aún sin aplicar) para un sujeto y predicado."""
+        return [o for p, o in self._pendientes_por_sujeto.get(sujeto, []) if p == predicado]
+
+    def al_aplicar(self, funcion):
+        """
+        Registra funcion() para ejecutarla cuando el lote (o el exterior al que se unió) se haya
+        aplicado al grafo, ya sin el cerrojo de escritura. Si el lote se descarta, no se llama.
+        """
+        self._al_aplicar.append(funcion)
+
+    def __len__(self):
+        return len(self._añadir) + len(self._eliminar)
+
+    def descartar(self):
+        self._añadir, self._eliminar, self._pendientes_por_sujeto = [], [], {}
+        self._al_aplicar = []
+
+    def aplicar(self):
+        al_aplicar = self._al_aplicar
+        with self.rdf_manager.escritura():
+            self._aplicar_en_grafo()
+        for funcion in al_aplicar:
+            try:
+                funcion()
+            except Exception as e:
+                print(f"Error en una función posterior al lote de escritura ({funcion}): {e}")
+
+    def _aplicar_en_grafo(self):
+        graph = self.rdf_manager.graph
+        eliminadas = []
+        for patron in self._eliminar:
+            eliminadas.extend(graph.triples(patron))
+        eliminadas = list(dict.fromkeys(eliminadas))
+        eliminadas_set = set(eliminadas)
+        añadidas = list(dict.fromkeys(self._añadir))
+        # Solo las tripletas que no existían deben retirarse si hay que deshacer
+        nuevas = [t for t in añadidas if t in eliminadas_set or t not in graph]
+
+        try:
+            for tripleta in eliminadas:
+                graph.remove(tripleta)
+            graph.addN((s, p, o, graph) for s, p, o in añadidas)
+        except Exception as e:
+            print(f"Error al aplicar el lote de escritura ({len(añadidas)} tripletas). Deshaciendo cambios: {e}")
+            for tripleta in nuevas:
+                graph.remove(tripleta)
+            for tripleta in eliminadas:
+                graph.add(tripleta)
+            raise
+        finally:
+            self.descartar()
+        self.num_añadidas, self.num_eliminadas = len(nuevas), len(eliminadas)
+        self.rdf_manager._registrar_cambios(añadidas=añadidas, eliminadas=eliminadas)
+
+
 class NamespaceHelper:
     """Clase auxiliar para un acceso más limpio a los namespaces y URIs comunes."""
     def __init__(self, graph: Graph):
@@ -229,6 +667,7 @@ if __name__ == '__main__':
         persist_path=persist_f
     )
     print(f"Total de tripletas después de recargar: {len(manager_recargado.graph)}")
+    print(f"Informe de arranque: primera carga {manager.informe_arranque}, recarga {manager_recargado.informe_arranque}")
     
     resultados_precio_recargado = manager_recargado.ejecutar_sparql(query_precio_wld)
     if resultados_precio_recargado:
@@ -236,4 +675,35 @@ if __name__ == '__main__':
             print(f"Precio de WLD_USDT después de recargar: {fila['precio']}")
             assert fila['precio'] == Literal(3.55, datatype=XSD.decimal), "La persistencia del precio falló"
 
+    print("\n--- Persistencia en modo diario ---")
+    persist_diario_f = os.path.join(base_dir, 'datos_trading', 'test_rdf_manager_diario.ttl')
+    for ruta in (persist_diario_f, persist_diario_f + ".diario.nq", persist_diario_f + ".diario.nq.compactando",
+                 persist_diario_f + ".cache.npz"):
+        if os.path.exists(ruta):
+            os.remove(ruta)
+    manager_diario = RDFManagerTrading(
+        ontologia_path=ontologia_f,
+        datos_muestra_path=datos_muestra_f,
+        persist_path=persist_diario_f,
+        modo_persistencia="diario"
+    )
+    manager_diario.actualizar_precio_par_mercado(wld_usdt_uri, 3.60)
+    manager_diario.guardar_datos() # Solo anexa el cambio de precio al diario
+    manager_diario.actualizar_precio_par_mercado(wld_usdt_uri, 3.65)
+    manager_diario.guardar_datos()
+
+    manager_diario_recargado = RDFManagerTrading(
+        ontologia_path=ontologia_f,
+        datos_muestra_path=datos_muestra_f,
+        persist_path=persist_diario_f,
+        modo_persistencia="diario"
+    )
+    precios = list(manager_diario_recargado.graph.objects(wld_usdt_uri, manager.ns_trade.precioActual))
+    print(f"Precio de WLD_USDT tras reproducir el diario: {precios}")
+    assert precios == [Literal(3.65, datatype=XSD.decimal)], "La reproducción del diario falló"
+
+    manager_diario_recargado.compactar()
+    assert not os.path.exists(manager_diario_recargado.diario.ruta_diario), "El diario no se integró en el snapshot"
+    print(f"Diario compactado en {persist_diario_f}")
+
     print("\nPrueba de RDFManagerTrading completada.")
@@ -0,0 +1,309 @@
+# rdf_utils/retencion_trading.py
+import os
+import sys
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+
+import pandas as pd
+from rdflib import Literal, URIRef
+from rdflib.namespace import RDF, XSD
+
+# --- Modificación para permitir la ejecución directa del script ---
+current_script_dir = os.path.dirname(os.path.abspath(__file__))
+project_root_dir = os.path.abspath(os.path.join(current_script_dir, '..'))
+if project_root_dir not in sys.path:
+    sys.path.insert(0, project_root_dir)
+# --- Fin de la modificación ---
+
+from rdf_utils.rdf_manager_trading import RDFManagerTrading
+from rdf_utils.almacen_series import AlmacenSeriesIndicadores
+
+# Retención del historial que generan los ciclos de análisis:
+#  - valores_1h / valores_1D: los trade:ValorIndicador con más de 'dias_valores_crudos' días se
+#    agregan en nodos horarios, y los de más de 'dias_valores_horarios' días en nodos diarios
+#    (media de cada componente, con trade:resolucionAgregado y trade:numeroMuestras).
+#  - series: la misma reducción sobre el almacén columnar de series, si lo hay.
+#  - recomendaciones: se eliminan las trade:RecomendacionTrading con más de
+#    'dias_recomendaciones' días (salvo la última de cada par).
+#  - señales_huerfanas: se eliminan las trade:señalTecnica que ninguna recomendación usa y
+#    que ya superan 'dias_valores_crudos' días.
+# Cada política trabaja en bloques de 'tamaño_bloque' nodos, cada uno en su propio lote de
+# escritura, con una pausa entre bloques para no acaparar el grafo.
+COMPONENTES_VALOR = ("valorNumerico", "valorMACD", "valorseñalMACD", "valorHistogramaMACD",
+                     "valorBandaMedia", "valorBandaSuperior", "valorBandaInferior")
+RESOLUCIONES = ("1h", "1D") # De más fina a más gruesa
+INTERVALO_RETENCION_DEFAULT_SEGUNDOS = 3600
+
+def _a_timestamp(literal) -> pd.Timestamp | None:
+    try:
+        ts = pd.Timestamp(str(literal))
+    except (ValueError, TypeError):
+        return None
+    return ts.tz_localize("UTC") if ts.tzinfo is None else ts.tz_convert("UTC")
+
+class RetencionTrading:
+    def __init__(self, rdf_manager: RDFManagerTrading, almacen_series: AlmacenSeriesIndicadores | None = None,
+                 dias_valores_crudos: int = 7, dias_valores_horarios: int = 90, dias_recomendaciones: int = 30,
+                 tamaño_bloque: int = 500, pausa_entre_bloques: float = 0.01):
+        self.rdf_manager = rdf_manager
+        self.almacen_series = almacen_series
+        self.ns = rdf_manager.ns_manager
+        self.dias_valores_crudos = dias_valores_crudos
+        self.dias_valores_horarios = dias_valores_horarios
+        self.dias_recomendaciones = dias_recomendaciones
+        self.tamaño_bloque = tamaño_bloque
+        self.pausa_entre_bloques = pausa_entre_bloques
+
+        self._hilo = None
+        self._detener = threading.Event()
+        self._lock_ejecucion = threading.Lock()
+
+    # --- Utilidades ---
+    def _leer_por_bloques(self, elementos: list, leer) -> list:
+        """
+        Concatena leer(bloque) sobre 'elementos' en bloques de 'tamaño_bloque', tomando el cerrojo
+        de lectura solo durante cada bloque para que las escrituras pendientes avancen entre ellos.
+        """
+        resultado = []
+        for inicio in range(0, len(elementos), self.tamaño_bloque):
+            with self.rdf_manager.lectura():
+                resultado.extend(leer(elementos[inicio:inicio + self.tamaño_bloque]))
+        return resultado
+
+    def _nodos_con_timestamp(self, clase: URIRef, prop_timestamp: URIRef, limite: pd.Timestamp | None = None) -> list[tuple]:
+        """(nodo, ts) de los nodos de 'clase' con timestamp anterior a 'limite' (todos si es None)."""
+        graph = self.rdf_manager.graph
+        with self.rdf_manager.lectura():
+            sujetos = list(graph.subjects(RDF.type, clase))
+        literales = self._leer_por_bloques(sujetos, lambda bloque: [(nodo, graph.value(nodo, prop_timestamp)) for nodo in bloque])
+        # La conversión de los timestamps (lo más costoso) se hace sin el cerrojo
+        nodos = []
+        for nodo, literal in literales:
+            ts = _a_timestamp(literal) if literal is not None else None
+            if ts is not None and (limite is None or ts < limite):
+                nodos.append((nodo, ts))
+        return nodos
+
+    def _por_bloques(self, elementos: list):
+        for inicio in range(0, len(elementos), self.tamaño_bloque):
+            if self._detener.is_set() and self._hilo is not None: # Parada pedida durante una ejecución de fondo
+                return
+            yield elementos[inicio:inicio + self.tamaño_bloque]
+            time.sleep(self.pausa_entre_bloques)
+
+    def _aplicar_bloque(self, escribir) -> int:
+        """
+        Ejecuta escribir(lote) en un lote de escritura propio y devuelve las tripletas netas reclamadas.
+        escribir lee el grafo con el cerrojo de lectura, que se suelta antes de aplicar el lote.
+        """
+        with self.rdf_manager.lote_escritura() as lote:
+            with self.rdf_manager.lectura():
+                escribir(lote)
+        return lote.num_eliminadas - lote.num_añadidas
+
+    # --- Políticas ---
+    def reducir_valores_indicador(self, resolucion: str, dias: int, ahora: datetime) -> int:
+        """Agrega los ValorIndicador más antiguos que 'dias' en nodos de la resolución indicada."""
+        graph = self.rdf_manager.graph
+        trade = self.ns.trade
+        limite = pd.Timestamp(ahora) - pd.Timedelta(days=dias)
+        resoluciones_finas = {None} | set(RESOLUCIONES[:RESOLUCIONES.index(resolucion)])
+        def resolucion_actual(nodo):
+            resolucion_nodo = graph.value(nodo, trade.resolucionAgregado)
+            return None if resolucion_nodo is None else str(resolucion_nodo)
+
+        # Los ValorIndicador estables del almacén de series (último valor) no se agregan nunca
+        candidatos = self._leer_por_bloques(
+            self._nodos_con_timestamp(trade.ValorIndicador, trade.timestampValor, limite),
+            lambda bloque: [(nodo, ts) for nodo, ts in bloque
+                            if graph.value(nodo, trade.tieneSerieTemporal) is None and resolucion_actual(nodo) in resoluciones_finas]
+        )
+        reclamadas = 0
+        for bloque in self._por_bloques(candidatos):
+            grupos = defaultdict(list)
+            with self.rdf_manager.lectura():
+                for nodo, ts in bloque:
+                    par_uri, config_uri = graph.value(nodo, trade.seAplicaA), graph.value(nodo, trade.esValorDe)
+                    if par_uri is None or config_uri is None:
+                        continue
+                    grupos[(par_uri, config_uri, ts.floor(resolucion))].append(nodo)
+            reclamadas += self._aplicar_bloque(lambda lote: self._agregar_grupos(lote, grupos, resolucion))
+        return reclamadas
+
+    def _agregar_grupos(self, lote, grupos: dict, resolucion: str):
+        graph = self.rdf_manager.graph
+        trade = self.ns.trade
+        for (par_uri, config_uri, inicio_intervalo), nodos in grupos.items():
+            par_local, config_local = str(par_uri).split('#')[-1], str(config_uri).split('#')[-1]
+            agregado_uri = trade[f"ValorAgregado_{par_local}_{config_local}_{resolucion}_{inicio_intervalo.strftime('%Y%m%d%H')}"]
+
+            # Sumas ponderadas por el número de muestras (los nodos ya agregados cuentan por sus muestras)
+            sumas, pesos = defaultdict(float), defaultdict(int)
+            for nodo in nodos + [agregado_uri]:
+                muestras = graph.value(nodo, trade.numeroMuestras)
+                peso = int(muestras) if muestras is not None else (0 if nodo == agregado_uri else 1)
+                for prop in COMPONENTES_VALOR:
+                    valor = graph.value(nodo, trade[prop])
+                    if valor is not None and peso:
+                        sumas[prop] += float(valor) * peso
+                        pesos[prop] += peso
+            num_muestras = sum(int(graph.value(n, trade.numeroMuestras) or 1) for n in nodos) \
+                + int(graph.value(agregado_uri, trade.numeroMuestras) or 0)
+
+            lote.eliminar(agregado_uri, None, None)
+            propiedades = {
+                trade.esValorDe: config_uri,
+                trade.seAplicaA: par_uri,
+                trade.timestampValor: Literal(inicio_intervalo.isoformat(), datatype=XSD.dateTime),
+                trade.resolucionAgregado: Literal(resolucion),
+                trade.numeroMuestras: Literal(num_muestras, datatype=XSD.integer),
+            }
+            for prop, suma in sumas.items():
+                propiedades[trade[prop]] = Literal(suma / pesos[prop], datatype=XSD.decimal)
+            lote.agregar_entidad(agregado_uri, trade.ValorIndicador, propiedades)
+
+            for nodo in nodos:
+                # Las señales que apuntaban al valor crudo pasan a apuntar al agregado
+                for señal_uri in list(graph.subjects(trade.generadaPorIndicador, nodo)):
+                    lote.eliminar(señal_uri, trade.generadaPorIndicador, nodo)
+                    lote.agregar(señal_uri, trade.generadaPorIndicador, agregado_uri)
+                lote.eliminar(nodo, None, None)
+
+    def reducir_series(self, ahora: datetime) -> int:
+        """Aplica la misma reducción al almacén columnar. Devuelve filas eliminadas (no tripletas)."""
+        if self.almacen_series is None:
+            return 0
+        niveles = [(ahora - timedelta(days=self.dias_valores_horarios), "1D"),
+                   (ahora - timedelta(days=self.dias_valores_crudos), "1h")]
+        filas = 0
+        for par_local, config_local in self.almacen_series.series():
+            filas += self.almacen_series.reducir(par_local, config_local, niveles)
+            time.sleep(self.pausa_entre_bloques)
+        return filas
+
+    def eliminar_recomendaciones_antiguas(self, ahora: datetime) -> int:
+        graph = self.rdf_manager.graph
+        trade = self.ns.trade
+        limite = pd.Timestamp(ahora) - pd.Timedelta(days=self.dias_recomendaciones)
+        # La última recomendación de cada par se conserva aunque sea antigua
+        ultimas = {}
+        recomendaciones = self._nodos_con_timestamp(trade.RecomendacionTrading, trade.timestampRecomendacion)
+        pares = self._leer_por_bloques(recomendaciones, lambda bloque: [graph.value(nodo, trade.paraActivo) for nodo, _ in bloque])
+        for (nodo, ts), par_uri in zip(recomendaciones, pares):
+            if par_uri not in ultimas or ts > ultimas[par_uri][1]:
+                ultimas[par_uri] = (nodo, ts)
+        conservar = {nodo for nodo, _ in ultimas.values()}
+        candidatos = [nodo for nodo, ts in recomendaciones if ts < limite and nodo not in conservar]
+        reclamadas = 0
+        for bloque in self._por_bloques(candidatos):
+            reclamadas += self._aplicar_bloque(lambda lote: [lote.eliminar(nodo, None, None) for nodo in bloque])
+        return reclamadas
+
+    def eliminar_señales_huerfanas(self, ahora: datetime) -> int:
+        graph = self.rdf_manager.graph
+        trade = self.ns.trade
+        limite = pd.Timestamp(ahora) - pd.Timedelta(days=self.dias_valores_crudos)
+        candidatos = self._leer_por_bloques(
+            self._nodos_con_timestamp(trade.señalTecnica, trade.fechaseñal, limite),
+            lambda bloque: [nodo for nodo, _ in bloque if (None, trade.basadaEnseñal, nodo) not in graph]
+        )
+        reclamadas = 0
+        for bloque in self._por_bloques(candidatos):
+            reclamadas += self._aplicar_bloque(lambda lote: [lote.eliminar(nodo, None, None) for nodo in bloque])
+        return reclamadas
+
+    # --- Ejecución ---
+    def ejecutar(self, ahora: datetime | None = None) -> dict:
+        """
+        Ejecuta todas las políticas una vez y devuelve las tripletas reclamadas por cada una
+        (y las filas eliminadas del almacén de series).
+        """
+        ahora = ahora or datetime.now(timezone.utc)
+        with self._lock_ejecucion:
+            inicio = time.perf_counter()
+            informe = {
+                "valores_1h": self.reducir_valores_indicador("1h", self.dias_valores_crudos, ahora),
+                "valores_1D": self.reducir_valores_indicador("1D", self.dias_valores_horarios, ahora),
+                # Las recomendaciones van antes que las señales: al borrarlas dejan señales huérfanas
+                "recomendaciones": self.eliminar_recomendaciones_antiguas(ahora),
+                "señales_huerfanas": self.eliminar_señales_huerfanas(ahora),
+                "filas_series": self.reducir_series(ahora),
+            }
+            if any(informe.values()):
+                self.rdf_manager.guardar_datos()
+            informe["duracion_segundos"] = time.perf_counter() - inicio
+            print(f"RetencionTrading: {informe}")
+            return informe
+
+    def _bucle(self, intervalo_segundos: float):
+        while not self._detener.is_set():
+            try:
+                self.ejecutar()
+            except Exception as e:
+                print(f"RetencionTrading: Error en la ejecución periódica: {e}")
+            self._detener.wait(intervalo_segundos)
+
+    def iniciar(self, intervalo_segundos: float = INTERVALO_RETENCION_DEFAULT_SEGUNDOS):
+        """Ejecuta la retención periódicamente en un hilo de fondo."""
+        if self._hilo and self._hilo.is_alive():
+            return
+        self._detener.clear()
+        self._hilo = threading.Thread(target=self._bucle, args=(intervalo_segundos,), name="RetencionTrading", daemon=True)
+        self._hilo.start()
+        print(f"RetencionTrading: Iniciada con intervalo de {intervalo_segundos}s.")
+
+    def detener(self):
+        self._detener.set()
+        if self._hilo:
+            self._hilo.join()
+            self._hilo = None
+
+
+# Bloque de prueba
+if __name__ == '__main__':
+    print("Probando RetencionTrading...")
+    persist_f = os.path.join(project_root_dir, 'datos_trading', 'test_retencion_persist.ttl')
+    for ruta in (persist_f, persist_f + ".cache.npz"):
+        if os.path.exists(ruta):
+            os.remove(ruta)
+
+    manager = RDFManagerTrading(
+        ontologia_path=os.path.join(project_root_dir, 'datos_trading', 'ontologia_trading.ttl'),
+        datos_muestra_path=os.path.join(project_root_dir, 'datos_trading', 'datos_trading_muestra.ttl'),
+        persist_path=persist_f
+    )
+    trade = manager.ns_manager.trade
+    ahora = datetime.now(timezone.utc)
+
+    # Historial sintético: 20 días de valores RSI cada 30 minutos, con una señal y una recomendación diarias
+    with manager.lote_escritura() as lote:
+        for i in range(20 * 48):
+            ts = ahora - timedelta(minutes=30 * i)
+            valor_uri = trade[f"ValorPrueba_{i}"]
+            lote.agregar_entidad(valor_uri, trade.ValorIndicador, {
+                trade.esValorDe: trade.ConfigRSI14, trade.seAplicaA: trade.WLD_USDT,
+                trade.valorNumerico: Literal(40 + i % 20, datatype=XSD.decimal),
+                trade.timestampValor: Literal(ts.isoformat(), datatype=XSD.dateTime),
+            })
+            if i % 48 == 0:
+                señal_uri, recom_uri = trade[f"SeñalPrueba_{i}"], trade[f"RecomPrueba_{i}"]
+                lote.agregar_entidad(señal_uri, trade.señalTecnica, {
+                    trade.generadaPorIndicador: valor_uri, trade.fechaseñal: Literal(ts.isoformat(), datatype=XSD.dateTime)})
+                if i % 96 == 0:
+                    lote.agregar_entidad(recom_uri, trade.RecomendacionTrading, {
+                        trade.paraActivo: trade.WLD_USDT, trade.basadaEnseñal: señal_uri,
+                        trade.timestampRecomendacion: Literal(ts.isoformat(), datatype=XSD.dateTime)})
+
+    print(f"Tripletas antes de la retención: {len(manager.graph)}")
+    retencion = RetencionTrading(manager, dias_valores_crudos=2, dias_valores_horarios=10, dias_recomendaciones=5,
+                                 tamaño_bloque=200, pausa_entre_bloques=0)
+    informe = retencion.ejecutar(ahora)
+    print(f"Tripletas después de la retención: {len(manager.graph)}")
+    print(f"Segunda ejecución (idempotente): {retencion.ejecutar(ahora)}")
+
+    for ruta in (persist_f, persist_f + ".cache.npz"):
+        if os.path.exists(ruta):
+            os.remove(ruta)
+    print("\nPrueba de RetencionTrading completada.")
@@ -0,0 +1,189 @@
+# rdf_utils/vista_ultimo_estado.py
+import os
+import sys
+import json
+import hashlib
+import threading
+from datetime import datetime, timezone
+
+# --- Modificación para permitir la ejecución directa del script ---
+current_script_dir = os.path.dirname(os.path.abspath(__file__))
+project_root_dir = os.path.abspath(os.path.join(current_script_dir, '..'))
+if project_root_dir not in sys.path:
+    sys.path.insert(0, project_root_dir)
+# --- Fin de la modificación ---
+
+from rdflib import URIRef
+
+# Vista precalculada del último estado de cada par: precio, último valor de cada
+# configuración de indicador y última recomendación. La mantiene el ciclo de análisis al
+# confirmar sus escrituras, así que el dashboard la lee en O(1) sin consultar el grafo y
+# su coste no crece con el historial. Cada actualización sustituye el estado del par por
+# un diccionario nuevo (los lectores nunca ven un estado a medias) con su ETag y fecha de
+# modificación para las peticiones condicionales. Si se le da un CanalEventos, publica en el
+# tema del par un evento 'delta' con solo lo que cambió (ver a_json y delta_estado).
+
+# Variable de la consulta valores_indicadores_par -> componente del motor de indicadores
+COMPONENTES_CONSULTA = {
+    "valorNum": "valor", "valorMACD": "macd", "valorseñalMACD": "señal", "valorHistMACD": "histograma",
+    "valorBandaMedia": "media", "valorBandaSuperior": "superior", "valorBandaInferior": "inferior",
+}
+
+def _estado_vacio(par_local: str) -> dict:
+    return {
+        "par": par_local,
+        "precio_actual": None,
+        "volumen24h": None,
+        "timestamp_precio": None,
+        "valores_indicadores": {}, # {config_local: {"nombre", "valores": {componente: valor}, "ts"}}
+        "ultima_recomendacion": None, # {"accion", "justificacion", "confianza", "timestamp", "señales": [...]}
+        "version": 0,
+        "modificado": None,
+        "etag": None,
+    }
+
+CAMPOS_DELTA = ("precio_actual", "volumen24h", "timestamp_precio", "ultima_recomendacion")
+
+def a_json(estado: dict) -> dict:
+    """Estado completo en forma serializable a JSON (la fecha de modificación en ISO 8601)."""
+    return {**estado, "modificado": estado["modificado"].isoformat() if estado["modificado"] else None}
+
+def delta_estado(anterior: dict, nuevo: dict) -> dict:
+    """Evento compacto con los campos que cambiaron entre dos estados publicados de un par."""
+    cambios = {campo: nuevo[campo] for campo in CAMPOS_DELTA if nuevo[campo] != anterior[campo]}
+    indicadores = {config: valor for config, valor in nuevo["valores_indicadores"].items()
+                   if anterior["valores_indicadores"].get(config) != valor}
+    if indicadores:
+        cambios["valores_indicadores"] = indicadores
+    return {"par": nuevo["par"], "version": nuevo["version"], "etag": nuevo["etag"],
+            "modificado": nuevo["modificado"].isoformat() if nuevo["modificado"] else None, "cambios": cambios}
+
+def _calcular_etag(estado: dict) -> str:
+    contenido = {k: v for k, v in estado.items() if k not in ("version", "modificado", "etag")}
+    return hashlib.sha1(json.dumps(contenido, sort_keys=True, default=str).encode("utf-8")).hexdigest()[:20]
+
+class VistaUltimoEstado:
+    def __init__(self, canal=None):
+        self._lock = threading.Lock()
+        self._estados = {} # par_local -> estado (no se modifica después de publicarlo)
+        self._versiones = {} # par_local -> última versión publicada; sobrevive a invalidar()
+        self.canal = canal # CanalEventos opcional (rdf_utils/canal_eventos.py); tema = ID local del par
+
+    def obtener(self, par_local: str) -> dict | None:
+        """Último estado publicado del par, o None si aún no hay (ver reconstruir_par)."""
+        return self._estados.get(par_local)
+
+    def pares(self) -> list[str]:
+        return sorted(self._estados)
+
+    def actualizar_par(self, par_local: str, precio: float | None = None, timestamp: datetime | None = None,
+                       valores_indicadores: dict | None = None, recomendacion: dict | None = None,
+                       volumen: float | None = None) -> dict:
+        """
+        Publica un estado nuevo del par combinando el anterior con lo indicado. Los valores de
+        indicadores se fusionan por configuración; el resto de campos solo cambian si se pasan.
+        """
+        with self._lock:
+            anterior = self._estados.get(par_local) or _estado_vacio(par_local)
+            nuevo = dict(anterior)
+            if precio is not None:
+                nuevo["precio_actual"] = float(precio)
+                nuevo["timestamp_precio"] = timestamp.isoformat() if timestamp else None
+            if volumen is not None:
+                nuevo["volumen24h"] = float(volumen)
+            if valores_indicadores:
+                nuevo["valores_indicadores"] = {**anterior["valores_indicadores"], **valores_indicadores}
+            if recomendacion is not None:
+                nuevo["ultima_recomendacion"] = recomendacion
+            nuevo["etag"] = _calcular_etag(nuevo)
+            if nuevo["etag"] == anterior["etag"]:
+                return anterior
+            # La versión sirve de ID de evento a los clientes conectados, así que nunca retrocede
+            nuevo["version"] = max(anterior["version"], self._versiones.get(par_local, 0)) + 1
+            self._versiones[par_local] = nuevo["version"]
+            # Last-Modified tiene resolución de segundos
+            nuevo["modificado"] = datetime.now(timezone.utc).replace(microsecond=0)
+            self._estados[par_local] = nuevo
+            if self.canal is not None:
+                # Dentro del lock para que los deltas de un par salgan en orden de versión (publicar no bloquea)
+                self.canal.publicar(par_local, "delta", nuevo["version"], delta_estado(anterior, nuevo))
+            return nuevo
+
+    def invalidar(self, par_local: str | None = None):
+        """Descarta el estado de un par (o de todos); la siguiente lectura lo reconstruye desde el grafo."""
+        with self._lock:
+            if par_local is None:
+                self._estados.clear()
+            else:
+                self._estados.pop(par_local, None)
+
+    def reconstruir_par(self, rdf_manager, par_mercado_uri: URIRef) -> dict:
+        """
+        Arranque en frío: lee el último estado del par del grafo con las consultas preparadas
+        (la de valores recorre el historial del par, por eso solo se usa aquí) y lo publica.
+        """
+        par_local = str(par_mercado_uri).split('#')[-1]
+        precio, volumen = None, None
+        for fila in (rdf_manager.ejecutar_consulta("info_par", par=par_mercado_uri) or []):
+            precio = float(fila["precio"]) if fila["precio"] is not None else None
+            volumen = float(fila["volumen"]) if fila["volumen"] is not None else None
+
+        valores_indicadores = {}
+        for fila in (rdf_manager.ejecutar_consulta("valores_indicadores_par", par=par_mercado_uri) or []):
+            config_local = str(fila["configIndURI"]).split('#')[-1]
+            if config_local in valores_indicadores:
+                continue # Filas ordenadas por timestamp descendente: la primera es la última
+            valores = {componente: float(fila[variable]) for variable, componente in COMPONENTES_CONSULTA.items()
+                       if fila[variable] is not None}
+            if valores:
+                valores_indicadores[config_local] = {"nombre": str(fila["configNombre"]), "valores": valores, "ts": str(fila["ts"])}
+
+        recomendacion = None
+        for fila in (rdf_manager.ejecutar_consulta("ultima_recomendacion_par", par=par_mercado_uri) or []):
+            detalle = str(fila["señalesDetalle"]) if fila["señalesDetalle"] is not None else "N/A"
+            recomendacion = {
+                "accion": str(fila["accion"]),
+                "justificacion": str(fila["justificacion"]),
+                "confianza": float(fila["confianza"]) if fila["confianza"] is not None else None,
+                "timestamp": str(fila["ts"]),
+                "señales": [] if detalle == "N/A" else detalle.split("; "),
+            }
+
+        with self._lock:
+            self._estados.pop(par_local, None)
+        # El grafo no guarda cuándo se fijó el precio, así que timestamp_precio queda vacío
+        return self.actualizar_par(par_local, precio=precio, valores_indicadores=valores_indicadores,
+                                   recomendacion=recomendacion, volumen=volumen)
+
+
+# Bloque de prueba
+if __name__ == '__main__':
+    import time
+    from rdf_utils.rdf_manager_trading import RDFManagerTrading
+    print("Probando VistaUltimoEstado...")
+    manager = RDFManagerTrading(
+        ontologia_path=os.path.join(project_root_dir, 'datos_trading', 'ontologia_trading.ttl'),
+        datos_muestra_path=os.path.join(project_root_dir, 'datos_trading', 'datos_trading_muestra.ttl'),
+        persist_path=None
+    )
+    from rdf_utils.canal_eventos import CanalEventos
+    canal = CanalEventos()
+    suscripcion = canal.suscribir("WLD_USDT")
+    vista = VistaUltimoEstado(canal=canal)
+    par_uri = manager.ns_manager.trade.WLD_USDT
+    estado = vista.reconstruir_par(manager, par_uri)
+    print(f"Reconstruido desde el grafo: precio={estado['precio_actual']}, "
+          f"{len(estado['valores_indicadores'])} indicadores, etag={estado['etag']}")
+
+    estado = vista.actualizar_par("WLD_USDT", precio=2.75, valores_indicadores={
+        "ConfigRSI14": {"nombre": "RSI de 14 períodos", "valores": {"valor": 41.2}, "ts": datetime.now(timezone.utc).isoformat()}})
+    print(f"Tras un ciclo: versión {estado['version']}, etag={estado['etag']}")
+    misma = vista.actualizar_par("WLD_USDT", volumen=None)
+    print(f"Actualización sin cambios conserva el ETag: {misma['etag'] == estado['etag']}")
+    eventos = [suscripcion.recibir(timeout=0.1) for _ in range(2)]
+    print(f"Eventos publicados: {[e.id for e in eventos]}; delta del ciclo: {eventos[-1].datos}")
+
+    inicio = time.perf_counter()
+    for _ in range(10000):
+        vista.obtener("WLD_USDT")
+    print(f"Lectura de la vista: {(time.perf_counter() - inicio) / 10000 * 1e6:.2f} µs")
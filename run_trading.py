@@ -38,4 +38,5 @@ if __name__ == '__main__':
     # Pasar use_reloader=False si estás teniendo problemas con múltiples inicializaciones de agentes
     # o si el debugger de Flask causa problemas con hilos/procesos de los agentes (si los tuvieras).
     # Para este proyecto simple, el reloader debería estar bien.
-    app.run(host=host, port=port, debug=debug_mode)
+    # Cada petición en su hilo: el RDFManagerTrading compartido serializa las escrituras con su cerrojo
+    app.run(host=host, port=port, debug=debug_mode, threaded=True)
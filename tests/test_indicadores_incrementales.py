@@ -0,0 +1,62 @@
+# tests/test_indicadores_incrementales.py
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+# --- Modificación para permitir la ejecución directa del script ---
+current_script_dir = os.path.dirname(os.path.abspath(__file__))
+project_root_dir = os.path.abspath(os.path.join(current_script_dir, '..'))
+if project_root_dir not in sys.path:
+    sys.path.insert(0, project_root_dir)
+# --- Fin de la modificación ---
+
+from utils import indicadores_tecnicos as it
+from utils.indicadores_incrementales import SeguimientoIndicadores
+
+LIMITE = 100
+CONFIGS_A = [{"id": "ConfigSMA20", "tipo": "SMA", "periodo": 20}]
+CONFIGS_B = [{"id": "ConfigRSI14", "tipo": "RSI", "periodo": 14}]
+
+@pytest.fixture(scope="module")
+def datos():
+    rng = np.random.default_rng(3)
+    indice = pd.date_range("2024-01-01", periods=300, freq="D", tz="UTC")
+    return pd.DataFrame({'close': 100 + np.cumsum(rng.normal(0, 1, 300))}, index=indice)
+
+def datos_ciclo(seguimiento: SeguimientoIndicadores, datos: pd.DataFrame, fin: int, configs: list[dict]) -> pd.DataFrame:
+    """Lo que pide AgenteseñalesTrading.obtener_datos_ciclo cuando la última barra cerrada es la fin-1."""
+    disponibles = datos.iloc[:fin]
+    desde = seguimiento.desde_necesario(("WLD/USDT", "1d"), configs)
+    if desde is None:
+        return disponibles.iloc[-LIMITE:]
+    return disponibles[disponibles.index >= desde].iloc[:LIMITE]
+
+def esperado(config: dict, cierres: pd.Series) -> float:
+    if config["tipo"] == "SMA":
+        return it.calcular_sma(cierres, config["periodo"])
+    return it.calcular_rsi(cierres, config["periodo"])
+
+def test_estrategias_alternas_en_un_par_ven_todas_las_barras(datos):
+    # Dos estrategias con configuraciones distintas sobre el mismo par y periodo, cada una en su
+    # propio ciclo (como /ejecutar_ciclo con una sola estrategia): ninguna debe perder las barras
+    # que avanzó el ciclo de la otra
+    seguimiento = SeguimientoIndicadores()
+    for ciclo, fin in enumerate(range(150, 170)):
+        for configs in ((CONFIGS_A, CONFIGS_B) if ciclo % 3 else (CONFIGS_B,)):
+            ultimos, _, precio, _ = seguimiento.avanzar(("WLD/USDT", "1d"),
+                                                         datos_ciclo(seguimiento, datos, fin, configs), configs)
+            cierres = datos['close'].iloc[:fin]
+            assert precio == pytest.approx(cierres.iloc[-1])
+            for config in configs:
+                assert ultimos[config["id"]]["valor"] == pytest.approx(esperado(config, cierres), rel=1e-9)
+
+def test_hueco_vuelve_a_sembrar(datos):
+    seguimiento = SeguimientoIndicadores()
+    seguimiento.avanzar(("WLD/USDT", "1d"), datos.iloc[:150].iloc[-LIMITE:], CONFIGS_A + CONFIGS_B)
+    # Los datos siguientes ya no incluyen la última barra vista
+    ultimos, _, _, _ = seguimiento.avanzar(("WLD/USDT", "1d"), datos.iloc[200:260], CONFIGS_B)
+    assert ultimos["ConfigRSI14"]["valor"] == pytest.approx(esperado(CONFIGS_B[0], datos['close'].iloc[:260]), rel=1e-9)
+    assert seguimiento.desde_necesario(("WLD/USDT", "1d"), CONFIGS_A) is None
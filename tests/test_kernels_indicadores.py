@@ -0,0 +1,119 @@
+# tests/test_kernels_indicadores.py
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+# --- Modificación para permitir la ejecución directa del script ---
+current_script_dir = os.path.dirname(os.path.abspath(__file__))
+project_root_dir = os.path.abspath(os.path.join(current_script_dir, '..'))
+if project_root_dir not in sys.path:
+    sys.path.insert(0, project_root_dir)
+# --- Fin de la modificación ---
+
+from utils import kernels_indicadores as kernels
+from utils import indicadores_tecnicos as it
+from utils.indicadores_incrementales import RSIIncremental
+
+TOLERANCIA = 1e-9
+
+@pytest.fixture(params=kernels.BACKENDS_KERNELS)
+def backend(request):
+    # Sin numba, ema/rsi_wilder caerían en NumPy sin avisar: el backend compilado se salta
+    if request.param == "numba":
+        pytest.importorskip("numba")
+    return request.param
+
+@pytest.fixture(scope="module")
+def serie():
+    rng = np.random.default_rng(11)
+    valores = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, 3000)))
+    valores[500:503] = valores[499] # Tramo constante: pérdidas nulas
+    return valores
+
+@pytest.fixture(scope="module")
+def matriz():
+    rng = np.random.default_rng(12)
+    valores = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, (2000, 50)), axis=0))
+    valores[:1200, 7] = np.nan # Histórico más corto
+    valores[300:310, 3] = np.nan # Hueco interior
+    valores[:, 9] = np.nan # Par sin datos
+    return valores
+
+def comprobar(obtenido, esperado):
+    np.testing.assert_allclose(obtenido, esperado, rtol=TOLERANCIA, atol=TOLERANCIA, equal_nan=True)
+
+def rsi_wilder_pandas(cierres: np.ndarray, periodo: int) -> np.ndarray:
+    """
+    Referencia independiente del kernel: medias de ganancias y pérdidas sembradas con la media
+    simple de los primeros 'periodo' cambios y suavizadas con ewm(alpha=1/periodo, adjust=False).
+    """
+    delta = pd.Series(cierres).diff()
+    medias = []
+    for valores in (delta.clip(lower=0), (-delta).clip(lower=0)):
+        sembrada = valores.iloc[periodo:].copy()
+        sembrada.iloc[0] = valores.iloc[1:periodo + 1].mean()
+        medias.append(sembrada.ewm(alpha=1 / periodo, adjust=False).mean().reindex(valores.index))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return (100 - 100 / (1 + medias[0] / medias[1])).to_numpy()
+
+def rsi_por_par(matriz: np.ndarray, periodo: int, backend: str) -> np.ndarray:
+    """RSI de cada columna calculado por separado solo con sus precios válidos."""
+    resultado = np.full(matriz.shape, np.nan)
+    for j in range(matriz.shape[1]):
+        validos = ~np.isnan(matriz[:, j])
+        resultado[validos, j] = kernels.rsi_wilder(matriz[validos, j], periodo, backend)
+    return resultado
+
+@pytest.mark.parametrize("span", [9, 12, 26])
+def test_ema_serie_igual_a_pandas(backend, serie, span):
+    comprobar(kernels.ema(serie, span, backend), pd.Series(serie).ewm(span=span, adjust=False).mean().to_numpy())
+
+@pytest.mark.parametrize("span", [9, 12, 26])
+def test_ema_matriz_con_huecos_igual_a_pandas(backend, matriz, span):
+    comprobar(kernels.ema(matriz, span, backend), pd.DataFrame(matriz).ewm(span=span, adjust=False).mean().to_numpy())
+
+def test_rsi_wilder_igual_a_rsi_incremental(backend, serie):
+    rsi_incremental = RSIIncremental(14, suavizado="wilder")
+    esperado = [rsi_incremental.update({'close': p})["valor"] for p in serie]
+    comprobar(kernels.rsi_wilder(serie, 14, backend), np.array([np.nan if v is None else v for v in esperado]))
+
+@pytest.mark.parametrize("periodo", [5, 14, 30])
+def test_rsi_wilder_igual_a_pandas(backend, serie, periodo):
+    comprobar(kernels.rsi_wilder(serie, periodo, backend), rsi_wilder_pandas(serie, periodo))
+
+def test_rsi_wilder_matriz_igual_a_pandas(backend, matriz):
+    esperado = np.full(matriz.shape, np.nan)
+    for j in range(matriz.shape[1]):
+        validos = ~np.isnan(matriz[:, j])
+        if validos.sum() > 14:
+            esperado[validos, j] = rsi_wilder_pandas(matriz[validos, j], 14)
+    comprobar(kernels.rsi_wilder(matriz, 14, backend), esperado)
+
+def test_rsi_wilder_matriz_igual_a_cada_par(backend, matriz):
+    comprobar(kernels.rsi_wilder(matriz, 14, backend), rsi_por_par(matriz, 14, backend))
+
+def test_rsi_wilder_salta_los_huecos(backend, serie):
+    con_huecos = serie.copy()
+    con_huecos[[40, 41, 700, 1500]] = np.nan
+    validos = ~np.isnan(con_huecos)
+    esperado = np.full(serie.shape, np.nan)
+    esperado[validos] = kernels.rsi_wilder(serie[validos], 14, backend)
+    comprobar(kernels.rsi_wilder(con_huecos, 14, backend), esperado)
+
+def test_backends_coinciden(matriz):
+    pytest.importorskip("numba")
+    comprobar(kernels.ema(matriz, 26, "numba"), kernels.ema(matriz, 26, "numpy"))
+    comprobar(kernels.rsi_wilder(matriz, 14, "numba"), kernels.rsi_wilder(matriz, 14, "numpy"))
+
+def test_entradas_vacias_o_cortas(backend):
+    assert kernels.rsi_wilder(np.array([]), 14, backend).shape == (0,)
+    assert np.isnan(kernels.rsi_wilder(np.arange(10.0), 14, backend)).all()
+    comprobar(kernels.ema(np.array([5.0]), 12, backend), [5.0])
+
+def test_macd_del_motor_igual_a_calcular_macd(serie):
+    ultimos = it.calcular_macd(pd.Series(serie))
+    macd = it.MotorIndicadores(serie).macd(12, 26, 9)
+    comprobar([macd[c][-1] for c in ("macd", "señal", "histograma")], [ultimos[c] for c in ("macd", "señal", "histograma")])
@@ -0,0 +1,291 @@
+# utils/backtesting.py
+import os
+import sys
+from dataclasses import dataclass, field, replace
+
+import numpy as np
+import pandas as pd
+
+# --- Modificación para permitir la ejecución directa del script ---
+current_script_dir = os.path.dirname(os.path.abspath(__file__))
+project_root_dir = os.path.abspath(os.path.join(current_script_dir, '..'))
+if project_root_dir not in sys.path:
+    sys.path.insert(0, project_root_dir)
+# --- Fin de la modificación ---
+
+from utils import indicadores_tecnicos as it
+from utils import reglas_señales as rs
+
+# Backtesting vectorizado de las reglas de señales y de decisión del AgenteseñalesTrading.
+# Las mismas reglas que el agente aplica a la última barra (trade:ReglaSeñal compiladas con
+# utils/reglas_señales.py, y COMPRAR/VENDER/MANTENER) se evalúan aquí sobre las columnas
+# completas que devuelve el motor por lotes, sin crear nodos RDF por barra. La decisión
+# tomada al cierre de la barra i se ejecuta a ese mismo cierre y rinde desde la barra i+1.
+
+# Configuraciones y umbrales de las reglas RSI/SMA predeterminadas (ver rs.REGLAS_PREDETERMINADAS)
+CONFIG_RSI_SEÑALES = "ConfigRSI14"
+CONFIG_SMA_SEÑALES = "ConfigSMA20"
+RSI_SOBREVENTA = 30
+RSI_SOBRECOMPRA = 70
+
+# Códigos de acción por barra
+ACCION_COMPRAR = 1
+ACCION_VENDER = -1
+ACCION_MANTENER = 0
+NOMBRES_ACCION = {ACCION_COMPRAR: "COMPRAR", ACCION_VENDER: "VENDER", ACCION_MANTENER: "MANTENER"}
+CONFIANZA_ACCION = 0.7
+CONFIANZA_MANTENER = 0.5
+
+@dataclass(frozen=True)
+class ParametrosReglas:
+    """Qué configuraciones (por ID) y qué umbrales usan las reglas RSI/SMA, p. ej. en un barrido de parámetros."""
+    config_rsi: str = CONFIG_RSI_SEÑALES
+    config_sma: str = CONFIG_SMA_SEÑALES
+    rsi_sobreventa: float = RSI_SOBREVENTA
+    rsi_sobrecompra: float = RSI_SOBRECOMPRA
+
+PARAMETROS_PREDETERMINADOS = ParametrosReglas()
+
+def reglas_para_configs(configs_motor: list[dict], base: ParametrosReglas = PARAMETROS_PREDETERMINADOS) -> ParametrosReglas:
+    """
+    Ajusta los parámetros a las configuraciones de una estrategia: si no incluye la
+    configuración RSI o SMA predeterminada (ConfigRSI14, ConfigSMA20) se usa la primera de ese tipo.
+    """
+    ids = {c["id"] for c in configs_motor if c.get("tipo")}
+    primera = lambda tipo: next((c["id"] for c in configs_motor if c.get("tipo") == tipo), None)
+    return replace(base,
+                   config_rsi=base.config_rsi if base.config_rsi in ids else (primera("RSI") or base.config_rsi),
+                   config_sma=base.config_sma if base.config_sma in ids else (primera("SMA") or base.config_sma))
+
+def reglas_desde_parametros(parametros: ParametrosReglas, estrategia: str | None = None) -> list[rs.ReglaSeñal]:
+    """Reglas RSI/SMA predeterminadas con las configuraciones y umbrales de 'parametros'."""
+    sustituciones = {
+        "SOBREVENTA_RSI": {"config": parametros.config_rsi, "umbral": parametros.rsi_sobreventa},
+        "SOBRECOMPRA_RSI": {"config": parametros.config_rsi, "umbral": parametros.rsi_sobrecompra},
+        "PRECIO_SOBRE_SMA20": {"config": parametros.config_sma},
+        "PRECIO_BAJO_SMA20": {"config": parametros.config_sma},
+    }
+    # Las descripciones nombran la media que realmente se usa (p. ej. SMA50 para ConfigSMA50)
+    etiqueta_sma = parametros.config_sma.removeprefix("Config")
+    return [replace(regla, estrategia=estrategia, plantilla=regla.plantilla.replace("SMA20", etiqueta_sma),
+                    **sustituciones[regla.tipo_señal])
+            for regla in rs.REGLAS_PREDETERMINADAS if regla.tipo_señal in sustituciones]
+
+def evaluar_señales(columnas_indicadores: dict, cierres: np.ndarray, reglas) -> dict:
+    """
+    Señales técnicas por barra como {tipo_señal: np.ndarray[bool]} para una lista de
+    ReglaSeñal (o unas ReglasCompiladas). Las reglas cuyas configuraciones no están en
+    columnas_indicadores no se evalúan, y las barras en las que el indicador aún no tiene
+    valor (NaN) no generan señal, igual que en el agente.
+    """
+    reglas = reglas.reglas if isinstance(reglas, rs.ReglasCompiladas) else reglas
+    disponibles = set(columnas_indicadores) | {rs.PRECIO}
+    evaluables = [r for r in reglas if r.config in disponibles and (r.operando_derecho() or (rs.PRECIO,))[0] in disponibles]
+    compiladas = rs.ReglasCompiladas(evaluables)
+    cierres = np.asarray(cierres, dtype=np.float64)
+    return compiladas.señales_por_tipo(compiladas.evaluar_serie(compiladas.matriz_series(columnas_indicadores, cierres)))
+
+def decidir_acciones(señales: dict, num_barras: int) -> tuple[np.ndarray, np.ndarray]:
+    """Acción (ACCION_*) y confianza de cada barra a partir de sus señales activas."""
+    ninguna = np.zeros(num_barras, dtype=bool)
+    comprar = señales.get("SOBREVENTA_RSI", ninguna) & señales.get("PRECIO_SOBRE_SMA20", ninguna)
+    vender = señales.get("SOBRECOMPRA_RSI", ninguna) & señales.get("PRECIO_BAJO_SMA20", ninguna)
+    acciones = np.full(num_barras, ACCION_MANTENER, dtype=np.int8)
+    acciones[comprar] = ACCION_COMPRAR
+    acciones[vender & ~comprar] = ACCION_VENDER
+    confianza = np.where(acciones != ACCION_MANTENER, CONFIANZA_ACCION, CONFIANZA_MANTENER)
+    return acciones, confianza
+
+def posiciones_desde_acciones(acciones: np.ndarray, permitir_cortos: bool = False) -> np.ndarray:
+    """
+    Posición al cierre de cada barra (1 comprado, 0 fuera, -1 corto). COMPRAR abre largo,
+    VENDER cierra el largo (o abre corto si permitir_cortos) y MANTENER conserva la anterior.
+    """
+    objetivo = np.where(acciones == ACCION_COMPRAR, 1, np.where(acciones == ACCION_VENDER, -1 if permitir_cortos else 0, 0))
+    # Propagar hacia delante la última acción distinta de MANTENER
+    indices = np.where(acciones != ACCION_MANTENER, np.arange(len(acciones)), -1)
+    np.maximum.accumulate(indices, out=indices)
+    return np.where(indices >= 0, objetivo[np.maximum(indices, 0)], 0).astype(np.int8)
+
+def periodos_por_año(indice) -> float | None:
+    """Barras por año según el paso mediano de un DatetimeIndex (None si no se puede inferir)."""
+    if not isinstance(indice, pd.DatetimeIndex) or len(indice) < 2:
+        return None
+    paso = np.median(np.diff(indice.asi8[:10_000]))
+    return float(365.25 * 24 * 3600 * 1e9 / paso) if paso > 0 else None
+
+def _tramos_operaciones(posicion: np.ndarray, cierres: np.ndarray, comision: float) -> dict:
+    """Barras de entrada/salida, lado y rendimiento neto de cada operación (tramo con posición distinta de 0)."""
+    anterior = np.concatenate([[0], posicion[:-1]])
+    cambios = np.flatnonzero(posicion != anterior)
+    # Cada cambio cierra el tramo anterior y abre otro; los tramos con posición 0 no son operaciones
+    fines = np.concatenate([cambios[1:], [len(posicion)]])
+    abiertos = posicion[cambios] != 0
+    entradas, salidas = cambios[abiertos], fines[abiertos]
+    abierta = salidas == len(posicion)
+    salidas = np.minimum(salidas, len(posicion) - 1)
+    lado = posicion[entradas].astype(np.int8)
+    rendimiento = lado * (cierres[salidas] / cierres[entradas] - 1) - 2 * comision
+    return {"entradas": entradas, "salidas": salidas, "lado": lado, "rendimiento": rendimiento, "abierta": abierta}
+
+def extraer_operaciones(posicion: np.ndarray, cierres: np.ndarray, indice, comision: float) -> pd.DataFrame:
+    """Una fila por operación: barras y precios de entrada/salida, lado y rendimiento neto de comisiones."""
+    tramos = _tramos_operaciones(posicion, cierres, comision)
+    entradas, salidas = tramos["entradas"], tramos["salidas"]
+    etiquetas = indice if indice is not None else np.arange(len(posicion))
+    return pd.DataFrame({
+        "entrada": etiquetas[entradas],
+        "salida": etiquetas[salidas],
+        "barras": salidas - entradas,
+        "lado": tramos["lado"],
+        "precio_entrada": cierres[entradas],
+        "precio_salida": cierres[salidas],
+        "rendimiento": tramos["rendimiento"],
+        "abierta": tramos["abierta"],
+    })
+
+def simular(cierres: np.ndarray, acciones: np.ndarray, capital_inicial: float = 10_000.0, comision: float = 0.001,
+            permitir_cortos: bool = False, periodos_anuales: float | None = None) -> tuple[dict, dict]:
+    """
+    Simula las acciones sobre los cierres. Devuelve (columnas, estadisticas): las columnas
+    'posicion', 'capital' y 'drawdown' por barra y las estadísticas del resultado.
+    """
+    posicion = posiciones_desde_acciones(acciones, permitir_cortos)
+    # La posición tomada al cierre de i-1 recibe el rendimiento de la barra i; cada cambio paga comisión
+    rendimientos = np.zeros_like(cierres)
+    rendimientos[1:] = cierres[1:] / cierres[:-1] - 1
+    posicion_previa = np.concatenate([[0], posicion[:-1]]).astype(np.float64)
+    rotacion = np.abs(np.diff(posicion.astype(np.float64), prepend=0.0))
+    rendimientos_estrategia = posicion_previa * rendimientos - rotacion * comision
+    capital = capital_inicial * np.cumprod(1 + rendimientos_estrategia)
+    drawdown = capital / np.maximum.accumulate(capital) - 1
+
+    tramos = _tramos_operaciones(posicion, cierres, comision)
+    cerradas = tramos["rendimiento"][~tramos["abierta"]]
+    desviacion = rendimientos_estrategia.std()
+    estadisticas = {
+        "barras": len(cierres),
+        "capital_final": float(capital[-1]),
+        "rendimiento_total": float(capital[-1] / capital_inicial - 1),
+        "max_drawdown": float(drawdown.min()),
+        "operaciones": int(len(tramos["entradas"])),
+        "operaciones_cerradas": int(len(cerradas)),
+        "tasa_acierto": float((cerradas > 0).mean()) if len(cerradas) else None,
+        "rendimiento_medio_operacion": float(cerradas.mean()) if len(cerradas) else None,
+        "exposicion": float(np.mean(posicion != 0)),
+        "sharpe": float(rendimientos_estrategia.mean() / desviacion * np.sqrt(periodos_anuales))
+                  if periodos_anuales and desviacion > 0 else None,
+        "acciones": {nombre: int(np.count_nonzero(acciones == codigo)) for codigo, nombre in NOMBRES_ACCION.items()},
+    }
+    return {"posicion": posicion, "capital": capital, "drawdown": drawdown}, estadisticas
+
+@dataclass
+class ResultadoBacktest:
+    indice: pd.Index
+    señales: dict # {tipo_señal: np.ndarray[bool]}
+    acciones: np.ndarray # ACCION_* por barra
+    confianza: np.ndarray
+    posicion: np.ndarray # Posición al cierre de cada barra
+    capital: np.ndarray # Curva de capital
+    drawdown: np.ndarray # Caída respecto al máximo previo (<= 0)
+    operaciones: pd.DataFrame
+    estadisticas: dict = field(default_factory=dict)
+
+    def por_barra(self) -> pd.DataFrame:
+        """Señales, acción, posición, capital y drawdown de cada barra en un DataFrame."""
+        datos = {tipo: columna for tipo, columna in self.señales.items()}
+        datos.update({"accion": self.acciones, "confianza": self.confianza, "posicion": self.posicion,
+                      "capital": self.capital, "drawdown": self.drawdown})
+        return pd.DataFrame(datos, index=self.indice)
+
+def ejecutar_backtest(datos_ohlcv: pd.DataFrame, configs_motor: list[dict], capital_inicial: float = 10_000.0,
+                      comision: float = 0.001, permitir_cortos: bool = False, columna: str = 'close',
+                      periodos_anuales: float | None = None, reglas: list | None = None) -> ResultadoBacktest | None:
+    """
+    Aplica las reglas de señales y decisión a todo el histórico y simula las operaciones.
+
+    Args:
+        datos_ohlcv (pd.DataFrame): Histórico OHLCV (índice temporal) con la columna indicada.
+        configs_motor (list[dict]): Configuraciones de la estrategia (AgenteseñalesTrading.resolver_configs_motor).
+                                    Solo se calculan las que usan las reglas.
+        capital_inicial (float): Capital al inicio de la simulación.
+        comision (float): Comisión por lado como fracción del nominal (0.001 = 0.1%).
+        permitir_cortos (bool): Si es True, VENDER abre una posición corta en lugar de solo cerrar el largo.
+        columna (str): Columna de precios.
+        periodos_anuales (float | None): Barras por año para anualizar el Sharpe; se infiere del índice si es None.
+        reglas (list[rs.ReglaSeñal] | None): Reglas de señales (p. ej. las del RegistroReglasSeñal para
+                                             la estrategia); por defecto las predeterminadas, con las
+                                             RSI/SMA ajustadas con reglas_para_configs(configs_motor).
+
+    Returns:
+        ResultadoBacktest | None: None si no hay datos.
+    """
+    if datos_ohlcv is None or columna not in datos_ohlcv or datos_ohlcv.empty:
+        print(f"Error en ejecutar_backtest: no hay datos en la columna '{columna}'.")
+        return None
+    if reglas is None:
+        ajustadas = reglas_desde_parametros(reglas_para_configs(configs_motor))
+        tipos_ajustados = {r.tipo_señal for r in ajustadas}
+        ids = {c["id"] for c in configs_motor if c.get("tipo")}
+        reglas = ajustadas + [r for r in rs.REGLAS_PREDETERMINADAS if r.tipo_señal not in tipos_ajustados and r.config in ids]
+    necesarias = ({r.config for r in reglas} | {r.operando_derecho()[0] for r in reglas if r.operando_derecho()}) - {rs.PRECIO}
+    usadas = [c for c in configs_motor if c.get("tipo") and c["id"] in necesarias]
+    faltan = necesarias - {c["id"] for c in usadas}
+    if faltan:
+        print(f"Advertencia en ejecutar_backtest: la estrategia no tiene {sorted(faltan)}; las reglas que las usan no se evalúan.")
+
+    cierres = datos_ohlcv[columna].to_numpy(dtype=np.float64)
+    columnas_indicadores = it.calcular_indicadores_lote(datos_ohlcv, usadas, columna=columna) if usadas else {}
+    señales = evaluar_señales(columnas_indicadores, cierres, reglas)
+    acciones, confianza = decidir_acciones(señales, len(cierres))
+    columnas, estadisticas = simular(cierres, acciones, capital_inicial, comision, permitir_cortos,
+                                     periodos_anuales or periodos_por_año(datos_ohlcv.index))
+    operaciones = extraer_operaciones(columnas["posicion"], cierres, datos_ohlcv.index, comision)
+    return ResultadoBacktest(datos_ohlcv.index, señales, acciones, confianza, columnas["posicion"], columnas["capital"],
+                             columnas["drawdown"], operaciones, estadisticas)
+
+
+# Bloque de prueba
+if __name__ == '__main__':
+    import time
+    print("Probando backtesting vectorizado...")
+    configs = [
+        {"id": "ConfigSMA20", "tipo": "SMA", "periodo": 20},
+        {"id": "ConfigRSI14", "tipo": "RSI", "periodo": 14},
+        {"id": "ConfigMACD12_26_9", "tipo": "MACD", "periodo_corto": 12, "periodo_largo": 26, "periodo_señal": 9},
+        {"id": "ConfigBB20_2", "tipo": "BB", "periodo": 20, "num_std_dev": 2.0},
+    ]
+
+    # Comprobación con el agente: la acción de la última barra coincide con la regla escalar
+    np.random.seed(7)
+    fechas = pd.date_range("2024-01-01", periods=300, freq="D", tz="UTC")
+    cierres_cortos = 100 * np.exp(np.cumsum(np.random.normal(0, 0.03, len(fechas))))
+    df_corto = pd.DataFrame({"close": cierres_cortos}, index=fechas)
+    resultado = ejecutar_backtest(df_corto, configs)
+    coincidencias = 0
+    for i in range(30, len(df_corto)):
+        rsi = it.calcular_rsi(df_corto["close"].iloc[:i + 1], 14)
+        sma = it.calcular_sma(df_corto["close"].iloc[:i + 1], 20)
+        precio = cierres_cortos[i]
+        if rsi < RSI_SOBREVENTA and precio > sma:
+            esperada = ACCION_COMPRAR
+        elif rsi > RSI_SOBRECOMPRA and precio < sma:
+            esperada = ACCION_VENDER
+        else:
+            esperada = ACCION_MANTENER
+        coincidencias += esperada == resultado.acciones[i]
+    print(f"  Acciones iguales a la regla barra a barra: {coincidencias}/{len(df_corto) - 30}")
+    print(f"  Acciones del histórico diario: {resultado.estadisticas['acciones']}")
+
+    # 10 años de barras de un minuto
+    num_barras = 10 * 365 * 24 * 60
+    fechas = pd.date_range("2015-01-01", periods=num_barras, freq="min", tz="UTC")
+    rendimientos_log = np.random.normal(0, 0.0008, num_barras)
+    df_largo = pd.DataFrame({"close": 3.5 * np.exp(np.cumsum(rendimientos_log))}, index=fechas)
+    inicio = time.perf_counter()
+    resultado = ejecutar_backtest(df_largo, configs, permitir_cortos=True)
+    print(f"  {num_barras:,} barras de 1 minuto en {time.perf_counter() - inicio:.2f}s")
+    for clave, valor in resultado.estadisticas.items():
+        print(f"    {clave}: {valor}")
+    print(f"  Barras con cada señal: { {tipo: int(columna.sum()) for tipo, columna in resultado.señales.items()} }")
+    print(f"  Primeras operaciones:\n{resultado.operaciones.head(3)}")
@@ -0,0 +1,52 @@
+# utils/benchmark_kernels_indicadores.py
+import os
+import sys
+import time
+
+import numpy as np
+
+# --- Modificación para permitir la ejecución directa del script ---
+current_script_dir = os.path.dirname(os.path.abspath(__file__))
+project_root_dir = os.path.abspath(os.path.join(current_script_dir, '..'))
+if project_root_dir not in sys.path:
+    sys.path.insert(0, project_root_dir)
+# --- Fin de la modificación ---
+
+from utils.kernels_indicadores import BACKEND, BACKENDS_KERNELS, ema, numba, rsi_wilder
+
+# Rendimiento de cada kernel de utils/kernels_indicadores.py con los backends disponibles
+# (la corrección se comprueba en tests/test_kernels_indicadores.py).
+# Uso: python utils/benchmark_kernels_indicadores.py
+REPETICIONES = 3
+
+def medir(funcion, backend: str, repeticiones: int = REPETICIONES) -> float:
+    """Mejor tiempo de 'repeticiones' llamadas; la primera llamada (compilación de numba) no cuenta."""
+    funcion(backend)
+    mejor = float("inf")
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion(backend)
+        mejor = min(mejor, time.perf_counter() - inicio)
+    return mejor
+
+
+if __name__ == '__main__':
+    print(f"Backend de kernels: {BACKEND} (numba {'disponible' if numba is not None else 'no instalado'})")
+    backends = [b for b in BACKENDS_KERNELS if b == "numpy" or numba is not None]
+
+    rng = np.random.default_rng(11)
+    largo = np.cumsum(rng.normal(0, 1, 2_000_000)) + 1e4
+    universo = np.cumsum(rng.normal(0, 1, (5000, 400)), axis=0) + 1e4
+    casos = [
+        ("EMA(26) serie 2M barras", lambda b: ema(largo, 26, b)),
+        ("EMA(26) matriz 5000×400", lambda b: ema(universo, 26, b)),
+        ("RSI(14) Wilder serie 2M barras", lambda b: rsi_wilder(largo, 14, b)),
+        ("RSI(14) Wilder matriz 5000×400", lambda b: rsi_wilder(universo, 14, b)),
+    ]
+    print(f"\nRendimiento (mejor de {REPETICIONES}):")
+    for nombre, funcion in casos:
+        tiempos = {backend: medir(funcion, backend) for backend in backends}
+        texto = ", ".join(f"{b}: {t * 1000:.1f} ms" for b, t in tiempos.items())
+        if "numba" in tiempos:
+            texto += f" (x{tiempos['numpy'] / tiempos['numba']:.1f})"
+        print(f"  {nombre}: {texto}")
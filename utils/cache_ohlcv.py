@@ -0,0 +1,261 @@
+# utils/cache_ohlcv.py
+import os
+import sys
+import copy
+import json
+import shutil
+import threading
+
+import numpy as np
+import pandas as pd
+
+# --- Modificación para permitir la ejecución directa del script ---
+current_script_dir = os.path.dirname(os.path.abspath(__file__))
+project_root_dir = os.path.abspath(os.path.join(current_script_dir, '..'))
+if project_root_dir not in sys.path:
+    sys.path.insert(0, project_root_dir)
+# --- Fin de la modificación ---
+
+from utils.proveedores_datos import (ProveedorDatos, COLUMNAS_OHLCV, COLUMNA_TIEMPO, duracion_periodo,
+                                     a_ns, nombre_seguro, rango_indices)
+
+# Caché local de barras OHLCV por (par, periodo) delante de otro proveedor. Cada serie es
+# un directorio con 'timestamp.i8' (int64, ns desde epoch UTC) y 'ohlcv.f8' (float64, una
+# fila de 5 valores por barra), que solo se anexan y se leen con np.memmap. Cada lectura
+# pide a la fuente solo lo que falta: las barras posteriores a la última guardada, las
+# anteriores a la primera si la ventana pedida empieza antes y los huecos (saltos mayores
+# que el periodo) dentro de la ventana. Los huecos que la fuente tampoco tiene se anotan en
+# 'meta.json' para no volver a pedirlos. Las ventanas se sirven como DataFrames sobre el
+# memmap: los precios no se copian (el índice de tiempos sí) y son de solo lectura.
+# Como en rdf_utils/almacen_series.py, 'timestamp' se escribe el último: una escritura
+# interrumpida nunca deja barras a medias visibles.
+ARCHIVO_TIEMPOS = "timestamp.i8"
+ARCHIVO_OHLCV = "ohlcv.f8"
+ARCHIVO_META = "meta.json"
+NUM_COLUMNAS = len(COLUMNAS_OHLCV)
+
+class CacheOHLCV(ProveedorDatos):
+    def __init__(self, fuente: ProveedorDatos, directorio: str):
+        self.fuente = fuente
+        self.directorio = directorio
+        self._lock = threading.Lock()
+        self._locks_series = {} # (par, periodo) -> Lock: pares distintos se sincronizan en paralelo
+        self.estadisticas = {"lecturas": 0, "barras_descargadas": 0, "peticiones_fuente": 0, "huecos_rellenados": 0}
+
+    def ruta_serie(self, simbolo_par: str, periodo_tiempo: str) -> str:
+        return os.path.join(self.directorio, f"{nombre_seguro(simbolo_par)}_{periodo_tiempo}")
+
+    def _lock_serie(self, simbolo_par: str, periodo_tiempo: str) -> threading.Lock:
+        with self._lock:
+            return self._locks_series.setdefault((simbolo_par, periodo_tiempo), threading.Lock())
+
+    def _contar(self, clave: str, cantidad: int = 1):
+        with self._lock:
+            self.estadisticas[clave] += cantidad
+
+    def _num_filas(self, ruta: str) -> int:
+        tamaño = lambda nombre: os.path.getsize(os.path.join(ruta, nombre)) if os.path.exists(os.path.join(ruta, nombre)) else 0
+        return min(tamaño(ARCHIVO_TIEMPOS) // 8, tamaño(ARCHIVO_OHLCV) // (8 * NUM_COLUMNAS))
+
+    def _abrir(self, ruta: str) -> tuple[np.ndarray, np.ndarray]:
+        filas = self._num_filas(ruta)
+        if filas == 0:
+            return np.empty(0, dtype=np.int64), np.empty((0, NUM_COLUMNAS))
+        tiempos = np.memmap(os.path.join(ruta, ARCHIVO_TIEMPOS), dtype=np.int64, mode="r", shape=(filas,))
+        matriz = np.memmap(os.path.join(ruta, ARCHIVO_OHLCV), dtype=np.float64, mode="r", shape=(filas, NUM_COLUMNAS))
+        return tiempos, matriz
+
+    def _leer_meta(self, ruta: str) -> dict:
+        ruta_meta = os.path.join(ruta, ARCHIVO_META)
+        if not os.path.exists(ruta_meta):
+            return {"inicio_fuente": None, "huecos_verificados": []}
+        with open(ruta_meta, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def _guardar_meta(self, ruta: str, meta: dict):
+        os.makedirs(ruta, exist_ok=True)
+        ruta_temporal = os.path.join(ruta, ARCHIVO_META + ".tmp")
+        with open(ruta_temporal, "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        os.replace(ruta_temporal, os.path.join(ruta, ARCHIVO_META))
+
+    def _anexar(self, ruta: str, tiempos: np.ndarray, matriz: np.ndarray):
+        os.makedirs(ruta, exist_ok=True)
+        filas = self._num_filas(ruta)
+        # Recortar lo que una escritura interrumpida dejó más largo que 'timestamp'
+        for nombre, ancho in ((ARCHIVO_TIEMPOS, 8), (ARCHIVO_OHLCV, 8 * NUM_COLUMNAS)):
+            archivo = os.path.join(ruta, nombre)
+            if os.path.exists(archivo) and os.path.getsize(archivo) != filas * ancho:
+                os.truncate(archivo, filas * ancho)
+        with open(os.path.join(ruta, ARCHIVO_OHLCV), "ab") as f:
+            np.ascontiguousarray(matriz, dtype=np.float64).tofile(f)
+        with open(os.path.join(ruta, ARCHIVO_TIEMPOS), "ab") as f:
+            np.ascontiguousarray(tiempos, dtype=np.int64).tofile(f)
+
+    def _fusionar(self, ruta: str, tiempos: np.ndarray, matriz: np.ndarray, meta: dict):
+        """Reescribe la serie con las barras nuevas intercaladas (barras anteriores o huecos rellenados)."""
+        actuales_t, actuales_m = self._abrir(ruta)
+        todos_t = np.concatenate([np.asarray(actuales_t), tiempos])
+        todos_m = np.concatenate([np.asarray(actuales_m), matriz])
+        # Ante timestamps repetidos prevalece la barra ya guardada (es la primera tras el orden estable)
+        orden = np.argsort(todos_t, kind="stable")
+        todos_t, todos_m = todos_t[orden], todos_m[orden]
+        unicos = np.concatenate(([True], np.diff(todos_t) > 0))
+        ruta_nueva, ruta_anterior = ruta + ".nueva", ruta + ".anterior"
+        shutil.rmtree(ruta_nueva, ignore_errors=True)
+        self._anexar(ruta_nueva, todos_t[unicos], todos_m[unicos])
+        self._guardar_meta(ruta_nueva, meta)
+        # Los memmap abiertos sobre la versión anterior siguen siendo válidos (otro inodo)
+        if os.path.exists(ruta):
+            os.replace(ruta, ruta_anterior)
+        os.replace(ruta_nueva, ruta)
+        shutil.rmtree(ruta_anterior, ignore_errors=True)
+
+    def _pedir(self, simbolo_par: str, periodo_tiempo: str, **rango) -> tuple[np.ndarray, np.ndarray]:
+        self._contar("peticiones_fuente")
+        df = self.fuente.leer(simbolo_par, periodo_tiempo, **rango)
+        if df is None or df.empty:
+            return np.empty(0, dtype=np.int64), np.empty((0, NUM_COLUMNAS))
+        self._contar("barras_descargadas", len(df))
+        indice = df.index.tz_localize("UTC") if df.index.tz is None else df.index.tz_convert("UTC")
+        return indice.asi8.astype(np.int64), df[list(COLUMNAS_OHLCV)].to_numpy(dtype=np.float64)
+
+    def _sincronizar(self, simbolo_par: str, periodo_tiempo: str, duracion: pd.Timedelta, desde, hasta, limite):
+        ruta = self.ruta_serie(simbolo_par, periodo_tiempo)
+        paso = duracion.value
+        meta = self._leer_meta(ruta)
+        meta_leida = copy.deepcopy(meta)
+        tiempos, _ = self._abrir(ruta)
+
+        if len(tiempos) == 0:
+            nuevos_t, nuevos_m = self._pedir(simbolo_par, periodo_tiempo, desde=desde, hasta=hasta, limite=limite)
+            if len(nuevos_t) == 0:
+                return
+            self._anexar(ruta, nuevos_t, nuevos_m)
+            return
+
+        # 1. Barras posteriores a la última guardada
+        ultimo = int(tiempos[-1])
+        if hasta is None or a_ns(hasta) > ultimo:
+            nuevos_t, nuevos_m = self._pedir(simbolo_par, periodo_tiempo, desde=pd.Timestamp(ultimo + paso, tz="UTC"), hasta=hasta)
+            validos = nuevos_t > ultimo
+            if validos.any():
+                self._anexar(ruta, nuevos_t[validos], nuevos_m[validos])
+                tiempos, _ = self._abrir(ruta)
+
+        # 2. Barras anteriores a la primera guardada, si la ventana empieza antes
+        primero = int(tiempos[0])
+        pendientes_t, pendientes_m = [], []
+        if meta["inicio_fuente"] is None or primero > meta["inicio_fuente"]:
+            hasta_previas = pd.Timestamp(primero - paso, tz="UTC")
+            previas = None
+            if desde is not None and a_ns(desde) < primero:
+                previas = self._pedir(simbolo_par, periodo_tiempo, desde=desde, hasta=hasta_previas)
+            elif limite is not None:
+                faltan = limite - rango_indices(tiempos, None, hasta, None)[1]
+                if faltan > 0:
+                    previas = self._pedir(simbolo_par, periodo_tiempo, hasta=hasta_previas, limite=faltan)
+                    if len(previas[0]) == 0:
+                        meta["inicio_fuente"] = primero # La fuente no tiene barras anteriores
+            if previas is not None and len(previas[0]):
+                pendientes_t.append(previas[0])
+                pendientes_m.append(previas[1])
+
+        # 3. Huecos dentro de la ventana pedida
+        inicio, fin = rango_indices(tiempos, desde, hasta, limite)
+        ventana = np.asarray(tiempos[inicio:fin])
+        verificados = {tuple(h) for h in meta["huecos_verificados"]}
+        for k in np.flatnonzero(np.diff(ventana) > paso):
+            hueco = (int(ventana[k]), int(ventana[k + 1]))
+            if hueco in verificados:
+                continue
+            relleno_t, relleno_m = self._pedir(simbolo_par, periodo_tiempo, desde=pd.Timestamp(hueco[0] + paso, tz="UTC"),
+                                               hasta=pd.Timestamp(hueco[1] - paso, tz="UTC"))
+            if len(relleno_t):
+                self._contar("huecos_rellenados")
+                pendientes_t.append(relleno_t)
+                pendientes_m.append(relleno_m)
+            if len(relleno_t) < (hueco[1] - hueco[0]) // paso - 1:
+                # Lo que la fuente no tiene queda como hueco conocido (entre las barras que lo delimiten)
+                meta["huecos_verificados"].append(list(hueco))
+
+        if pendientes_t:
+            self._fusionar(ruta, np.concatenate(pendientes_t), np.concatenate(pendientes_m), meta)
+        elif meta != meta_leida: # Las lecturas que no descubren nada nuevo no reescriben meta.json
+            self._guardar_meta(ruta, meta)
+
+    def leer(self, simbolo_par: str, periodo_tiempo: str, desde=None, hasta=None, limite: int | None = None) -> pd.DataFrame | None:
+        duracion = duracion_periodo(periodo_tiempo)
+        if duracion is None:
+            return None
+        self._contar("lecturas")
+        with self._lock_serie(simbolo_par, periodo_tiempo):
+            try:
+                self._sincronizar(simbolo_par, periodo_tiempo, duracion, desde, hasta, limite)
+            except OSError as e:
+                print(f"CacheOHLCV: Error al sincronizar {simbolo_par} ({periodo_tiempo}): {e}")
+            tiempos, matriz = self._abrir(self.ruta_serie(simbolo_par, periodo_tiempo))
+        if len(tiempos) == 0:
+            return None
+        inicio, fin = rango_indices(tiempos, desde, hasta, limite)
+        return ventana_ohlcv(tiempos[inicio:fin], matriz[inicio:fin])
+
+def ventana_ohlcv(tiempos: np.ndarray, matriz: np.ndarray) -> pd.DataFrame:
+    """DataFrame OHLCV sobre 'matriz' sin copiar los precios (solo se construye el índice)."""
+    indice = pd.DatetimeIndex(pd.to_datetime(np.asarray(tiempos), utc=True), name=COLUMNA_TIEMPO)
+    return pd.DataFrame(matriz, index=indice, columns=list(COLUMNAS_OHLCV), copy=False)
+
+
+# Bloque de prueba
+if __name__ == '__main__':
+    import tempfile
+    import time
+    from utils.proveedores_datos import ProveedorSimulado
+
+    class FuenteConHuecos(ProveedorDatos):
+        """Fuente simulada a la que le faltan barras en un tramo, hasta que se 'recuperan'."""
+        def __init__(self, base, hueco):
+            self.base, self.hueco, self.recuperada = base, hueco, False
+        def leer(self, simbolo_par, periodo_tiempo, desde=None, hasta=None, limite=None):
+            df = self.base.leer(simbolo_par, periodo_tiempo, desde, hasta, limite)
+            if df is not None and not self.recuperada:
+                df = df[(df.index < self.hueco[0]) | (df.index > self.hueco[1])]
+            return df
+
+    print("Probando CacheOHLCV...")
+    reloj = {"fin": pd.Timestamp("2024-06-30 23:59", tz="UTC")}
+    simulado = ProveedorSimulado(semilla=3, inicio="2024-01-01", fin=reloj["fin"])
+    fuente = FuenteConHuecos(simulado, (pd.Timestamp("2024-06-30 20:00", tz="UTC"), pd.Timestamp("2024-06-30 20:09", tz="UTC")))
+
+    with tempfile.TemporaryDirectory() as directorio:
+        cache = CacheOHLCV(fuente, directorio)
+        ventana = cache.obtener("WLD/USDT", "1m", 500)
+        print(f"  Primera lectura: {len(ventana)} barras; {cache.estadisticas}")
+        ventana = cache.obtener("WLD/USDT", "1m", 500)
+        print(f"  Segunda lectura (completa la ventana con barras anteriores y anota el hueco): {cache.estadisticas}")
+
+        # Avanza el tiempo: solo se descargan las barras nuevas
+        simulado.fin_ns = a_ns("2024-07-01 00:09")
+        ventana = cache.obtener("WLD/USDT", "1m", 500)
+        print(f"  Tras 10 barras nuevas: última {ventana.index[-1]}; {cache.estadisticas}")
+
+        # La fuente recupera el tramo: se borra de los huecos conocidos y se vuelve a pedir
+        fuente.recuperada = True
+        ruta = cache.ruta_serie("WLD/USDT", "1m")
+        cache._guardar_meta(ruta, {**cache._leer_meta(ruta), "huecos_verificados": []})
+        ventana = cache.obtener("WLD/USDT", "1m", 500)
+        esperado = simulado.obtener("WLD/USDT", "1m", 500)
+        print(f"  Hueco rellenado: {cache.estadisticas['huecos_rellenados']}; ventana igual a la fuente: "
+              f"{np.allclose(ventana.to_numpy(), esperado.to_numpy()) and ventana.index.equals(esperado.index)}")
+
+        ventana = cache.obtener("WLD/USDT", "1m", 2000)
+        print(f"  Ventana más larga (pide solo las {2000 - 500} anteriores): {len(ventana)} barras; {cache.estadisticas}")
+        print(f"  Precios servidos sobre el memmap (sin copia, solo lectura): {not ventana['close'].to_numpy().flags.writeable}")
+        ventana = cache.leer("WLD/USDT", "1m", desde="2023-12-31", hasta="2024-01-01 00:04")
+        print(f"  Antes del inicio de la fuente: {len(ventana)} barras; inicio conocido tras pedirlo: "
+              f"{cache.obtener('WLD/USDT', '1m', 10**6) is not None and cache._leer_meta(ruta)['inicio_fuente'] is not None}")
+
+        inicio = time.perf_counter()
+        for _ in range(1000):
+            cache.obtener("WLD/USDT", "1m", 100)
+        print(f"  Lectura de 100 barras ya en caché: {(time.perf_counter() - inicio):.3f} ms cada una")
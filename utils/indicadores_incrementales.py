@@ -0,0 +1,330 @@
+# utils/indicadores_incrementales.py
+import os
+import sys
+import math
+import threading
+from abc import ABC, abstractmethod
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+# --- Modificación para permitir la ejecución directa del script ---
+current_script_dir = os.path.dirname(os.path.abspath(__file__))
+project_root_dir = os.path.abspath(os.path.join(current_script_dir, '..'))
+if project_root_dir not in sys.path:
+    sys.path.insert(0, project_root_dir)
+# --- Fin de la modificación ---
+
+from utils import indicadores_tecnicos as it
+
+# Indicadores con estado que se actualizan en O(1) por cada barra nueva.
+# Se siembran una vez con el histórico disponible y luego avanzan con update(barra).
+# Cada update devuelve el mismo diccionario de componentes que it.extraer_ultimos_valores
+# aplicado al motor por lotes ('valor' para SMA/RSI, 'macd'/'señal'/'histograma', 'media'/'superior'/'inferior').
+
+def _precio_cierre(barra) -> float:
+    """Acepta un precio suelto o una barra OHLCV (dict, pd.Series o fila con 'close')."""
+    if isinstance(barra, (int, float, np.floating, np.integer)):
+        return float(barra)
+    return float(barra['close'])
+
+class _IndicadorIncremental(ABC):
+    @abstractmethod
+    def update(self, barra) -> dict:
+        """Avanza el indicador con una barra nueva y devuelve sus componentes."""
+
+    def sembrar(self, serie) -> dict | None:
+        """Avanza el indicador con todas las barras de un histórico y devuelve el último valor."""
+        ultimo = None
+        for precio in np.asarray(serie, dtype=np.float64):
+            ultimo = self.update(precio)
+        return ultimo
+
+class SMAIncremental(_IndicadorIncremental):
+    """SMA por suma móvil. La suma se recalcula sobre la ventana cada 'periodo' barras para acotar el error de redondeo."""
+    def __init__(self, periodo: int):
+        self.periodo = periodo
+        self._ventana = deque(maxlen=periodo)
+        self._suma = 0.0
+        self._barras_desde_resincronizacion = 0
+
+    def update(self, barra) -> dict:
+        precio = _precio_cierre(barra)
+        if len(self._ventana) == self.periodo:
+            self._suma -= self._ventana[0]
+        self._ventana.append(precio)
+        self._suma += precio
+        self._barras_desde_resincronizacion += 1
+        if self._barras_desde_resincronizacion >= self.periodo:
+            self._suma = math.fsum(self._ventana)
+            self._barras_desde_resincronizacion = 0
+        return {"valor": self.valor}
+
+    @property
+    def valor(self) -> float | None:
+        if len(self._ventana) < self.periodo:
+            return None
+        return self._suma / self.periodo
+
+class RSIIncremental(_IndicadorIncremental):
+    """
+    RSI con estado.
+    suavizado='simple' reproduce it.calcular_rsi (medias móviles simples de ganancias y pérdidas).
+    suavizado='wilder' aplica la media suavizada de Wilder, sembrada con la media simple de los primeros 'periodo' cambios.
+    """
+    def __init__(self, periodo: int = it.RSI_DEFAULT_PERIOD, suavizado: str = "simple"):
+        if suavizado not in ("simple", "wilder"):
+            raise ValueError(f"Suavizado de RSI no soportado: {suavizado}")
+        self.periodo = periodo
+        self.suavizado = suavizado
+        self._precio_anterior = None
+        self._num_precios = 0
+        self._ganancias = SMAIncremental(periodo)
+        self._perdidas = SMAIncremental(periodo)
+        self._media_ganancias = None
+        self._media_perdidas = None
+
+    def update(self, barra) -> dict:
+        precio = _precio_cierre(barra)
+        # Como en series.diff().where(...), el primer cambio cuenta como 0
+        delta = 0.0 if self._precio_anterior is None else precio - self._precio_anterior
+        self._precio_anterior = precio
+        self._num_precios += 1
+        ganancia, perdida = max(delta, 0.0), max(-delta, 0.0)
+
+        if self.suavizado == "simple":
+            self._media_ganancias = self._ganancias.update(ganancia)["valor"]
+            self._media_perdidas = self._perdidas.update(perdida)["valor"]
+        elif self._num_precios <= self.periodo + 1:
+            if self._num_precios > 1: # Los primeros 'periodo' cambios reales siembran la media de Wilder
+                self._media_ganancias = self._ganancias.update(ganancia)["valor"]
+                self._media_perdidas = self._perdidas.update(perdida)["valor"]
+        else:
+            self._media_ganancias = (self._media_ganancias * (self.periodo - 1) + ganancia) / self.periodo
+            self._media_perdidas = (self._media_perdidas * (self.periodo - 1) + perdida) / self.periodo
+        return {"valor": self.valor}
+
+    @property
+    def valor(self) -> float | None:
+        if self._num_precios < self.periodo + 1 or self._media_ganancias is None:
+            return None
+        if self._media_perdidas == 0:
+            return 100.0 if self._media_ganancias > 0 else None
+        rs = self._media_ganancias / self._media_perdidas
+        return 100 - (100 / (1 + rs))
+
+class _EMAIncremental:
+    def __init__(self, span: int):
+        self.alpha = 2 / (span + 1)
+        self.valor = None
+
+    def update(self, x: float) -> float:
+        self.valor = x if self.valor is None else self.valor + self.alpha * (x - self.valor)
+        return self.valor
+
+class MACDIncremental(_IndicadorIncremental):
+    """MACD como cadena de EMAs (adjust=False), equivalente a it.calcular_macd."""
+    def __init__(self, periodo_corto: int = it.MACD_DEFAULT_FAST,
+                 periodo_largo: int = it.MACD_DEFAULT_SLOW,
+                 periodo_señal: int = it.MACD_DEFAULT_SIGNAL):
+        self.periodo_largo = periodo_largo
+        self.periodo_señal = periodo_señal
+        self._ema_corto = _EMAIncremental(periodo_corto)
+        self._ema_largo = _EMAIncremental(periodo_largo)
+        self._ema_señal = _EMAIncremental(periodo_señal)
+        self._num_precios = 0
+
+    def update(self, barra) -> dict:
+        precio = _precio_cierre(barra)
+        self._num_precios += 1
+        linea_macd = self._ema_corto.update(precio) - self._ema_largo.update(precio)
+        linea_señal = self._ema_señal.update(linea_macd)
+        if self._num_precios < self.periodo_largo + self.periodo_señal:
+            return {"macd": None, "señal": None, "histograma": None}
+        return {"macd": linea_macd, "señal": linea_señal, "histograma": linea_macd - linea_señal}
+
+class BandasBollingerIncremental(_IndicadorIncremental):
+    """Bandas de Bollinger con varianza móvil de Welford (ddof=1, como rolling().std())."""
+    def __init__(self, periodo: int = it.BBANDS_DEFAULT_PERIOD, num_std_dev: float = it.BBANDS_DEFAULT_STD_DEV):
+        self.periodo = periodo
+        self.num_std_dev = num_std_dev
+        self._ventana = deque(maxlen=periodo)
+        self._media = 0.0
+        self._m2 = 0.0
+
+    def update(self, barra) -> dict:
+        precio = _precio_cierre(barra)
+        if len(self._ventana) < self.periodo:
+            self._ventana.append(precio)
+            delta = precio - self._media
+            self._media += delta / len(self._ventana)
+            self._m2 += delta * (precio - self._media)
+        else:
+            saliente = self._ventana[0]
+            self._ventana.append(precio)
+            media_anterior = self._media
+            self._media += (precio - saliente) / self.periodo
+            self._m2 += (precio - saliente) * (precio - self._media + saliente - media_anterior)
+
+        if len(self._ventana) < self.periodo or self.periodo < 2:
+            return {"media": None, "superior": None, "inferior": None}
+        desviacion = math.sqrt(max(self._m2, 0.0) / (self.periodo - 1))
+        return {
+            "media": self._media,
+            "superior": self._media + desviacion * self.num_std_dev,
+            "inferior": self._media - desviacion * self.num_std_dev,
+        }
+
+def crear_indicador_incremental(config: dict) -> _IndicadorIncremental | None:
+    """Crea el indicador incremental correspondiente a una configuración del motor por lotes."""
+    tipo = str(config.get("tipo", "")).upper()
+    if tipo == "SMA" and config.get("periodo"):
+        return SMAIncremental(int(config["periodo"]))
+    if tipo == "RSI" and config.get("periodo"):
+        return RSIIncremental(int(config["periodo"]), config.get("suavizado") or "simple")
+    if tipo == "MACD":
+        return MACDIncremental(int(config.get("periodo_corto") or it.MACD_DEFAULT_FAST),
+                               int(config.get("periodo_largo") or it.MACD_DEFAULT_SLOW),
+                               int(config.get("periodo_señal") or it.MACD_DEFAULT_SIGNAL))
+    if tipo == "BB":
+        return BandasBollingerIncremental(int(config.get("periodo") or it.BBANDS_DEFAULT_PERIOD),
+                                          float(config.get("num_std_dev") or it.BBANDS_DEFAULT_STD_DEV))
+    return None
+
+def desde_historial(config: dict, serie) -> _IndicadorIncremental | None:
+    """Crea un indicador incremental y lo siembra con un histórico de cierres."""
+    indicador = crear_indicador_incremental(config)
+    if indicador is not None:
+        indicador.sembrar(serie)
+    return indicador
+
+def clave_config(config_motor: dict) -> tuple:
+    # Dos estrategias que usan la misma configuración con los mismos parámetros comparten el cálculo
+    return tuple(sorted((k, v) for k, v in config_motor.items()))
+
+def sembrar_configs(cierres: np.ndarray, configs_motor: list[dict]) -> dict:
+    """
+    Siembra un indicador por configuración con los cierres (la última barra con update(), para
+    tener también los valores de la barra anterior) y devuelve {clave_config: [indicador, previos, ultimos]}.
+    Es una función de módulo para poder ejecutarla en un pool de procesos (PlanificadorAnalisis).
+    """
+    sembrados = {}
+    for config in configs_motor:
+        indicador = crear_indicador_incremental(config)
+        if indicador is None:
+            continue
+        anterior = indicador.sembrar(cierres[:-1])
+        actual = indicador.update(cierres[-1])
+        sembrados[clave_config(config)] = [indicador, anterior or {c: None for c in actual}, actual]
+    return sembrados
+
+class SeguimientoIndicadores:
+    """
+    Estado de los indicadores incrementales de cada serie (par, periodo) entre ciclos de análisis.
+    Cada configuración se siembra una vez con el histórico (desde_historial) y después cada ciclo
+    solo aplica update() a las barras posteriores a la última vista: el coste por ciclo es
+    O(indicadores) por barra nueva en lugar de recalcular toda la ventana.
+    Cada llamada a avanzar aplica las barras nuevas a todas las configuraciones sembradas de la
+    serie, aunque solo pida algunas, así que la última barra vista es común a toda la serie.
+    Si los datos recibidos no incluyen la última barra vista (hueco), la serie se vuelve a sembrar.
+    """
+    def __init__(self):
+        self._series = {} # clave_serie -> {"ultima": pd.Timestamp, "precios": deque, "indicadores": {clave_config: [indicador, previos, ultimos]}}
+        self._lock = threading.Lock()
+
+    def desde_necesario(self, clave_serie, configs_motor: list[dict]):
+        """
+        Timestamp de la última barra vista si todas las configuraciones ya están sembradas
+        (basta con pedir las barras desde ahí), o None si hace falta el histórico completo.
+        """
+        with self._lock:
+            estado = self._series.get(clave_serie)
+            if estado is None or any(clave_config(c) not in estado["indicadores"] for c in configs_motor if c.get("tipo")):
+                return None
+            return estado["ultima"]
+
+    def configs_por_sembrar(self, clave_serie, datos_ohlcv: pd.DataFrame, configs_motor: list[dict]) -> list[dict]:
+        """Configuraciones que avanzar(clave_serie, datos_ohlcv, configs_motor) tendría que sembrar."""
+        with self._lock:
+            estado = self._series.get(clave_serie)
+            if estado is None or estado["ultima"] not in datos_ohlcv.index:
+                return [c for c in configs_motor if c.get("tipo")]
+            return [c for c in configs_motor if c.get("tipo") and clave_config(c) not in estado["indicadores"]]
+
+    def avanzar(self, clave_serie, datos_ohlcv: pd.DataFrame, configs_motor: list[dict],
+                sembrados: dict | None = None) -> tuple[dict, dict, float, float | None]:
+        """
+        Aplica las barras de datos_ohlcv posteriores a la última vista y devuelve
+        ({id_config: últimos valores}, {id_config: valores de la barra anterior}, precio, precio_previo),
+        con los mismos diccionarios que it.extraer_ultimos_valores.
+        sembrados: resultado de sembrar_configs sobre los cierres de datos_ohlcv ya calculado
+        (p. ej. en otro proceso); las configuraciones que falten se siembran aquí.
+        """
+        with self._lock:
+            estado = self._series.get(clave_serie)
+            if estado is None or estado["ultima"] not in datos_ohlcv.index:
+                estado = {"ultima": None, "precios": deque(maxlen=2), "indicadores": {}}
+                self._series[clave_serie] = estado
+            cierres = datos_ohlcv['close'].to_numpy(dtype=np.float64)
+            nuevas = cierres if estado["ultima"] is None else cierres[datos_ohlcv.index > estado["ultima"]]
+
+            # Todas las configuraciones ya sembradas avanzan, también las que no se piden ahora:
+            # 'ultima' es de toda la serie y un ciclo con otras estrategias no debe saltarles barras
+            for seguido in estado["indicadores"].values():
+                for precio in nuevas:
+                    seguido[1], seguido[2] = seguido[2], seguido[0].update(precio)
+
+            sembrados = dict(sembrados or {})
+            faltan = [c for c in configs_motor if c.get("tipo") and clave_config(c) not in estado["indicadores"]
+                      and clave_config(c) not in sembrados]
+            sembrados.update(sembrar_configs(cierres, faltan) if faltan else {})
+
+            ultimos, previos = {}, {}
+            for config in configs_motor:
+                if not config.get("tipo"):
+                    continue
+                seguido = estado["indicadores"].get(clave_config(config))
+                if seguido is None:
+                    seguido = sembrados.get(clave_config(config))
+                    if seguido is None:
+                        continue
+                    estado["indicadores"][clave_config(config)] = seguido
+                previos[config["id"]], ultimos[config["id"]] = dict(seguido[1]), dict(seguido[2])
+
+            estado["precios"].extend(nuevas)
+            estado["ultima"] = datos_ohlcv.index[-1]
+            precios = estado["precios"]
+            return ultimos, previos, float(precios[-1]), (float(precios[-2]) if len(precios) > 1 else None)
+
+
+# Bloque de prueba
+if __name__ == '__main__':
+    print("Comparando indicadores incrementales con el motor por lotes...")
+
+    np.random.seed(7)
+    cierres = pd.Series(np.random.normal(0, 1, 500).cumsum() + 100)
+    datos = pd.DataFrame({'close': cierres})
+    configs = [
+        {"id": "ConfigSMA20", "tipo": "SMA", "periodo": 20},
+        {"id": "ConfigRSI14", "tipo": "RSI", "periodo": 14},
+        {"id": "ConfigMACD12_26_9", "tipo": "MACD", "periodo_corto": 12, "periodo_largo": 26, "periodo_señal": 9},
+        {"id": "ConfigBB20_2", "tipo": "BB", "periodo": 20, "num_std_dev": 2.0},
+    ]
+    lote = it.calcular_indicadores_lote(datos, configs)
+
+    # Sembrar con las primeras 400 barras y avanzar barra a barra con el resto
+    for config in configs:
+        indicador = desde_historial(config, cierres.iloc[:400])
+        diferencia_maxima = 0.0
+        for i in range(400, len(cierres)):
+            incremental = indicador.update({'close': cierres.iloc[i]})
+            por_lotes = {k: v[i] for k, v in lote[config["id"]].items()}
+            for componente, valor in incremental.items():
+                diferencia_maxima = max(diferencia_maxima, abs(valor - por_lotes[componente]))
+        estado = "OK" if diferencia_maxima < 1e-8 else "DIFERENCIA"
+        print(f"  {config['id']}: diferencia máxima {diferencia_maxima:.2e} [{estado}]")
+
+    rsi_wilder = RSIIncremental(14, suavizado="wilder")
+    print(f"  RSI(14) Wilder sobre toda la serie: {rsi_wilder.sembrar(cierres)['valor']:.2f}")
+    print("\nPrueba de indicadores incrementales completada.")
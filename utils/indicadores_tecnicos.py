@@ -1,6 +1,18 @@
 # utils/indicadores_tecnicos.py
+import os
+import sys
 import pandas as pd
 import numpy as np # Para np.nan si es necesario
+from numpy.lib.stride_tricks import sliding_window_view
+
+# --- Modificación para permitir la ejecución directa del script ---
+current_script_dir = os.path.dirname(os.path.abspath(__file__))
+project_root_dir = os.path.abspath(os.path.join(current_script_dir, '..'))
+if project_root_dir not in sys.path:
+    sys.path.insert(0, project_root_dir)
+# --- Fin de la modificación ---
+
+from utils import kernels_indicadores as kernels
 
 # --- Constantes para periodos por defecto ---
 SMA_DEFAULT_PERIODS = [20, 50] # Periodos comunes para SMA
@@ -133,6 +145,306 @@ def calcular_bandas_bollinger(series: pd.Series,
         print(f"Error calculando Bandas de Bollinger: {e}")
         return None
 
+# --- Motor de indicadores por lotes (series completas) ---
+# Los indicadores se devuelven como columnas NumPy alineadas con la serie de entrada.
+# El valor en la posición i coincide con lo que devolvería calcular_*(serie[:i+1]);
+# las posiciones sin datos suficientes quedan en NaN.
+# También aceptan una matriz tiempo × pares (un par por columna, eje 0 = tiempo); los pares con
+# histórico más corto se rellenan con NaN al principio y obtienen los mismos valores que por separado.
+TIPOS_INDICADOR_MOTOR = ("SMA", "RSI", "MACD", "BB")
+ELEMENTOS_BLOQUE_VENTANAS = 1 << 22 # Tamaño de los bloques de ventanas de la desviación estándar
+CONFIGS_MOTOR_DEFAULT = [
+    {"id": f"ConfigSMA{SMA_DEFAULT_PERIODS[0]}", "tipo": "SMA", "periodo": SMA_DEFAULT_PERIODS[0]},
+    {"id": f"ConfigRSI{RSI_DEFAULT_PERIOD}", "tipo": "RSI", "periodo": RSI_DEFAULT_PERIOD},
+    {"id": f"ConfigMACD{MACD_DEFAULT_FAST}_{MACD_DEFAULT_SLOW}_{MACD_DEFAULT_SIGNAL}", "tipo": "MACD",
+     "periodo_corto": MACD_DEFAULT_FAST, "periodo_largo": MACD_DEFAULT_SLOW, "periodo_señal": MACD_DEFAULT_SIGNAL},
+    {"id": f"ConfigBB{BBANDS_DEFAULT_PERIOD}_{BBANDS_DEFAULT_STD_DEV}", "tipo": "BB",
+     "periodo": BBANDS_DEFAULT_PERIOD, "num_std_dev": BBANDS_DEFAULT_STD_DEV},
+]
+
+def _ema(valores: np.ndarray, span: int) -> np.ndarray:
+    """EMA con adjust=False (misma recursión que pandas.ewm) a lo largo del eje 0."""
+    return kernels.ema(valores, span) # numba si está instalado (ver utils/kernels_indicadores.py)
+
+class MotorIndicadores:
+    """
+    Calcula indicadores técnicos sobre una serie completa de precios de cierre.
+    Los resultados intermedios (sumas acumuladas, diferencias, EMAs) se calculan
+    una sola vez y se reutilizan entre todas las configuraciones que los necesitan.
+    Con una matriz tiempo × pares los NaN marcan las barras que faltan: las ventanas que
+    incluyen alguna quedan en NaN y las EMAs empiezan en la primera barra de cada par.
+    """
+    def __init__(self, cierres):
+        self.cierres = np.asarray(cierres, dtype=np.float64)
+        self._intermedios = {}
+        self.con_huecos = bool(np.isnan(self.cierres).any())
+
+    def _intermedio(self, clave, funcion):
+        if clave not in self._intermedios:
+            self._intermedios[clave] = funcion()
+        return self._intermedios[clave]
+
+    def _sumas_acumuladas(self, valores: np.ndarray) -> np.ndarray:
+        # Se antepone una fila de ceros para que suma[i+periodo] - suma[i] sea la ventana [i, i+periodo)
+        ceros = np.zeros((1,) + valores.shape[1:])
+        return np.concatenate([ceros, np.cumsum(valores, axis=0)])
+
+    def _media_ventana(self, clave_suma: str, valores: np.ndarray, periodo: int, clave_huecos: str = "cierres") -> np.ndarray:
+        # Con huecos los NaN suman 0 y las ventanas que contienen alguno se anulan después.
+        # clave_huecos identifica el patrón de NaN de valores para compartir esa máscara.
+        suma = self._intermedio((clave_suma,), lambda: self._sumas_acumuladas(
+            np.nan_to_num(valores) if self.con_huecos else valores))
+        resultado = np.full(valores.shape, np.nan)
+        if periodo <= len(valores):
+            resultado[periodo - 1:] = (suma[periodo:] - suma[:-periodo]) / periodo
+            if self.con_huecos:
+                resultado[periodo - 1:][self._ventanas_con_huecos(clave_huecos, valores, periodo)] = np.nan
+        return resultado
+
+    def _ventanas_con_huecos(self, clave_huecos: str, valores: np.ndarray, periodo: int) -> np.ndarray:
+        def calcular():
+            huecos = self._intermedio(("huecos", clave_huecos), lambda: self._sumas_acumuladas(np.isnan(valores)))
+            return huecos[periodo:] > huecos[:-periodo]
+        return self._intermedio(("ventanas_con_huecos", clave_huecos, periodo), calcular)
+
+    def _barras_validas(self) -> np.ndarray:
+        """Número de barras con precio vistas hasta cada posición (por par)."""
+        return self._intermedio(("validas",), lambda: np.cumsum(~np.isnan(self.cierres), axis=0))
+
+    def _diferencias(self) -> np.ndarray:
+        # Igual que series.diff() seguido de where(...): la primera diferencia cuenta como 0.
+        # Con huecos la primera queda en NaN, que las ventanas ya descartan.
+        def calcular():
+            delta = np.full_like(self.cierres, np.nan) if self.con_huecos else np.zeros_like(self.cierres)
+            delta[1:] = np.diff(self.cierres, axis=0)
+            return delta
+        return self._intermedio(("diff",), calcular)
+
+    def sma(self, periodo: int) -> np.ndarray:
+        return self._intermedio(("sma", periodo), lambda: self._media_ventana("suma", self.cierres, periodo))
+
+    def desviacion_estandar(self, periodo: int) -> np.ndarray:
+        """
+        Desviación estándar móvil muestral (ddof=1, como rolling().std()).
+        Se calcula ventana a ventana respecto a la media de cada ventana (no con sumas
+        acumuladas, cuyo error crece con la longitud del histórico), por bloques de filas.
+        """
+        def calcular():
+            resultado = np.full(self.cierres.shape, np.nan)
+            if periodo < 2 or periodo > len(self.cierres):
+                return resultado
+            ventanas = sliding_window_view(self.cierres, periodo, axis=0) # (filas, ..., periodo) sin copia
+            salida = resultado[periodo - 1:]
+            filas_bloque = max(1, ELEMENTOS_BLOQUE_VENTANAS // (periodo * max(1, self.cierres[0].size)))
+            for inicio in range(0, len(ventanas), filas_bloque):
+                bloque = ventanas[inicio:inicio + filas_bloque]
+                desviaciones = bloque - bloque.mean(axis=-1, keepdims=True)
+                salida[inicio:inicio + filas_bloque] = np.sqrt(
+                    np.einsum('...k,...k->...', desviaciones, desviaciones) / (periodo - 1))
+            return resultado
+        return self._intermedio(("std", periodo), calcular)
+
+    def ema(self, span: int) -> np.ndarray:
+        def calcular():
+            resultado = _ema(self.cierres, span)
+            if self.con_huecos:
+                resultado[np.isnan(self.cierres)] = np.nan
+            return resultado
+        return self._intermedio(("ema", span), calcular)
+
+    def rsi(self, periodo: int) -> np.ndarray:
+        def calcular():
+            delta = self._diferencias()
+            # Escritas para conservar los NaN de los huecos
+            ganancias = self._intermedio(("ganancias",), lambda: np.where(delta < 0, 0.0, delta))
+            perdidas = self._intermedio(("perdidas",), lambda: np.where(delta > 0, 0.0, -delta))
+            media_ganancias = self._media_ventana("suma_ganancias", ganancias, periodo, "diff")
+            media_perdidas = self._media_ventana("suma_perdidas", perdidas, periodo, "diff")
+            with np.errstate(divide='ignore', invalid='ignore'):
+                rs = media_ganancias / media_perdidas
+                rsi = 100 - (100 / (1 + rs))
+            rsi[:periodo] = np.nan # calcular_rsi exige periodo+1 precios
+            return rsi
+        return self._intermedio(("rsi", periodo), calcular)
+
+    def rsi_wilder(self, periodo: int) -> np.ndarray:
+        """RSI con la media suavizada de Wilder (como RSIIncremental con suavizado='wilder')."""
+        return self._intermedio(("rsi_wilder", periodo), lambda: kernels.rsi_wilder(self.cierres, periodo))
+
+    def macd(self, periodo_corto: int, periodo_largo: int, periodo_señal: int) -> dict:
+        linea_macd = self.ema(periodo_corto) - self.ema(periodo_largo)
+        linea_señal = _ema(linea_macd, periodo_señal)
+        histograma = linea_macd - linea_señal
+        calentamiento = periodo_largo + periodo_señal - 1 # calcular_macd exige periodo_largo + periodo_señal precios
+        for columna in (linea_macd, linea_señal, histograma):
+            if self.con_huecos:
+                columna[self._barras_validas() <= calentamiento] = np.nan
+            else:
+                columna[:calentamiento] = np.nan
+        return {"macd": linea_macd, "señal": linea_señal, "histograma": histograma}
+
+    def bandas_bollinger(self, periodo: int, num_std_dev: float) -> dict:
+        media = self.sma(periodo)
+        desviacion = self.desviacion_estandar(periodo)
+        return {
+            "media": media,
+            "superior": media + desviacion * num_std_dev,
+            "inferior": media - desviacion * num_std_dev,
+        }
+
+    def calcular(self, config: dict) -> dict | None:
+        """
+        Calcula un indicador a partir de su configuración.
+        Claves reconocidas: 'tipo' (SMA, RSI, MACD, BB), 'periodo', 'periodo_corto',
+        'periodo_largo', 'periodo_señal', 'num_std_dev' y 'suavizado' (RSI: 'simple' o 'wilder').
+        Devuelve un diccionario de columnas ('valor' para SMA/RSI) o None si la configuración es inválida.
+        """
+        tipo = str(config.get("tipo", "")).upper()
+        if tipo == "SMA" and config.get("periodo"):
+            return {"valor": self.sma(int(config["periodo"]))}
+        if tipo == "RSI" and config.get("periodo"):
+            if config.get("suavizado") == "wilder":
+                return {"valor": self.rsi_wilder(int(config["periodo"]))}
+            return {"valor": self.rsi(int(config["periodo"]))}
+        if tipo == "MACD":
+            return self.macd(int(config.get("periodo_corto") or MACD_DEFAULT_FAST),
+                             int(config.get("periodo_largo") or MACD_DEFAULT_SLOW),
+                             int(config.get("periodo_señal") or MACD_DEFAULT_SIGNAL))
+        if tipo == "BB":
+            return self.bandas_bollinger(int(config.get("periodo") or BBANDS_DEFAULT_PERIOD),
+                                         float(config.get("num_std_dev") or BBANDS_DEFAULT_STD_DEV))
+        return None
+
+def calcular_indicadores_lote(datos_ohlcv: pd.DataFrame, configs: list[dict], columna: str = 'close') -> dict:
+    """
+    Calcula todos los indicadores de una estrategia en una sola pasada sobre datos OHLCV.
+
+    Args:
+        datos_ohlcv (pd.DataFrame): Datos con al menos la columna indicada.
+        configs (list[dict]): Configuraciones de indicadores; cada una con un 'id' único y los
+                              parámetros descritos en MotorIndicadores.calcular.
+        columna (str): Columna de precios sobre la que se calculan los indicadores.
+
+    Returns:
+        dict: {id_config: {componente: np.ndarray}} con series completas alineadas con datos_ohlcv.
+              Las configuraciones no reconocidas se omiten.
+    """
+    if datos_ohlcv is None or columna not in datos_ohlcv or datos_ohlcv.empty:
+        print(f"Error en calcular_indicadores_lote: no hay datos en la columna '{columna}'.")
+        return {}
+    return _calcular_configs(MotorIndicadores(datos_ohlcv[columna].to_numpy()), configs)
+
+def _calcular_configs(motor: MotorIndicadores, configs: list[dict]) -> dict:
+    resultados = {}
+    for config in configs:
+        try:
+            columnas = motor.calcular(config)
+        except Exception as e:
+            print(f"Error calculando indicador {config.get('id')}: {e}")
+            continue
+        if columnas is not None:
+            resultados[config["id"]] = columnas
+    return resultados
+
+def extraer_ultimos_valores(columnas: dict, atras: int = 0) -> dict:
+    """
+    Convierte las columnas de un indicador en sus últimos valores (None si no hay valor).
+    Con atras=1 devuelve los de la barra anterior (los que usan las reglas de cruce).
+    """
+    ultimos = {}
+    for componente, serie in columnas.items():
+        ultimo = serie[-1 - atras] if len(serie) > atras else np.nan
+        ultimos[componente] = float(ultimo) if pd.notna(ultimo) else None
+    return ultimos
+
+# --- Indicadores de todo el universo de pares (matriz tiempo × pares) ---
+def matriz_cierres(datos_por_par: dict, columna: str = 'close', alinear_por_tiempo: bool = True) -> pd.DataFrame:
+    """
+    Une las series de precios de varios pares en una matriz tiempo × pares (una columna por par).
+
+    Args:
+        datos_por_par (dict): {par: pd.DataFrame OHLCV}.
+        columna (str): Columna de precios que se toma de cada par.
+        alinear_por_tiempo (bool): Si es True las filas son la unión de los timestamps y las barras
+                                   que le faltan a un par quedan en NaN. Si es False cada par se
+                                   alinea por su última barra (fila -1) y solo se rellena con NaN
+                                   el principio de los históricos más cortos.
+    """
+    series = {par: df[columna] for par, df in datos_por_par.items() if df is not None and columna in df}
+    if alinear_por_tiempo:
+        return pd.concat(series, axis=1).sort_index() if series else pd.DataFrame()
+    longitud = max((len(serie) for serie in series.values()), default=0)
+    matriz = np.full((longitud, len(series)), np.nan)
+    for j, serie in enumerate(series.values()):
+        if len(serie):
+            matriz[longitud - len(serie):, j] = serie.to_numpy(dtype=np.float64)
+    return pd.DataFrame(matriz, columns=list(series))
+
+def calcular_indicadores_matriz(cierres, configs: list[dict]) -> dict:
+    """
+    Calcula los indicadores de todos los pares a la vez sobre una matriz de cierres tiempo × pares.
+
+    Args:
+        cierres (pd.DataFrame | np.ndarray): Matriz de cierres (ver matriz_cierres); NaN donde un par no tiene barra.
+        configs (list[dict]): Configuraciones de indicadores, como en calcular_indicadores_lote.
+
+    Returns:
+        dict: {id_config: {componente: np.ndarray}} con matrices de la misma forma que cierres.
+    """
+    matriz = np.asarray(cierres, dtype=np.float64)
+    if matriz.ndim != 2 or matriz.size == 0:
+        print(f"Error en calcular_indicadores_matriz: se esperaba una matriz tiempo × pares no vacía, forma {matriz.shape}.")
+        return {}
+    return _calcular_configs(MotorIndicadores(matriz), configs)
+
+def extraer_ultimos_valores_matriz(resultados: dict, cierres, atras: int = 0) -> dict:
+    """
+    Versión matricial de extraer_ultimos_valores: para cada par toma la última barra con precio
+    (o la anterior a ella con atras=1), aunque los pares terminen en filas distintas.
+
+    Returns:
+        dict: {id_config: {componente: np.ndarray}} con un valor por par (NaN si no lo hay).
+    """
+    validas = np.cumsum(~np.isnan(np.asarray(cierres, dtype=np.float64)), axis=0)
+    objetivo = validas[-1] - atras
+    filas = np.argmax(validas >= objetivo, axis=0)
+    sin_barra = objetivo < 1
+    pares = np.arange(validas.shape[1])
+    ultimos = {}
+    for id_config, columnas in resultados.items():
+        ultimos[id_config] = {}
+        for componente, matriz in columnas.items():
+            valores = matriz[filas, pares]
+            valores[sin_barra] = np.nan
+            ultimos[id_config][componente] = valores
+    return ultimos
+
+def instantanea_universo(cierres: pd.DataFrame, configs: list[dict] | None = None, atras: int = 0) -> pd.DataFrame:
+    """
+    Instantánea de indicadores de todo el universo de pares en una sola llamada.
+
+    Args:
+        cierres (pd.DataFrame): Matriz de cierres tiempo × pares (ver matriz_cierres).
+        configs (list[dict] | None): Configuraciones de indicadores; CONFIGS_MOTOR_DEFAULT si es None.
+        atras (int): 0 para la última barra de cada par, 1 para la anterior.
+
+    Returns:
+        pd.DataFrame: Una fila por par con el 'precio' y una columna '<id_config>.<componente>'
+                      por cada componente de indicador.
+    """
+    configs = CONFIGS_MOTOR_DEFAULT if configs is None else configs
+    resultados = calcular_indicadores_matriz(cierres, configs)
+    if not resultados:
+        return pd.DataFrame(index=cierres.columns)
+    # El precio se extrae como un indicador más para usar las mismas filas por par
+    resultados["precio"] = {"": cierres.to_numpy(dtype=np.float64)}
+    ultimos = extraer_ultimos_valores_matriz(resultados, cierres, atras=atras)
+    columnas = {"precio": ultimos.pop("precio")[""]}
+    for id_config, componentes in ultimos.items():
+        for componente, valores in componentes.items():
+            columnas[f"{id_config}.{componente}"] = valores
+    return pd.DataFrame(columnas, index=cierres.columns)
+
 # --- Funciones de ayuda para obtener datos históricos (simuladas o de API real) ---
 def obtener_datos_historicos_simulados(simbolo_par: str, periodo_tiempo: str, limite: int) -> pd.DataFrame | None:
     """
@@ -259,4 +571,32 @@ if __name__ == '__main__':
     else:
         print("No se pudieron obtener datos OHLCV simulados.")
 
+    print("\n--- Prueba de indicadores del universo (matriz tiempo × pares) ---")
+    rng = np.random.default_rng(0)
+    fechas_universo = pd.date_range("2024-01-01", periods=500, freq="D", tz="UTC")
+    datos_universo = {}
+    for j in range(200):
+        barras = int(rng.integers(10, len(fechas_universo) + 1)) # Históricos de distinta longitud
+        cierres_par = 100 * np.exp(np.cumsum(rng.normal(0, 0.02, barras)))
+        datos_universo[f"PAR{j}/USDT"] = pd.DataFrame({"close": cierres_par}, index=fechas_universo[-barras:])
+    cierres_universo = matriz_cierres(datos_universo)
+    import time
+    instantanea_universo(cierres_universo.iloc[:50]) # Con numba, la primera llamada incluye la compilación
+    inicio = time.perf_counter()
+    instantanea = instantanea_universo(cierres_universo)
+    duracion_matriz = time.perf_counter() - inicio
+    inicio = time.perf_counter()
+    por_par = {par: calcular_indicadores_lote(df, CONFIGS_MOTOR_DEFAULT) for par, df in datos_universo.items()}
+    duracion_bucle = time.perf_counter() - inicio
+    diferencias = 0
+    for par, resultados_par in por_par.items():
+        for id_config, columnas in resultados_par.items():
+            for componente, valor in extraer_ultimos_valores(columnas).items():
+                calculado = instantanea.loc[par, f"{id_config}.{componente}"]
+                if (valor is None) != pd.isna(calculado) or (valor is not None and abs(valor - calculado) > 1e-9):
+                    diferencias += 1
+    print(f"Matriz {cierres_universo.shape}: instantánea en {duracion_matriz * 1000:.1f} ms "
+          f"(bucle por par: {duracion_bucle * 1000:.1f} ms), diferencias con el cálculo por par: {diferencias}")
+    print(instantanea.head(3).T)
+
     print("\nPruebas de indicadores completadas.")
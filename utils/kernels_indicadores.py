@@ -0,0 +1,172 @@
+# utils/kernels_indicadores.py
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+# --- Modificación para permitir la ejecución directa del script ---
+current_script_dir = os.path.dirname(os.path.abspath(__file__))
+project_root_dir = os.path.abspath(os.path.join(current_script_dir, '..'))
+if project_root_dir not in sys.path:
+    sys.path.insert(0, project_root_dir)
+# --- Fin de la modificación ---
+
+try:
+    import numba # Opcional: bucles compilados para los indicadores recursivos
+except ImportError:
+    numba = None
+
+# Núcleos de los indicadores recursivos (EMA y RSI de Wilder), que no se pueden expresar
+# con sumas acumuladas como SMA o Bollinger. Hay dos implementaciones con los mismos resultados:
+# - "numba": bucles compilados (solo CPU) que recorren la matriz una vez, fila a fila.
+# - "numpy": NumPy y pandas.ewm (la implementación de siempre), usada si numba no está instalado.
+# KERNELS_INDICADORES=numba|numpy fuerza una de ellas; por defecto se usa numba si está disponible.
+# Aceptan una serie (1-D) o una matriz tiempo × pares (2-D, eje 0 = tiempo) con NaN en las barras que faltan.
+BACKENDS_KERNELS = ("numba", "numpy")
+
+def _elegir_backend(preferido: str | None) -> str:
+    preferido = (preferido or "").strip().lower()
+    if preferido and preferido not in BACKENDS_KERNELS:
+        print(f"Advertencia: KERNELS_INDICADORES='{preferido}' no reconocido; se elige automáticamente.")
+        preferido = ""
+    if preferido == "numba" and numba is None:
+        print("Advertencia: KERNELS_INDICADORES=numba pero numba no está instalado; se usa NumPy.")
+    if preferido == "numpy" or numba is None:
+        return "numpy"
+    return "numba"
+
+BACKEND = _elegir_backend(os.environ.get('KERNELS_INDICADORES'))
+
+def _como_matriz(valores) -> np.ndarray:
+    valores = np.asarray(valores, dtype=np.float64)
+    return valores.reshape(-1, 1) if valores.ndim == 1 else valores
+
+# --- Implementación NumPy/pandas ---
+def _ema_numpy(valores: np.ndarray, span: int) -> np.ndarray:
+    if valores.ndim == 1:
+        return pd.Series(valores).ewm(span=span, adjust=False).mean().to_numpy()
+    return pd.DataFrame(valores).ewm(span=span, adjust=False).mean().to_numpy()
+
+def _rsi_wilder_numpy(cierres: np.ndarray, periodo: int) -> np.ndarray:
+    precios = pd.DataFrame(_como_matriz(cierres))
+    validos = precios.notna().to_numpy()
+    # Cambio respecto al precio válido anterior: los huecos no cuentan como barras
+    delta = (precios - precios.ffill().shift(1)).to_numpy()
+    ganancias = np.where(delta < 0, 0.0, delta)
+    perdidas = np.where(delta > 0, 0.0, -delta)
+    cambios = np.cumsum(~np.isnan(delta), axis=0)
+    # La media de Wilder se siembra con la media simple de los primeros 'periodo' cambios y
+    # desde ahí es una EMA con alpha = 1/periodo (ignorando los huecos)
+    semilla = np.expand_dims(np.argmax(cambios >= periodo, axis=0), 0)
+    con_semilla = cambios[-1] >= periodo
+    medias = []
+    for valores in (ganancias, perdidas):
+        serie = np.where(cambios > periodo, valores, np.nan)
+        suma = np.take_along_axis(np.nancumsum(valores, axis=0), semilla, axis=0)
+        np.put_along_axis(serie, semilla, np.where(con_semilla, suma / periodo, np.nan), axis=0)
+        medias.append(pd.DataFrame(serie).ewm(alpha=1 / periodo, adjust=False, ignore_na=True).mean().to_numpy())
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rsi = 100 - (100 / (1 + medias[0] / medias[1]))
+    rsi[~validos] = np.nan
+    return rsi.reshape(np.shape(cierres))
+
+# --- Implementación numba ---
+if numba is not None:
+    @numba.njit(cache=True)
+    def _ema_numba(valores, alpha, resultado):
+        # Misma recursión que pandas.ewm(adjust=False, ignore_na=False), incluido el
+        # tratamiento de los NaN: el peso de la media anterior decae también en los huecos
+        filas, columnas = valores.shape
+        factor = 1.0 - alpha
+        media = np.full(columnas, np.nan)
+        peso_anterior = np.ones(columnas)
+        for i in range(filas):
+            for j in range(columnas):
+                actual = valores[i, j]
+                observado = actual == actual
+                if media[j] == media[j]:
+                    peso_anterior[j] *= factor
+                    if observado:
+                        if media[j] != actual:
+                            media[j] = (peso_anterior[j] * media[j] + alpha * actual) / (peso_anterior[j] + alpha)
+                        peso_anterior[j] = 1.0
+                elif observado:
+                    media[j] = actual
+                resultado[i, j] = media[j]
+
+    @numba.njit(cache=True)
+    def _rsi_wilder_numba(cierres, periodo, resultado):
+        filas, columnas = cierres.shape
+        anterior = np.full(columnas, np.nan)
+        cambios = np.zeros(columnas, dtype=np.int64)
+        media_ganancias = np.zeros(columnas)
+        media_perdidas = np.zeros(columnas)
+        for i in range(filas):
+            for j in range(columnas):
+                precio = cierres[i, j]
+                resultado[i, j] = np.nan
+                if precio != precio:
+                    continue
+                if anterior[j] != anterior[j]:
+                    anterior[j] = precio
+                    continue
+                delta = precio - anterior[j]
+                anterior[j] = precio
+                ganancia = delta if delta > 0 else 0.0
+                perdida = -delta if delta < 0 else 0.0
+                cambios[j] += 1
+                if cambios[j] <= periodo:
+                    media_ganancias[j] += ganancia
+                    media_perdidas[j] += perdida
+                    if cambios[j] < periodo:
+                        continue
+                    media_ganancias[j] /= periodo
+                    media_perdidas[j] /= periodo
+                else:
+                    media_ganancias[j] = (media_ganancias[j] * (periodo - 1) + ganancia) / periodo
+                    media_perdidas[j] = (media_perdidas[j] * (periodo - 1) + perdida) / periodo
+                if media_perdidas[j] == 0:
+                    resultado[i, j] = 100.0 if media_ganancias[j] > 0 else np.nan
+                else:
+                    resultado[i, j] = 100.0 - 100.0 / (1.0 + media_ganancias[j] / media_perdidas[j])
+
+def ema(valores, span: int, backend: str | None = None) -> np.ndarray:
+    """
+    EMA con adjust=False (misma recursión que pandas.ewm) a lo largo del eje 0.
+    backend ('numba' o 'numpy') sustituye a BACKEND para esta llamada.
+    """
+    valores = np.asarray(valores, dtype=np.float64)
+    if (backend or BACKEND) == "numba" and numba is not None:
+        matriz = np.ascontiguousarray(_como_matriz(valores))
+        resultado = np.empty_like(matriz)
+        _ema_numba(matriz, 2.0 / (span + 1.0), resultado)
+        return resultado.reshape(valores.shape)
+    return _ema_numpy(valores, span)
+
+def rsi_wilder(cierres, periodo: int, backend: str | None = None) -> np.ndarray:
+    """
+    RSI con la media suavizada de Wilder, sembrada con la media simple de los primeros
+    'periodo' cambios (como RSIIncremental con suavizado='wilder'). Los NaN se saltan:
+    el cambio siguiente se mide respecto al último precio válido y su posición queda en NaN.
+    """
+    cierres = np.asarray(cierres, dtype=np.float64)
+    if cierres.size == 0:
+        return np.full(cierres.shape, np.nan)
+    if (backend or BACKEND) == "numba" and numba is not None:
+        matriz = np.ascontiguousarray(_como_matriz(cierres))
+        resultado = np.empty_like(matriz)
+        _rsi_wilder_numba(matriz, int(periodo), resultado)
+        return resultado.reshape(cierres.shape)
+    return _rsi_wilder_numpy(cierres, periodo)
+
+
+# Bloque de prueba
+# (comparaciones con pandas y RSIIncremental en tests/test_kernels_indicadores.py y
+# rendimiento en utils/benchmark_kernels_indicadores.py)
+if __name__ == '__main__':
+    print(f"Backend de kernels: {BACKEND} (numba {'disponible' if numba is not None else 'no instalado'})")
+    cierres = 100 + np.cumsum(np.random.default_rng(11).normal(0, 1, 200))
+    for backend in (b for b in BACKENDS_KERNELS if b == "numpy" or numba is not None):
+        print(f"  {backend}: EMA(12) = {ema(cierres, 12, backend)[-1]:.4f}, RSI(14) Wilder = {rsi_wilder(cierres, 14, backend)[-1]:.2f}")
+    print("\nPrueba de kernels de indicadores completada.")
@@ -0,0 +1,444 @@
+# utils/proveedores_datos.py
+import os
+import sys
+import json
+import re
+import shutil
+import threading
+import time
+import zlib
+from abc import ABC, abstractmethod
+
+import numpy as np
+import pandas as pd
+
+# --- Modificación para permitir la ejecución directa del script ---
+current_script_dir = os.path.dirname(os.path.abspath(__file__))
+project_root_dir = os.path.abspath(os.path.join(current_script_dir, '..'))
+if project_root_dir not in sys.path:
+    sys.path.insert(0, project_root_dir)
+# --- Fin de la modificación ---
+
+try:
+    import pyarrow.parquet as pq # Opcional: solo para los archivos .parquet
+except ImportError:
+    pq = None
+
+# Proveedores de datos de mercado OHLCV con una interfaz común (ProveedorDatos.leer):
+# - ProveedorSimulado: barras deterministas a partir de una semilla; la barra i de un par
+#   y periodo es siempre la misma, se pida sola o dentro de cualquier rango.
+# - ProveedorArchivos: archivos locales CSV (convertidos una vez a columnas binarias que se
+#   leen con np.memmap) o Parquet (solo los grupos de filas del rango, si hay pyarrow).
+# - ProveedorReproduccion: reproduce las barras de otro proveedor a una velocidad dada y,
+#   como proveedor, solo deja ver las barras ya reproducidas.
+# Todos devuelven un DataFrame con columnas open/high/low/close/volume indexado por
+# 'timestamp' (UTC), como it.obtener_datos_historicos_simulados.
+COLUMNAS_OHLCV = ("open", "high", "low", "close", "volume")
+COLUMNA_TIEMPO = "timestamp"
+PERIODOS = {
+    "1m": pd.Timedelta(minutes=1),
+    "5m": pd.Timedelta(minutes=5),
+    "15m": pd.Timedelta(minutes=15),
+    "30m": pd.Timedelta(minutes=30),
+    "1h": pd.Timedelta(hours=1),
+    "4h": pd.Timedelta(hours=4),
+    "1d": pd.Timedelta(days=1),
+    "1w": pd.Timedelta(weeks=1),
+}
+FILAS_POR_TROZO_CSV = 500_000 # Filas leídas a la vez al convertir un CSV
+
+def duracion_periodo(periodo_tiempo: str) -> pd.Timedelta | None:
+    duracion = PERIODOS.get(periodo_tiempo)
+    if duracion is None:
+        print(f"Periodo de tiempo '{periodo_tiempo}' no soportado. Periodos válidos: {list(PERIODOS)}")
+    return duracion
+
+def nombre_seguro(nombre: str) -> str:
+    return re.sub(r"[^\w\-]", "_", nombre)
+
+def a_ns(timestamp) -> int:
+    ts = pd.Timestamp(timestamp)
+    return (ts.tz_localize("UTC") if ts.tzinfo is None else ts.tz_convert("UTC")).value
+
+def _tiempos_ns(serie: pd.Series) -> np.ndarray:
+    """Timestamps (fechas ISO o epoch en s/ms/us/ns) como int64 en ns desde epoch UTC."""
+    if pd.api.types.is_numeric_dtype(serie) and not pd.api.types.is_bool_dtype(serie):
+        valores = serie.to_numpy(dtype=np.int64)
+        magnitud = int(np.abs(valores).max()) if len(valores) else 0
+        unidad = "s" if magnitud < 10**11 else "ms" if magnitud < 10**14 else "us" if magnitud < 10**17 else "ns"
+        return pd.to_datetime(valores, unit=unidad, utc=True).asi8
+    return pd.DatetimeIndex(pd.to_datetime(serie, utc=True)).asi8
+
+def dataframe_ohlcv(tiempos_ns: np.ndarray, columnas: dict) -> pd.DataFrame:
+    indice = pd.DatetimeIndex(pd.to_datetime(np.asarray(tiempos_ns, dtype=np.int64), utc=True), name=COLUMNA_TIEMPO)
+    return pd.DataFrame({c: np.asarray(columnas[c], dtype=np.float64) for c in COLUMNAS_OHLCV}, index=indice)
+
+def rango_indices(tiempos: np.ndarray, desde, hasta, limite: int | None) -> tuple[int, int]:
+    """[inicio, fin) de las filas de tiempos (ordenados) en [desde, hasta], solo las 'limite' últimas si se indica."""
+    inicio = int(np.searchsorted(tiempos, a_ns(desde), side="left")) if desde is not None else 0
+    fin = int(np.searchsorted(tiempos, a_ns(hasta), side="right")) if hasta is not None else len(tiempos)
+    if limite is not None:
+        inicio = max(inicio, fin - limite)
+    return inicio, max(inicio, fin)
+
+
+class ProveedorDatos(ABC):
+    """Interfaz común de los proveedores de datos de mercado."""
+    @abstractmethod
+    def leer(self, simbolo_par: str, periodo_tiempo: str, desde=None, hasta=None, limite: int | None = None) -> pd.DataFrame | None:
+        """
+        Barras OHLCV de [desde, hasta] (ambos incluidos; None = sin límite). Con 'limite' solo
+        las 'limite' últimas del rango. None si el par o el periodo no están disponibles.
+        """
+
+    def obtener(self, simbolo_par: str, periodo_tiempo: str = "1d", limite: int = 100) -> pd.DataFrame | None:
+        """Las 'limite' barras más recientes (la firma de it.obtener_datos_historicos_simulados)."""
+        return self.leer(simbolo_par, periodo_tiempo, limite=limite)
+
+
+class ProveedorSimulado(ProveedorDatos):
+    """
+    Paseo aleatorio geométrico reproducible. Las barras se generan por bloques de
+    barras_por_bloque y cada bloque usa su propio generador, sembrado con (semilla, par,
+    periodo, bloque); el nivel de precio al inicio de cada bloque se acumula una vez y se
+    guarda, así que leer cualquier rango solo genera los bloques que lo cubren.
+    La serie empieza en 'inicio' y termina en 'fin' (por defecto, la última barra cerrada).
+    """
+    def __init__(self, semilla: int = 0, inicio="2020-01-01", fin=None, precio_inicial: float = 3.5,
+                 volatilidad_diaria: float = 0.03, volumen_medio: float = 1_000_000.0, barras_por_bloque: int = 4096):
+        self.semilla = semilla
+        self.inicio_ns = a_ns(inicio)
+        self.fin_ns = a_ns(fin) if fin is not None else None
+        self.precio_inicial = precio_inicial
+        self.volatilidad_diaria = volatilidad_diaria
+        self.volumen_medio = volumen_medio
+        self.barras_por_bloque = barras_por_bloque
+        self._lock = threading.Lock()
+        self._acumulados = {} # (par, periodo) -> [suma de log-rendimientos antes de cada bloque]
+
+    def _generador(self, simbolo_par: str, periodo_tiempo: str, bloque: int) -> np.random.Generator:
+        return np.random.default_rng([self.semilla, zlib.crc32(simbolo_par.encode()), zlib.crc32(periodo_tiempo.encode()), bloque])
+
+    def _sigma(self, duracion: pd.Timedelta) -> float:
+        return self.volatilidad_diaria * np.sqrt(duracion / pd.Timedelta(days=1))
+
+    def _acumulado(self, simbolo_par: str, periodo_tiempo: str, bloque: int, sigma: float) -> float:
+        with self._lock:
+            acumulados = self._acumulados.setdefault((simbolo_par, periodo_tiempo), [0.0])
+            while len(acumulados) <= bloque:
+                # El primer valor que saca el generador del bloque son sus rendimientos (ver _bloque)
+                retornos = self._generador(simbolo_par, periodo_tiempo, len(acumulados) - 1).normal(0.0, sigma, self.barras_por_bloque)
+                acumulados.append(acumulados[-1] + float(retornos.sum()))
+            return acumulados[bloque]
+
+    def _bloque(self, simbolo_par: str, periodo_tiempo: str, bloque: int, sigma: float) -> dict:
+        generador = self._generador(simbolo_par, periodo_tiempo, bloque)
+        n = self.barras_por_bloque
+        retornos = generador.normal(0.0, sigma, n)
+        mechas = np.abs(generador.normal(0.0, sigma / 2, (2, n)))
+        volumen = generador.lognormal(np.log(self.volumen_medio), 0.5, n)
+        log_cierre = np.log(self.precio_inicial) + self._acumulado(simbolo_par, periodo_tiempo, bloque, sigma) + np.cumsum(retornos)
+        log_apertura = np.concatenate(([log_cierre[0] - retornos[0]], log_cierre[:-1]))
+        apertura, cierre = np.exp(log_apertura), np.exp(log_cierre)
+        return {
+            "open": apertura,
+            "high": np.maximum(apertura, cierre) * np.exp(mechas[0]),
+            "low": np.minimum(apertura, cierre) * np.exp(-mechas[1]),
+            "close": cierre,
+            "volume": volumen,
+        }
+
+    def num_barras(self, periodo_tiempo: str) -> int:
+        duracion = duracion_periodo(periodo_tiempo)
+        if duracion is None:
+            return 0
+        fin_ns = self.fin_ns if self.fin_ns is not None else pd.Timestamp.now(tz="UTC").floor(duracion).value - duracion.value
+        return max(0, (fin_ns - self.inicio_ns) // duracion.value + 1)
+
+    def leer(self, simbolo_par: str, periodo_tiempo: str, desde=None, hasta=None, limite: int | None = None) -> pd.DataFrame | None:
+        duracion = duracion_periodo(periodo_tiempo)
+        if duracion is None:
+            return None
+        paso, total = duracion.value, self.num_barras(periodo_tiempo)
+        primera = max(0, -(-(a_ns(desde) - self.inicio_ns) // paso)) if desde is not None else 0
+        ultima = min(total - 1, (a_ns(hasta) - self.inicio_ns) // paso) if hasta is not None else total - 1
+        if limite is not None:
+            primera = max(primera, ultima - limite + 1)
+        if ultima < primera:
+            return dataframe_ohlcv(np.empty(0, dtype=np.int64), {c: [] for c in COLUMNAS_OHLCV})
+
+        sigma = self._sigma(duracion)
+        n = self.barras_por_bloque
+        partes = {c: [] for c in COLUMNAS_OHLCV}
+        for bloque in range(primera // n, ultima // n + 1):
+            columnas = self._bloque(simbolo_par, periodo_tiempo, bloque, sigma)
+            corte = slice(max(primera, bloque * n) - bloque * n, min(ultima, bloque * n + n - 1) - bloque * n + 1)
+            for c in COLUMNAS_OHLCV:
+                partes[c].append(columnas[c][corte])
+        tiempos = self.inicio_ns + np.arange(primera, ultima + 1, dtype=np.int64) * paso
+        return dataframe_ohlcv(tiempos, {c: np.concatenate(partes[c]) for c in COLUMNAS_OHLCV})
+
+
+class ProveedorArchivos(ProveedorDatos):
+    """
+    Archivos OHLCV locales, uno por par y periodo: '<directorio>/<PAR>_<periodo>.csv' o
+    '.parquet' (p. ej. 'WLD_USDT_1m.csv'), con una columna de tiempo ('timestamp' o la
+    primera; fechas ISO o epoch) y open/high/low/close/volume, ordenados por tiempo.
+    Un CSV se convierte la primera vez a columnas binarias en '<directorio>/.columnas/'
+    (como en rdf_utils/almacen_series.py) y desde entonces se lee con np.memmap: un rango
+    se localiza por búsqueda binaria sin cargar el archivo. Si el CSV cambia se vuelve a
+    convertir. Los Parquet se leen con pyarrow, solo los grupos de filas cuyo rango de
+    tiempos (estadísticas del archivo) toca el pedido.
+    """
+    def __init__(self, directorio: str):
+        self.directorio = directorio
+        self._lock = threading.Lock()
+
+    def ruta_archivo(self, simbolo_par: str, periodo_tiempo: str, extension: str) -> str:
+        return os.path.join(self.directorio, f"{nombre_seguro(simbolo_par)}_{periodo_tiempo}.{extension}")
+
+    def _ruta_columnas(self, simbolo_par: str, periodo_tiempo: str) -> str:
+        return os.path.join(self.directorio, ".columnas", f"{nombre_seguro(simbolo_par)}_{periodo_tiempo}")
+
+    def escribir(self, simbolo_par: str, periodo_tiempo: str, df: pd.DataFrame, formato: str = "csv") -> str:
+        """Escribe un DataFrame OHLCV en el formato que lee este proveedor. Devuelve la ruta."""
+        os.makedirs(self.directorio, exist_ok=True)
+        ruta = self.ruta_archivo(simbolo_par, periodo_tiempo, formato)
+        datos = df[list(COLUMNAS_OHLCV)].rename_axis(COLUMNA_TIEMPO)
+        if formato == "parquet":
+            if pq is None:
+                raise ImportError("Escribir archivos Parquet requiere pyarrow.")
+            datos.to_parquet(ruta, row_group_size=100_000)
+        else:
+            datos.to_csv(ruta, date_format="%Y-%m-%dT%H:%M:%S%z")
+        return ruta
+
+    def _origen(self, ruta: str) -> dict:
+        estado = os.stat(ruta)
+        return {"tamaño": estado.st_size, "mtime_ns": estado.st_mtime_ns}
+
+    def _columnas_csv(self, ruta_csv: str, ruta_columnas: str) -> int | None:
+        """Convierte el CSV a columnas binarias si hace falta. Devuelve el número de filas."""
+        with self._lock:
+            origen = self._origen(ruta_csv)
+            ruta_meta = os.path.join(ruta_columnas, "origen.json")
+            if os.path.exists(ruta_meta):
+                with open(ruta_meta, "r", encoding="utf-8") as f:
+                    meta = json.load(f)
+                if {k: meta.get(k) for k in origen} == origen:
+                    return meta["filas"]
+            try:
+                filas = self._convertir_csv(ruta_csv, ruta_columnas, origen)
+            except (OSError, ValueError, KeyError) as e:
+                print(f"ProveedorArchivos: Error al convertir '{ruta_csv}': {e}")
+                return None
+            print(f"ProveedorArchivos: '{os.path.basename(ruta_csv)}' convertido a columnas ({filas} filas).")
+            return filas
+
+    def _convertir_csv(self, ruta_csv: str, ruta_columnas: str, origen: dict) -> int:
+        temporal = ruta_columnas + ".tmp"
+        shutil.rmtree(temporal, ignore_errors=True)
+        os.makedirs(temporal)
+        archivos = {c: open(os.path.join(temporal, f"{c}.{'i8' if c == COLUMNA_TIEMPO else 'f8'}"), "wb")
+                    for c in (COLUMNA_TIEMPO,) + COLUMNAS_OHLCV}
+        filas, ultimo, ordenado = 0, np.iinfo(np.int64).min, True
+        try:
+            for trozo in pd.read_csv(ruta_csv, chunksize=FILAS_POR_TROZO_CSV):
+                trozo.columns = [str(c).strip().lower() for c in trozo.columns]
+                columna_tiempo = COLUMNA_TIEMPO if COLUMNA_TIEMPO in trozo.columns else trozo.columns[0]
+                tiempos = _tiempos_ns(trozo[columna_tiempo])
+                if len(tiempos):
+                    ordenado = ordenado and ultimo <= tiempos[0] and bool(np.all(np.diff(tiempos) >= 0))
+                    ultimo = tiempos[-1]
+                tiempos.astype(np.int64).tofile(archivos[COLUMNA_TIEMPO])
+                for c in COLUMNAS_OHLCV:
+                    trozo[c].to_numpy(dtype=np.float64).tofile(archivos[c])
+                filas += len(trozo)
+        finally:
+            for archivo in archivos.values():
+                archivo.close()
+
+        if not ordenado:
+            # Caso poco habitual: se ordena en memoria una única vez
+            print(f"ProveedorArchivos: '{os.path.basename(ruta_csv)}' no está ordenado por tiempo; se ordena al convertirlo.")
+            orden = np.argsort(np.fromfile(os.path.join(temporal, f"{COLUMNA_TIEMPO}.i8"), dtype=np.int64), kind="stable")
+            for c in (COLUMNA_TIEMPO,) + COLUMNAS_OHLCV:
+                ruta = os.path.join(temporal, f"{c}.{'i8' if c == COLUMNA_TIEMPO else 'f8'}")
+                np.fromfile(ruta, dtype=np.int64 if c == COLUMNA_TIEMPO else np.float64)[orden].tofile(ruta)
+
+        with open(os.path.join(temporal, "origen.json"), "w", encoding="utf-8") as f:
+            json.dump({**origen, "filas": filas}, f)
+        shutil.rmtree(ruta_columnas, ignore_errors=True)
+        os.replace(temporal, ruta_columnas)
+        return filas
+
+    def _leer_csv(self, simbolo_par: str, periodo_tiempo: str, desde, hasta, limite) -> pd.DataFrame | None:
+        ruta_columnas = self._ruta_columnas(simbolo_par, periodo_tiempo)
+        filas = self._columnas_csv(self.ruta_archivo(simbolo_par, periodo_tiempo, "csv"), ruta_columnas)
+        if filas is None:
+            return None
+        abrir = lambda c, dtype: (np.memmap(os.path.join(ruta_columnas, f"{c}.{'i8' if dtype is np.int64 else 'f8'}"),
+                                            dtype=dtype, mode="r", shape=(filas,)) if filas else np.empty(0, dtype=dtype))
+        tiempos = abrir(COLUMNA_TIEMPO, np.int64)
+        inicio, fin = rango_indices(tiempos, desde, hasta, limite)
+        return dataframe_ohlcv(np.array(tiempos[inicio:fin]), {c: np.array(abrir(c, np.float64)[inicio:fin]) for c in COLUMNAS_OHLCV})
+
+    def _leer_parquet(self, ruta: str, desde, hasta, limite) -> pd.DataFrame | None:
+        archivo = pq.ParquetFile(ruta)
+        nombres = [n.lower() for n in archivo.schema_arrow.names]
+        columna_tiempo = archivo.schema_arrow.names[nombres.index(COLUMNA_TIEMPO) if COLUMNA_TIEMPO in nombres else 0]
+        indice_tiempo = archivo.schema_arrow.get_field_index(columna_tiempo)
+        desde_ns = a_ns(desde) if desde is not None else None
+        hasta_ns = a_ns(hasta) if hasta is not None else None
+
+        grupos = []
+        for g in range(archivo.num_row_groups):
+            estadisticas = archivo.metadata.row_group(g).column(indice_tiempo).statistics
+            if estadisticas is not None and estadisticas.has_min_max:
+                minimo, maximo = (_tiempos_ns(pd.Series([v]))[0] for v in (estadisticas.min, estadisticas.max))
+                if (desde_ns is not None and maximo < desde_ns) or (hasta_ns is not None and minimo > hasta_ns):
+                    continue
+            grupos.append(g)
+        if limite is not None:
+            # Con un límite basta con los últimos grupos del rango que sumen 'limite' filas
+            necesarios, filas = [], 0
+            for g in reversed(grupos):
+                necesarios.insert(0, g)
+                filas += archivo.metadata.row_group(g).num_rows
+                if filas >= limite and hasta_ns is None:
+                    break
+            grupos = necesarios
+
+        columnas = [columna_tiempo] + [archivo.schema_arrow.names[nombres.index(c)] for c in COLUMNAS_OHLCV]
+        df = archivo.read_row_groups(grupos, columns=columnas).to_pandas() if grupos else pd.DataFrame(columns=columnas)
+        df.columns = [str(c).lower() for c in df.columns]
+        tiempos = _tiempos_ns(df[df.columns[0]])
+        orden = np.argsort(tiempos, kind="stable")
+        tiempos = tiempos[orden]
+        inicio, fin = rango_indices(tiempos, desde, hasta, limite)
+        return dataframe_ohlcv(tiempos[inicio:fin], {c: df[c].to_numpy(dtype=np.float64)[orden][inicio:fin] for c in COLUMNAS_OHLCV})
+
+    def leer(self, simbolo_par: str, periodo_tiempo: str, desde=None, hasta=None, limite: int | None = None) -> pd.DataFrame | None:
+        ruta_parquet = self.ruta_archivo(simbolo_par, periodo_tiempo, "parquet")
+        if os.path.exists(ruta_parquet):
+            if pq is not None:
+                try:
+                    return self._leer_parquet(ruta_parquet, desde, hasta, limite)
+                except (OSError, ValueError, KeyError) as e:
+                    print(f"ProveedorArchivos: Error al leer '{ruta_parquet}': {e}")
+                    return None
+            print(f"ProveedorArchivos: '{ruta_parquet}' requiere pyarrow; se intenta con el CSV.")
+        if os.path.exists(self.ruta_archivo(simbolo_par, periodo_tiempo, "csv")):
+            return self._leer_csv(simbolo_par, periodo_tiempo, desde, hasta, limite)
+        print(f"ProveedorArchivos: No hay datos de '{simbolo_par}' ({periodo_tiempo}) en '{self.directorio}'.")
+        return None
+
+
+class ProveedorReproduccion(ProveedorDatos):
+    """
+    Reproduce las barras grabadas de otro proveedor. reproducir() las entrega una a una
+    respetando el tiempo entre barras dividido por 'velocidad' (velocidad=None: sin esperas)
+    y avanza el reloj de reproducción; leer() devuelve solo barras con timestamp <= reloj,
+    de modo que el resto del sistema ve el mercado tal como estaba en ese momento.
+    """
+    def __init__(self, fuente: ProveedorDatos, velocidad: float | None = 1.0, barras_por_lectura: int = 1000):
+        self.fuente = fuente
+        self.velocidad = velocidad
+        self.barras_por_lectura = barras_por_lectura
+        self.reloj = None # Timestamp de la última barra reproducida
+        self._detener = threading.Event()
+
+    def avanzar_hasta(self, timestamp):
+        self.reloj = pd.Timestamp(a_ns(timestamp), tz="UTC")
+
+    def detener(self):
+        self._detener.set()
+
+    def reproducir(self, simbolo_par: str, periodo_tiempo: str, desde, hasta=None):
+        """Generador de (timestamp, {columna: valor}) con las barras de [desde, hasta] (hasta=None: hasta el final)."""
+        duracion = duracion_periodo(periodo_tiempo)
+        if duracion is None:
+            return
+        self._detener.clear()
+        cursor = pd.Timestamp(a_ns(desde), tz="UTC")
+        fin = pd.Timestamp(a_ns(hasta), tz="UTC") if hasta is not None else None
+        inicio_real, inicio_mercado = None, None
+        while not self._detener.is_set():
+            limite_bloque = cursor + duracion * (self.barras_por_lectura - 1)
+            bloque = self.fuente.leer(simbolo_par, periodo_tiempo, desde=cursor,
+                                      hasta=min(limite_bloque, fin) if fin is not None else limite_bloque)
+            if bloque is None or bloque.empty:
+                return
+            for timestamp, fila in zip(bloque.index, bloque.itertuples(index=False)):
+                if self._detener.is_set():
+                    return
+                if self.velocidad:
+                    inicio_real = inicio_real if inicio_real is not None else time.monotonic()
+                    inicio_mercado = inicio_mercado if inicio_mercado is not None else timestamp
+                    espera = inicio_real + (timestamp - inicio_mercado).total_seconds() / self.velocidad - time.monotonic()
+                    if espera > 0 and self._detener.wait(espera):
+                        return
+                self.reloj = timestamp
+                yield timestamp, dict(zip(COLUMNAS_OHLCV, fila))
+            cursor = bloque.index[-1] + duracion
+
+    def leer(self, simbolo_par: str, periodo_tiempo: str, desde=None, hasta=None, limite: int | None = None) -> pd.DataFrame | None:
+        if self.reloj is not None:
+            hasta = self.reloj if hasta is None else min(pd.Timestamp(a_ns(hasta), tz="UTC"), self.reloj)
+        return self.fuente.leer(simbolo_par, periodo_tiempo, desde=desde, hasta=hasta, limite=limite)
+
+
+def crear_proveedor(tipo: str = "simulado", directorio: str | None = None, semilla: int = 0) -> ProveedorDatos:
+    """Proveedor según la configuración ('simulado' o 'archivos')."""
+    if tipo == "archivos":
+        if not directorio:
+            raise ValueError("El proveedor 'archivos' necesita un directorio de datos de mercado.")
+        return ProveedorArchivos(directorio)
+    if tipo != "simulado":
+        print(f"Proveedor de datos '{tipo}' desconocido; se usa el simulado.")
+    return ProveedorSimulado(semilla=semilla)
+
+
+# Bloque de prueba
+if __name__ == '__main__':
+    import tempfile
+    print("Probando proveedores de datos de mercado...")
+
+    simulado = ProveedorSimulado(semilla=7, inicio="2023-01-01", fin="2024-12-31 23:59")
+    inicio_t = time.perf_counter()
+    completo = simulado.leer("WLD/USDT", "1m")
+    print(f"  Simulado: {len(completo)} barras de 1m en {time.perf_counter() - inicio_t:.2f}s; "
+          f"cierre final {completo['close'].iloc[-1]:.4f}")
+    rango = simulado.leer("WLD/USDT", "1m", desde="2024-06-01", hasta="2024-06-01 00:09")
+    print(f"  Rango de 10 barras igual a la serie completa: {rango.equals(completo.loc[rango.index])}")
+    otra = ProveedorSimulado(semilla=7, inicio="2023-01-01", fin="2024-12-31 23:59").obtener("WLD/USDT", "1m", 5)
+    print(f"  Otra instancia con la misma semilla da las mismas barras: {otra.equals(completo.tail(5))}")
+    print(f"  Otro par es otra serie: {not simulado.obtener('BTC/USDT', '1m', 5)['close'].equals(otra['close'])}")
+    print(f"  OHLC coherente: {bool(((completo['high'] >= completo[['open', 'close']].max(axis=1)) & (completo['low'] <= completo[['open', 'close']].min(axis=1))).all())}")
+
+    with tempfile.TemporaryDirectory() as directorio:
+        archivos = ProveedorArchivos(directorio)
+        inicio_t = time.perf_counter()
+        ruta = archivos.escribir("WLD/USDT", "1m", completo.loc["2024-05-01":"2024-07-31"])
+        print(f"\n  CSV de {os.path.getsize(ruta) / 1e6:.0f} MB escrito en {time.perf_counter() - inicio_t:.2f}s")
+        inicio_t = time.perf_counter()
+        ultimas = archivos.obtener("WLD/USDT", "1m", 100)
+        print(f"  Primera lectura (convierte a columnas): {time.perf_counter() - inicio_t:.2f}s")
+        inicio_t = time.perf_counter()
+        for _ in range(100):
+            ultimas = archivos.obtener("WLD/USDT", "1m", 100)
+        print(f"  Lecturas siguientes de 100 barras (memmap): {(time.perf_counter() - inicio_t) * 10:.2f} ms cada una")
+        rango_csv = archivos.leer("WLD/USDT", "1m", desde="2024-06-01", hasta="2024-06-01 00:09")
+        print(f"  Mismo rango que el simulado: {np.allclose(rango_csv.to_numpy(), rango.to_numpy(), rtol=1e-12)} "
+              f"{rango_csv.index.equals(rango.index)}")
+        print(f"  Par inexistente: {archivos.obtener('XYZ/USDT', '1m', 10)}")
+
+        print("\n  Reproducción de 5 barras de 1m a 600x (una barra cada 0.1s):")
+        reproduccion = ProveedorReproduccion(archivos, velocidad=600)
+        inicio_t = time.perf_counter()
+        for i, (timestamp, barra) in enumerate(reproduccion.reproducir("WLD/USDT", "1m", desde="2024-06-01")):
+            visibles = reproduccion.obtener("WLD/USDT", "1m", 3)
+            print(f"    {time.perf_counter() - inicio_t:.2f}s {timestamp} close={barra['close']:.4f} "
+                  f"última visible={visibles.index[-1]}")
+            if i == 4:
+                break
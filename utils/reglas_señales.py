@@ -0,0 +1,254 @@
+# utils/reglas_señales.py
+import os
+import sys
+from dataclasses import dataclass
+
+import numpy as np
+
+# --- Modificación para permitir la ejecución directa del script ---
+current_script_dir = os.path.dirname(os.path.abspath(__file__))
+project_root_dir = os.path.abspath(os.path.join(current_script_dir, '..'))
+if project_root_dir not in sys.path:
+    sys.path.insert(0, project_root_dir)
+# --- Fin de la modificación ---
+
+# Reglas de señales técnicas declaradas como datos (umbrales, cruces, toques de bandas) y
+# compiladas a predicados vectorizados. Cada regla compara un componente de una
+# configuración de indicador (operando izquierdo) con un umbral fijo, con otro componente
+# o con el precio de cierre (operando derecho). Los operandos se leen de una matriz con una
+# fila por contexto (un par/estrategia en el ciclo en vivo, o una barra en el backtesting)
+# y una columna por (configuración, componente); una sola evaluación resuelve todas las
+# reglas para todas las filas. Los cruces comparan además con la fila "previa" (el valor
+# de la barra anterior). En el grafo las reglas son individuos trade:ReglaSeñal (ver
+# agentes/registro_reglas_señal.py).
+
+OPERADORES_REGLA = ("MENOR_QUE", "MAYOR_QUE", "MENOR_IGUAL", "MAYOR_IGUAL", "CRUCE_ALCISTA", "CRUCE_BAJISTA")
+PRECIO = "precio" # Operando especial: el precio de cierre del par
+FILAS_POR_BLOQUE = 1 << 18 # Filas evaluadas a la vez en series largas (limita la memoria temporal)
+
+@dataclass(frozen=True)
+class ReglaSeñal:
+    id: str
+    tipo_señal: str # Valor de trade:tiposeñal de la señal generada
+    config: str # ID local de la configuración del operando izquierdo
+    operador: str
+    componente: str = "valor"
+    umbral: float | None = None # Operando derecho fijo...
+    compara_con: str | None = None # ...o un componente (o PRECIO)...
+    compara_con_config: str | None = None # ...de esta configuración (por defecto, la misma)
+    plantilla: str = "" # Descripción; admite {valor}, {referencia} y {par}
+    estrategia: str | None = None # Si se indica, la regla solo se aplica a esa estrategia
+
+    def validar(self) -> str | None:
+        """Motivo por el que la regla no es válida, o None."""
+        if self.operador not in OPERADORES_REGLA:
+            return f"operador '{self.operador}' desconocido"
+        if (self.umbral is None) == (self.compara_con is None):
+            return "debe tener un umbral o un operando con el que comparar (solo uno)"
+        if self.umbral is not None and not np.isfinite(self.umbral):
+            return "umbral no válido"
+        return None
+
+    def operando_derecho(self) -> tuple[str, str] | None:
+        if self.compara_con is None:
+            return None
+        if self.compara_con == PRECIO and self.compara_con_config is None:
+            return (PRECIO, PRECIO)
+        return (self.compara_con_config or self.config, self.compara_con)
+
+    def describir(self, valor: float, referencia: float, par: str) -> str:
+        if not self.plantilla:
+            return f"{self.tipo_señal}: {self.componente} de {self.config} ({valor:.4f}) frente a {referencia:.4f} para {par}."
+        try:
+            return self.plantilla.format(valor=valor, referencia=referencia, par=par)
+        except (KeyError, ValueError, IndexError) as e:
+            print(f"Error en la plantilla de la regla {self.id}: {e}")
+            return f"{self.tipo_señal} para {par}."
+
+# Reglas que usa el agente cuando el grafo no tiene ninguna trade:ReglaSeñal
+REGLAS_PREDETERMINADAS = (
+    ReglaSeñal("ReglaSobreventaRSI14", "SOBREVENTA_RSI", "ConfigRSI14", "MENOR_QUE", umbral=30,
+               plantilla="RSI ({valor:.2f}) indica sobreventa para {par}."),
+    ReglaSeñal("ReglaSobrecompraRSI14", "SOBRECOMPRA_RSI", "ConfigRSI14", "MAYOR_QUE", umbral=70,
+               plantilla="RSI ({valor:.2f}) indica sobrecompra para {par}."),
+    ReglaSeñal("ReglaPrecioSobreSMA20", "PRECIO_SOBRE_SMA20", "ConfigSMA20", "MENOR_QUE", compara_con=PRECIO,
+               plantilla="Precio actual ({referencia:.4f}) está por encima de SMA20 ({valor:.4f}) para {par}."),
+    ReglaSeñal("ReglaPrecioBajoSMA20", "PRECIO_BAJO_SMA20", "ConfigSMA20", "MAYOR_QUE", compara_con=PRECIO,
+               plantilla="Precio actual ({referencia:.4f}) está por debajo de SMA20 ({valor:.4f}) para {par}."),
+    ReglaSeñal("ReglaCruceAlcistaMACD", "CRUCE_ALCISTA_MACD", "ConfigMACD12_26_9", "CRUCE_ALCISTA",
+               componente="macd", compara_con="señal",
+               plantilla="La línea MACD ({valor:.4f}) cruza por encima de su señal ({referencia:.4f}) para {par}."),
+    ReglaSeñal("ReglaCruceBajistaMACD", "CRUCE_BAJISTA_MACD", "ConfigMACD12_26_9", "CRUCE_BAJISTA",
+               componente="macd", compara_con="señal",
+               plantilla="La línea MACD ({valor:.4f}) cruza por debajo de su señal ({referencia:.4f}) para {par}."),
+    ReglaSeñal("ReglaPrecioBandaSuperiorBB", "PRECIO_TOCA_BANDA_SUPERIOR", "ConfigBB20_2", "MENOR_IGUAL",
+               componente="superior", compara_con=PRECIO,
+               plantilla="Precio actual ({referencia:.4f}) toca la banda superior de Bollinger ({valor:.4f}) para {par}."),
+    ReglaSeñal("ReglaPrecioBandaInferiorBB", "PRECIO_TOCA_BANDA_INFERIOR", "ConfigBB20_2", "MAYOR_IGUAL",
+               componente="inferior", compara_con=PRECIO,
+               plantilla="Precio actual ({referencia:.4f}) toca la banda inferior de Bollinger ({valor:.4f}) para {par}."),
+)
+
+def reglas_de_estrategia(reglas, nombre_estrategia: str | None) -> list[ReglaSeñal]:
+    """
+    Reglas que se aplican a una estrategia: las suyas y las generales, salvo las generales de
+    un tipo de señal para el que la estrategia tiene reglas propias.
+    """
+    propias = [r for r in reglas if r.estrategia is not None and r.estrategia == nombre_estrategia]
+    tipos_propios = {r.tipo_señal for r in propias}
+    return [r for r in reglas if r.estrategia is None and r.tipo_señal not in tipos_propios] + propias
+
+class ReglasCompiladas:
+    """
+    Conjunto de reglas listo para evaluar. Cada operando (configuración, componente) recibe
+    una columna; las reglas se agrupan por operador y cada grupo se evalúa con una sola
+    operación de NumPy sobre las columnas que usa.
+    """
+    def __init__(self, reglas):
+        self.reglas = []
+        for regla in reglas:
+            motivo = regla.validar()
+            if motivo:
+                print(f"Regla de señal '{regla.id}' ignorada: {motivo}.")
+            else:
+                self.reglas.append(regla)
+        self.columnas = {(PRECIO, PRECIO): 0} # (config, componente) -> índice de columna
+        columna = lambda clave: self.columnas.setdefault(clave, len(self.columnas))
+        self.izquierda = np.array([columna((r.config, r.componente)) for r in self.reglas], dtype=np.intp)
+        derechos = [r.operando_derecho() for r in self.reglas]
+        # Las reglas con umbral leen una columna cualquiera (la 0) y la sustituyen por el umbral
+        self.derecha = np.array([columna(d) if d else 0 for d in derechos], dtype=np.intp)
+        self.umbrales = np.array([np.nan if r.umbral is None else float(r.umbral) for r in self.reglas])
+        self.usa_umbral = ~np.isnan(self.umbrales)
+        operadores = np.array([r.operador for r in self.reglas])
+        self.grupos = {op: np.flatnonzero(operadores == op) for op in OPERADORES_REGLA if np.any(operadores == op)}
+        self.configs = sorted({c for c, _ in self.columnas if c != PRECIO})
+        self._mascaras = {}
+
+    def __len__(self):
+        return len(self.reglas)
+
+    def fila(self, valores_por_config: dict, precio: float) -> np.ndarray:
+        """Fila de operandos a partir de {config: {componente: valor}} y el precio (NaN si falta)."""
+        fila = np.full(len(self.columnas), np.nan)
+        fila[0] = precio if precio is not None else np.nan
+        for (config, componente), indice in self.columnas.items():
+            valor = valores_por_config.get(config, {}).get(componente) if config != PRECIO else None
+            if valor is not None:
+                fila[indice] = valor
+        return fila
+
+    def matriz_series(self, columnas_indicadores: dict, cierres: np.ndarray) -> np.ndarray:
+        """Matriz (barras × columnas) a partir de las columnas del motor por lotes y los cierres."""
+        matriz = np.full((len(cierres), len(self.columnas)), np.nan)
+        matriz[:, 0] = cierres
+        for (config, componente), indice in self.columnas.items():
+            serie = columnas_indicadores.get(config, {}).get(componente) if config != PRECIO else None
+            if serie is not None:
+                matriz[:, indice] = serie
+        return matriz
+
+    def mascara_estrategias(self, estrategias: list[str | None]) -> np.ndarray:
+        """Matriz (filas × reglas) con las reglas aplicables a la estrategia de cada fila (reglas_de_estrategia)."""
+        for nombre in set(estrategias) - self._mascaras.keys():
+            aplicables = {id(r) for r in reglas_de_estrategia(self.reglas, nombre)}
+            self._mascaras[nombre] = np.array([id(r) in aplicables for r in self.reglas], dtype=bool)
+        return np.array([self._mascaras[nombre] for nombre in estrategias]).reshape(len(estrategias), len(self.reglas))
+
+    def _evaluar_bloque(self, actuales: np.ndarray, previos: np.ndarray | None) -> np.ndarray:
+        resultado = np.zeros((len(actuales), len(self.reglas)), dtype=bool)
+        for operador, indices in self.grupos.items():
+            izquierda = actuales[:, self.izquierda[indices]]
+            derecha = np.where(self.usa_umbral[indices], self.umbrales[indices], actuales[:, self.derecha[indices]])
+            if operador == "MENOR_QUE":
+                resultado[:, indices] = izquierda < derecha
+            elif operador == "MAYOR_QUE":
+                resultado[:, indices] = izquierda > derecha
+            elif operador == "MENOR_IGUAL":
+                resultado[:, indices] = izquierda <= derecha
+            elif operador == "MAYOR_IGUAL":
+                resultado[:, indices] = izquierda >= derecha
+            elif previos is not None:
+                izquierda_previa = previos[:, self.izquierda[indices]]
+                derecha_previa = np.where(self.usa_umbral[indices], self.umbrales[indices], previos[:, self.derecha[indices]])
+                if operador == "CRUCE_ALCISTA":
+                    resultado[:, indices] = (izquierda_previa <= derecha_previa) & (izquierda > derecha)
+                else:
+                    resultado[:, indices] = (izquierda_previa >= derecha_previa) & (izquierda < derecha)
+        return resultado
+
+    def evaluar(self, actuales: np.ndarray, previos: np.ndarray | None = None, aplicables: np.ndarray | None = None) -> np.ndarray:
+        """
+        Matriz (filas × reglas) con las reglas que se cumplen en cada fila. 'previos' son los
+        operandos de la barra anterior de cada fila (sin ellos ningún cruce se cumple) y
+        'aplicables' una máscara opcional como la de mascara_estrategias.
+        """
+        resultado = self._evaluar_bloque(np.atleast_2d(actuales), None if previos is None else np.atleast_2d(previos))
+        return resultado & aplicables if aplicables is not None else resultado
+
+    def evaluar_serie(self, matriz: np.ndarray) -> np.ndarray:
+        """Evalúa una serie temporal (una barra por fila); la fila previa de cada barra es la anterior."""
+        resultado = np.zeros((len(matriz), len(self.reglas)), dtype=bool)
+        for inicio in range(0, len(matriz), FILAS_POR_BLOQUE):
+            fin = min(inicio + FILAS_POR_BLOQUE, len(matriz))
+            if inicio == 0:
+                # La primera barra no tiene anterior: sus cruces quedan en False
+                previos = np.vstack([np.full((1, matriz.shape[1]), np.nan), matriz[:fin - 1]])
+            else:
+                previos = matriz[inicio - 1:fin - 1]
+            resultado[inicio:fin] = self._evaluar_bloque(matriz[inicio:fin], previos)
+        return resultado
+
+    def valores(self, actuales: np.ndarray, indice_regla: int) -> tuple[float, float]:
+        """(valor, referencia) de una regla en una fila, para describir la señal."""
+        valor = float(actuales[self.izquierda[indice_regla]])
+        referencia = self.umbrales[indice_regla] if self.usa_umbral[indice_regla] else actuales[self.derecha[indice_regla]]
+        return valor, float(referencia)
+
+    def señales_por_tipo(self, resultado: np.ndarray) -> dict:
+        """{tipo_señal: np.ndarray[bool]} uniendo (OR) las reglas de cada tipo."""
+        señales = {}
+        for indice, regla in enumerate(self.reglas):
+            columna = resultado[:, indice]
+            señales[regla.tipo_señal] = señales[regla.tipo_señal] | columna if regla.tipo_señal in señales else columna.copy()
+        return señales
+
+
+# Bloque de prueba
+if __name__ == '__main__':
+    import time
+    print("Probando ReglasCompiladas...")
+    compiladas = ReglasCompiladas(REGLAS_PREDETERMINADAS)
+    print(f"  {len(compiladas)} reglas, {len(compiladas.columnas)} columnas de operandos, operadores: {list(compiladas.grupos)}")
+
+    valores = {
+        "ConfigRSI14": {"valor": 25.0},
+        "ConfigSMA20": {"valor": 3.40},
+        "ConfigMACD12_26_9": {"macd": 0.012, "señal": 0.010, "histograma": 0.002},
+        "ConfigBB20_2": {"media": 3.40, "superior": 3.55, "inferior": 3.25},
+    }
+    previos = {**valores, "ConfigMACD12_26_9": {"macd": 0.008, "señal": 0.010, "histograma": -0.002}}
+    actual, previa = compiladas.fila(valores, 3.60), compiladas.fila(previos, 3.50)
+    activas = np.flatnonzero(compiladas.evaluar(actual, previa)[0])
+    for indice in activas:
+        regla = compiladas.reglas[indice]
+        print(f"  {regla.tipo_señal}: {regla.describir(*compiladas.valores(actual, indice), 'WLD_USDT')}")
+
+    invalida = ReglaSeñal("ReglaMal", "X", "ConfigRSI14", "ENTRE", umbral=1)
+    ReglasCompiladas([invalida])
+
+    # 500 reglas × 200 pares en un solo lote
+    rng = np.random.default_rng(0)
+    configs = [f"ConfigRSI{p}" for p in range(5, 55)]
+    reglas = [ReglaSeñal(f"Regla{i}", f"TIPO_{i % 25}", configs[i % len(configs)],
+                         OPERADORES_REGLA[i % len(OPERADORES_REGLA)], umbral=float(rng.uniform(20, 80)))
+              for i in range(500)]
+    inicio = time.perf_counter()
+    compiladas = ReglasCompiladas(reglas)
+    print(f"  Compilación de 500 reglas: {(time.perf_counter() - inicio) * 1000:.2f} ms")
+    actuales = rng.uniform(0, 100, (200, len(compiladas.columnas)))
+    previos = rng.uniform(0, 100, (200, len(compiladas.columnas)))
+    aplicables = compiladas.mascara_estrategias([None] * 200)
+    inicio = time.perf_counter()
+    resultado = compiladas.evaluar(actuales, previos, aplicables)
+    print(f"  500 reglas × 200 pares: {(time.perf_counter() - inicio) * 1000:.2f} ms ({int(resultado.sum())} señales)")
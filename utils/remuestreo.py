@@ -0,0 +1,246 @@
+# utils/remuestreo.py
+import os
+import sys
+import threading
+
+import numpy as np
+import pandas as pd
+
+# --- Modificación para permitir la ejecución directa del script ---
+current_script_dir = os.path.dirname(os.path.abspath(__file__))
+project_root_dir = os.path.abspath(os.path.join(current_script_dir, '..'))
+if project_root_dir not in sys.path:
+    sys.path.insert(0, project_root_dir)
+# --- Fin de la modificación ---
+
+from utils.proveedores_datos import ProveedorDatos, COLUMNAS_OHLCV, duracion_periodo, a_ns, rango_indices
+from utils.cache_ohlcv import ventana_ohlcv
+
+# Remuestreo incremental: un único flujo de barras base por par (p. ej. 1m) del que se
+# derivan las barras de los periodos mayores (5m, 15m, 1h, 4h, 1d). Cada periodo guarda
+# sus barras cerradas en búferes que crecen por duplicación y la barra en curso aparte;
+# las barras base nuevas se agregan con np.*.reduceat sobre los grupos consecutivos del
+# mismo intervalo, sin recalcular lo ya agregado. Los intervalos se alinean con la época
+# Unix (UTC): 4h empieza a las 00:00, 04:00, ...; 1d a medianoche UTC, como resample().
+# Las barras base nuevas llegan leyendo el proveedor base o con agregar_barras_base (p. ej.
+# desde ProveedorReproduccion); en ambos casos se reparten a todos los periodos del par.
+CAPACIDAD_INICIAL = 1024
+
+def agregar_grupos(ids: np.ndarray, matriz: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Agrega filas OHLCV consecutivas con el mismo id de intervalo. Devuelve (ids de cada
+    grupo, matriz agregada): open del primero, high máximo, low mínimo, close del último y
+    suma de volumen.
+    """
+    if len(ids) == 0:
+        return ids, matriz
+    cortes = np.flatnonzero(np.diff(ids)) + 1
+    inicios = np.concatenate(([0], cortes))
+    finales = np.concatenate((cortes, [len(ids)])) - 1
+    agregada = np.empty((len(inicios), len(COLUMNAS_OHLCV)))
+    agregada[:, 0] = matriz[inicios, 0]
+    agregada[:, 1] = np.maximum.reduceat(matriz[:, 1], inicios)
+    agregada[:, 2] = np.minimum.reduceat(matriz[:, 2], inicios)
+    agregada[:, 3] = matriz[finales, 3]
+    agregada[:, 4] = np.add.reduceat(matriz[:, 4], inicios)
+    return ids[inicios], agregada
+
+class SerieAgregada:
+    """Barras cerradas de un periodo derivado y la barra en curso (aún abierta)."""
+    def __init__(self, paso: int, paso_base: int):
+        self.paso = paso
+        self.paso_base = paso_base
+        self.tiempos = np.empty(CAPACIDAD_INICIAL, dtype=np.int64)
+        self.matriz = np.empty((CAPACIDAD_INICIAL, len(COLUMNAS_OHLCV)))
+        self.filas = 0
+        self.parcial = None # (id de intervalo, fila OHLCV) de la barra en curso
+        self.inicio_ns = None # Primera barra base agregada
+        self.inicio_fuente = False # True si el proveedor base no tiene barras anteriores
+
+    def _anexar_cerradas(self, ids: np.ndarray, matriz: np.ndarray):
+        necesarias = self.filas + len(ids)
+        if necesarias > len(self.tiempos):
+            # Se copian a búferes nuevos: las ventanas ya servidas siguen apuntando a los anteriores
+            capacidad = max(necesarias, 2 * len(self.tiempos))
+            tiempos, agregada = np.empty(capacidad, dtype=np.int64), np.empty((capacidad, len(COLUMNAS_OHLCV)))
+            tiempos[:self.filas], agregada[:self.filas] = self.tiempos[:self.filas], self.matriz[:self.filas]
+            self.tiempos, self.matriz = tiempos, agregada
+        self.tiempos[self.filas:necesarias] = ids * self.paso
+        self.matriz[self.filas:necesarias] = matriz
+        self.filas = necesarias
+
+    def agregar(self, tiempos_base: np.ndarray, matriz_base: np.ndarray):
+        """Incorpora barras base posteriores a las ya agregadas."""
+        if len(tiempos_base) == 0:
+            return
+        if self.inicio_ns is None:
+            self.inicio_ns = int(tiempos_base[0])
+        ids = tiempos_base // self.paso
+        if self.parcial is not None:
+            ids = np.concatenate(([self.parcial[0]], ids))
+            matriz_base = np.vstack((self.parcial[1], matriz_base))
+        ids_grupo, agregada = agregar_grupos(ids, matriz_base)
+        # El último intervalo se cierra cuando llega su última barra base
+        ultimo_cerrado = int(tiempos_base[-1]) + self.paso_base >= (int(ids_grupo[-1]) + 1) * self.paso
+        num_cerradas = len(ids_grupo) if ultimo_cerrado else len(ids_grupo) - 1
+        self._anexar_cerradas(ids_grupo[:num_cerradas], agregada[:num_cerradas])
+        self.parcial = None if ultimo_cerrado else (int(ids_grupo[-1]), agregada[-1].copy())
+
+    def ventana(self, desde=None, hasta=None, limite: int | None = None, incluir_parcial: bool = False) -> pd.DataFrame:
+        tiempos, matriz = self.tiempos[:self.filas], self.matriz[:self.filas]
+        if incluir_parcial and self.parcial is not None:
+            tiempos = np.append(tiempos, self.parcial[0] * self.paso)
+            matriz = np.vstack((matriz, self.parcial[1]))
+        inicio, fin = rango_indices(tiempos, desde, hasta, limite)
+        vista = matriz[inicio:fin]
+        vista.flags.writeable = False # Es una vista del búfer: quien la recibe no debe modificarla
+        return ventana_ohlcv(tiempos[inicio:fin], vista)
+
+class ProveedorRemuestreado(ProveedorDatos):
+    """
+    Proveedor que sirve los periodos derivables de periodo_base (múltiplos suyos que dividen
+    un día, o el día) agregando las barras base de 'base'; los demás periodos (y el propio
+    periodo base, o todos si el par no tiene barras base) se piden directamente a 'base'. Por
+    defecto solo se sirven barras cerradas.
+    """
+    def __init__(self, base: ProveedorDatos, periodo_base: str = "1m", incluir_parcial: bool = False):
+        self.base = base
+        self.periodo_base = periodo_base
+        self.paso_base = duracion_periodo(periodo_base).value
+        self.incluir_parcial = incluir_parcial
+        self._lock = threading.Lock()
+        self._pares = {} # par -> {"lock", "ultimo_base", "series": {periodo: SerieAgregada}}
+        self.barras_base_leidas = 0
+
+    def derivable(self, periodo_tiempo: str) -> bool:
+        duracion = duracion_periodo(periodo_tiempo)
+        if duracion is None or duracion.value <= self.paso_base or duracion.value % self.paso_base:
+            return False
+        dia = pd.Timedelta(days=1).value
+        return dia % duracion.value == 0 or duracion.value == dia
+
+    def _estado_par(self, simbolo_par: str) -> dict:
+        with self._lock:
+            return self._pares.setdefault(simbolo_par, {"lock": threading.Lock(), "ultimo_base": None, "series": {}})
+
+    def _leer_base(self, simbolo_par: str, **rango) -> tuple[np.ndarray, np.ndarray]:
+        df = self.base.leer(simbolo_par, self.periodo_base, **rango)
+        if df is None or df.empty:
+            return np.empty(0, dtype=np.int64), np.empty((0, len(COLUMNAS_OHLCV)))
+        self.barras_base_leidas += len(df)
+        indice = df.index.tz_localize("UTC") if df.index.tz is None else df.index.tz_convert("UTC")
+        return indice.asi8.astype(np.int64), df[list(COLUMNAS_OHLCV)].to_numpy(dtype=np.float64)
+
+    def agregar_barras_base(self, simbolo_par: str, tiempos_base, matriz_base):
+        """Reparte barras base nuevas (timestamps en ns o fechas, y filas OHLCV) a todos los periodos del par."""
+        estado = self._estado_par(simbolo_par)
+        with estado["lock"]:
+            self._repartir(estado, np.asarray(pd.DatetimeIndex(pd.to_datetime(tiempos_base, utc=True)).asi8, dtype=np.int64),
+                           np.asarray(matriz_base, dtype=np.float64).reshape(-1, len(COLUMNAS_OHLCV)))
+
+    def _repartir(self, estado: dict, tiempos: np.ndarray, matriz: np.ndarray):
+        if estado["ultimo_base"] is not None:
+            nuevas = tiempos > estado["ultimo_base"]
+            tiempos, matriz = tiempos[nuevas], matriz[nuevas]
+        if len(tiempos) == 0:
+            return
+        for serie in estado["series"].values():
+            serie.agregar(tiempos, matriz)
+        estado["ultimo_base"] = int(tiempos[-1])
+
+    def _construir(self, simbolo_par: str, estado: dict, duracion: pd.Timedelta, desde_ns: int) -> SerieAgregada:
+        """Agrega de una vez las barras base desde el inicio del intervalo de desde_ns hasta la última repartida."""
+        serie = SerieAgregada(duracion.value, self.paso_base)
+        desde = pd.Timestamp((desde_ns // duracion.value) * duracion.value, tz="UTC")
+        hasta = pd.Timestamp(estado["ultimo_base"], tz="UTC") if estado["ultimo_base"] is not None else None
+        tiempos, matriz = self._leer_base(simbolo_par, desde=desde, hasta=hasta)
+        serie.agregar(tiempos, matriz)
+        serie.inicio_fuente = len(tiempos) == 0 or tiempos[0] > desde.value
+        if estado["ultimo_base"] is None and len(tiempos):
+            estado["ultimo_base"] = int(tiempos[-1])
+        return serie
+
+    def _desde_necesario(self, serie: SerieAgregada | None, paso: int, ultimo_base: int, desde, hasta, limite) -> int | None:
+        """Inicio (ns) desde el que hay que reconstruir la serie para cubrir la ventana, o None si ya la cubre."""
+        if desde is not None:
+            objetivo = a_ns(desde)
+        else:
+            fin = min(a_ns(hasta), ultimo_base) if hasta is not None else ultimo_base
+            objetivo = (fin // paso - (limite if limite is not None else 1)) * paso
+        if serie is None:
+            return objetivo
+        if serie.inicio_fuente or serie.inicio_ns is None or serie.inicio_ns <= objetivo:
+            return None
+        return objetivo
+
+    def leer(self, simbolo_par: str, periodo_tiempo: str, desde=None, hasta=None, limite: int | None = None) -> pd.DataFrame | None:
+        if not self.derivable(periodo_tiempo):
+            return self.base.leer(simbolo_par, periodo_tiempo, desde=desde, hasta=hasta, limite=limite)
+        duracion = duracion_periodo(periodo_tiempo)
+        estado = self._estado_par(simbolo_par)
+        with estado["lock"]:
+            if estado["ultimo_base"] is None:
+                tiempos, matriz = self._leer_base(simbolo_par, limite=1)
+                if len(tiempos) == 0:
+                    # Sin flujo base para el par (p. ej. solo hay archivos diarios): se pide el periodo tal cual
+                    return self.base.leer(simbolo_par, periodo_tiempo, desde=desde, hasta=hasta, limite=limite)
+            else:
+                # Una sola lectura de barras base nuevas para todos los periodos del par
+                tiempos, matriz = self._leer_base(simbolo_par, desde=pd.Timestamp(estado["ultimo_base"] + self.paso_base, tz="UTC"))
+            ultimo_base = max(int(tiempos[-1]) if len(tiempos) else estado["ultimo_base"], estado["ultimo_base"] or 0)
+            serie = estado["series"].get(periodo_tiempo)
+            desde_ns = self._desde_necesario(serie, duracion.value, ultimo_base, desde, hasta, limite)
+            if desde_ns is not None and estado["ultimo_base"] is None:
+                # Primera lectura del par: la serie se construye con todo hasta la última barra base
+                estado["series"][periodo_tiempo] = self._construir(simbolo_par, estado, duracion, desde_ns)
+            else:
+                self._repartir(estado, tiempos, matriz)
+                if desde_ns is not None:
+                    estado["series"][periodo_tiempo] = self._construir(simbolo_par, estado, duracion, desde_ns)
+            return estado["series"][periodo_tiempo].ventana(desde, hasta, limite, self.incluir_parcial)
+
+
+# Bloque de prueba
+if __name__ == '__main__':
+    import time
+    from utils.proveedores_datos import ProveedorSimulado
+
+    def remuestreo_pandas(df: pd.DataFrame, regla: str) -> pd.DataFrame:
+        return df.resample(regla, label="left", closed="left").agg(
+            {"open": "first", "high": "max", "low": "min", "close": "last", "volume": "sum"}).dropna()
+
+    print("Probando ProveedorRemuestreado...")
+    simulado = ProveedorSimulado(semilla=11, inicio="2024-01-01", fin="2024-03-31 11:59")
+    remuestreado = ProveedorRemuestreado(simulado, periodo_base="1m")
+    base_completa = simulado.leer("WLD/USDT", "1m")
+
+    for periodo, regla in (("5m", "5min"), ("15m", "15min"), ("1h", "1h"), ("4h", "4h"), ("1d", "1D")):
+        inicio = time.perf_counter()
+        ventana = remuestreado.obtener("WLD/USDT", periodo, 60)
+        esperado = remuestreo_pandas(base_completa, regla)
+        esperado = esperado[esperado.index + duracion_periodo(periodo) <= base_completa.index[-1] + pd.Timedelta(minutes=1)].tail(60)
+        print(f"  {periodo}: {len(ventana)} barras cerradas en {(time.perf_counter() - inicio) * 1000:.1f} ms; "
+              f"igual que resample(): {np.allclose(ventana.to_numpy(), esperado.to_numpy()) and ventana.index.equals(esperado.index)}")
+    print(f"  Barras base leídas: {remuestreado.barras_base_leidas}")
+
+    # Llegan 3 horas más de barras base: se agregan solo las nuevas, para todos los periodos del par
+    simulado.fin_ns = a_ns("2024-03-31 14:59")
+    leidas_antes = remuestreado.barras_base_leidas
+    ventanas = {periodo: remuestreado.obtener("WLD/USDT", periodo, 3) for periodo in ("5m", "1h", "4h", "1d")}
+    print(f"\n  Tras 180 barras base nuevas: leídas {remuestreado.barras_base_leidas - leidas_antes}; "
+          f"última barra 1h cerrada: {ventanas['1h'].index[-1]}; 4h: {ventanas['4h'].index[-1]}")
+    base_completa = simulado.leer("WLD/USDT", "1m")
+    esperado = remuestreo_pandas(base_completa, "1h").tail(3)
+    print(f"  1h igual que resample() sobre toda la historia: {np.allclose(ventanas['1h'].to_numpy(), esperado.to_numpy())}")
+
+    # Flujo empujado: las barras de una reproducción se agregan según llegan
+    parcial = ProveedorRemuestreado(simulado, periodo_base="1m", incluir_parcial=True)
+    parcial.obtener("WLD/USDT", "15m", 2)
+    nuevas = ProveedorSimulado(semilla=11, inicio="2024-01-01", fin="2024-03-31 15:06").leer("WLD/USDT", "1m", desde="2024-03-31 15:00")
+    parcial.agregar_barras_base("WLD/USDT", nuevas.index, nuevas.to_numpy())
+    print(f"  Barra de 15m en curso tras 7 barras base empujadas: {parcial.obtener('WLD/USDT', '15m', 1).iloc[-1].round(4).to_dict()}")
+
+    inicio = time.perf_counter()
+    for _ in range(1000):
+        remuestreado.obtener("WLD/USDT", "1h", 100)
+    print(f"  Lectura de 100 barras de 1h ya agregadas: {(time.perf_counter() - inicio):.3f} ms cada una")